@@ -115,13 +115,40 @@ async def get_task_performance(task_id: int):
     if task_id not in task_executor.running_tasks:
         return {"error": f"任务 {task_id} 未在运行"}
     
-    # 这里可以扩展获取具体任务的性能数据
-    # 例如从OptimizedAsyncProcessor获取性能报告
-    return {
-        "task_id": task_id,
-        "status": "running",
-        "message": "任务性能详细报告功能待实现"
-    }
+    processor = task_executor.frame_processors.get(task_id)
+    if processor is None:
+        return {"task_id": task_id, "status": "running", "message": "任务尚未创建帧处理器"}
+    
+    if hasattr(processor, "get_performance_report"):
+        report = processor.get_performance_report()
+    else:
+        report = {"task_id": task_id, "performance": processor.get_stats()}
+    report["status"] = "running"
+    return report
+
+@router.get("/frame-latency")
+def get_frame_latency():
+    """
+    获取各运行中任务的帧延迟统计
+    
+    按任务返回各阶段距采集/耗时的平均值、分位数和直方图（毫秒），主要阶段：
+    - frame_age: 帧采集到投递给检测的时间
+    - end_to_end: 帧采集到检测结果交付的时间
+    - alert: 帧采集到预警进入合并管理器的时间
+    - stream: 推流画面距采集的时间
+    """
+    tasks = {}
+    for task_id, processor in list(task_executor.frame_processors.items()):
+        try:
+            stats = processor.get_stats()
+            tasks[task_id] = {
+                "camera_id": getattr(processor, "camera_id", None),
+                "frames_expired": stats.get("frames_expired", 0),
+                "stage_timings": stats.get("stage_timings", {}),
+            }
+        except Exception as e:
+            logger.error(f"获取任务 {task_id} 帧延迟统计失败: {str(e)}")
+    return {"success": True, "tasks": tasks}
 
 @router.get("/frame-readers/stats")
 def get_frame_reader_stats():
@@ -0,0 +1,214 @@
+"""
+推理后端基准测试：同一模型分别经ONNX Runtime进程内后端和Triton路径推理，对比单帧延迟
+
+两条路径使用同一个技能实例（相同的预处理和后处理），只切换 INFERENCE_BACKEND_MODELS，
+逐帧统计总耗时和预处理/推理阶段的p50/p99。
+
+Triton路径:
+- 指定 --triton-url 时访问真实的Triton服务器（服务器上需部署同名模型）
+- 未指定时启动进程内假Triton服务，计算耗时取ONNX Runtime实测的推理中位数、输出取ONNX Runtime的真实输出，
+  即“无GPU设备上把同一模型部署到本机Triton”的情况，两条路径的差异就是gRPC序列化和往返开销
+
+模型目录下没有该模型时，若安装了onnx包，会生成一个输入输出与YOLO一致的小型测试模型（仅用于冒烟测试）。
+
+用法:
+    python -m app.benchmark.backend_benchmark --model yolo11_coco --onnx-repository /data/models --frames 200
+    python -m app.benchmark.backend_benchmark --skill coco_detector --triton-url 172.18.1.1:8201
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.fake_triton_server import FakeModelSpec, FakeTritonServer
+from app.services.frame_pipeline import PipelineSequencer, StageTimer
+from app.services.inference_backend import OnnxRuntimeBackend
+from app.services.synthetic_frame_source import SyntheticFrameSource
+
+logger = logging.getLogger("backend_benchmark")
+
+SKILL_DIR = os.path.join(PROJECT_ROOT, "app", "plugins", "skills")
+
+
+def build_test_yolo_model(model_repository: str, model_name: str, num_classes: int = 80, input_size: int = 640):
+    """
+    生成输入输出与YOLO一致的小型ONNX模型: images [N,3,S,S] -> output0 [N,4+nc,anchors]
+
+    三个步长（8/16/32）的卷积头拼接成锚点维度，计算量远小于真实模型，只用于验证链路。
+    """
+    import numpy as np
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    channels = 4 + num_classes
+    nodes, initializers, heads = [], [], []
+    for stride in (8, 16, 32):
+        weight = rng.normal(0, 0.01, (channels, 3, stride, stride)).astype(np.float32)
+        initializers.append(numpy_helper.from_array(weight, f"w{stride}"))
+        nodes.append(helper.make_node("Conv", ["images", f"w{stride}"], [f"conv{stride}"], strides=[stride, stride]))
+        initializers.append(numpy_helper.from_array(np.array([0, channels, -1], dtype=np.int64), f"shape{stride}"))
+        nodes.append(helper.make_node("Reshape", [f"conv{stride}", f"shape{stride}"], [f"head{stride}"]))
+        heads.append(f"head{stride}")
+    nodes.append(helper.make_node("Concat", heads, ["output0"], axis=2))
+
+    num_anchors = sum((input_size // s) ** 2 for s in (8, 16, 32))
+    graph = helper.make_graph(
+        nodes, model_name,
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, input_size, input_size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", channels, num_anchors])],
+        initializer=initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    os.makedirs(os.path.join(model_repository, model_name, "1"), exist_ok=True)
+    path = os.path.join(model_repository, model_name, "1", "model.onnx")
+    onnx.save(model, path)
+    return path
+
+
+def measure(skill, frames, warmup: int) -> Dict[str, Dict[str, float]]:
+    """逐帧调用技能，返回各阶段（含total）的耗时统计"""
+    sequencer = PipelineSequencer()
+    timer = StageTimer(window=len(frames))
+    for frame in frames[:warmup]:
+        skill.process(frame)
+
+    for frame in frames:
+        with sequencer.frame(sequencer.next_seq()) as stages:
+            start = time.perf_counter()
+            result = skill.process(frame)
+            total = time.perf_counter() - start
+        if not result.success:
+            raise RuntimeError(f"技能处理失败: {result.error_message}")
+        timer.record({**stages, "total": total})
+    return timer.get_stats()
+
+
+def fake_spec_from_onnx(backend: OnnxRuntimeBackend, model_name: str, frame_input: Dict[str, Any],
+                        compute_ms: float) -> FakeModelSpec:
+    """按ONNX模型的输入输出构造假Triton模型，输出使用ONNX Runtime的真实输出"""
+    metadata = backend.get_model_metadata(model_name)
+    outputs = backend.infer(model_name, frame_input)
+    batched = all(inp["shape"] and inp["shape"][0] == -1 for inp in metadata["inputs"])
+
+    def dims(shape):
+        return shape[1:] if batched else shape
+
+    canned = {name: (value[0] if batched else value) for name, value in outputs.items()}
+    return FakeModelSpec(
+        inputs=[(inp["name"], inp["datatype"], dims(inp["shape"])) for inp in metadata["inputs"]],
+        outputs=[(out["name"], out["datatype"], list(canned[out["name"]].shape)) for out in metadata["outputs"]],
+        max_batch_size=16 if batched else 0,
+        compute_ms=compute_ms,
+        per_item_ms=0.0,
+        canned_outputs=canned,
+    )
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.services.triton_client import triton_client
+    from app.skills.skill_factory import skill_factory
+
+    repository = args.onnx_repository or settings.ONNX_MODEL_REPOSITORY or settings.TRITON_MODEL_REPOSITORY
+    probe = OnnxRuntimeBackend(repository)
+    if probe.resolve_model_path(args.model) is None:
+        repository = tempfile.mkdtemp(prefix="onnx_bench_")
+        path = build_test_yolo_model(repository, args.model)
+        print(f"模型目录中没有 {args.model}，已生成测试模型: {path}")
+
+    settings.ONNX_MODEL_REPOSITORY = repository
+    settings.ONNX_INTRA_OP_THREADS = args.intra_op_threads
+    settings.ONNX_INTER_OP_THREADS = args.inter_op_threads
+
+    skill_factory.scan_and_register_skills(SKILL_DIR)
+    skill_class = skill_factory.get_skill_class(args.skill)
+    if skill_class is None:
+        raise RuntimeError(f"技能 {args.skill} 不存在")
+    config = dict(skill_class.DEFAULT_CONFIG)
+    config["required_models"] = [args.model]
+    skill = skill_factory.create_skill(args.skill, config)
+    if skill is None:
+        raise RuntimeError(f"创建技能 {args.skill} 实例失败")
+
+    source = SyntheticFrameSource(args.width, args.height, fps=0, objects=args.objects)
+    frames = [source.read()[1] for _ in range(args.frames)]
+
+    # 1. ONNX Runtime进程内后端
+    settings.INFERENCE_BACKEND_MODELS = {args.model: OnnxRuntimeBackend.name}
+    backend = triton_client._get_local_backend(args.model)
+    onnx_stats = measure(skill, frames, args.warmup)
+
+    # 2. Triton路径
+    server = None
+    if args.triton_url:
+        url = args.triton_url
+    else:
+        spec = fake_spec_from_onnx(backend, args.model, {"images": skill.preprocess(frames[0])},
+                                   onnx_stats["inference"]["p50_ms"])
+        server = FakeTritonServer(models={args.model: spec}, rpc_latency_ms=args.latency_ms)
+        url = server.start()
+    settings.INFERENCE_BACKEND_MODELS = {args.model: "triton"}
+    triton_client.url = url
+    triton_client.invalidate_model_binding(args.model)
+    if not triton_client.reconnect():
+        raise RuntimeError(f"无法连接Triton服务 {url}")
+    try:
+        triton_stats = measure(skill, frames, args.warmup)
+    finally:
+        if server:
+            server.stop()
+
+    return {"onnxruntime": onnx_stats, "triton": triton_stats, "triton_url": url, "simulated": server is not None}
+
+
+def print_report(report: Dict[str, Any]):
+    triton_label = "triton(模拟)" if report["simulated"] else "triton"
+    print(f"\n{'后端':<14} {'阶段':<12} {'p50(ms)':>9} {'p99(ms)':>9} {'平均(ms)':>9}")
+    for label, key in (("onnxruntime", "onnxruntime"), (triton_label, "triton")):
+        for stage in ("preprocess", "inference", "total"):
+            stats = report[key].get(stage)
+            if stats:
+                print(f"{label:<14} {stage:<12} {stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['avg_ms']:>9.2f}")
+    onnx_total = report["onnxruntime"]["total"]["p50_ms"]
+    triton_total = report["triton"]["total"]["p50_ms"]
+    print(f"\n单帧延迟p50: onnxruntime {onnx_total:.2f}ms vs {triton_label} {triton_total:.2f}ms "
+          f"（差值 {triton_total - onnx_total:+.2f}ms）")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ONNX Runtime后端与Triton路径单帧延迟对比")
+    parser.add_argument("--model", default="yolo11_coco", help="模型名称")
+    parser.add_argument("--skill", default="coco_detector", help="用于预处理/后处理的技能名称")
+    parser.add_argument("--onnx-repository", default="", help="ONNX模型目录，默认使用配置")
+    parser.add_argument("--triton-url", default="", help="真实Triton服务地址，为空时使用进程内假Triton服务")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="假Triton服务额外的网络开销（毫秒）")
+    parser.add_argument("--intra-op-threads", type=int, default=0, help="ONNX Runtime单次推理的并行线程数")
+    parser.add_argument("--inter-op-threads", type=int, default=1, help="ONNX Runtime算子间并行线程数")
+    parser.add_argument("--frames", type=int, default=100, help="计时帧数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热帧数")
+    parser.add_argument("--width", type=int, default=1920, help="帧宽度")
+    parser.add_argument("--height", type=int, default=1080, help="帧高度")
+    parser.add_argument("--objects", type=int, default=3, help="合成画面中的移动目标数")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    report = run_benchmark(args)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+BoTSORT人员跟踪技能外观特征与卡尔曼滤波批量化的基准测试与一致性检查
+
+1. 一致性:
+   - LBP: 随机灰度图（含平坦区域、极小尺寸、不同半径/采样点数）上，原逐像素三重循环与 compute_lbp_images 的编码图完全相同
+   - 外观特征: 随机图像和检测框（含越界框、空框、极小框、纯色区域，特征维度截断/填充两种情况）上，
+     原逐框实现与批量实现的特征向量完全相同（空框的随机特征在相同随机种子下也相同）
+   - 卡尔曼滤波: 随机的预测/更新序列上，原逐轨迹 KalmanFilter 与 BatchKalmanFilter 的预测框一致
+   - 跟踪器: 同一检测序列上，原逐轨迹实现与 BotSortTracker 每帧所有轨迹的状态和确认输出（ID、框、停留时间）完全相同
+2. 耗时: 5/25/100 个人员时，每帧外观特征提取 + 跟踪更新的耗时（不含模型推理）
+
+用法:
+    python -m app.benchmark.botsort_benchmark
+    python -m app.benchmark.botsort_benchmark --persons 5 25 100 200 --frames 100 --reference-frames 1
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.tracker_benchmark import generate_sequence
+from app.plugins.skills.person_botsort_skill import (BatchKalmanFilter, BotSortTracker, PersonBotSortSkill, Track,
+                                                     compute_lbp_images)
+
+
+def reference_lbp(gray_image: np.ndarray, radius: int = 1, n_points: int = 8) -> np.ndarray:
+    """原 _compute_lbp_features 的逐像素LBP编码"""
+    height, width = gray_image.shape
+    lbp = np.zeros_like(gray_image)
+    for i in range(radius, height - radius):
+        for j in range(radius, width - radius):
+            center = gray_image[i, j]
+            binary_string = ''
+            for k in range(n_points):
+                angle = 2 * np.pi * k / n_points
+                x = int(i + radius * np.cos(angle))
+                y = int(j + radius * np.sin(angle))
+                binary_string += '1' if gray_image[x, y] >= center else '0'
+            lbp[i, j] = int(binary_string, 2)
+    return lbp
+
+
+def reference_features(image: np.ndarray, detections: List[List], feature_dim: int) -> List[np.ndarray]:
+    """原 _extract_appearance_features 的逐框实现"""
+    features = []
+    for det in detections:
+        x1, y1, x2, y2 = [int(coord) for coord in det[:4]]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2 = min(image.shape[1], x2)
+        y2 = min(image.shape[0], y2)
+        if x2 <= x1 or y2 <= y1:
+            features.append(np.random.rand(feature_dim))
+            continue
+        roi_resized = cv2.resize(image[y1:y2, x1:x2], (64, 128))
+        color_features = []
+        for i in range(3):
+            hist = cv2.calcHist([roi_resized], [i], None, [16], [0, 256])
+            color_features.extend(hist.flatten())
+        hsv_roi = cv2.cvtColor(roi_resized, cv2.COLOR_BGR2HSV)
+        hsv_hist = cv2.calcHist([hsv_roi], [0, 1], None, [8, 8], [0, 180, 0, 256])
+        color_features.extend(hsv_hist.flatten())
+        gray_roi = cv2.cvtColor(roi_resized, cv2.COLOR_BGR2GRAY)
+        hist, _ = np.histogram(reference_lbp(gray_roi).ravel(), bins=32, range=(0, 256))
+        all_features = np.concatenate([color_features, hist.astype(np.float32)])
+        all_features = all_features / (np.linalg.norm(all_features) + 1e-6)
+        if len(all_features) > feature_dim:
+            features.append(all_features[:feature_dim])
+        else:
+            padded = np.zeros(feature_dim)
+            padded[:len(all_features)] = all_features
+            features.append(padded)
+    return features
+
+
+class ReferenceKalmanFilter:
+    """原逐轨迹 KalmanFilter"""
+
+    def __init__(self, bbox):
+        self.x = np.array([bbox[0] + bbox[2] / 2, bbox[1] + bbox[3] / 2, bbox[2], bbox[3], 0, 0, 0, 0],
+                          dtype=np.float32)
+        self.F = np.eye(8, dtype=np.float32)
+        self.F[:4, 4:] = np.eye(4, dtype=np.float32)
+        self.H = np.eye(4, 8, dtype=np.float32)
+        self.Q = np.eye(8, dtype=np.float32) * 1.0
+        self.Q[4:, 4:] *= 0.01
+        self.R = np.eye(4, dtype=np.float32) * 10.0
+        self.P = np.eye(8, dtype=np.float32) * 1000.0
+
+    def predict(self):
+        self.x = np.dot(self.F, self.x)
+        self.P = np.dot(np.dot(self.F, self.P), self.F.T) + self.Q
+
+    def update(self, bbox):
+        z = np.array([bbox[0] + bbox[2] / 2, bbox[1] + bbox[3] / 2, bbox[2], bbox[3]], dtype=np.float32)
+        S = np.dot(np.dot(self.H, self.P), self.H.T) + self.R
+        K = np.dot(np.dot(self.P, self.H.T), np.linalg.inv(S))
+        self.x = self.x + np.dot(K, z - np.dot(self.H, self.x))
+        self.P = np.dot(np.eye(8) - np.dot(K, self.H), self.P)
+
+    def get_bbox(self):
+        cx, cy, w, h = self.x[0], self.x[1], self.x[2], self.x[3]
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+class ReferenceTracker(BotSortTracker):
+    """原逐轨迹实现: 每条轨迹一个卡尔曼滤波器，逐对计算IoU，列表查找未匹配项"""
+
+    def update(self, detections, features=None):
+        self.frame_count += 1
+        for track in self.tracks:
+            track.predict()
+            track.reference_kalman.predict()
+        matched_tracks, unmatched_detections, unmatched_tracks = self._associate(detections, features)
+        for track_idx, det_idx in matched_tracks:
+            feat = features[det_idx] if features else None
+            self.tracks[track_idx].reference_kalman.update(detections[det_idx][:4])
+            self.tracks[track_idx].update(detections[det_idx][:4], detections[det_idx][4], feat, self.frame_count)
+        for det_idx in unmatched_detections:
+            feat = features[det_idx] if features else None
+            track = Track(detections[det_idx][:4], detections[det_idx][4], feat)
+            track.reference_kalman = ReferenceKalmanFilter(detections[det_idx][:4])
+            track.first_seen_frame = self.frame_count
+            track.last_seen_frame = self.frame_count
+            self.tracks.append(track)
+        for track_idx in unmatched_tracks:
+            self.tracks[track_idx].mark_missed()
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        return [{'bbox': track.bbox, 'track_id': track.track_id, 'confidence': track.confidence, 'class_id': 0,
+                 'class_name': 'person', 'dwell_time': self.frame_count - track.first_seen_frame}
+                for track in self.tracks if track.is_confirmed()]
+
+    def _compute_iou_distance(self, detections):
+        track_bboxes = [track.reference_kalman.get_bbox() for track in self.tracks]
+        iou_matrix = np.zeros((len(track_bboxes), len(detections)))
+        for i, box1 in enumerate(track_bboxes):
+            for j, det in enumerate(detections):
+                box2 = det[:4]
+                x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+                x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+                if x2 <= x1 or y2 <= y1:
+                    iou = 0.0
+                else:
+                    intersection = (x2 - x1) * (y2 - y1)
+                    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + \
+                        (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection
+                    iou = intersection / union if union > 0 else 0.0
+                iou_matrix[i, j] = 1.0 - iou
+        return iou_matrix
+
+    def _associate(self, detections, features):
+        if not self.tracks:
+            return [], list(range(len(detections))), []
+        cost_matrix = self._compute_iou_distance(detections)
+        if features and any(t.feature_history for t in self.tracks):
+            appearance_matrix = self._compute_appearance_distance(features)
+            cost_matrix = self.lambda_param * cost_matrix + (1 - self.lambda_param) * appearance_matrix
+        from scipy.optimize import linear_sum_assignment
+        track_indices, det_indices = linear_sum_assignment(cost_matrix)
+        matches = [(t, d) for t, d in zip(track_indices, det_indices) if cost_matrix[t, d] < 0.8]
+        unmatched_tracks = [i for i in range(len(self.tracks)) if i not in [m[0] for m in matches]]
+        unmatched_detections = [i for i in range(len(detections)) if i not in [m[1] for m in matches]]
+        return matches, unmatched_detections, unmatched_tracks
+
+
+def make_image(rng: np.random.Generator, width: int = 1920, height: int = 1080) -> np.ndarray:
+    """带平滑区域、纯色块和噪声的合成画面"""
+    image = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    image = cv2.addWeighted(image, 3.0, image, 0, -200)
+    for _ in range(20):
+        x, y = rng.integers(0, width - 100), rng.integers(0, height - 100)
+        image[y:y + rng.integers(10, 100), x:x + rng.integers(10, 100)] = rng.integers(0, 256, 3)
+    return image
+
+
+def random_boxes(rng: np.random.Generator, image: np.ndarray, count: int) -> List[List]:
+    """随机检测框，含越界框、空框和极小框"""
+    height, width = image.shape[:2]
+    boxes = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(-50, width), rng.uniform(-50, height)
+        w, h = rng.choice([rng.uniform(1, 3), rng.uniform(20, 300)]), rng.choice([rng.uniform(1, 3), rng.uniform(40, 400)])
+        boxes.append([float(x1), float(y1), float(x1 + w), float(y1 + h), 0.9])
+    boxes += [[10.0, 10.0, 10.5, 40.0, 0.9], [width + 5.0, 0.0, width + 50.0, 50.0, 0.9], [0.0, 0.0, 1.0, 1.0, 0.9]]
+    return boxes
+
+
+def check_lbp(rng: np.random.Generator) -> int:
+    checked = 0
+    shapes = [(128, 64), (40, 33), (3, 3), (2, 7), (5, 2), (17, 1)]
+    for shape in shapes:
+        for radius, n_points in ((1, 8), (2, 8), (1, 4), (3, 6)):
+            images = rng.integers(0, 256, (3,) + shape, dtype=np.uint8)
+            images[1] //= 64  # 大量相等的像素
+            images[2] = 128
+            batched = compute_lbp_images(images, radius, n_points)
+            for image, actual in zip(images, batched):
+                assert np.array_equal(actual, reference_lbp(image, radius, n_points)), \
+                    f"LBP不一致: shape={shape} radius={radius} n_points={n_points}"
+                checked += 1
+    return checked
+
+
+def check_features(rng: np.random.Generator, rounds: int, boxes_per_round: int) -> int:
+    checked = 0
+    for round_index in range(rounds):
+        image = make_image(rng, 640, 480)
+        boxes = random_boxes(rng, image, boxes_per_round)
+        feature_dim = 128 if round_index % 2 == 0 else 200
+        skill = PersonBotSortSkill({"params": {"feature_dim": feature_dim}})
+        np.random.seed(round_index)
+        expected = reference_features(image, boxes, feature_dim)
+        np.random.seed(round_index)
+        actual = skill._extract_appearance_features(image, boxes)
+        assert len(actual) == len(expected)
+        for index, (a, e) in enumerate(zip(actual, expected)):
+            assert a.dtype == e.dtype and np.array_equal(a, e), f"第{round_index}轮第{index}个框的特征不一致: {boxes[index]}"
+        checked += len(boxes)
+    return checked
+
+
+def check_kalman(rng: np.random.Generator, tracks: int, steps: int) -> float:
+    bboxes = rng.uniform([0, 0, 20, 40], [1800, 1000, 120, 240], (tracks, 4))
+    references = [ReferenceKalmanFilter(bbox) for bbox in bboxes]
+    batch = BatchKalmanFilter()
+    batch.add(bboxes)
+    max_error = 0.0
+    for _ in range(steps):
+        for kf in references:
+            kf.predict()
+        batch.predict()
+        rows = np.flatnonzero(rng.random(tracks) < 0.7)
+        bboxes[rows] += rng.normal(0, 3, (len(rows), 4))
+        for row in rows:
+            references[row].update(bboxes[row])
+        batch.update(rows, bboxes[rows])
+        expected = np.array([kf.get_bbox() for kf in references], dtype=np.float64)
+        error = np.abs(batch.get_bboxes() - expected) / np.maximum(1.0, np.abs(expected))
+        max_error = max(max_error, float(error.max()))
+    assert max_error < 1e-4, f"卡尔曼滤波预测框误差过大: {max_error}"
+    return max_error
+
+
+def to_detections(dets: np.ndarray) -> List[List]:
+    return [[float(v) for v in det[:4]] + [float(det[4])] for det in dets]
+
+
+def sequence_features(dets: np.ndarray, rng: np.random.Generator, dim: int = 128) -> List[np.ndarray]:
+    """按目标编号生成稳定的特征（加少量噪声），误检为随机特征"""
+    base = np.random.default_rng(12345).random((10000, dim))
+    return [base[int(label)] + rng.normal(0, 0.05, dim) if label >= 0 else rng.random(dim) for label in dets[:, 5]]
+
+
+def track_states(tracker: BotSortTracker) -> List[tuple]:
+    """所有轨迹（含未确认的）的状态，比只比较确认的输出更严格"""
+    return [(t.track_id, t.state, t.hits, t.age, t.time_since_update, t.last_seen_frame, list(t.bbox))
+            for t in tracker.tracks]
+
+
+def check_tracker(num_objects: int, frames: int, seed: int) -> Dict[str, int]:
+    sequence = generate_sequence(num_objects, frames, seed=seed)
+    rng_a, rng_b = np.random.default_rng(seed), np.random.default_rng(seed)
+    Track.count = 0
+    reference = ReferenceTracker()
+    expected = []
+    for dets in sequence:
+        output = reference.update(to_detections(dets), sequence_features(dets, rng_a))
+        expected.append((output, track_states(reference)))
+    Track.count = 0
+    tracker = BotSortTracker()
+    result = {"outputs": 0, "states": 0}
+    for frame, dets in enumerate(sequence):
+        output = tracker.update(to_detections(dets), sequence_features(dets, rng_b))
+        assert (output, track_states(tracker)) == expected[frame], f"第{frame}帧跟踪结果不一致"
+        result["outputs"] += len(output)
+        result["states"] += len(tracker.tracks)
+    return result
+
+
+def time_frames(skill_factory, extract, image: np.ndarray, sequence: List[np.ndarray]) -> float:
+    """每帧 外观特征提取 + 跟踪更新 的平均耗时（第一帧预热）"""
+    skill = skill_factory()
+    elapsed = 0.0
+    for frame, dets in enumerate(sequence):
+        detections = to_detections(dets)
+        begin = time.perf_counter()
+        features = extract(skill, image, detections)
+        skill.tracker.update(detections, features)
+        if frame:
+            elapsed += time.perf_counter() - begin
+    return elapsed / max(1, len(sequence) - 1)
+
+
+def run_timing(args) -> List[Dict[str, float]]:
+    image = make_image(np.random.default_rng(args.seed))
+
+    def reference_skill():
+        skill = PersonBotSortSkill()
+        skill.tracker = ReferenceTracker()
+        return skill
+
+    rows = []
+    for persons in args.persons:
+        sequence = generate_sequence(persons, args.frames + 1, seed=args.seed, clutter=0)
+        new = time_frames(PersonBotSortSkill, lambda skill, img, dets: skill._extract_appearance_features(img, dets),
+                          image, sequence)
+        old = time_frames(reference_skill, lambda skill, img, dets: reference_features(img, dets, skill.feature_dim),
+                          image, sequence[:args.reference_frames + 1])
+        rows.append({"persons": persons, "reference": old, "batched": new})
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BoTSORT人员跟踪技能批量化的基准测试与一致性检查")
+    parser.add_argument("--persons", type=int, nargs="+", default=[5, 25, 100], help="每帧人员数")
+    parser.add_argument("--frames", type=int, default=50, help="批量实现计时帧数")
+    parser.add_argument("--reference-frames", type=int, default=2, help="原实现计时帧数（逐像素LBP很慢）")
+    parser.add_argument("--feature-rounds", type=int, default=6, help="外观特征一致性检查轮数")
+    parser.add_argument("--boxes", type=int, default=12, help="每轮检测框数")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+
+    print(f"LBP一致性: {check_lbp(rng)} 张图的编码与逐像素实现完全相同")
+    print(f"外观特征一致性: {check_features(rng, args.feature_rounds, args.boxes)} 个检测框的特征与逐框实现完全相同")
+    print(f"卡尔曼滤波一致性: 预测框最大相对误差 {check_kalman(rng, 50, 200):.2e}")
+    for num_objects in (5, 40):
+        result = check_tracker(num_objects, 150, args.seed + num_objects)
+        print(f"跟踪器一致性: {num_objects} 个目标 150 帧，{result['states']} 条轨迹状态、"
+              f"{result['outputs']} 条确认输出完全相同")
+
+    print(f"\n每帧外观特征 + 跟踪耗时（批量 {args.frames} 帧、原实现 {args.reference_frames} 帧平均，不含推理）:")
+    print(f"{'人员数':>6} {'原实现':>12} {'批量实现':>10} {'加速':>7}")
+    for row in run_timing(args):
+        print(f"{row['persons']:>6} {row['reference'] * 1000:>10.1f}ms {row['batched'] * 1000:>8.2f}ms "
+              f"{row['reference'] / row['batched']:>6.0f}x")
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+解码基准测试：原始分辨率解码 vs 直接解码为推理尺寸（缩放解码）
+
+用本地测试视频分别驱动 ThreadedFrameReader 的两条解码路径，对比每路摄像头的开销:
+- FFmpeg管道: 不限速读完整个视频，统计管道吞吐（MB/s、帧/s）、每帧字节数以及FFmpeg子进程内存峰值，
+  并换算为按源帧率实时读取时每路摄像头的管道带宽。无GPU时使用软件解码，管道数据量与NVDEC路径相同
+- OpenCV: 按源帧率实时读取，统计输出帧率、每秒输出帧字节数、读取器常驻帧内存以及进程内存增量
+两条路径都会测量一次预警截图所需的全分辨率取帧耗时（OpenCV为缓存原图，FFmpeg为重新抓帧），
+并在缩放解码时模拟若干次预警（取检测帧，经过预警调度延迟后按预警流程还原原图），统计截图为同一帧原图、
+之后的原图（标记为之后的帧）和仍为检测分辨率的预警数。
+缩放解码的输出帧覆盖输入尺寸（两个方向都不小于输入尺寸，源分辨率更小时保持原图），测试前先检查常见分辨率组合。
+
+未指定 --video 时用合成视频源生成测试视频（需要OpenCV支持mp4v编码）。
+
+用法:
+    python -m app.benchmark.decode_benchmark --width 1920 --height 1080 --input-size 640 640
+    python -m app.benchmark.decode_benchmark --video /data/sample_4k.mp4 --frame-interval 0.1
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.adaptive_frame_reader import ThreadedFrameReader
+from app.services.synthetic_frame_source import SyntheticFrameSource
+
+logger = logging.getLogger("decode_benchmark")
+
+
+class OpenCVFrameReader(ThreadedFrameReader):
+    """固定使用OpenCV解码的读取器"""
+
+    def _check_nvdec_available(self) -> bool:
+        return False
+
+
+class SoftwareFFmpegFrameReader(ThreadedFrameReader):
+    """FFmpeg管道读取器，无GPU时使用软件解码，其余逻辑（滤镜、管道读取、全分辨率抓帧）与NVDEC路径一致"""
+
+    pace_local_files = False  # 不限速读完视频
+
+    def _check_nvdec_available(self) -> bool:
+        return True
+
+    def _select_ffmpeg_decoder(self, codec_name: str) -> Optional[str]:
+        return None
+
+    def _get_stream_info(self) -> Tuple[int, int, str]:
+        cap = cv2.VideoCapture(self.stream_url)
+        try:
+            return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), "h264"
+        finally:
+            cap.release()
+
+
+def check_scaled_sizes():
+    """缩放解码尺寸在两个方向上都不小于输入尺寸（源更小时不放大），宽高为偶数"""
+    sources = [(1920, 1080), (2560, 1440), (3840, 2160), (1280, 720), (704, 576), (1080, 1920), (640, 480)]
+    inputs = [(640, 640), (320, 320), (1280, 1280), (640, 384), (416, 416), (641, 641)]
+    for source in sources:
+        for input_size in inputs:
+            width, height = ThreadedFrameReader._compute_scaled_size(*source, input_size)
+            assert width >= min(input_size[0], source[0]) and height >= min(input_size[1], source[1]), \
+                f"{source} -> {input_size}: 缩放尺寸 {width}x{height} 小于输入尺寸"
+            assert width <= source[0] and height <= source[1], f"{source} -> {input_size}: 不应放大"
+            if (width, height) != source:
+                assert width % 2 == 0 and height % 2 == 0, f"{source} -> {input_size}: {width}x{height}"
+
+
+def write_test_video(path: str, width: int, height: int, fps: int, seconds: float) -> str:
+    """用合成视频源生成本地测试视频"""
+    source = SyntheticFrameSource(width, height, fps=0, objects=3)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV无法写入mp4v视频，请通过 --video 指定测试视频")
+    for _ in range(int(fps * seconds)):
+        writer.write(source.read()[1])
+    writer.release()
+    return path
+
+
+def _rss_mb(process) -> float:
+    try:
+        return process.memory_info().rss / 1024 / 1024
+    except Exception:
+        return 0.0
+
+
+def _measure_full_resolution(reader: ThreadedFrameReader) -> Dict[str, Any]:
+    start = time.perf_counter()
+    full_frame = reader.get_full_resolution_frame()
+    return {
+        "full_grab_ms": (time.perf_counter() - start) * 1000,
+        "full_grab_shape": None if full_frame is None else tuple(full_frame.shape[:2][::-1]),
+    }
+
+
+class AlertFrameReader:
+    """预警流程使用的帧读取器接口（与 AdaptiveFrameReader 一致），包装基准测试中的 ThreadedFrameReader"""
+
+    camera_id = 0
+
+    def __init__(self, reader: ThreadedFrameReader, input_size: Tuple[int, int]):
+        self.reader = reader
+        self.input_size = input_size
+
+    def get_full_resolution_frame(self, generation: Optional[int] = None, allow_later: bool = False):
+        return self.reader.get_full_resolution_frame(generation, allow_later)
+
+
+def _measure_alerts(reader: ThreadedFrameReader, output_size: Optional[Tuple[int, int]],
+                    delays: List[float], alerts: int) -> Dict[str, Any]:
+    """模拟预警：取检测帧，等待预警调度延迟后按预警流程还原原图，统计截图来源"""
+    from app.services.ai_task_executor import AITaskExecutor
+
+    counts = {"same_frame": 0, "later_frame": 0, "detection_resolution": 0}
+    if not output_size:
+        return {"alerts": counts}
+    alert_reader = AlertFrameReader(reader, output_size)
+    source = (reader.source_height, reader.source_width)
+    for i in range(alerts):
+        frame, info = reader.get_latest_frame_with_info()
+        if frame is None:
+            break
+        time.sleep(delays[i % len(delays)])
+        alert_data = {"detections": [{"bbox": [10, 10, 50, 50]}]}
+        screenshot, alert_data = AITaskExecutor._restore_alert_resolution(frame, alert_data, alert_reader, info)
+        if screenshot.shape[:2] != source:
+            counts["detection_resolution"] += 1
+        elif alert_data.get("screenshot_frame", {}).get("later_frame"):
+            counts["later_frame"] += 1
+        else:
+            counts["same_frame"] += 1
+    return {"alerts": counts}
+
+
+def run_ffmpeg(video: str, output_size: Optional[Tuple[int, int]], source_fps: float,
+               delays: List[float], alerts: int) -> Dict[str, Any]:
+    """FFmpeg管道：不限速读完视频，统计管道吞吐和FFmpeg子进程内存峰值"""
+    import psutil
+
+    reader = SoftwareFFmpegFrameReader(video, frame_interval=None, output_size=output_size)
+    start = time.perf_counter()
+    if not reader.start() or not reader.use_nvdec:
+        raise RuntimeError("FFmpeg管道启动失败")
+    # 首帧已到达，读取器仍在运行时测量全分辨率抓帧和预警截图（管道中没有原图，每次预警都需重新抓帧）
+    full_stats = _measure_full_resolution(reader)
+    full_stats.update(_measure_alerts(reader, output_size, delays, alerts))
+
+    child = psutil.Process(reader.ffmpeg_process.pid)
+    peak_rss = 0.0
+    while reader.running:
+        peak_rss = max(peak_rss, _rss_mb(child))
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    stats = reader.get_stats()
+    reader.stop()
+
+    frames = stats["frames_retrieved"]
+    frame_bytes = stats["pipe_bytes"] / frames if frames else 0
+    return {
+        "resolution": stats["output_resolution"],
+        "frames": frames,
+        "fps": frames / elapsed,
+        "pipe_mb_per_s": stats["pipe_bytes"] / elapsed / 1024 / 1024,
+        "frame_kb": frame_bytes / 1024,
+        "realtime_mb_per_s": frame_bytes * source_fps / 1024 / 1024,
+        "decoder_rss_mb": peak_rss,
+        **full_stats,
+    }
+
+
+def run_opencv(video: str, output_size: Optional[Tuple[int, int]], frame_interval: Optional[float],
+               seconds: float, delays: List[float], alerts: int) -> Dict[str, Any]:
+    """OpenCV：按源帧率实时读取，统计输出帧字节数和读取器内存"""
+    import psutil
+
+    process = psutil.Process()
+    rss_before = _rss_mb(process)
+    reader = OpenCVFrameReader(video, frame_interval=frame_interval, output_size=output_size)
+    if not reader.start():
+        raise RuntimeError("OpenCV读取器启动失败")
+
+    before = dict(reader.stats)
+    cpu_start = os.times()
+    time.sleep(seconds)
+    cpu_end = os.times()
+    after = dict(reader.stats)
+    rss_after = _rss_mb(process)
+
+    with reader.frame_lock:
+        latest = reader.latest_frame
+        resident_bytes = (latest.nbytes if latest is not None else 0) + \
+            sum(full.nbytes for _, full in reader._full_frames)
+        frame_bytes = latest.nbytes if latest is not None else 0
+    full_stats = _measure_full_resolution(reader)
+    full_stats.update(_measure_alerts(reader, output_size, delays, alerts))
+    stats = reader.get_stats()
+    reader.stop()
+
+    retrieved = after["frames_retrieved"] - before["frames_retrieved"]
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    return {
+        "resolution": stats["output_resolution"],
+        "decode_fps": (after["frames_grabbed"] - before["frames_grabbed"]) / seconds,
+        "fps": retrieved / seconds,
+        "output_mb_per_s": retrieved * frame_bytes / seconds / 1024 / 1024,
+        "frame_kb": frame_bytes / 1024,
+        "resident_mb": resident_bytes / 1024 / 1024,
+        "rss_delta_mb": rss_after - rss_before,
+        "cpu_cores": cpu / seconds,
+        **full_stats,
+    }
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    tmp_dir = None
+    video = args.video
+    if not video:
+        tmp_dir = tempfile.mkdtemp(prefix="decode_bench_")
+        video = write_test_video(os.path.join(tmp_dir, "sample.mp4"), args.width, args.height,
+                                 args.fps, args.seconds)
+        print(f"已生成测试视频: {video} ({args.width}x{args.height}, {args.fps}fps, {args.seconds}s)")
+
+    cap = cv2.VideoCapture(video)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or float(args.fps)
+    cap.release()
+
+    check_scaled_sizes()
+    input_size = tuple(args.input_size)
+    modes: List[Tuple[str, Optional[Tuple[int, int]]]] = [("原始分辨率", None), ("缩放解码", input_size)]
+    report: Dict[str, Any] = {"video": video, "source_fps": source_fps, "ffmpeg": {}, "opencv": {}}
+    try:
+        if shutil.which("ffmpeg"):
+            for label, output_size in modes:
+                report["ffmpeg"][label] = run_ffmpeg(video, output_size, source_fps,
+                                                     args.alert_delays, args.ffmpeg_alerts)
+        else:
+            print("未找到ffmpeg，跳过FFmpeg管道测试")
+        for label, output_size in modes:
+            report["opencv"][label] = run_opencv(video, output_size, args.frame_interval, args.measure_seconds,
+                                                 args.alert_delays, args.alerts)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for results in (report["ffmpeg"], report["opencv"]):
+        if "缩放解码" in results:
+            width, height = results["缩放解码"]["resolution"]
+            source_width, source_height = results["原始分辨率"]["resolution"]
+            assert width >= min(input_size[0], source_width) and height >= min(input_size[1], source_height), \
+                f"缩放解码输出 {width}x{height} 小于输入尺寸 {input_size}"
+            alerts = results["缩放解码"]["alerts"]
+            if (width, height) != (source_width, source_height) and sum(alerts.values()):
+                assert alerts["detection_resolution"] == 0, f"缩放解码时有预警截图未取得原图: {alerts}"
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    def resolution(r):
+        return f"{r[0]}x{r[1]}"
+
+    if report["ffmpeg"]:
+        print(f"\nFFmpeg管道（不限速读完视频，源帧率 {report['source_fps']:.0f}fps）")
+        print(f"{'模式':<10} {'输出分辨率':>11} {'帧/s':>8} {'管道MB/s':>9} {'每帧KB':>9} "
+              f"{'实时MB/s':>9} {'FFmpeg内存MB':>12} {'原图取帧ms':>10}")
+        for label, r in report["ffmpeg"].items():
+            print(f"{label:<10} {resolution(r['resolution']):>11} {r['fps']:>8.1f} {r['pipe_mb_per_s']:>9.1f} "
+                  f"{r['frame_kb']:>9.1f} {r['realtime_mb_per_s']:>9.1f} {r['decoder_rss_mb']:>12.1f} "
+                  f"{r['full_grab_ms']:>10.1f}")
+
+    if report["ffmpeg"]:
+        r = report["ffmpeg"].get("缩放解码")
+        if r:
+            print(f"缩放解码预警截图: {_format_alerts(r['alerts'])}")
+
+    print(f"\nOpenCV（按源帧率实时读取）")
+    print(f"{'模式':<10} {'输出分辨率':>11} {'解码fps':>8} {'输出fps':>8} {'输出MB/s':>9} {'每帧KB':>9} "
+          f"{'常驻帧MB':>9} {'内存增量MB':>10} {'CPU核':>6} {'原图取帧ms':>10}")
+    for label, r in report["opencv"].items():
+        print(f"{label:<10} {resolution(r['resolution']):>11} {r['decode_fps']:>8.1f} {r['fps']:>8.1f} "
+              f"{r['output_mb_per_s']:>9.1f} {r['frame_kb']:>9.1f} {r['resident_mb']:>9.1f} "
+              f"{r['rss_delta_mb']:>10.1f} {r['cpu_cores']:>6.2f} {r['full_grab_ms']:>10.1f}")
+    r = report["opencv"].get("缩放解码")
+    if r:
+        print(f"缩放解码预警截图: {_format_alerts(r['alerts'])}")
+
+
+def _format_alerts(alerts: Dict[str, int]) -> str:
+    return (f"共 {sum(alerts.values())} 次，同一帧原图 {alerts['same_frame']}，之后的原图 {alerts['later_frame']}，"
+            f"检测分辨率 {alerts['detection_resolution']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="原始分辨率解码与缩放解码的管道吞吐和内存对比")
+    parser.add_argument("--video", default="", help="本地测试视频，为空时生成合成视频")
+    parser.add_argument("--width", type=int, default=1920, help="生成视频的宽度")
+    parser.add_argument("--height", type=int, default=1080, help="生成视频的高度")
+    parser.add_argument("--fps", type=int, default=25, help="生成视频的帧率")
+    parser.add_argument("--seconds", type=float, default=20.0, help="生成视频的时长（秒）")
+    parser.add_argument("--input-size", type=int, nargs=2, default=[640, 640], metavar=("W", "H"),
+                        help="订阅者所需的最大输入尺寸")
+    parser.add_argument("--frame-interval", type=float, default=None,
+                        help="OpenCV测试中订阅者的帧间隔（秒），默认按源帧率输出")
+    parser.add_argument("--measure-seconds", type=float, default=5.0, help="OpenCV测试的计时时长（秒）")
+    parser.add_argument("--alerts", type=int, default=20, help="OpenCV缩放解码时模拟的预警次数")
+    parser.add_argument("--ffmpeg-alerts", type=int, default=3, help="FFmpeg缩放解码时模拟的预警次数（每次重新抓帧）")
+    parser.add_argument("--alert-delays", type=float, nargs="+", default=[0.0, 0.05, 0.2, 0.5],
+                        help="预警调度延迟（秒），依次循环使用")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    report = run_benchmark(args)
+    print_report(report)
+    print("\n检查通过")
+    return report
+
+
+if __name__ == "__main__":
+    main()
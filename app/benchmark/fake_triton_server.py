@@ -0,0 +1,290 @@
+"""
+进程内假Triton gRPC服务
+
+实现 TritonClient 用到的 Triton gRPC 接口（健康检查、模型元数据/配置、仓库索引、加载/卸载、推理），
+推理返回预先生成的YOLO形状输出，延迟可配置。TritonClient 无需任何修改，
+只要指向本服务的地址即可在CPU环境下跑通完整的推理链路（含微批处理、去重缓存、绑定计划缓存）。
+
+延迟模型:
+- rpc_latency_ms: 每次请求的网络往返开销，不占用“GPU”
+- compute_ms + per_item_ms * 批量: 模型计算耗时，同一时刻最多 instances 个请求在计算（模拟GPU串行执行）
+"""
+import threading
+import time
+from concurrent import futures
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import grpc
+import numpy as np
+from tritonclient.grpc import model_config_pb2, service_pb2, service_pb2_grpc
+from tritonclient.utils import triton_to_np_dtype
+
+# 张量描述: (名称, Triton数据类型, 不含批次维的形状)
+TensorSpec = Tuple[str, str, List[int]]
+
+_CONFIG_DATA_TYPES = {
+    "FP32": model_config_pb2.TYPE_FP32,
+    "FP16": model_config_pb2.TYPE_FP16,
+    "INT64": model_config_pb2.TYPE_INT64,
+    "INT32": model_config_pb2.TYPE_INT32,
+    "UINT8": model_config_pb2.TYPE_UINT8,
+}
+
+
+@dataclass
+class FakeModelSpec:
+    """假模型描述"""
+    inputs: List[TensorSpec]
+    outputs: List[TensorSpec]
+    max_batch_size: int = 16
+    compute_ms: float = 8.0        # 每次推理的固定计算耗时（毫秒）
+    per_item_ms: float = 1.0       # 批量中每一行的额外计算耗时（毫秒）
+    canned_outputs: Dict[str, np.ndarray] = field(default_factory=dict)  # 单行输出，按批量复制
+
+
+def canned_yolo_output(num_classes: int = 80, num_anchors: int = 8400, input_size: int = 640,
+                       num_objects: int = 8, extra_channels: int = 0, seed: int = 0) -> np.ndarray:
+    """
+    生成单张图像的YOLO检测输出 (4 + num_classes + extra_channels, num_anchors)
+
+    包含 num_objects 个目标，每个目标附带若干重叠的候选框，使后处理的NMS有实际工作量。
+    """
+    rng = np.random.default_rng(seed)
+    output = np.zeros((4 + num_classes + extra_channels, num_anchors), dtype=np.float32)
+    output[4:4 + num_classes] = rng.uniform(0, 0.05, (num_classes, num_anchors))
+    anchor = 0
+    for _ in range(num_objects):
+        cx, cy = rng.uniform(input_size * 0.1, input_size * 0.9, 2)
+        w, h = rng.uniform(input_size * 0.05, input_size * 0.3, 2)
+        class_id = int(rng.integers(0, num_classes))
+        for _ in range(6):
+            if anchor >= num_anchors:
+                break
+            jitter = rng.normal(0, 2.0, 4)
+            output[0:4, anchor] = [cx + jitter[0], cy + jitter[1], w + jitter[2], h + jitter[3]]
+            output[4 + class_id, anchor] = rng.uniform(0.6, 0.95)
+            if extra_channels:
+                output[4 + num_classes:, anchor] = rng.uniform(0, input_size, extra_channels)
+            anchor += 1
+    return output
+
+
+def yolo_model_spec(num_classes: int = 80, input_size: int = 640, num_objects: int = 8,
+                    extra_channels: int = 0, **kwargs) -> FakeModelSpec:
+    """YOLO检测/姿态模型描述（输入 images，输出 output0）"""
+    num_anchors = (input_size // 8) ** 2 + (input_size // 16) ** 2 + (input_size // 32) ** 2
+    output = canned_yolo_output(num_classes, num_anchors, input_size, num_objects, extra_channels)
+    return FakeModelSpec(
+        inputs=[("images", "FP32", [3, input_size, input_size])],
+        outputs=[("output0", "FP32", list(output.shape))],
+        canned_outputs={"output0": output},
+        **kwargs
+    )
+
+
+class _FakeTritonServicer(service_pb2_grpc.GRPCInferenceServiceServicer):
+    """Triton gRPC接口实现"""
+
+    def __init__(self, server: "FakeTritonServer"):
+        self.server = server
+
+    def ServerLive(self, request, context):
+        return service_pb2.ServerLiveResponse(live=True)
+
+    def ServerReady(self, request, context):
+        return service_pb2.ServerReadyResponse(ready=True)
+
+    def ServerMetadata(self, request, context):
+        return service_pb2.ServerMetadataResponse(name="fake_triton", version="2.41.0", extensions=[])
+
+    def ModelReady(self, request, context):
+        return service_pb2.ModelReadyResponse(ready=self.server.get_model(request.name) is not None)
+
+    def ModelMetadata(self, request, context):
+        spec = self._get_model_or_abort(request.name, context)
+        batch_dims = [-1] if spec.max_batch_size > 0 else []
+        return service_pb2.ModelMetadataResponse(
+            name=request.name,
+            versions=["1"],
+            platform="tensorrt_plan",
+            inputs=[service_pb2.ModelMetadataResponse.TensorMetadata(name=name, datatype=dtype, shape=batch_dims + dims)
+                    for name, dtype, dims in spec.inputs],
+            outputs=[service_pb2.ModelMetadataResponse.TensorMetadata(name=name, datatype=dtype, shape=batch_dims + dims)
+                     for name, dtype, dims in spec.outputs],
+        )
+
+    def ModelConfig(self, request, context):
+        spec = self._get_model_or_abort(request.name, context)
+        config = model_config_pb2.ModelConfig(
+            name=request.name,
+            platform="tensorrt_plan",
+            max_batch_size=spec.max_batch_size,
+            input=[model_config_pb2.ModelInput(name=name, data_type=_CONFIG_DATA_TYPES.get(dtype), dims=dims)
+                   for name, dtype, dims in spec.inputs],
+            output=[model_config_pb2.ModelOutput(name=name, data_type=_CONFIG_DATA_TYPES.get(dtype), dims=dims)
+                    for name, dtype, dims in spec.outputs],
+        )
+        return service_pb2.ModelConfigResponse(config=config)
+
+    def RepositoryIndex(self, request, context):
+        return service_pb2.RepositoryIndexResponse(models=[
+            service_pb2.RepositoryIndexResponse.ModelIndex(name=name, version="1", state="READY")
+            for name in self.server.model_names()
+        ])
+
+    def RepositoryModelLoad(self, request, context):
+        self.server.add_model(request.model_name, self.server.get_model(request.model_name))
+        return service_pb2.RepositoryModelLoadResponse()
+
+    def RepositoryModelUnload(self, request, context):
+        self.server.remove_model(request.model_name)
+        return service_pb2.RepositoryModelUnloadResponse()
+
+    def ModelInfer(self, request, context):
+        spec = self._get_model_or_abort(request.model_name, context)
+        if not request.inputs:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "请求中没有输入")
+        batch = int(request.inputs[0].shape[0]) if spec.max_batch_size > 0 else 1
+        if spec.max_batch_size > 0 and batch > spec.max_batch_size:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          f"批量 {batch} 超过模型 {request.model_name} 的 max_batch_size {spec.max_batch_size}")
+
+        self.server._simulate_latency(spec, batch)
+
+        requested = [out.name for out in request.outputs] or [name for name, _, _ in spec.outputs]
+        response = service_pb2.ModelInferResponse(model_name=request.model_name, model_version="1", id=request.id)
+        for name, dtype, dims in spec.outputs:
+            if name not in requested:
+                continue
+            single = spec.canned_outputs.get(name)
+            if single is None:
+                single = np.zeros(dims, dtype=triton_to_np_dtype(dtype))
+            data = np.broadcast_to(single, (batch,) + single.shape) if spec.max_batch_size > 0 else single
+            tensor = response.outputs.add()
+            tensor.name = name
+            tensor.datatype = dtype
+            tensor.shape.extend(data.shape)
+            response.raw_output_contents.append(np.ascontiguousarray(data).tobytes())
+
+        self.server._record_infer(request.model_name, batch)
+        return response
+
+    def _get_model_or_abort(self, model_name: str, context) -> FakeModelSpec:
+        spec = self.server.get_model(model_name)
+        if spec is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"模型 {model_name} 不存在")
+        return spec
+
+
+class FakeTritonServer:
+    """进程内假Triton服务"""
+
+    def __init__(self, models: Optional[Dict[str, FakeModelSpec]] = None,
+                 default_spec: Optional[FakeModelSpec] = None,
+                 rpc_latency_ms: float = 2.0, instances: int = 1,
+                 host: str = "127.0.0.1", port: int = 0, max_workers: int = 64):
+        """
+        参数:
+            models: 模型名称 -> 模型描述
+            default_spec: 请求未注册的模型时使用的描述（为None时返回NOT_FOUND），默认YOLO 80类
+            rpc_latency_ms: 每次请求的网络往返开销（毫秒）
+            instances: 同时计算的请求数（模型实例数）
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            max_workers: gRPC服务线程数
+        """
+        self._models: Dict[str, FakeModelSpec] = dict(models or {})
+        self.default_spec = default_spec if default_spec is not None else yolo_model_spec()
+        self.rpc_latency = rpc_latency_ms / 1000.0
+        self._compute_slots = threading.Semaphore(max(1, instances))
+        self._lock = threading.Lock()
+        self.host = host
+        self.port = port
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
+                                   options=[("grpc.max_send_message_length", -1),
+                                            ("grpc.max_receive_message_length", -1)])
+        service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(_FakeTritonServicer(self), self._server)
+
+        self.stats = {"requests": 0, "rows": 0, "max_batch_rows": 0, "per_model": {}}
+
+    @property
+    def url(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """启动服务，返回 host:port 地址"""
+        self.port = self._server.add_insecure_port(f"{self.host}:{self.port}")
+        self._server.start()
+        return self.url
+
+    def stop(self, grace: float = 0.5):
+        self._server.stop(grace)
+
+    def get_model(self, model_name: str) -> Optional[FakeModelSpec]:
+        with self._lock:
+            spec = self._models.get(model_name)
+            if spec is None and self.default_spec is not None:
+                spec = self._models[model_name] = self.default_spec
+            return spec
+
+    def add_model(self, model_name: str, spec: FakeModelSpec):
+        with self._lock:
+            self._models[model_name] = spec
+
+    def remove_model(self, model_name: str):
+        with self._lock:
+            self._models.pop(model_name, None)
+
+    def model_names(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def _simulate_latency(self, spec: FakeModelSpec, batch: int):
+        if self.rpc_latency > 0:
+            time.sleep(self.rpc_latency)
+        compute = (spec.compute_ms + spec.per_item_ms * batch) / 1000.0
+        if compute > 0:
+            with self._compute_slots:
+                time.sleep(compute)
+
+    def _record_infer(self, model_name: str, batch: int):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["rows"] += batch
+            self.stats["max_batch_rows"] = max(self.stats["max_batch_rows"], batch)
+            self.stats["per_model"][model_name] = self.stats["per_model"].get(model_name, 0) + 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["per_model"] = dict(self.stats["per_model"])
+        stats["avg_batch_rows"] = stats["rows"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+
+# 测试代码：用真实的tritonclient访问假服务
+if __name__ == "__main__":
+    import tritonclient.grpc as grpcclient
+
+    server = FakeTritonServer(rpc_latency_ms=1.0)
+    url = server.start()
+    client = grpcclient.InferenceServerClient(url=url)
+    assert client.is_server_live() and client.is_server_ready()
+
+    metadata = client.get_model_metadata("yolo11_coco", as_json=True)
+    config = client.get_model_config("yolo11_coco", as_json=True)
+    print(f"元数据输入: {metadata['inputs']}")
+    print(f"max_batch_size: {config['config']['max_batch_size']}")
+
+    images = np.zeros((2, 3, 640, 640), dtype=np.float32)
+    infer_input = grpcclient.InferInput("images", images.shape, "FP32")
+    infer_input.set_data_from_numpy(images)
+    start = time.perf_counter()
+    result = client.infer("yolo11_coco", [infer_input], outputs=[grpcclient.InferRequestedOutput("output0")])
+    output = result.as_numpy("output0")
+    print(f"输出形状: {output.shape}, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    assert output.shape == (2, 84, 8400) and np.array_equal(output[0], output[1])
+    print(f"服务统计: {server.get_stats()}")
+    server.stop()
+    print("测试通过")
@@ -0,0 +1,123 @@
+"""
+本地假WVP服务（HTTP），用于在没有WVP平台和摄像头的情况下测试按需截图链路
+
+实现引擎用到的截图接口 /api/common/channel/snap/stream?channelId=N，返回带人为延迟的JPEG图片，
+图片内容随请求序号变化（每次截图都是不同的一帧）。
+
+用法:
+    server = FakeWVPServer(snapshot_delay_ms=300)
+    base_url = server.start()
+    wvp_client.base_url = base_url  # 让全局WVP客户端请求本地服务
+    ...
+    server.stop()
+"""
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = "/api/common/channel/snap/stream"
+
+
+class _FakeWVPHandler(BaseHTTPRequestHandler):
+    server: "_FakeWVPHTTPServer"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path != SNAPSHOT_PATH:
+            self.send_error(404)
+            return
+        channel_id = int(parse_qs(parsed.query).get("channelId", ["0"])[0])
+        body = self.server.owner.snapshot(channel_id)
+        if body is None:
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FakeWVPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, owner: "FakeWVPServer", address):
+        super().__init__(address, _FakeWVPHandler)
+        self.owner = owner
+
+
+class FakeWVPServer:
+    """返回带人为延迟JPEG截图的本地HTTP服务"""
+
+    def __init__(self, snapshot_delay_ms: float = 300.0, width: int = 640, height: int = 360,
+                 jitter_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        """
+        参数:
+            snapshot_delay_ms: 每次截图的人为延迟（毫秒），模拟WVP向设备请求截图的耗时
+            width, height: 截图尺寸
+            jitter_ms: 延迟的随机抖动上限（毫秒）
+            host, port: 监听地址，端口为0时自动分配
+        """
+        self.snapshot_delay_ms = snapshot_delay_ms
+        self.jitter_ms = jitter_ms
+        self.width = width
+        self.height = height
+        self._address = (host, port)
+        self._server: Optional[_FakeWVPHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(0)
+        self.stats: Dict[str, int] = {"snapshots": 0, "in_flight": 0, "peak_in_flight": 0}
+        self.snapshots_per_channel: Dict[int, int] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._server = _FakeWVPHTTPServer(self, self._address)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="FakeWVPServer")
+        self._thread.start()
+        logger.info(f"假WVP服务已启动: {self.url}")
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def snapshot(self, channel_id: int) -> Optional[bytes]:
+        with self._lock:
+            self.stats["snapshots"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+            sequence = self.snapshots_per_channel.get(channel_id, 0) + 1
+            self.snapshots_per_channel[channel_id] = sequence
+            jitter = float(self._rng.uniform(0, self.jitter_ms)) if self.jitter_ms > 0 else 0.0
+        try:
+            time.sleep((self.snapshot_delay_ms + jitter) / 1000.0)
+            image = np.full((self.height, self.width, 3), 60, dtype=np.uint8)
+            cv2.putText(image, f"{channel_id}:{sequence}", (20, self.height // 2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 2)
+            ok, encoded = cv2.imencode(".jpg", image)
+            return encoded.tobytes() if ok else None
+        finally:
+            with self._lock:
+                self.stats["in_flight"] -= 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,208 @@
+"""
+电子围栏预编译的基准测试与一致性检查
+
+1. 一致性: 随机生成多种围栏（凸/凹多边形、自相交星形、含水平/竖直边的多边形、多个多边形）和图像尺寸，
+   在随机点、顶点、边上的点、紧贴边的点、整数/半整数坐标和图像外的点上，
+   对比原逐点实现（每次校验配置、换算坐标、射线法）与编译后围栏（有/无栅格掩码，批量/单点）的判断结果，要求完全相同
+2. 耗时: 200 个检测、多多边形围栏时，原实现与 filter_detections_by_fence 的单帧耗时，以及围栏编译耗时
+
+用法:
+    python -m app.benchmark.fence_benchmark
+    python -m app.benchmark.fence_benchmark --detections 500 --polygons 5 --vertices 24
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.skills.fence_geometry import CompiledFence, point_in_polygon
+from app.skills.skill_base import BaseSkill
+
+
+class FenceSkill(BaseSkill):
+    DEFAULT_CONFIG = {"type": "detection", "name": "fence_benchmark", "name_zh": "围栏测试", "params": {}}
+
+    def process(self, input_data, context=None, **kwargs):
+        return None
+
+
+def reference_inside(point: Tuple[float, float], fence_config: Dict, image_size: Tuple[int, int]) -> bool:
+    """原 BaseSkill.is_point_inside_fence 的逐点实现（配置已校验）"""
+    for polygon in fence_config.get("points", []):
+        if len(polygon) < 3:
+            continue
+        poly_points = [(p["x"] * image_size[0], p["y"] * image_size[1]) for p in polygon]
+        if point_in_polygon(point, poly_points):
+            return True
+    return False
+
+
+def reference_filter(skill: BaseSkill, detections: List[Dict], fence_config: Dict,
+                     image_size: Tuple[int, int]) -> List[Dict]:
+    """原 BaseSkill.filter_detections_by_fence：每个检测都重新校验配置、换算坐标并做射线法"""
+    if not skill.is_fence_config_valid(fence_config):
+        return detections
+    trigger_mode = fence_config.get("trigger_mode", "inside")
+    results = []
+    for detection in detections:
+        point = skill._get_detection_point(detection)
+        if not point:
+            continue
+        is_inside = skill.is_fence_config_valid(fence_config) and reference_inside(point, fence_config, image_size)
+        if (trigger_mode == "inside" and is_inside) or (trigger_mode == "outside" and not is_inside) \
+                or trigger_mode == "cross":
+            results.append(detection)
+    return results
+
+
+def random_polygon(rng: np.random.Generator, kind: str, vertices: int) -> List[Dict[str, float]]:
+    """生成归一化坐标的多边形"""
+    center = rng.uniform(0.2, 0.8, 2)
+    if kind == "axis":
+        # 含水平/竖直边的阶梯形
+        xs = np.sort(rng.uniform(0.05, 0.95, 3))
+        ys = np.sort(rng.uniform(0.05, 0.95, 3))
+        points = [(xs[0], ys[0]), (xs[2], ys[0]), (xs[2], ys[1]), (xs[1], ys[1]), (xs[1], ys[2]), (xs[0], ys[2])]
+    elif kind == "star":
+        # 自相交星形（隔点连接）
+        angles = np.arange(5) * 4 * np.pi / 5 + rng.uniform(0, np.pi)
+        radius = rng.uniform(0.1, 0.3)
+        points = [(center[0] + radius * np.cos(a), center[1] + radius * np.sin(a)) for a in angles]
+    else:
+        angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+        radius = rng.uniform(0.1, 0.35, vertices) if kind == "concave" else np.full(vertices, rng.uniform(0.1, 0.35))
+        points = [(center[0] + r * np.cos(a), center[1] + r * np.sin(a)) for a, r in zip(angles, radius)]
+    if rng.random() < 0.3:
+        # 量化到粗网格，制造与像素网格对齐的顶点和边
+        points = [(round(x * 20) / 20, round(y * 20) / 20) for x, y in points]
+    return [{"x": float(np.clip(x, -0.05, 1.05)), "y": float(np.clip(y, -0.05, 1.05))} for x, y in points]
+
+
+def random_fence(rng: np.random.Generator, polygons: int, vertices: int) -> Dict:
+    kinds = ["convex", "concave", "star", "axis"]
+    points = [random_polygon(rng, kinds[rng.integers(len(kinds))], vertices) for _ in range(polygons)]
+    if rng.random() < 0.2:
+        points.append([{"x": 0.1, "y": 0.1}, {"x": 0.2, "y": 0.2}])  # 少于3个点的多边形应被忽略
+    return {"enabled": True, "points": points, "trigger_mode": rng.choice(["inside", "outside"])}
+
+
+def probe_points(rng: np.random.Generator, fence_config: Dict, image_size: Tuple[int, int], count: int) -> np.ndarray:
+    """随机点 + 顶点 + 边上的点 + 紧贴边的点 + 整数/半整数坐标 + 图像外的点"""
+    width, height = image_size
+    groups = [rng.uniform([-0.1 * width, -0.1 * height], [1.1 * width, 1.1 * height], (count, 2))]
+    for polygon in fence_config["points"]:
+        if len(polygon) < 3:
+            continue
+        vertices = np.array([(p["x"] * width, p["y"] * height) for p in polygon])
+        nxt = np.roll(vertices, -1, axis=0)
+        t = rng.random((len(vertices), 4, 1))
+        on_edges = (vertices[:, None] + t * (nxt - vertices)[:, None]).reshape(-1, 2)
+        groups += [vertices, on_edges, on_edges + rng.normal(0, 1e-9, on_edges.shape),
+                   on_edges + rng.normal(0, 0.7, on_edges.shape)]
+    groups.append(np.floor(groups[0]))
+    groups.append(np.floor(groups[0]) + 0.5)
+    return np.concatenate(groups)
+
+
+def check_equivalence(args) -> int:
+    rng = np.random.default_rng(args.seed)
+    skill = FenceSkill()
+    checked = 0
+    for index in range(args.fences):
+        fence_config = random_fence(rng, int(rng.integers(1, args.polygons + 1)), args.vertices)
+        image_size = [(1920, 1080), (1280, 720), (640, 480), (703, 397)][index % 4]
+        points = probe_points(rng, fence_config, image_size, args.points)
+        expected = np.array([reference_inside(tuple(point), fence_config, image_size) for point in points])
+
+        masked = CompiledFence.from_config(fence_config, image_size, build_mask=True)
+        exact = CompiledFence.from_config(fence_config, image_size, build_mask=False)
+        for name, actual in (("掩码批量", masked.contains(points)), ("射线法批量", exact.contains(points)),
+                             ("掩码单点", np.array([masked.contains_point(tuple(p)) for p in points])),
+                             ("射线法单点", np.array([exact.contains_point(tuple(p)) for p in points]))):
+            wrong = np.flatnonzero(actual != expected)
+            assert not len(wrong), f"围栏 {index} {name} 判断不一致: {points[wrong[:5]].tolist()}"
+
+        detections = [{"bbox": [x - 10, y - 20, x + 10, y + 20]} for x, y in points[:400]]
+        assert skill.filter_detections_by_fence(detections, fence_config, image_size) == \
+            reference_filter(skill, detections, fence_config, image_size), f"围栏 {index} 过滤结果不一致"
+        checked += len(points)
+    return checked
+
+
+def make_detections(rng: np.random.Generator, count: int, image_size: Tuple[int, int]) -> List[Dict]:
+    width, height = image_size
+    centers = rng.uniform([0, 0], [width, height], (count, 2))
+    sizes = rng.uniform([20, 40], [120, 240], (count, 2))
+    return [{"bbox": [float(cx - w / 2), float(cy - h / 2), float(cx + w / 2), float(cy + h / 2)],
+             "confidence": 0.8, "class_name": "person"} for (cx, cy), (w, h) in zip(centers, sizes)]
+
+
+def time_per_call(func, repeat: int) -> float:
+    func()
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - begin) / repeat
+
+
+def run_timing(args) -> Dict[str, float]:
+    from app.core.config import settings
+
+    rng = np.random.default_rng(args.seed + 1)
+    image_size = (1920, 1080)
+    fence_config = {"enabled": True, "trigger_mode": "inside",
+                    "points": [random_polygon(rng, "concave", args.vertices) for _ in range(args.polygons)]}
+    detections = make_detections(rng, args.detections, image_size)
+
+    default_mask = settings.FENCE_RASTER_MASK_ENABLED
+    skill = FenceSkill()
+    result = {"reference": time_per_call(lambda: reference_filter(skill, detections, fence_config, image_size),
+                                         args.repeat)}
+    for name, build_mask in (("mask", True), ("exact", False)):
+        settings.FENCE_RASTER_MASK_ENABLED = build_mask
+        skill = FenceSkill()
+        begin = time.perf_counter()
+        skill.compile_fence(fence_config, image_size)
+        result[f"{name}_compile"] = time.perf_counter() - begin
+        result[name] = time_per_call(lambda: skill.filter_detections_by_fence(detections, fence_config, image_size),
+                                     args.repeat)
+    settings.FENCE_RASTER_MASK_ENABLED = default_mask
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="电子围栏预编译的基准测试与一致性检查")
+    parser.add_argument("--detections", type=int, default=200, help="每帧检测数")
+    parser.add_argument("--polygons", type=int, default=3, help="围栏多边形数")
+    parser.add_argument("--vertices", type=int, default=12, help="每个多边形的顶点数")
+    parser.add_argument("--repeat", type=int, default=200, help="计时重复次数")
+    parser.add_argument("--fences", type=int, default=40, help="一致性检查的随机围栏数")
+    parser.add_argument("--points", type=int, default=2000, help="每个围栏的随机测试点数")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    checked = check_equivalence(args)
+    print(f"一致性检查: {args.fences} 个围栏、{checked} 个测试点的判断与原实现完全相同")
+
+    timing = run_timing(args)
+    print(f"\n{args.detections} 个检测、{args.polygons} 个多边形（每个 {args.vertices} 个顶点）的单帧耗时:")
+    print(f"  原实现（逐点射线法）      {timing['reference'] * 1000:>8.3f}ms")
+    print(f"  编译 + 射线法批量（默认）  {timing['exact'] * 1000:>8.3f}ms  "
+          f"{timing['reference'] / timing['exact']:>5.1f}x  （编译 {timing['exact_compile'] * 1000:.2f}ms）")
+    print(f"  编译 + 栅格掩码（可选）    {timing['mask'] * 1000:>8.3f}ms  "
+          f"{timing['reference'] / timing['mask']:>5.1f}x  （编译 {timing['mask_compile'] * 1000:.2f}ms）")
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
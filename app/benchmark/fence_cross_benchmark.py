@@ -0,0 +1,357 @@
+"""
+越线（trigger_mode="cross"）检测的轨迹检查与基准测试
+
+1. 场景检查: 用人工构造的轨迹检查越线语义
+   - 计数线双向穿越的方向、碰线返回不算越线、停在线上再穿过只算一次、从计数线端点外绕过不算越线
+   - 多边形进入/离开（顺时针和逆时针顶点顺序结果相同）、穿过顶点只算一次、一步内穿过多边形一角先进后出
+   - direction 过滤（计数仍包含两个方向）、轨迹首次出现不产生事件、中断超过 max_gap 后重新出现不产生事件、
+     没有 track_id 的检测被忽略
+2. 一致性: 随机围栏和随机轨迹（含停在边上的点）上，向量化实现与逐轨迹逐边的标量实现逐帧事件完全相同
+3. 流水线: 检测流水线深度>1、多帧并发处理时（跟踪器更新和越线更新之间有随机耗时），
+   add_tracking_ids + cross过滤的逐帧结果与顺序执行的跟踪器 + 标量实现完全相同
+4. 耗时: 数百条轨迹时 filter_detections_by_fence（cross）与标量实现的单帧耗时
+
+用法:
+    python -m app.benchmark.fence_cross_benchmark
+    python -m app.benchmark.fence_cross_benchmark --tracks 100 300 1000 --frames 100
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.skills.fence_geometry import CompiledFence, FenceCrossingDetector
+from app.skills.skill_base import BaseSkill
+
+IMAGE_SIZE = (1000, 1000)
+
+
+class CrossSkill(BaseSkill):
+    DEFAULT_CONFIG = {"type": "detection", "name": "fence_cross_benchmark", "name_zh": "越线测试", "params": {}}
+
+    def process(self, input_data, context=None, **kwargs):
+        return None
+
+
+class ReferenceCrossing:
+    """逐轨迹、逐边的标量实现，语义与 FenceCrossingDetector 相同"""
+
+    def __init__(self, fence: CompiledFence, direction: str = "any", max_gap: int = 30):
+        edges = fence.crossing_edges
+        self.edges = [(float(edges.px[i]), float(edges.py[i]), float(edges.qx[i]), float(edges.qy[i]),
+                       float(edges.inward[i]), int(edges.shape_index[i])) for i in range(len(edges))]
+        self.direction = direction
+        self.max_gap = max_gap
+        self.frame = 0
+        self.tracks = {}
+        self.counts = {index: {"in": 0, "out": 0} for index in fence.shape_indices}
+
+    @staticmethod
+    def side(edge, x, y):
+        px, py, qx, qy, inward, _ = edge
+        return ((qx - px) * (y - py) - (qy - py) * (x - px)) * inward
+
+    def update(self, track_ids, points):
+        self.frame += 1
+        events = []
+        for track_id, (bx, by) in zip(track_ids, points):
+            track_events = []
+            state = self.tracks.get(track_id)
+            if state is None:
+                sides = [self.side(edge, bx, by) > 0 for edge in self.edges]
+            else:
+                (ax, ay), previous, _ = state
+                found, sides = [], []
+                for index, edge in enumerate(self.edges):
+                    px, py, qx, qy, _, shape_index = edge
+                    sb = self.side(edge, bx, by)
+                    new_side = previous[index] if sb == 0 else sb > 0
+                    sides.append(new_side)
+                    mx, my = bx - ax, by - ay
+                    oa = mx * (py - ay) - my * (px - ax)
+                    ob = mx * (qy - ay) - my * (qx - ax)
+                    hit = (oa <= 0 < ob) or (ob < 0 <= oa)
+                    if new_side != previous[index] and hit:
+                        sa = self.side(edge, ax, ay)
+                        found.append((sa / (sa - sb), index, shape_index, "in" if new_side else "out"))
+                for _, index, shape_index, direction in sorted(found):
+                    self.counts[shape_index][direction] += 1
+                    if self.direction in ("any", direction):
+                        track_events.append({"fence_index": shape_index, "edge_index": index, "direction": direction,
+                                             "count": self.counts[shape_index][direction]})
+            self.tracks[track_id] = ((bx, by), sides, self.frame)
+            events.append(track_events)
+        self.tracks = {k: v for k, v in self.tracks.items() if self.frame - v[2] <= self.max_gap}
+        return events
+
+
+def box_at(x: float, y: float, track_id=None) -> Dict:
+    detection = {"bbox": [x - 10, y - 10, x + 10, y + 10], "confidence": 0.9, "class_name": "person"}
+    if track_id is not None:
+        detection["track_id"] = track_id
+    return detection
+
+
+def run_trajectory(fence_config: Dict, trajectories: Dict, skill: CrossSkill = None) -> Tuple[List[List], CrossSkill]:
+    """trajectories: {track_id: [(x, y) 或 None（该帧未出现）, ...]}，返回每帧 (track_id, 方向列表)"""
+    skill = skill or CrossSkill()
+    frames = max(len(points) for points in trajectories.values())
+    timeline = []
+    for frame in range(frames):
+        detections = [box_at(*points[frame], track_id=track_id) for track_id, points in trajectories.items()
+                      if frame < len(points) and points[frame] is not None]
+        kept = skill.filter_detections_by_fence(detections, fence_config, IMAGE_SIZE)
+        timeline.append([(d["track_id"], [e["direction"] for e in d["crossings"]]) for d in kept])
+    return timeline, skill
+
+
+def events_of(timeline) -> List[Tuple[int, object, List[str]]]:
+    return [(frame, track_id, directions) for frame, kept in enumerate(timeline) for track_id, directions in kept]
+
+
+def line_config(direction: str = "any") -> Dict:
+    # 水平计数线 (100, 500) -> (900, 500)：从上方（p1->p2 的左侧）穿到下方为 in
+    return {"enabled": True, "trigger_mode": "cross", "direction": direction,
+            "points": [[{"x": 0.1, "y": 0.5}, {"x": 0.9, "y": 0.5}]]}
+
+
+def square_config(clockwise: bool = True) -> Dict:
+    square = [{"x": 0.3, "y": 0.3}, {"x": 0.7, "y": 0.3}, {"x": 0.7, "y": 0.7}, {"x": 0.3, "y": 0.7}]
+    return {"enabled": True, "trigger_mode": "cross", "points": [square if clockwise else square[::-1]]}
+
+
+def check_scenarios():
+    column = lambda ys, x=500.0: [(x, float(y)) for y in ys]
+
+    timeline, skill = run_trajectory(line_config(), {1: column([400, 450, 550, 600])})
+    assert events_of(timeline) == [(2, 1, ["in"])], events_of(timeline)
+    assert skill.get_fence_cross_counts() == {0: {"in": 1, "out": 0}}
+
+    timeline, _ = run_trajectory(line_config(), {1: column([600, 550, 450, 400])})
+    assert events_of(timeline) == [(2, 1, ["out"])], "反向穿越应为 out"
+
+    timeline, _ = run_trajectory(line_config(), {1: column([400, 450, 500, 450]), 2: column([600, 550, 500, 550])})
+    assert events_of(timeline) == [], f"碰线返回不应越线: {events_of(timeline)}"
+
+    timeline, _ = run_trajectory(line_config(), {1: column([400, 500, 500, 600, 650])})
+    assert events_of(timeline) == [(3, 1, ["in"])], f"停在线上再穿过应只算一次: {events_of(timeline)}"
+
+    timeline, _ = run_trajectory(line_config(), {1: column([400, 600], x=950.0), 2: [(950.0, 400.0), (750.0, 600.0)]})
+    assert events_of(timeline) == [(1, 2, ["in"])], f"从端点外绕过不应越线: {events_of(timeline)}"
+
+    timeline, _ = run_trajectory(line_config(), {1: [(100.0, 400.0), (100.0, 600.0)], 2: [(900.0, 400.0), (900.0, 600.0)]})
+    assert events_of(timeline) == [(1, 1, ["in"])], f"计数线为半开区间 [p1, p2): {events_of(timeline)}"
+
+    for clockwise in (True, False):
+        enter_leave = [(200.0, 500.0), (400.0, 500.0), (500.0, 500.0), (800.0, 500.0)]
+        timeline, _ = run_trajectory(square_config(clockwise), {7: enter_leave})
+        assert events_of(timeline) == [(1, 7, ["in"]), (3, 7, ["out"])], f"多边形进入/离开: {events_of(timeline)}"
+
+    timeline, skill = run_trajectory(square_config(), {1: [(200.0, 200.0), (400.0, 400.0)]})
+    assert events_of(timeline) == [(1, 1, ["in"])], f"穿过顶点应只算一次: {events_of(timeline)}"
+    assert skill.get_fence_cross_counts() == {0: {"in": 1, "out": 0}}
+
+    timeline, _ = run_trajectory(square_config(), {1: [(250.0, 400.0), (400.0, 250.0)]})
+    assert events_of(timeline) == [(1, 1, ["in", "out"])], f"一步穿过一角应先进后出: {events_of(timeline)}"
+
+    timeline, skill = run_trajectory(line_config("in"), {1: column([400, 600, 400, 600])})
+    assert events_of(timeline) == [(1, 1, ["in"]), (3, 1, ["in"])], f"direction=in 只输出进入: {events_of(timeline)}"
+    assert skill.get_fence_cross_counts() == {0: {"in": 2, "out": 1}}, "计数应包含两个方向"
+
+    timeline, _ = run_trajectory(square_config(), {1: [(500.0, 500.0), (800.0, 500.0)]})
+    assert events_of(timeline) == [(1, 1, ["out"])], "首次出现不产生事件，之后离开产生事件"
+
+    skill = CrossSkill()
+    from app.core.config import settings
+    gap = settings.FENCE_CROSS_MAX_GAP_FRAMES
+    trajectory = [(500.0, 400.0)] + [None] * (gap + 1) + [(500.0, 600.0)]
+    timeline, _ = run_trajectory(line_config(), {1: trajectory, 2: [(0.0, 0.0)] * len(trajectory)}, skill)
+    assert events_of(timeline) == [], "中断超过 max_gap 后重新出现不应越线"
+
+    skill = CrossSkill()
+    skill.filter_detections_by_fence([box_at(500, 400)], line_config(), IMAGE_SIZE)
+    assert skill.filter_detections_by_fence([box_at(500, 600)], line_config(), IMAGE_SIZE) == [], "没有 track_id 的检测应忽略"
+    return 14
+
+
+def random_fence_config(rng: np.random.Generator) -> Dict:
+    shapes = []
+    for _ in range(int(rng.integers(1, 4))):
+        center, radius = rng.uniform(0.25, 0.75, 2), rng.uniform(0.08, 0.25)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, int(rng.integers(3, 10))))
+        points = center + (radius * rng.uniform(0.5, 1.0, len(angles)))[:, None] * np.stack([np.cos(angles), np.sin(angles)], 1)
+        shapes.append(np.round(points * 50) / 50)  # 对齐到网格，便于轨迹点正好落在边上
+    for _ in range(int(rng.integers(0, 3))):
+        shapes.append(np.round(rng.uniform(0.05, 0.95, (2, 2)) * 50) / 50)
+    return {"enabled": True, "trigger_mode": "cross", "direction": str(rng.choice(["any", "in", "out"])),
+            "points": [[{"x": float(x), "y": float(y)} for x, y in shape] for shape in shapes]}
+
+
+def random_tracks(rng: np.random.Generator, count: int, frames: int) -> List[List[Tuple[object, Tuple[float, float]]]]:
+    """每帧 [(track_id, 点), ...]；随机游走，部分点量化到网格（会落在对齐网格的边和顶点上），轨迹随机中断和消失"""
+    positions = rng.uniform(0, 1000, (count, 2))
+    velocity = rng.normal(0, 15, (count, 2))
+    ids = list(range(count))
+    next_id = count
+    sequence = []
+    for _ in range(frames):
+        positions += velocity + rng.normal(0, 5, (count, 2))
+        snap = rng.random(count) < 0.3
+        positions[snap] = np.round(positions[snap] / 20) * 20
+        reborn = rng.random(count) < 0.02
+        for index in np.flatnonzero(reborn):
+            ids[index] = next_id
+            next_id += 1
+            positions[index] = rng.uniform(0, 1000, 2)
+        visible = rng.random(count) >= 0.1
+        sequence.append([(ids[i], (float(positions[i, 0]), float(positions[i, 1]))) for i in np.flatnonzero(visible)])
+    return sequence
+
+
+def check_equivalence(args) -> int:
+    rng = np.random.default_rng(args.seed)
+    total = 0
+    for _ in range(args.fences):
+        config = random_fence_config(rng)
+        fence = CompiledFence.from_config(config, IMAGE_SIZE, build_mask=False)
+        detector = FenceCrossingDetector(fence, direction=config["direction"], max_gap=5)
+        reference = ReferenceCrossing(fence, direction=config["direction"], max_gap=5)
+        for frame, tracks in enumerate(random_tracks(rng, args.check_tracks, args.frames)):
+            ids = [track_id for track_id, _ in tracks]
+            points = [point for _, point in tracks]
+            actual, expected = detector.update(ids, points), reference.update(ids, points)
+            assert [list(events) for events in actual] == expected, f"第{frame}帧越线事件不一致"
+            total += sum(len(events) for events in actual)
+        assert detector.counts == reference.counts
+    return total
+
+
+def check_pipeline(args) -> Dict[int, int]:
+    """流水线各深度下与顺序参照逐帧比较，返回 {深度: 越线事件数}"""
+    from app.core.config import settings
+    from app.services.batch_sort import BatchSort
+    from app.services.frame_pipeline import PipelineSequencer
+    from app.services.tracker_service import TrackerService
+    from app.skills.skill_base import _TRACKER_PARAMS
+
+    rng = np.random.default_rng(args.seed + 2)
+    config = random_fence_config(rng)
+    config["points"].append([{"x": 0.05, "y": 0.5}, {"x": 0.95, "y": 0.5}])
+    config["direction"] = "any"
+    # 框比单帧位移大，跟踪器能连续关联
+    frames = [[{"bbox": [x - 30, y - 30, x + 30, y + 30], "confidence": 0.9, "class_name": "person"}
+               for _, (x, y) in tracks] for tracks in random_tracks(rng, args.check_tracks, args.pipeline_frames)]
+
+    # 参照：顺序执行的跟踪器 + 标量实现
+    BatchSort.count = 0
+    tracker = TrackerService(**_TRACKER_PARAMS)
+    reference = ReferenceCrossing(CompiledFence.from_config(config, IMAGE_SIZE, build_mask=False),
+                                  max_gap=settings.FENCE_CROSS_MAX_GAP_FRAMES)
+    point_of = CrossSkill()._get_detection_point
+    expected = []
+    for detections in frames:
+        tracked = [d for d in tracker.update([dict(d) for d in detections]) if d.get("track_id") is not None]
+        events = reference.update([d["track_id"] for d in tracked], [point_of(d) for d in tracked])
+        expected.append([(d["track_id"], e) for d, e in zip(tracked, events) if e])
+
+    results = {}
+    for depth in args.depths:
+        BatchSort.count = 0
+        skill = CrossSkill()
+        sequencer = PipelineSequencer()
+        actual = [None] * len(frames)
+        frame_ids = iter(range(len(frames)))
+        dequeue_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with dequeue_lock:
+                    frame_id = next(frame_ids, None)
+                    if frame_id is None:
+                        return
+                    seq = sequencer.next_seq()
+                with sequencer.frame(seq):
+                    time.sleep(random.uniform(0, 0.002))  # 推理RPC
+                    tracked = skill.add_tracking_ids([dict(d) for d in frames[frame_id]])
+                    time.sleep(random.uniform(0, 0.002))  # 跟踪后到越线判断之间的其他处理
+                    kept = skill.filter_detections_by_fence(tracked, config, IMAGE_SIZE)
+                actual[frame_id] = [(d["track_id"], list(d["crossings"])) for d in kept]
+
+        threads = [threading.Thread(target=worker) for _ in range(depth)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for frame_id, (got, want) in enumerate(zip(actual, expected)):
+            assert got == want, f"流水线深度={depth} 第{frame_id}帧越线事件与顺序参照不一致"
+        assert skill.get_fence_cross_counts() == reference.counts
+        assert sequencer.stats["ordered_timeouts"] == 0
+        results[depth] = sum(len(events) for kept in actual for _, events in kept)
+    return results
+
+
+def time_frames(update, frames: Sequence) -> float:
+    begin = time.perf_counter()
+    for frame in frames:
+        update(frame)
+    return (time.perf_counter() - begin) / len(frames)
+
+
+def run_timing(args) -> List[Dict[str, float]]:
+    rng = np.random.default_rng(args.seed + 1)
+    config = random_fence_config(rng)
+    config["points"].append([{"x": 0.05, "y": 0.5}, {"x": 0.95, "y": 0.5}])
+    config["direction"] = "any"
+    rows = []
+    for count in args.tracks:
+        sequence = random_tracks(rng, count, args.frames)
+        frames = [[box_at(x, y, track_id) for track_id, (x, y) in tracks] for tracks in sequence]
+        skill = CrossSkill()
+        vectorized = time_frames(lambda detections: skill.filter_detections_by_fence(detections, config, IMAGE_SIZE),
+                                 frames)
+        reference = ReferenceCrossing(CompiledFence.from_config(config, IMAGE_SIZE, build_mask=False))
+        scalar = time_frames(lambda tracks: reference.update([t for t, _ in tracks], [p for _, p in tracks]), sequence)
+        rows.append({"tracks": count, "edges": len(skill._fence_crossing.edges), "vectorized": vectorized,
+                     "scalar": scalar, "events": sum(sum(c.values()) for c in skill.get_fence_cross_counts().values())})
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="越线检测的轨迹检查与基准测试")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[100, 300, 1000], help="每帧轨迹数")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--fences", type=int, default=30, help="一致性检查的随机围栏数")
+    parser.add_argument("--check-tracks", type=int, default=40, help="一致性检查的轨迹数")
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4], help="流水线检查的流水线深度")
+    parser.add_argument("--pipeline-frames", type=int, default=300, help="流水线检查的帧数")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"场景检查: {check_scenarios()} 组轨迹通过")
+    events = check_equivalence(args)
+    print(f"一致性检查: {args.fences} 个随机围栏、{events} 个越线事件与标量实现完全相同")
+    for depth, count in check_pipeline(args).items():
+        print(f"流水线检查: 深度={depth}，{args.pipeline_frames} 帧、{count} 个越线事件与顺序执行的参照完全相同")
+
+    print(f"\n单帧耗时（{args.frames} 帧平均）:")
+    print(f"{'轨迹数':>6} {'边数':>5} {'逐轨迹逐边':>12} {'cross过滤':>11} {'加速':>6} {'事件数':>7}")
+    for row in run_timing(args):
+        print(f"{row['tracks']:>6} {row['edges']:>5} {row['scalar'] * 1000:>10.2f}ms {row['vectorized'] * 1000:>9.2f}ms "
+              f"{row['scalar'] / row['vectorized']:>5.1f}x {row['events']:>7}")
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
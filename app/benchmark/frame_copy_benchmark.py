@@ -0,0 +1,210 @@
+"""
+帧拷贝基准测试：统计帧读取器到各任务之间每秒的整帧拷贝字节数
+
+同一摄像头（合成视频源）被多个模拟任务订阅，每个任务按自己的帧率取帧:
+- 检测任务: 取帧后交给检测（只读），启用 --draw 时模拟推流绘制（需要拷贝）
+- 时序分析任务: 取帧后放入 FrameBufferService 的帧缓冲区（最多 max_frames 帧）
+
+拷贝统计:
+- 读取器内部: ThreadedFrameReader.stats["bytes_copied"]
+- 取帧: 任务拿到的帧自有数据（非共享帧槽视图）时计为一次拷贝
+- 帧缓冲区: 缓冲区保存的不是传入的帧对象时计为一次拷贝（帧缓冲区长期持有帧，按采样帧率拷贝）
+- 绘制: 只读帧绘制前的拷贝
+帧槽被消费者占满时帧读取器会为每帧新分配缓冲区，不计入拷贝但同样是整帧的内存开销，
+因此同时统计帧环形缓冲区的帧槽复用率与新分配字节数。
+并按原实现（写入最新帧拷贝1次、每次取帧拷贝1次、帧缓冲区拷贝1次，绘制直接在取帧的拷贝上进行）
+估算改造前的拷贝量作为对比。
+
+用法:
+    python -m app.benchmark.frame_copy_benchmark --tasks 4 --buffer-tasks 2 --width 1920 --height 1080
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.adaptive_frame_reader import SharedFrameReader, register_stream_url
+from app.services.frame_buffer_service import FrameBufferService
+from app.services.synthetic_frame_source import make_synthetic_url
+
+logger = logging.getLogger("frame_copy_benchmark")
+
+
+class CopyCounter:
+    """线程安全的拷贝计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"get": 0, "buffer": 0, "draw": 0}
+        self.frames: Dict[str, int] = {"get": 0, "buffer": 0}
+
+    def add(self, key: str, nbytes: int):
+        with self._lock:
+            self.counts[key] += nbytes
+
+    def frame(self, key: str):
+        with self._lock:
+            self.frames[key] += 1
+
+
+def _owns_data(frame) -> bool:
+    """帧是否自有数据（即被拷贝过），共享帧槽的视图不自有数据"""
+    return frame.flags.owndata
+
+
+def detection_task(reader: SharedFrameReader, interval: float, draw: bool, counter: CopyCounter,
+                   stop_event: threading.Event):
+    import cv2
+
+    while not stop_event.is_set():
+        start = time.time()
+        frame, _ = reader.get_latest_frame_with_generation()
+        if frame is not None:
+            counter.frame("get")
+            if _owns_data(frame):
+                counter.add("get", frame.nbytes)
+            # 检测只读取帧内容
+            frame[::64, ::64].mean()
+            if draw:
+                annotated = frame if frame.flags.writeable else frame.copy()
+                if annotated is not frame:
+                    counter.add("draw", annotated.nbytes)
+                cv2.rectangle(annotated, (10, 10), (200, 200), (0, 255, 0), 2)
+        stop_event.wait(max(0.0, interval - (time.time() - start)))
+
+
+def buffer_task(task_id: int, reader: SharedFrameReader, interval: float, max_frames: int,
+                counter: CopyCounter, stop_event: threading.Event):
+    service = FrameBufferService(max_frames=max_frames, adaptive_reader=reader)
+    service.init_task_buffer(task_id)
+    while not stop_event.is_set():
+        start = time.time()
+        frame, _ = reader.get_latest_frame_with_generation()
+        if frame is not None:
+            counter.frame("get")
+            if _owns_data(frame):
+                counter.add("get", frame.nbytes)
+            service.add_frame(task_id, frame)
+            counter.frame("buffer")
+            if service.task_buffers[task_id]["frames"][-1] is not frame:
+                counter.add("buffer", frame.nbytes)
+        stop_event.wait(max(0.0, interval - (time.time() - start)))
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    camera_id = 990013
+    register_stream_url(camera_id, make_synthetic_url(args.width, args.height, fps=args.source_fps, objects=3))
+    shared_reader = SharedFrameReader(camera_id, connection_overhead_threshold=30.0)
+    counter = CopyCounter()
+    stop_event = threading.Event()
+    threads: List[threading.Thread] = []
+    try:
+        interval = 1.0 / args.task_fps
+        for i in range(args.tasks + args.buffer_tasks):
+            if not shared_reader.add_subscriber(i + 1, interval):
+                raise RuntimeError("帧读取器启动失败")
+        for i in range(args.tasks):
+            threads.append(threading.Thread(target=detection_task, daemon=True,
+                                            args=(shared_reader, interval, args.draw, counter, stop_event)))
+        for i in range(args.buffer_tasks):
+            threads.append(threading.Thread(target=buffer_task, daemon=True,
+                                            args=(i + 1, shared_reader, interval, args.max_frames,
+                                                  counter, stop_event)))
+        for thread in threads:
+            thread.start()
+
+        time.sleep(args.warmup)
+        reader = shared_reader.threaded_reader
+        before_reader = dict(reader.stats)
+        before_counts, before_frames = dict(counter.counts), dict(counter.frames)
+        before_ring = dict(reader.frame_ring.stats)
+        cpu_start = os.times()
+        time.sleep(args.duration)
+        cpu_end = os.times()
+        after_reader = dict(reader.stats)
+        after_counts, after_frames = dict(counter.counts), dict(counter.frames)
+        after_ring = dict(reader.frame_ring.stats)
+        ring_stats = reader.frame_ring.get_stats()
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        for i in range(args.tasks + args.buffer_tasks):
+            shared_reader.remove_subscriber(i + 1)
+        register_stream_url(camera_id, None)
+
+    seconds = args.duration
+    frame_bytes = args.width * args.height * 3
+    copied = {key: (after_counts[key] - before_counts[key]) / seconds for key in after_counts}
+    copied["reader"] = (after_reader["bytes_copied"] - before_reader["bytes_copied"]) / seconds
+    published = (after_reader["frames_retrieved"] - before_reader["frames_retrieved"]) / seconds
+    gets = (after_frames["get"] - before_frames["get"]) / seconds
+    buffered = (after_frames["buffer"] - before_frames["buffer"]) / seconds
+    ring_delta = {key: after_ring[key] - before_ring[key]
+                  for key in ("slot_reuses", "slot_allocations", "overflow_allocations")}
+    acquired = sum(ring_delta.values())
+    allocated = ring_delta["slot_allocations"] + ring_delta["overflow_allocations"]
+    return {
+        "frame_mb": frame_bytes / 1024 / 1024,
+        "published_fps": published,
+        "get_fps": gets,
+        "copied_mb_per_s": {key: value / 1024 / 1024 for key, value in copied.items()},
+        "total_copied_mb_per_s": sum(copied.values()) / 1024 / 1024,
+        # 原实现绘制直接在取帧得到的拷贝上进行，无额外拷贝
+        "legacy_copied_mb_per_s": (published + gets + buffered) * frame_bytes / 1024 / 1024,
+        "slot_reuse_ratio": ring_delta["slot_reuses"] / acquired if acquired else 0.0,
+        "ring_allocations": ring_delta,
+        "allocated_mb_per_s": allocated * frame_bytes / seconds / 1024 / 1024,
+        "process_cpu_cores": ((cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)) / seconds,
+        "frame_ring": ring_stats,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n单帧 {report['frame_mb']:.1f}MB, 读取器发布 {report['published_fps']:.1f} 帧/s, "
+          f"任务取帧 {report['get_fps']:.1f} 次/s")
+    print(f"{'拷贝来源':<10} {'MB/s':>10}")
+    for key, value in report["copied_mb_per_s"].items():
+        print(f"{key:<10} {value:>10.1f}")
+    print(f"{'合计':<10} {report['total_copied_mb_per_s']:>10.1f}")
+    print(f"{'原实现估算':<10} {report['legacy_copied_mb_per_s']:>10.1f}")
+    print(f"帧槽复用率: {report['slot_reuse_ratio']:.1%}, 新分配 {report['allocated_mb_per_s']:.1f} MB/s, "
+          f"计时内 {report['ring_allocations']}")
+    print(f"进程CPU: {report['process_cpu_cores']:.2f} 核")
+    print("帧环形缓冲区:", report["frame_ring"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="帧读取器到任务之间的整帧拷贝量统计")
+    parser.add_argument("--tasks", type=int, default=4, help="检测任务数")
+    parser.add_argument("--buffer-tasks", type=int, default=1, help="使用帧缓冲区的时序分析任务数")
+    parser.add_argument("--max-frames", type=int, default=50, help="帧缓冲区容量")
+    parser.add_argument("--task-fps", type=float, default=10.0, help="每个任务的取帧帧率")
+    parser.add_argument("--source-fps", type=float, default=25.0, help="合成视频源帧率")
+    parser.add_argument("--width", type=int, default=1920, help="帧宽度")
+    parser.add_argument("--height", type=int, default=1080, help="帧高度")
+    parser.add_argument("--draw", action="store_true", help="检测任务模拟推流绘制")
+    parser.add_argument("--warmup", type=float, default=2.0, help="预热时长（秒）")
+    parser.add_argument("--duration", type=float, default=10.0, help="计时时长（秒）")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    report = run_benchmark(args)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
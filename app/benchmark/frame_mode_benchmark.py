@@ -0,0 +1,247 @@
+"""
+取帧模式自动选择的模拟测试
+
+用合成视频源（持续连接模式的"解码"开销）和本地假WVP服务（带人为延迟的截图接口）模拟若干路摄像头:
+1. 标定: 单独测量合成视频源的解码CPU占用和假WVP的截图耗时，据此算出各取帧间隔下真正更便宜的模式
+2. 固定间隔: 每路摄像头一个订阅者，取帧间隔从短到长；启动时尚无截图实测值，按固定阈值选择，
+   之后由监督线程试截图、采样解码CPU并复查，检查最终模式与标定结果一致（代价差在滞回范围内的间隔不检查）。
+   默认参数下合成视频源解码很便宜，交叉间隔远大于固定阈值，60s间隔的摄像头应从按需截图切换到持续连接
+3. 间隔变化: 第一路摄像头（已有实测代价）先只有长间隔订阅者，加入短间隔订阅者后切换到持续连接，
+   短间隔订阅者退出后切回按需截图
+
+用法:
+    python -m app.benchmark.frame_mode_benchmark
+    python -m app.benchmark.frame_mode_benchmark --delay-ms 800 --intervals 1 5 20 60 300 --duration 40
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.fake_wvp_server import FakeWVPServer
+
+logger = logging.getLogger("frame_mode_benchmark")
+
+
+def calibrate(args, stream_url: str, camera_id: int) -> Dict[str, float]:
+    """单独测量持续连接的解码CPU占用和截图耗时"""
+    from app.services.adaptive_frame_reader import ThreadedFrameReader
+    from app.services.wvp_client import wvp_client
+
+    reader = ThreadedFrameReader(stream_url, frame_interval=1.0)
+    if not reader.start():
+        raise RuntimeError("合成视频源启动失败")
+    try:
+        time.sleep(1.0)
+        before, begin = reader.get_stats()["decoder_cpu_time"], time.time()
+        time.sleep(args.calibrate_seconds)
+        decode_cpu = (reader.get_stats()["decoder_cpu_time"] - before) / (time.time() - begin)
+    finally:
+        reader.stop()
+
+    latencies = []
+    for _ in range(5):
+        begin = time.time()
+        if wvp_client.get_channel_snap_stream(camera_id):
+            latencies.append(time.time() - begin)
+    if not latencies:
+        raise RuntimeError("假WVP截图失败")
+    return {"decode_cpu": decode_cpu, "snapshot_latency": sum(latencies) / len(latencies)}
+
+
+class Subscriber:
+    """与 AITaskExecutor 主循环相同：在同一线程中启动、按间隔取帧和释放读取器"""
+
+    def __init__(self, camera_id: int, interval: float, threshold: float):
+        self.camera_id = camera_id
+        self.interval = interval
+        self.threshold = threshold
+        self.started = threading.Event()
+        self.stop_event = threading.Event()
+        self.ok = False
+        self.frames = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> bool:
+        self.thread.start()
+        self.started.wait(30)
+        return self.ok
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=30)
+
+    def _run(self):
+        from app.services.adaptive_frame_reader import AdaptiveFrameReader
+
+        reader = AdaptiveFrameReader(self.camera_id, self.interval, connection_overhead_threshold=self.threshold)
+        self.ok = reader.start()
+        self.started.set()
+        if not self.ok:
+            return
+        try:
+            while not self.stop_event.is_set():
+                frame, _ = reader.get_latest_frame_with_info()
+                if frame is not None:
+                    self.frames += 1
+                self.stop_event.wait(self.interval)
+        finally:
+            reader.stop()
+
+
+def expected_mode(calibration: Dict[str, float], interval: float, hysteresis: float) -> Optional[str]:
+    """按标定结果更便宜的模式；两者代价差在滞回范围内时返回None（两种结果都合理）"""
+    persistent = calibration["decode_cpu"]
+    on_demand = calibration["snapshot_latency"] / interval
+    if on_demand < persistent * (1 - hysteresis):
+        return "on_demand"
+    if persistent < on_demand * (1 - hysteresis):
+        return "persistent"
+    return None
+
+
+def run_fixed_intervals(args, calibration: Dict[str, float]) -> List[Dict[str, Any]]:
+    from app.core.config import settings
+    from app.services.adaptive_frame_reader import frame_reader_manager
+
+    subscribers = [Subscriber(args.camera_base + i, interval, args.threshold)
+                   for i, interval in enumerate(args.intervals)]
+    initial_modes = {}
+    for subscriber in subscribers:
+        if not subscriber.start():
+            raise RuntimeError(f"摄像头 {subscriber.camera_id} 启动失败")
+        initial_modes[subscriber.camera_id] = frame_reader_manager.shared_readers[subscriber.camera_id].mode
+    time.sleep(args.duration)
+
+    rows = []
+    for subscriber in subscribers:
+        reader = frame_reader_manager.shared_readers[subscriber.camera_id]
+        selection = reader.mode_selector.get_stats(subscriber.interval)
+        rows.append({
+            "camera_id": subscriber.camera_id,
+            "interval": subscriber.interval,
+            "initial_mode": initial_modes[subscriber.camera_id],
+            "final_mode": reader.mode,
+            "expected": expected_mode(calibration, subscriber.interval, settings.ADAPTIVE_FRAME_MODE_HYSTERESIS),
+            "estimate": selection["estimate"],
+            "switches": selection["stats"]["switches"],
+            "frames": subscriber.frames,
+            "decisions": selection["decisions"],
+        })
+    for subscriber in subscribers:
+        subscriber.stop()
+    return rows
+
+
+def run_interval_change(args) -> List[Dict[str, Any]]:
+    """长间隔订阅者所在摄像头加入/移除短间隔订阅者，返回各阶段的模式（沿用固定间隔场景中该摄像头的实测代价）"""
+    from app.services.adaptive_frame_reader import frame_reader_manager
+
+    camera_id = args.camera_base
+    slow = Subscriber(camera_id, max(args.intervals), args.threshold)
+    if not slow.start():
+        raise RuntimeError(f"摄像头 {camera_id} 启动失败")
+    reader = frame_reader_manager.shared_readers[camera_id]
+    phases = [{"phase": "长间隔订阅者", "mode": reader.mode}]
+
+    fast = Subscriber(camera_id, min(args.intervals), args.threshold)
+    fast.start()
+    time.sleep(args.change_settle)
+    phases.append({"phase": "加入短间隔订阅者", "mode": reader.mode})
+
+    fast.stop()
+    time.sleep(args.change_settle)
+    phases.append({"phase": "短间隔订阅者退出", "mode": reader.mode})
+    phases.append({"decisions": reader.mode_selector.get_stats()["decisions"]})
+    slow.stop()
+    return phases
+
+
+def print_report(args, calibration, rows, phases):
+    print(f"\n标定: 解码CPU {calibration['decode_cpu']:.3f} 核，截图耗时 {calibration['snapshot_latency'] * 1000:.0f}ms，"
+          f"交叉间隔约 {calibration['snapshot_latency'] / max(calibration['decode_cpu'], 1e-6):.1f}s；"
+          f"固定阈值 {args.threshold:.0f}s")
+    print(f"{'间隔':>6} {'启动模式':<11} {'最终模式':<11} {'应选':<11} {'持续连接代价':>12} {'按需代价':>9} {'切换':>4} {'取帧':>5}")
+    for row in rows:
+        estimate = row["estimate"]
+        on_demand_cost = estimate["on_demand_cost"]
+        print(f"{row['interval']:>5.0f}s {row['initial_mode']:<11} {row['final_mode']:<11} "
+              f"{row['expected'] or '(滞回内)':<11} {estimate['persistent_cost']:>12.3f} "
+              f"{on_demand_cost if on_demand_cost is not None else float('nan'):>9.3f} "
+              f"{row['switches']:>4} {row['frames']:>5}")
+    print("\n间隔变化:")
+    for phase in phases[:-1]:
+        print(f"  {phase['phase']}: {phase['mode']}")
+    for decision in phases[-1]["decisions"]:
+        print(f"  [{decision['trigger']}] {decision['from']} -> {decision['mode']}: {decision['reason']}")
+
+
+def run_benchmark(args):
+    from app.core.config import settings
+    from app.services.adaptive_frame_reader import frame_reader_manager, register_stream_url
+    from app.services.synthetic_frame_source import make_synthetic_url
+    from app.services.wvp_client import wvp_client
+
+    settings.ADAPTIVE_FRAME_COST_MODE_ENABLED = True
+    settings.ADAPTIVE_FRAME_MODE_EVAL_INTERVAL = args.eval_interval
+    settings.ADAPTIVE_FRAME_MODE_MIN_DWELL = args.min_dwell
+    settings.FRAME_READER_SUPERVISOR_INTERVAL = 0.5
+
+    server = FakeWVPServer(snapshot_delay_ms=args.delay_ms, width=args.width, height=args.height)
+    wvp_client.base_url = server.start()
+    stream_url = make_synthetic_url(args.width, args.height, fps=args.fps, objects=3)
+    for index in range(len(args.intervals)):
+        register_stream_url(args.camera_base + index, stream_url)
+    try:
+        calibration = calibrate(args, stream_url, args.camera_base)
+        rows = run_fixed_intervals(args, calibration)
+        phases = run_interval_change(args)
+    finally:
+        server.stop()
+        frame_reader_manager.shutdown()
+    return calibration, rows, phases
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="按实测代价选择持续连接/按需截图模式的模拟测试")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[1.0, 10.0, 60.0, 600.0],
+                        help="各路摄像头订阅者的取帧间隔（秒）")
+    parser.add_argument("--delay-ms", type=float, default=1500.0, help="假WVP每次截图的延迟（毫秒）")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=25.0, help="合成视频源帧率")
+    parser.add_argument("--threshold", type=float, default=30.0, help="固定阈值（秒），启动时尚无截图实测值时使用")
+    parser.add_argument("--eval-interval", type=float, default=2.0, help="复查取帧模式的间隔（秒）")
+    parser.add_argument("--min-dwell", type=float, default=30.0, help="定期复查切换前的最短驻留（秒），也用于分摊拉流启动耗时")
+    parser.add_argument("--duration", type=float, default=45.0, help="固定间隔场景的运行时间（秒）")
+    parser.add_argument("--change-settle", type=float, default=3.0, help="间隔变化后等待的时间（秒）")
+    parser.add_argument("--calibrate-seconds", type=float, default=4.0)
+    parser.add_argument("--camera-base", type=int, default=940000)
+    parser.add_argument("--log-level", default="ERROR")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.ERROR),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    calibration, rows, phases = run_benchmark(args)
+    print_report(args, calibration, rows, phases)
+
+    mismatched = [row for row in rows if row["expected"] and row["final_mode"] != row["expected"]]
+    assert not mismatched, f"最终模式与标定结果不一致: {[(r['interval'], r['final_mode']) for r in mismatched]}"
+    assert phases[1]["mode"] == "persistent", "加入短间隔订阅者后应切换到持续连接"
+    if expected_mode(calibration, max(args.intervals), 0.0) == "on_demand":
+        assert phases[2]["mode"] == "on_demand", "短间隔订阅者退出后应切回按需截图"
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
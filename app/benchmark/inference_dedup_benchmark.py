@@ -0,0 +1,221 @@
+"""
+同摄像头多任务推理去重校验
+
+在同一个合成摄像头上运行多个共用 yolo11_coco 模型的任务，走与生产一致的完整链路：
+合成视频源 -> 共享帧读取器 -> 异步帧处理器（inference_cache.frame_scope）-> 技能 -> TritonClient.infer -> 假Triton服务。
+
+各任务每轮读取同一帧后投递给自己的处理器，等待检测结果后再进入下一轮，
+最后校验假Triton服务收到的推理请求数与实际处理的帧代次数相同，即每一代帧只推理一次。
+
+用法:
+    python -m app.benchmark.inference_dedup_benchmark
+    python -m app.benchmark.inference_dedup_benchmark --frames 50 --skills coco_detector,pstop_coco_detector
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.fake_triton_server import FakeTritonServer, yolo_model_spec
+from app.services.synthetic_frame_source import make_synthetic_url
+
+logger = logging.getLogger("inference_dedup_benchmark")
+
+SKILL_DIR = os.path.join(PROJECT_ROOT, "app", "plugins", "skills")
+MODEL_NAME = "yolo11_coco"
+DEFAULT_SKILLS = "coco_detector,crowd_detector,person_intrusion,pstop_coco_detector"
+
+
+class DedupTask:
+    """单个任务：独立的帧读取器、处理器和技能实例，按轮次与其他任务同步"""
+
+    def __init__(self, task_id: int, camera_id: int, skill_instance, frame_interval: float):
+        self.task_id = task_id
+        self.camera_id = camera_id
+        self.skill_instance = skill_instance
+        self.frame_interval = frame_interval
+        self.generations: List[int] = []
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, rounds: int, barrier: threading.Barrier, result_timeout: float):
+        self._thread = threading.Thread(target=self._run, args=(rounds, barrier, result_timeout),
+                                        daemon=True, name=f"DedupTask-{self.task_id}")
+        self._thread.start()
+
+    def join(self, timeout: float = 30.0):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self, rounds: int, barrier: threading.Barrier, result_timeout: float):
+        from app.services.adaptive_frame_reader import AdaptiveFrameReader
+        from app.services.ai_task_executor import OptimizedAsyncProcessor
+
+        frame_reader = AdaptiveFrameReader(camera_id=self.camera_id, frame_interval=self.frame_interval,
+                                           connection_overhead_threshold=30.0)
+        processor = None
+        try:
+            if not frame_reader.start():
+                raise RuntimeError(f"摄像头 {self.camera_id} 帧读取器启动失败")
+            processor = OptimizedAsyncProcessor(self.task_id, max_queue_size=2, camera_id=self.camera_id)
+            processor.start(self.skill_instance, {"fence_config": {}})
+
+            last_generation = None
+            for _ in range(rounds):
+                # 等到读取器出了新的一帧，所有任务到齐后同时取帧，保证各任务拿到同一代帧
+                deadline = time.time() + result_timeout
+                while True:
+                    frame, frame_info = frame_reader.get_latest_frame_with_info()
+                    if frame is not None and frame_info.generation != last_generation:
+                        break
+                    if time.time() > deadline:
+                        raise RuntimeError("等待新帧超时")
+                    time.sleep(0.005)
+                barrier.wait()
+                frame, frame_info = frame_reader.get_latest_frame_with_info()
+                last_generation = frame_info.generation
+
+                if not processor.put_raw_frame(frame, frame_info.generation, frame_info.capture_time):
+                    raise RuntimeError("帧投递失败")
+                deadline = time.time() + result_timeout
+                while True:
+                    detection_result = processor.get_alert_result()
+                    if detection_result is not None:
+                        break
+                    if time.time() > deadline:
+                        raise RuntimeError(f"第 {len(self.generations) + 1} 帧检测超时")
+                    time.sleep(0.002)
+                if not detection_result["result"].success:
+                    raise RuntimeError(f"技能处理失败: {detection_result['result'].error_message}")
+                self.generations.append(detection_result["frame_info"].generation)
+                barrier.wait()
+        except Exception as e:
+            self.error = str(e)
+            logger.exception(f"任务 {self.task_id} 运行出错")
+            barrier.abort()
+        finally:
+            if processor:
+                processor.stop()
+            frame_reader.stop()
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """运行校验，返回汇总结果"""
+    from app.services.adaptive_frame_reader import register_stream_url
+    from app.services.inference_cache import inference_cache
+    from app.services.triton_client import triton_client
+    from app.skills.skill_factory import skill_factory
+
+    server = FakeTritonServer(default_spec=yolo_model_spec(compute_ms=args.compute_ms),
+                              rpc_latency_ms=args.latency_ms)
+    url = server.start()
+    triton_client.url = url
+    if not triton_client.reconnect():
+        raise RuntimeError(f"无法连接假Triton服务 {url}")
+
+    register_stream_url(args.camera_id, make_synthetic_url(args.width, args.height, fps=args.source_fps,
+                                                           objects=args.objects, seed=0))
+
+    # 各技能默认使用不同的人员检测模型，这里统一指定为同一个模型，模拟同摄像头上共用COCO模型的多个任务
+    skill_factory.scan_and_register_skills(SKILL_DIR)
+    tasks = []
+    for task_index, skill_name in enumerate(args.skills.split(",")):
+        skill_class = skill_factory.get_skill_class(skill_name)
+        if skill_class is None:
+            raise RuntimeError(f"技能 {skill_name} 不存在，可用技能: {skill_factory.get_registered_skill_names()}")
+        config = dict(skill_class.DEFAULT_CONFIG)
+        config["required_models"] = [MODEL_NAME]
+        skill_instance = skill_factory.create_skill(skill_name, config)
+        if skill_instance is None:
+            raise RuntimeError(f"创建技能 {skill_name} 实例失败")
+        tasks.append(DedupTask(task_index + 1, args.camera_id, skill_instance, 1.0 / args.source_fps))
+
+    cache_before = inference_cache.get_stats()
+    server_before = server.get_stats()["per_model"].get(MODEL_NAME, 0)
+    barrier = threading.Barrier(len(tasks))
+    start = time.perf_counter()
+    for task in tasks:
+        task.start(args.frames, barrier, args.timeout)
+    for task in tasks:
+        task.join(args.frames * args.timeout)
+    wall = time.perf_counter() - start
+
+    infer_calls = server.get_stats()["per_model"].get(MODEL_NAME, 0) - server_before
+    cache_after = inference_cache.get_stats()
+    server.stop()
+    register_stream_url(args.camera_id, None)
+
+    processed = sum(len(task.generations) for task in tasks)
+    generations = set()
+    for task in tasks:
+        generations.update(task.generations)
+    return {
+        "wall_seconds": wall,
+        "tasks": [{"task_id": t.task_id, "skill": t.skill_instance.name, "frames": len(t.generations),
+                   "error": t.error} for t in tasks],
+        "frames_processed": processed,
+        "generations": len(generations),
+        "infer_calls": infer_calls,
+        "cache_hits": cache_after["hits"] - cache_before["hits"],
+        "cache_misses": cache_after["misses"] - cache_before["misses"],
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'任务':>4} {'技能':<22} {'处理帧数':>8}")
+    for t in report["tasks"]:
+        line = f"{t['task_id']:>4} {t['skill']:<22} {t['frames']:>8}"
+        print(line + (f"  失败: {t['error']}" if t["error"] else ""))
+    generations = report["generations"]
+    print(f"\n处理帧次: {report['frames_processed']}, 帧代次: {generations}, "
+          f"每代帧任务数: {report['frames_processed'] / generations if generations else 0.0:.2f}")
+    print(f"假Triton收到 {MODEL_NAME} 推理请求: {report['infer_calls']} 次, "
+          f"每代帧推理 {report['infer_calls'] / generations if generations else 0.0:.2f} 次")
+    print(f"推理缓存: 命中 {report['cache_hits']} 次, 未命中 {report['cache_misses']} 次, 耗时 {report['wall_seconds']:.1f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="同摄像头多任务推理去重校验（假Triton服务 + 合成视频源）")
+    parser.add_argument("--skills", default=DEFAULT_SKILLS, help="逗号分隔的技能名称，每个技能一个任务")
+    parser.add_argument("--frames", type=int, default=30, help="每个任务处理的帧数")
+    parser.add_argument("--camera-id", type=int, default=910000, help="合成摄像头ID")
+    parser.add_argument("--width", type=int, default=1920, help="合成视频宽度")
+    parser.add_argument("--height", type=int, default=1080, help="合成视频高度")
+    parser.add_argument("--source-fps", type=float, default=10.0, help="合成视频源帧率")
+    parser.add_argument("--objects", type=int, default=3, help="合成视频中的移动目标数")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="假Triton每次请求的网络开销（毫秒）")
+    parser.add_argument("--compute-ms", type=float, default=8.0, help="假Triton每次推理的固定计算耗时（毫秒）")
+    parser.add_argument("--timeout", type=float, default=10.0, help="单帧等待超时（秒）")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from app.core.config import settings
+
+    print(f"技能={args.skills} 帧数={args.frames} 推理去重={'启用' if settings.INFERENCE_DEDUP_ENABLED else '关闭'}")
+    report = run_benchmark(args)
+    print_report(report)
+
+    errors = [t for t in report["tasks"] if t["error"]]
+    assert not errors, f"任务运行失败: {errors}"
+    assert report["frames_processed"] == len(report["tasks"]) * args.frames
+    if settings.INFERENCE_DEDUP_ENABLED:
+        assert report["infer_calls"] == report["generations"], \
+            f"每代帧应只推理一次: {report['infer_calls']} 次推理 / {report['generations']} 代帧"
+    print("检查通过")
+    return report
+
+
+if __name__ == "__main__":
+    main()
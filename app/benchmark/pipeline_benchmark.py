@@ -0,0 +1,333 @@
+"""
+检测链路基准测试
+
+在纯CPU环境下运行完整的任务链路：合成视频源 -> 共享帧读取器 -> 异步帧处理器 -> 技能 -> TritonClient -> 假Triton服务，
+输出每个任务的检测帧率、各阶段耗时分位数以及CPU占用，用于在没有GPU和摄像头的情况下评估性能改动。
+
+假Triton服务默认运行在独立子进程中，统计的CPU占用只包含引擎自身（解码、预处理、后处理、gRPC序列化）。
+
+用法:
+    python -m app.benchmark.pipeline_benchmark --tasks 8 --cameras 4 --fps 10 --duration 30
+    python -m app.benchmark.pipeline_benchmark --skill coco_detector --latency-ms 15 --pipeline-depth 2
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.fake_triton_server import FakeTritonServer, yolo_model_spec
+from app.services.synthetic_frame_source import make_synthetic_url
+
+logger = logging.getLogger("pipeline_benchmark")
+
+SKILL_DIR = os.path.join(PROJECT_ROOT, "app", "plugins", "skills")
+
+
+def _serve_fake_triton(port_queue, stop_event, rpc_latency_ms: float, compute_ms: float,
+                       per_item_ms: float, instances: int):
+    """子进程入口：运行假Triton服务直到收到停止信号"""
+    server = FakeTritonServer(
+        default_spec=yolo_model_spec(compute_ms=compute_ms, per_item_ms=per_item_ms),
+        rpc_latency_ms=rpc_latency_ms,
+        instances=instances,
+    )
+    port_queue.put(server.start())
+    stop_event.wait()
+    port_queue.put(server.get_stats())
+    server.stop()
+
+
+class FakeTritonProcess:
+    """在独立子进程中运行的假Triton服务"""
+
+    def __init__(self, rpc_latency_ms: float, compute_ms: float, per_item_ms: float, instances: int):
+        ctx = multiprocessing.get_context("spawn")
+        self._queue = ctx.Queue()
+        self._stop_event = ctx.Event()
+        self._process = ctx.Process(
+            target=_serve_fake_triton,
+            args=(self._queue, self._stop_event, rpc_latency_ms, compute_ms, per_item_ms, instances),
+            daemon=True,
+        )
+
+    def start(self, timeout: float = 30.0) -> str:
+        self._process.start()
+        return self._queue.get(timeout=timeout)
+
+    def stop(self, timeout: float = 10.0) -> Dict[str, Any]:
+        self._stop_event.set()
+        try:
+            stats = self._queue.get(timeout=timeout)
+        except Exception:
+            stats = {}
+        self._process.join(timeout)
+        return stats
+
+
+class BenchmarkTask:
+    """单个模拟任务：与 AITaskExecutor._execute_task 的主循环一致"""
+
+    def __init__(self, task_id: int, camera_id: int, skill_instance, frame_rate: float,
+                 pipeline_depth: int, motion_gate_threshold: Optional[float]):
+        self.task_id = task_id
+        self.camera_id = camera_id
+        self.skill_instance = skill_instance
+        self.frame_rate = frame_rate
+        self.pipeline_depth = pipeline_depth
+        self.motion_gate_threshold = motion_gate_threshold
+        self.processor = None
+        self.frames_put = 0
+        self.results = 0
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, stop_event: threading.Event, ready: threading.Barrier):
+        self._thread = threading.Thread(target=self._run, args=(stop_event, ready),
+                                        daemon=True, name=f"BenchTask-{self.task_id}")
+        self._thread.start()
+
+    def join(self, timeout: float = 10.0):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self, stop_event: threading.Event, ready: threading.Barrier):
+        from app.services.adaptive_frame_reader import AdaptiveFrameReader
+        from app.services.ai_task_executor import OptimizedAsyncProcessor
+        from app.services.motion_gate import MotionGate
+
+        frame_interval = 1.0 / self.frame_rate
+        frame_reader = AdaptiveFrameReader(camera_id=self.camera_id, frame_interval=frame_interval,
+                                           connection_overhead_threshold=30.0)
+        try:
+            if not frame_reader.start():
+                self.error = f"摄像头 {self.camera_id} 帧读取器启动失败"
+                return
+
+            motion_gate = MotionGate(threshold=self.motion_gate_threshold) \
+                if self.motion_gate_threshold is not None else None
+            self.processor = OptimizedAsyncProcessor(self.task_id, max_queue_size=2, camera_id=self.camera_id,
+                                                     pipeline_depth=self.pipeline_depth, motion_gate=motion_gate)
+            self.processor.start(self.skill_instance, {"fence_config": {}})
+        finally:
+            ready.wait()
+
+        try:
+            last_frame_time = 0.0
+            while not stop_event.is_set():
+                current_time = time.time()
+                if current_time - last_frame_time < frame_interval:
+                    time.sleep(max(0.001, frame_interval - (current_time - last_frame_time)))
+                    continue
+                last_frame_time = current_time
+
+                frame, frame_info = frame_reader.get_latest_frame_with_info()
+                if frame is None:
+                    time.sleep(0.05)
+                    continue
+                if not self.processor.put_raw_frame(frame, frame_info.generation, frame_info.capture_time):
+                    continue
+                self.frames_put += 1
+
+                detection_result = self.processor.get_alert_result()
+                if detection_result and detection_result["result"].success:
+                    self.results += 1
+        except Exception as e:
+            self.error = str(e)
+            logger.exception(f"任务 {self.task_id} 运行出错")
+        finally:
+            if self.processor:
+                self.processor.stop()
+            frame_reader.stop()
+
+
+def _merge_stage_stats(tasks: List[BenchmarkTask]) -> Dict[str, Dict[str, float]]:
+    """合并各任务的阶段耗时：按帧数加权平均值与p50，p99/max取最大"""
+    merged: Dict[str, Dict[str, float]] = {}
+    for task in tasks:
+        if task.processor is None:
+            continue
+        for stage, stats in task.processor.stage_timer.get_stats().items():
+            entry = merged.setdefault(stage, {"count": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0})
+            entry["avg_ms"] += stats["avg_ms"] * stats["count"]
+            entry["p50_ms"] += stats["p50_ms"] * stats["count"]
+            entry["p99_ms"] = max(entry["p99_ms"], stats["p99_ms"])
+            entry["max_ms"] = max(entry["max_ms"], stats["max_ms"])
+            entry["count"] += stats["count"]
+    for entry in merged.values():
+        if entry["count"]:
+            entry["avg_ms"] /= entry["count"]
+            entry["p50_ms"] /= entry["count"]
+    return merged
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """运行基准测试，返回汇总结果"""
+    from app.services.adaptive_frame_reader import register_stream_url
+    from app.services.triton_client import triton_client
+    from app.skills.skill_factory import skill_factory
+
+    # 1. 启动假Triton服务并让全局客户端指向它
+    server = None
+    server_process = None
+    if args.server_in_process:
+        server = FakeTritonServer(
+            default_spec=yolo_model_spec(compute_ms=args.compute_ms, per_item_ms=args.per_item_ms),
+            rpc_latency_ms=args.latency_ms, instances=args.instances,
+        )
+        url = server.start()
+    else:
+        server_process = FakeTritonProcess(args.latency_ms, args.compute_ms, args.per_item_ms, args.instances)
+        url = server_process.start()
+    triton_client.url = url
+    if not triton_client.reconnect():
+        raise RuntimeError(f"无法连接假Triton服务 {url}")
+
+    # 2. 合成视频源
+    for camera_index in range(args.cameras):
+        register_stream_url(args.camera_base + camera_index, make_synthetic_url(
+            args.width, args.height, fps=args.source_fps, objects=args.objects, seed=camera_index))
+
+    # 3. 技能：同一技能类的实例在同摄像头任务间不共享，与生产一致
+    skill_factory.scan_and_register_skills(SKILL_DIR)
+    skill_class = skill_factory.get_skill_class(args.skill)
+    if skill_class is None:
+        raise RuntimeError(f"技能 {args.skill} 不存在，可用技能: {skill_factory.get_registered_skill_names()}")
+
+    tasks = []
+    for task_index in range(args.tasks):
+        skill_instance = skill_factory.create_skill(args.skill, dict(skill_class.DEFAULT_CONFIG))
+        if skill_instance is None:
+            raise RuntimeError(f"创建技能 {args.skill} 实例失败")
+        tasks.append(BenchmarkTask(
+            task_id=task_index + 1,
+            camera_id=args.camera_base + task_index % args.cameras,
+            skill_instance=skill_instance,
+            frame_rate=args.fps,
+            pipeline_depth=args.pipeline_depth,
+            motion_gate_threshold=args.motion_gate,
+        ))
+
+    # 4. 启动任务，预热后开始计时
+    stop_event = threading.Event()
+    ready = threading.Barrier(len(tasks) + 1)
+    for task in tasks:
+        task.start(stop_event, ready)
+    ready.wait()
+    time.sleep(args.warmup)
+
+    baseline = {id(task): dict(task.processor.stats) for task in tasks if task.processor}
+    cpu_start = os.times()
+    wall_start = time.perf_counter()
+    time.sleep(args.duration)
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    final = {id(task): dict(task.processor.stats) for task in tasks if task.processor}
+    stage_stats = _merge_stage_stats(tasks)
+
+    stop_event.set()
+    for task in tasks:
+        task.join()
+    server_stats = server.get_stats() if server else server_process.stop()
+    if server:
+        server.stop()
+
+    # 5. 汇总
+    per_task = []
+    for task in tasks:
+        if id(task) not in final:
+            per_task.append({"task_id": task.task_id, "camera_id": task.camera_id, "error": task.error})
+            continue
+        before, after = baseline[id(task)], final[id(task)]
+        detected = after["frames_detected"] - before["frames_detected"]
+        cpu_time = after["detection_cpu_time"] - before["detection_cpu_time"]
+        per_task.append({
+            "task_id": task.task_id,
+            "camera_id": task.camera_id,
+            "detection_fps": detected / wall,
+            "dropped": after["frames_dropped"] - before["frames_dropped"],
+            "stale": after["frames_stale"] - before["frames_stale"],
+            "motion_skipped": after["frames_motion_skipped"] - before["frames_motion_skipped"],
+            "cpu_ms_per_frame": cpu_time / detected * 1000 if detected else 0.0,
+            "error": task.error,
+        })
+
+    process_cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    total_fps = sum(t.get("detection_fps", 0.0) for t in per_task)
+    return {
+        "wall_seconds": wall,
+        "total_detection_fps": total_fps,
+        "target_fps": args.tasks * args.fps,
+        "process_cpu_cores": process_cpu / wall,
+        "process_cpu_ms_per_frame": process_cpu / (total_fps * wall) * 1000 if total_fps else 0.0,
+        "per_task": per_task,
+        "stages": stage_stats,
+        "server": server_stats,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'任务':>4} {'摄像头':>6} {'检测FPS':>8} {'丢帧':>6} {'过期':>6} {'门控跳过':>8} {'CPU/帧(ms)':>10}")
+    for t in report["per_task"]:
+        if "detection_fps" not in t:
+            print(f"{t['task_id']:>4} {t['camera_id']:>6}  失败: {t['error']}")
+            continue
+        print(f"{t['task_id']:>4} {t['camera_id']:>6} {t['detection_fps']:>8.2f} {t['dropped']:>6} {t['stale']:>6} "
+              f"{t['motion_skipped']:>8} {t['cpu_ms_per_frame']:>10.2f}")
+
+    print(f"\n{'阶段':<14} {'次数':>7} {'平均(ms)':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9}")
+    for stage, s in sorted(report["stages"].items()):
+        print(f"{stage:<14} {s['count']:>7} {s['avg_ms']:>9.2f} {s['p50_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+
+    server = report["server"]
+    print(f"\n总检测FPS: {report['total_detection_fps']:.1f} / 目标 {report['target_fps']:.1f}")
+    print(f"进程CPU: {report['process_cpu_cores']:.2f} 核, 每帧 {report['process_cpu_ms_per_frame']:.2f}ms")
+    if server:
+        print(f"Triton请求: {server.get('requests', 0)} 次, 平均批量 {server.get('avg_batch_rows', 0.0):.2f}, "
+              f"最大批量 {server.get('max_batch_rows', 0)}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检测链路CPU基准测试（假Triton服务 + 合成视频源）")
+    parser.add_argument("--tasks", type=int, default=4, help="任务数")
+    parser.add_argument("--cameras", type=int, default=2, help="摄像头数，任务按顺序分配到摄像头")
+    parser.add_argument("--camera-base", type=int, default=900000, help="合成摄像头ID起始值")
+    parser.add_argument("--fps", type=float, default=5.0, help="每个任务的检测帧率")
+    parser.add_argument("--duration", type=float, default=20.0, help="计时时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长（秒）")
+    parser.add_argument("--skill", default="coco_detector", help="技能名称")
+    parser.add_argument("--width", type=int, default=1920, help="合成视频宽度")
+    parser.add_argument("--height", type=int, default=1080, help="合成视频高度")
+    parser.add_argument("--source-fps", type=float, default=25.0, help="合成视频源帧率")
+    parser.add_argument("--objects", type=int, default=3, help="合成视频中的移动目标数")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="假Triton每次请求的网络开销（毫秒）")
+    parser.add_argument("--compute-ms", type=float, default=8.0, help="假Triton每次推理的固定计算耗时（毫秒）")
+    parser.add_argument("--per-item-ms", type=float, default=1.0, help="假Triton批量中每行的额外计算耗时（毫秒）")
+    parser.add_argument("--instances", type=int, default=1, help="假Triton模型实例数（可同时计算的请求数）")
+    parser.add_argument("--pipeline-depth", type=int, default=1, help="每个任务的检测流水线深度")
+    parser.add_argument("--motion-gate", type=float, default=None, help="启用运动门控并指定阈值")
+    parser.add_argument("--server-in-process", action="store_true", help="假Triton服务与引擎运行在同一进程")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(f"任务={args.tasks} 摄像头={args.cameras} 帧率={args.fps} 技能={args.skill} "
+          f"流水线深度={args.pipeline_depth} 假Triton延迟={args.latency_ms}+{args.compute_ms}ms")
+    report = run_benchmark(args)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
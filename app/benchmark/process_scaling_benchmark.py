@@ -0,0 +1,303 @@
+"""
+多进程任务执行基准测试：线程模式 vs 工作进程模式的吞吐与每核扩展性
+
+同一组合成摄像头和任务分别以线程模式（所有检测在主进程中）和多进程模式（检测分片到 N 个工作进程，
+帧经共享内存传递）运行，输出总检测帧率、主进程/工作进程CPU占用以及每核检测帧率。
+技能在真实技能基础上附加一段持有GIL的纯Python计算（--python-work-ms），模拟后处理、跟踪和绘制的开销；
+推理由独立子进程中的假Triton服务完成，其CPU不计入统计。
+
+用法:
+    python -m app.benchmark.process_scaling_benchmark --tasks 16 --cameras 4 --workers 1 2 4
+    python -m app.benchmark.process_scaling_benchmark --python-work-ms 20 --fps 10 --duration 20
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.pipeline_benchmark import SKILL_DIR, FakeTritonProcess
+from app.services.synthetic_frame_source import make_synthetic_url
+
+logger = logging.getLogger("process_scaling_benchmark")
+
+
+def _spin(seconds: float):
+    """持有GIL的纯Python计算，按本线程CPU时间计时"""
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        pass
+
+
+def register_benchmark_skill(base_skill: str, python_work_ms: float) -> str:
+    """注册在真实技能之后附加纯Python计算的基准技能，返回技能名称"""
+    from app.skills.skill_factory import skill_factory
+
+    base_class = skill_factory.get_skill_class(base_skill)
+    if base_class is None:
+        raise RuntimeError(f"技能 {base_skill} 不存在，可用技能: {skill_factory.get_registered_skill_names()}")
+    name = f"{base_skill}_bench"
+    work_seconds = python_work_ms / 1000.0
+
+    def process(self, input_data, fence_config=None):
+        result = base_class.process(self, input_data, fence_config)
+        _spin(work_seconds)
+        return result
+
+    skill_class = type(f"{base_class.__name__}Bench", (base_class,), {
+        "DEFAULT_CONFIG": {**base_class.DEFAULT_CONFIG, "name": name},
+        "process": process,
+    })
+    skill_factory.register_skill_class(skill_class)
+    return name
+
+
+def init_benchmark_worker(triton_url: str, base_skill: str, python_work_ms: float, log_level: int):
+    """工作进程初始化：连接假Triton服务并注册基准技能"""
+    from app.services.triton_client import triton_client
+
+    logging.getLogger().setLevel(log_level)
+    triton_client.url = triton_url
+    if not triton_client.reconnect():
+        raise RuntimeError(f"工作进程无法连接假Triton服务 {triton_url}")
+    register_benchmark_skill(base_skill, python_work_ms)
+
+
+class ScalingTask:
+    """单个模拟任务：与 AITaskExecutor._execute_task 的主循环一致，帧处理器由调用方创建"""
+
+    def __init__(self, task_id: int, camera_id: int, frame_rate: float, processor):
+        self.task_id = task_id
+        self.camera_id = camera_id
+        self.frame_rate = frame_rate
+        self.processor = processor
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, stop_event: threading.Event, ready: threading.Barrier):
+        self._thread = threading.Thread(target=self._run, args=(stop_event, ready),
+                                        daemon=True, name=f"ScalingTask-{self.task_id}")
+        self._thread.start()
+
+    def join(self, timeout: float = 10.0):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self, stop_event: threading.Event, ready: threading.Barrier):
+        from app.services.adaptive_frame_reader import AdaptiveFrameReader
+
+        frame_interval = 1.0 / self.frame_rate
+        frame_reader = AdaptiveFrameReader(camera_id=self.camera_id, frame_interval=frame_interval,
+                                           connection_overhead_threshold=30.0)
+        try:
+            if not frame_reader.start():
+                self.error = f"摄像头 {self.camera_id} 帧读取器启动失败"
+        finally:
+            ready.wait()
+        if self.error:
+            return
+
+        try:
+            last_frame_time = 0.0
+            while not stop_event.is_set():
+                current_time = time.time()
+                if current_time - last_frame_time < frame_interval:
+                    time.sleep(max(0.001, frame_interval - (current_time - last_frame_time)))
+                    continue
+                last_frame_time = current_time
+
+                frame, frame_generation = frame_reader.get_latest_frame_with_generation()
+                if frame is None:
+                    time.sleep(0.05)
+                    continue
+                if not self.processor.put_raw_frame(frame, frame_generation):
+                    continue
+                self.processor.get_alert_result()
+        except Exception as e:
+            self.error = str(e)
+            logger.exception(f"任务 {self.task_id} 运行出错")
+        finally:
+            self.processor.stop()
+            frame_reader.stop()
+
+
+def _worker_cpu_seconds(pool) -> float:
+    import psutil
+
+    total = 0.0
+    for worker in pool.get_stats()["workers"]:
+        try:
+            times = psutil.Process(worker["pid"]).cpu_times()
+            total += times.user + times.system
+        except Exception:
+            pass
+    return total
+
+
+def run_mode(args, skill_name: str, workers: int, triton_url: str) -> Dict[str, Any]:
+    """
+    运行一种模式
+
+    Args:
+        workers: 工作进程数，0为线程模式
+    """
+    from app.services.ai_task_executor import OptimizedAsyncProcessor, ProcessPoolTaskProcessor
+    from app.services.task_process_pool import TaskProcessPool
+    from app.skills.skill_factory import skill_factory
+
+    pool = None
+    if workers > 0:
+        pool = TaskProcessPool(workers, skill_dirs=[SKILL_DIR], initializer=init_benchmark_worker,
+                               initargs=(triton_url, args.skill, args.python_work_ms,
+                                         logging.getLogger().getEffectiveLevel()))
+        if not pool.start():
+            raise RuntimeError("任务工作进程池启动失败")
+
+    tasks: List[ScalingTask] = []
+    try:
+        for task_index in range(args.tasks):
+            task_id = task_index + 1
+            camera_id = args.camera_base + task_index % args.cameras
+            skill_instance = skill_factory.create_skill(skill_name, dict(skill_factory.get_skill_class(
+                skill_name).DEFAULT_CONFIG))
+            if pool is not None:
+                processor = ProcessPoolTaskProcessor(task_id, pool, camera_id)
+                processor.start(skill_instance, {
+                    "task_id": task_id, "camera_id": camera_id, "skill_name": skill_name,
+                    "skill_config": skill_instance.config, "fence_config": {},
+                    "frame_interval": 1.0 / args.fps, "motion_gate": None,
+                })
+            else:
+                processor = OptimizedAsyncProcessor(task_id, max_queue_size=2, camera_id=camera_id)
+                processor.start(skill_instance, {"fence_config": {}})
+            tasks.append(ScalingTask(task_id, camera_id, args.fps, processor))
+
+        stop_event = threading.Event()
+        ready = threading.Barrier(len(tasks) + 1)
+        for task in tasks:
+            task.start(stop_event, ready)
+        ready.wait()
+        time.sleep(args.warmup)
+
+        before = [task.processor.stats["frames_detected"] for task in tasks]
+        worker_cpu_start = _worker_cpu_seconds(pool) if pool else 0.0
+        cpu_start = os.times()
+        wall_start = time.perf_counter()
+        time.sleep(args.duration)
+        wall = time.perf_counter() - wall_start
+        cpu_end = os.times()
+        worker_cpu_end = _worker_cpu_seconds(pool) if pool else 0.0
+        after = [task.processor.stats["frames_detected"] for task in tasks]
+        pool_stats = pool.get_stats() if pool else None
+
+        stop_event.set()
+        for task in tasks:
+            task.join()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    detected = sum(a - b for a, b in zip(after, before))
+    main_cores = ((cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)) / wall
+    worker_cores = (worker_cpu_end - worker_cpu_start) / wall
+    total_cores = main_cores + worker_cores
+    fps = detected / wall
+    return {
+        "mode": f"{workers}进程" if workers else "线程",
+        "workers": workers,
+        "detection_fps": fps,
+        "target_fps": args.tasks * args.fps,
+        "main_cpu_cores": main_cores,
+        "worker_cpu_cores": worker_cores,
+        "fps_per_core": fps / total_cores if total_cores else 0.0,
+        "errors": [task.error for task in tasks if task.error],
+        "pool": pool_stats,
+    }
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    from app.services.adaptive_frame_reader import register_stream_url
+    from app.services.triton_client import triton_client
+    from app.skills.skill_factory import skill_factory
+
+    server_process = FakeTritonProcess(args.latency_ms, args.compute_ms, args.per_item_ms, args.instances)
+    url = server_process.start()
+    triton_client.url = url
+    if not triton_client.reconnect():
+        raise RuntimeError(f"无法连接假Triton服务 {url}")
+
+    for camera_index in range(args.cameras):
+        register_stream_url(args.camera_base + camera_index, make_synthetic_url(
+            args.width, args.height, fps=args.source_fps, objects=args.objects, seed=camera_index))
+
+    skill_factory.scan_and_register_skills(SKILL_DIR)
+    skill_name = register_benchmark_skill(args.skill, args.python_work_ms)
+
+    modes = [] if args.skip_threads else [0]
+    modes += [w for w in args.workers if w > 0]
+    results = []
+    try:
+        for workers in modes:
+            results.append(run_mode(args, skill_name, workers, url))
+    finally:
+        server_process.stop()
+        for camera_index in range(args.cameras):
+            register_stream_url(args.camera_base + camera_index, None)
+    return {"cpu_count": os.cpu_count(), "results": results}
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\nCPU核数: {report['cpu_count']}")
+    print(f"{'模式':<8} {'检测FPS':>9} {'目标FPS':>9} {'主进程核':>9} {'工作进程核':>10} {'每核FPS':>9} {'相对线程':>9}")
+    baseline = next((r["detection_fps"] for r in report["results"] if r["workers"] == 0), None)
+    for r in report["results"]:
+        speedup = f"{r['detection_fps'] / baseline:.2f}x" if baseline else "-"
+        print(f"{r['mode']:<8} {r['detection_fps']:>9.1f} {r['target_fps']:>9.1f} {r['main_cpu_cores']:>9.2f} "
+              f"{r['worker_cpu_cores']:>10.2f} {r['fps_per_core']:>9.1f} {speedup:>9}")
+        for error in r["errors"][:3]:
+            print(f"    错误: {error}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="线程模式与多进程模式的检测吞吐和每核扩展性对比")
+    parser.add_argument("--tasks", type=int, default=8, help="任务数")
+    parser.add_argument("--cameras", type=int, default=4, help="摄像头数，任务按顺序分配到摄像头")
+    parser.add_argument("--camera-base", type=int, default=910000, help="合成摄像头ID起始值")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="多进程模式的工作进程数列表")
+    parser.add_argument("--skip-threads", action="store_true", help="不运行线程模式")
+    parser.add_argument("--fps", type=float, default=10.0, help="每个任务的检测帧率")
+    parser.add_argument("--python-work-ms", type=float, default=10.0, help="每帧附加的纯Python计算（毫秒）")
+    parser.add_argument("--duration", type=float, default=15.0, help="每种模式的计时时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长（秒）")
+    parser.add_argument("--skill", default="coco_detector", help="基础技能名称")
+    parser.add_argument("--width", type=int, default=1280, help="合成视频宽度")
+    parser.add_argument("--height", type=int, default=720, help="合成视频高度")
+    parser.add_argument("--source-fps", type=float, default=25.0, help="合成视频源帧率")
+    parser.add_argument("--objects", type=int, default=3, help="合成视频中的移动目标数")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="假Triton每次请求的网络开销（毫秒）")
+    parser.add_argument("--compute-ms", type=float, default=5.0, help="假Triton每次推理的固定计算耗时（毫秒）")
+    parser.add_argument("--per-item-ms", type=float, default=1.0, help="假Triton批量中每行的额外计算耗时（毫秒）")
+    parser.add_argument("--instances", type=int, default=4, help="假Triton模型实例数（可同时计算的请求数）")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(f"任务={args.tasks} 摄像头={args.cameras} 帧率={args.fps} 技能={args.skill} "
+          f"纯Python计算={args.python_work_ms}ms/帧 工作进程={args.workers}")
+    report = run_benchmark(args)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
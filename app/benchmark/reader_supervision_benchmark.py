@@ -0,0 +1,238 @@
+"""
+帧读取器监督基准测试：大量摄像头同时启动时的线程数和启动耗时，以及断流后的重启限速与恢复
+
+用本地小尺寸测试视频模拟 N 路摄像头（通过 register_stream_url 指定流地址），经 frame_reader_manager 启动共享读取器:
+- 启动: 全部读取器的启动总耗时、单个启动耗时分布、启动前后的Python线程数和进程线程数
+- 断流: 将所有流地址指向不存在的文件并停止解码器，统计监督线程每秒发起的重启数峰值和同时进行的重启数峰值
+- 恢复: 恢复流地址后所有读取器重新输出帧所需的时间
+--decoder ffmpeg 时读取器走FFmpeg管道（软件解码，与NVDEC路径相同的管道读取和健康检查逻辑）。
+
+用法:
+    python -m app.benchmark.reader_supervision_benchmark --readers 200
+    python -m app.benchmark.reader_supervision_benchmark --readers 50 --decoder ffmpeg --outage-seconds 20
+"""
+import argparse
+import contextlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from unittest import mock
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.decode_benchmark import SoftwareFFmpegFrameReader
+from app.services.adaptive_frame_reader import frame_reader_manager, register_stream_url
+
+logger = logging.getLogger("reader_supervision_benchmark")
+
+
+class PacedFFmpegFrameReader(SoftwareFFmpegFrameReader):
+    """FFmpeg管道读取器（软件解码），本地文件按原始帧率读取以模拟实时流"""
+
+    pace_local_files = True
+
+
+def write_test_video(path: str, width: int, height: int, fps: int, seconds: float) -> str:
+    """生成小尺寸MJPG测试视频，每路模拟摄像头的解码开销很小"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV无法写入MJPG视频")
+    for i in range(int(fps * seconds)):
+        image = np.full((height, width, 3), 40, dtype=np.uint8)
+        cv2.circle(image, (i * 2 % width, height // 2), max(2, height // 8), (0, 0, 255), -1)
+        writer.write(image)
+    writer.release()
+    return path
+
+
+def _thread_counts() -> Dict[str, int]:
+    import psutil
+
+    return {"python": threading.active_count(), "process": psutil.Process().num_threads()}
+
+
+def _running_readers(camera_ids: List[int]) -> int:
+    running = 0
+    for camera_id in camera_ids:
+        shared_reader = frame_reader_manager.shared_readers.get(camera_id)
+        reader = shared_reader.threaded_reader if shared_reader else None
+        if reader is not None and reader.running and reader.latest_frame is not None:
+            running += 1
+    return running
+
+
+def measure_startup(args, camera_ids: List[int]) -> Dict[str, Any]:
+    """并发启动所有读取器（模拟批量恢复任务），统计启动耗时和线程数"""
+    threads_before = _thread_counts()
+    durations: List[float] = []
+
+    def start(camera_id: int):
+        begin = time.perf_counter()
+        reader = frame_reader_manager.get_frame_reader(camera_id, args.frame_interval, 30.0)
+        durations.append(time.perf_counter() - begin)
+        return reader is not None
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.start_concurrency) as executor:
+        started = sum(executor.map(start, camera_ids))
+    wall = time.perf_counter() - wall_start
+    time.sleep(1.0)
+    threads_after = _thread_counts()
+
+    durations.sort()
+    return {
+        "started": started,
+        "wall_seconds": wall,
+        "start_p50_ms": durations[len(durations) // 2] * 1000,
+        "start_max_ms": durations[-1] * 1000,
+        "python_threads": (threads_before["python"], threads_after["python"]),
+        "process_threads": (threads_before["process"], threads_after["process"]),
+        "python_threads_per_reader": (threads_after["python"] - threads_before["python"]) / max(1, started),
+    }
+
+
+def measure_outage(args, camera_ids: List[int], video: str) -> Dict[str, Any]:
+    """所有流同时断开再恢复：统计重启速率峰值、同时重启数峰值和恢复时间"""
+    stats = frame_reader_manager.stats
+    missing = os.path.join(os.path.dirname(video), "missing.avi")
+    scheduled_before = stats["restarts_scheduled"]
+    window_start = time.time()
+    outage_end = window_start + args.outage_seconds
+    for camera_id in camera_ids:
+        register_stream_url(camera_id, missing)
+    # 与健康检查发现断流时相同：结束解码进程并让读取线程退出
+    for camera_id in camera_ids:
+        shared_reader = frame_reader_manager.shared_readers.get(camera_id)
+        if shared_reader and shared_reader.threaded_reader:
+            shared_reader.threaded_reader._force_stop_ffmpeg()
+
+    peak_rate = 0
+    peak_in_flight = 0
+    peak_waiting = 0
+    last_scheduled = scheduled_before
+    while time.time() < outage_end:
+        in_flight = stats["restarts_scheduled"] - stats["restarts_succeeded"] - stats["restarts_failed"]
+        peak_in_flight = max(peak_in_flight, in_flight)
+        peak_waiting = max(peak_waiting, stats["restarts_waiting"])
+        time.sleep(0.1)
+        # 按实际经过的时间计算每秒重启数（CPU繁忙时sleep可能明显超时）
+        elapsed = time.time() - window_start
+        if elapsed >= 1.0:
+            scheduled = stats["restarts_scheduled"]
+            peak_rate = max(peak_rate, (scheduled - last_scheduled) / elapsed)
+            last_scheduled = scheduled
+            window_start = time.time()
+    outage_attempts = stats["restarts_scheduled"] - scheduled_before
+
+    for camera_id in camera_ids:
+        register_stream_url(camera_id, video)
+    recovery_start = time.perf_counter()
+    recovered = 0
+    while time.perf_counter() - recovery_start < args.recovery_timeout:
+        recovered = _running_readers(camera_ids)
+        if recovered == len(camera_ids):
+            break
+        time.sleep(0.2)
+    return {
+        "outage_seconds": args.outage_seconds,
+        "restart_attempts": outage_attempts,
+        "peak_restarts_per_second": peak_rate,
+        "peak_restarts_in_flight": peak_in_flight,
+        "peak_waiting": peak_waiting,
+        "recovered": recovered,
+        "recovery_seconds": time.perf_counter() - recovery_start,
+    }
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    from app.core.config import settings
+
+    settings.FRAME_READER_RESTART_RATE = args.restart_rate
+    settings.FRAME_READER_RESTART_CONCURRENCY = args.restart_concurrency
+
+    tmp_dir = tempfile.mkdtemp(prefix="reader_supervision_bench_")
+    camera_ids = [args.camera_base + i for i in range(args.readers)]
+    reader_patch = mock.patch("app.services.adaptive_frame_reader.ThreadedFrameReader", PacedFFmpegFrameReader) \
+        if args.decoder == "ffmpeg" else contextlib.nullcontext()
+    try:
+        video = write_test_video(os.path.join(tmp_dir, "sample.avi"), args.width, args.height,
+                                 args.source_fps, args.video_seconds)
+        for camera_id in camera_ids:
+            register_stream_url(camera_id, video)
+        with reader_patch:
+            report = {"readers": args.readers, "decoder": args.decoder,
+                      "startup": measure_startup(args, camera_ids)}
+            report["running_after_start"] = _running_readers(camera_ids)
+            if args.outage_seconds > 0:
+                report["outage"] = measure_outage(args, camera_ids, video)
+            report["manager"] = frame_reader_manager.get_manager_stats()
+            frame_reader_manager.shutdown()
+    finally:
+        for camera_id in camera_ids:
+            register_stream_url(camera_id, None)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    startup = report["startup"]
+    print(f"\n{report['readers']} 路读取器（{report['decoder']}）")
+    print(f"启动: 成功 {startup['started']}，总耗时 {startup['wall_seconds']:.2f}s，"
+          f"单路 p50 {startup['start_p50_ms']:.0f}ms / 最大 {startup['start_max_ms']:.0f}ms，"
+          f"启动后有帧 {report['running_after_start']}")
+    print(f"线程: Python {startup['python_threads'][0]} -> {startup['python_threads'][1]}"
+          f"（每路 {startup['python_threads_per_reader']:.2f}），"
+          f"进程 {startup['process_threads'][0]} -> {startup['process_threads'][1]}")
+    outage = report.get("outage")
+    if outage:
+        print(f"断流 {outage['outage_seconds']:.0f}s: 重启尝试 {outage['restart_attempts']}，"
+              f"峰值 {outage['peak_restarts_per_second']:.1f} 次/s，同时重启峰值 {outage['peak_restarts_in_flight']}，"
+              f"限速等待峰值 {outage['peak_waiting']} 路")
+        print(f"恢复: {outage['recovered']}/{report['readers']} 路，耗时 {outage['recovery_seconds']:.1f}s")
+    print("监督线程:", report["manager"]["supervisor"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="大量帧读取器的线程数、启动耗时和断流重启限速")
+    parser.add_argument("--readers", type=int, default=200, help="模拟摄像头数")
+    parser.add_argument("--camera-base", type=int, default=920000, help="模拟摄像头ID起始值")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="opencv: 先检测NVDEC再使用OpenCV解码; ffmpeg: FFmpeg管道软件解码")
+    parser.add_argument("--start-concurrency", type=int, default=16, help="同时启动读取器的线程数")
+    parser.add_argument("--frame-interval", type=float, default=1.0, help="订阅者帧间隔（秒）")
+    parser.add_argument("--width", type=int, default=64, help="测试视频宽度")
+    parser.add_argument("--height", type=int, default=48, help="测试视频高度")
+    parser.add_argument("--source-fps", type=int, default=5, help="测试视频帧率")
+    parser.add_argument("--video-seconds", type=float, default=600.0, help="测试视频时长（秒）")
+    parser.add_argument("--outage-seconds", type=float, default=10.0, help="模拟断流时长（秒），0表示不测试")
+    parser.add_argument("--recovery-timeout", type=float, default=120.0, help="等待全部恢复的超时（秒）")
+    parser.add_argument("--restart-rate", type=float, default=5.0, help="全局重启速率上限（次/秒）")
+    parser.add_argument("--restart-concurrency", type=int, default=4, help="同时进行的重启数")
+    parser.add_argument("--log-level", default="ERROR", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.ERROR),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # 模拟摄像头没有对应的WVP通道，断流期间监督线程试截图必然失败，每路一条报错会淹没结果
+    logging.getLogger("app.services.wvp_client").setLevel(logging.CRITICAL)
+    report = run_benchmark(args)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
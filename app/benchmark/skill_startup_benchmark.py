@@ -0,0 +1,119 @@
+"""
+跟踪模块导入耗时与技能构造耗时测量
+
+每项在新的Python进程中测量（避免模块缓存），重复若干次取中位数:
+1. 导入 app.services.sort / app.services.tracker_service / app.skills.skill_base 的耗时
+2. 构造一个不做跟踪的技能的耗时（首个实例含基类首次初始化，之后的实例取平均）
+3. 首次访问 skill.tracker（创建跟踪器）的耗时
+并记录构造技能后是否已加载 matplotlib / skimage / filterpy。
+
+--root 可指向另一份代码检出（如改动前的版本），用于前后对比:
+    git worktree add /tmp/before <改动前的提交>
+    python -m app.benchmark.skill_startup_benchmark --root /tmp/before
+
+用法:
+    python -m app.benchmark.skill_startup_benchmark
+    python -m app.benchmark.skill_startup_benchmark --repeat 5 --instances 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORT_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+begin = time.perf_counter()
+import {module}
+print(time.perf_counter() - begin)
+"""
+
+SKILL_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+begin = time.perf_counter()
+from app.skills.skill_base import BaseSkill
+import_time = time.perf_counter() - begin
+
+
+class ProbeSkill(BaseSkill):
+    DEFAULT_CONFIG = {{"type": "detection", "name": "probe_skill", "name_zh": "测量用技能", "params": {{}}}}
+
+    def process(self, input_data, context=None, **kwargs):
+        return None
+
+
+begin = time.perf_counter()
+skill = ProbeSkill()
+first = time.perf_counter() - begin
+begin = time.perf_counter()
+for _ in range({instances}):
+    ProbeSkill()
+each = (time.perf_counter() - begin) / {instances}
+loaded = [name for name in ("matplotlib", "skimage", "filterpy") if name in sys.modules]
+begin = time.perf_counter()
+tracker = skill.tracker
+tracker_first_access = time.perf_counter() - begin
+print(json.dumps({{"import": import_time, "first": first, "each": each, "loaded": loaded,
+                  "tracker_first_access": tracker_first_access, "tracker": type(tracker).__name__}}))
+"""
+
+
+def run_probe(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env=dict(os.environ, MPLBACKEND=os.environ.get("MPLBACKEND", "Agg")))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "测量进程失败")
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure_imports(root: str, modules: List[str], repeat: int) -> Dict[str, float]:
+    return {module: statistics.median(float(run_probe(IMPORT_PROBE.format(root=root, module=module)))
+                                      for _ in range(repeat))
+            for module in modules}
+
+
+def measure_skill(root: str, repeat: int, instances: int) -> Dict[str, object]:
+    runs = [json.loads(run_probe(SKILL_PROBE.format(root=root, instances=instances))) for _ in range(repeat)]
+    summary = {key: statistics.median(run[key] for run in runs)
+               for key in ("import", "first", "each", "tracker_first_access")}
+    summary["loaded"] = runs[-1]["loaded"]
+    summary["tracker"] = runs[-1]["tracker"]
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="跟踪模块导入耗时与技能构造耗时测量")
+    parser.add_argument("--root", default=PROJECT_ROOT, help="被测代码目录（默认当前检出）")
+    parser.add_argument("--modules", nargs="+",
+                        default=["app.services.sort", "app.services.tracker_service", "app.skills.skill_base"])
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的进程数（取中位数）")
+    parser.add_argument("--instances", type=int, default=20, help="首个实例之后再构造的技能数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = os.path.abspath(args.root)
+    print(f"被测代码: {root}")
+
+    print("\n导入耗时（新进程，中位数）:")
+    for module, seconds in measure_imports(root, args.modules, args.repeat).items():
+        print(f"  {module:<32} {seconds * 1000:>8.1f}ms")
+
+    skill = measure_skill(root, args.repeat, args.instances)
+    print("\n技能构造:")
+    print(f"  导入 skill_base                  {skill['import'] * 1000:>8.1f}ms")
+    print(f"  首个技能实例                     {skill['first'] * 1000:>8.1f}ms")
+    print(f"  之后每个实例                     {skill['each'] * 1000:>8.2f}ms")
+    print(f"  首次访问 tracker                 {skill['tracker_first_access'] * 1000:>8.1f}ms ({skill['tracker']})")
+    print(f"  构造技能后已加载: {', '.join(skill['loaded']) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+按需截图预取基准测试
+
+用本地假WVP服务（带人为延迟的JPEG截图接口）模拟 N 路按需截图模式的摄像头，每路运行若干个与
+AITaskExecutor 主循环相同节奏的任务线程（按帧间隔取帧），分别在关闭和开启预取时统计:
+- 取帧耗时分位数（直接计入检测延迟）
+- 取到的帧的新鲜度（取帧时距截图完成的时间）、预取命中率、截止时间未就绪次数
+- 假WVP收到的截图请求数和同时进行的截图请求峰值（受预取线程池大小限制）
+
+用法:
+    python -m app.benchmark.snapshot_prefetch_benchmark --cameras 20 --interval 5 --delay-ms 400
+    python -m app.benchmark.snapshot_prefetch_benchmark --cameras 50 --tasks-per-camera 2 --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.benchmark.fake_wvp_server import FakeWVPServer
+
+logger = logging.getLogger("snapshot_prefetch_benchmark")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_tasks(args, prefetch: bool) -> Dict[str, Any]:
+    """运行一轮：每个任务线程按帧间隔取帧，返回取帧耗时与预取统计"""
+    from app.core.config import settings
+    from app.services.adaptive_frame_reader import AdaptiveFrameReader
+    from app.services.snapshot_prefetcher import snapshot_prefetcher
+
+    settings.SNAPSHOT_PREFETCH_ENABLED = prefetch
+    camera_ids = [args.camera_base + i for i in range(args.cameras)]
+    latencies: List[float] = []
+    failures = [0]
+    prefetch_stats: Dict[int, Dict[str, Any]] = {}
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    ready = threading.Barrier(args.cameras * args.tasks_per_camera + 1)
+
+    def task_loop(camera_id: int, task_index: int):
+        # 与 AITaskExecutor 相同：在同一线程中启动、取帧和释放读取器
+        reader = AdaptiveFrameReader(camera_id, args.interval, connection_overhead_threshold=args.interval / 2)
+        started = reader.start()
+        ready.wait()
+        if not started:
+            with lock:
+                failures[0] += 1
+            return
+        # 任务错开启动，模拟不同时间创建的任务
+        time.sleep(args.interval * task_index / args.tasks_per_camera)
+        last_frame_time = 0.0
+        while not stop_event.is_set():
+            now = time.time()
+            if now - last_frame_time < args.interval:
+                time.sleep(max(0.001, args.interval - (now - last_frame_time)))
+                continue
+            last_frame_time = now
+            begin = time.perf_counter()
+            frame, _ = reader.get_latest_frame_with_generation()
+            elapsed = time.perf_counter() - begin
+            with lock:
+                if frame is None:
+                    failures[0] += 1
+                else:
+                    latencies.append(elapsed)
+        if task_index == 0:
+            stats = snapshot_prefetcher.get_camera_stats(camera_id)
+            if stats:
+                with lock:
+                    prefetch_stats[camera_id] = stats
+        reader.stop()
+
+    threads = [threading.Thread(target=task_loop, args=(camera_id, index), daemon=True)
+               for camera_id in camera_ids for index in range(args.tasks_per_camera)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    time.sleep(args.duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=args.interval + 30)
+
+    report = {
+        "prefetch": prefetch,
+        "frames": len(latencies),
+        "failures": failures[0],
+        "latency_p50_ms": _percentile(latencies, 50) * 1000,
+        "latency_p95_ms": _percentile(latencies, 95) * 1000,
+        "latency_max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+    if prefetch_stats:
+        stats = list(prefetch_stats.values())
+        requests = sum(s["requests"] for s in stats)
+        report.update({
+            "hit_rate": sum(s["prefetch_hits"] for s in stats) / max(1, requests),
+            "in_flight_joins": sum(s["in_flight_joins"] for s in stats),
+            "sync_fetches": sum(s["sync_fetches"] for s in stats),
+            "deadline_misses": sum(s["deadline_misses"] for s in stats),
+            "avg_frame_age_ms": float(np.mean([s["avg_frame_age"] for s in stats])) * 1000,
+        })
+    return report
+
+
+def run_benchmark(args) -> List[Dict[str, Any]]:
+    from app.core.config import settings
+    from app.services.snapshot_prefetcher import snapshot_prefetcher
+    from app.services.wvp_client import wvp_client
+
+    settings.SNAPSHOT_PREFETCH_WORKERS = args.workers
+    snapshot_prefetcher.max_workers = args.workers
+    server = FakeWVPServer(snapshot_delay_ms=args.delay_ms, jitter_ms=args.jitter_ms)
+    wvp_client.base_url = server.start()
+    reports = []
+    try:
+        for prefetch in (False, True):
+            before = server.get_stats()
+            server.stats["peak_in_flight"] = 0
+            report = run_tasks(args, prefetch)
+            after = server.get_stats()
+            report["wvp_snapshots"] = after["snapshots"] - before["snapshots"]
+            report["wvp_peak_in_flight"] = after["peak_in_flight"]
+            reports.append(report)
+    finally:
+        server.stop()
+    return reports
+
+
+def print_reports(args, reports: List[Dict[str, Any]]):
+    print(f"\n{args.cameras} 路摄像头 × {args.tasks_per_camera} 任务，取帧间隔 {args.interval}s，"
+          f"截图延迟 {args.delay_ms:.0f}ms，预取线程 {args.workers}，持续 {args.duration:.0f}s")
+    for report in reports:
+        label = "预取" if report["prefetch"] else "同步截图"
+        line = (f"{label:<6} 取帧 {report['frames']} 次（失败 {report['failures']}），"
+                f"耗时 p50 {report['latency_p50_ms']:.1f}ms / p95 {report['latency_p95_ms']:.1f}ms / "
+                f"最大 {report['latency_max_ms']:.1f}ms，WVP截图 {report['wvp_snapshots']} 次"
+                f"（并发峰值 {report['wvp_peak_in_flight']}）")
+        if "hit_rate" in report:
+            line += (f"\n       命中率 {report['hit_rate']:.1%}，等待进行中截图 {report['in_flight_joins']}，"
+                     f"同步截图 {report['sync_fetches']}，截止时间未就绪 {report['deadline_misses']}，"
+                     f"平均帧龄 {report['avg_frame_age_ms']:.0f}ms")
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="按需截图模式预取调度的取帧延迟")
+    parser.add_argument("--cameras", type=int, default=20, help="模拟摄像头数")
+    parser.add_argument("--tasks-per-camera", type=int, default=1, help="每路摄像头的任务数")
+    parser.add_argument("--camera-base", type=int, default=930000, help="模拟摄像头ID起始值")
+    parser.add_argument("--interval", type=float, default=5.0, help="任务取帧间隔（秒）")
+    parser.add_argument("--delay-ms", type=float, default=400.0, help="假WVP每次截图的延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="截图延迟的随机抖动上限（毫秒）")
+    parser.add_argument("--workers", type=int, default=8, help="预取截图线程数")
+    parser.add_argument("--duration", type=float, default=30.0, help="每轮持续时间（秒）")
+    parser.add_argument("--log-level", default="ERROR", help="日志级别")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.ERROR),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    reports = run_benchmark(args)
+    print_reports(args, reports)
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+SORT跟踪器批量化的基准测试与一致性检查
+
+1. 一致性: 用固定随机种子生成的检测序列（目标出现/消失、漏检、交叉运动、框抖动、误检）
+   逐帧对比 sort.Sort 与 BatchSort 的输出: 轨迹ID完全相同，框坐标误差不超过 1e-6；
+   同时对比 TrackerService 的跟踪结果与原逐条贪心关联的结果
+2. 耗时: 10/50/200 个目标时 sort.Sort、BatchSort 和 TrackerService.update 的单帧耗时
+
+用法:
+    python -m app.benchmark.tracker_benchmark
+    python -m app.benchmark.tracker_benchmark --objects 10 50 200 500 --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def generate_sequence(num_objects: int, frames: int, seed: int, width: int = 1920, height: int = 1080,
+                      miss_rate: float = 0.05, noise: float = 2.0, clutter: float = 0.5) -> List[np.ndarray]:
+    """
+    生成检测序列，每帧为 [[x1, y1, x2, y2, score, label], ...]（跟踪器只用前5列）
+
+    目标匀速运动并在边界反弹（相互交叉），随机漏检、框抖动，按一定概率消失并由新目标替换，每帧还有少量误检；
+    label 为目标编号（误检为 -1），用于给 TrackerService 测试分配稳定的类别
+    """
+    rng = np.random.default_rng(seed)
+    size = rng.uniform([20, 40], [80, 160], (num_objects, 2))
+    center = rng.uniform([0, 0], [width, height], (num_objects, 2))
+    velocity = rng.normal(0, 6, (num_objects, 2))
+
+    sequence = []
+    for _ in range(frames):
+        center += velocity
+        for axis, limit in ((0, width), (1, height)):
+            out = (center[:, axis] < 0) | (center[:, axis] > limit)
+            velocity[out, axis] *= -1
+        # 目标消失，新目标出现
+        reborn = rng.random(num_objects) < 0.01
+        count = int(reborn.sum())
+        center[reborn] = rng.uniform([0, 0], [width, height], (count, 2))
+        size[reborn] = rng.uniform([20, 40], [80, 160], (count, 2))
+        velocity[reborn] = rng.normal(0, 6, (count, 2))
+
+        visible = rng.random(num_objects) >= miss_rate
+        jitter = rng.normal(0, noise, (num_objects, 4))
+        boxes = np.concatenate([center - size / 2, center + size / 2], axis=1) + jitter
+        labels = np.arange(num_objects, dtype=np.float64)[:, None]
+        dets = np.concatenate([boxes, rng.uniform(0.3, 1.0, (num_objects, 1)), labels], axis=1)[visible]
+
+        false_count = rng.poisson(clutter)
+        if false_count:
+            corner = rng.uniform([0, 0], [width, height], (false_count, 2))
+            extent = rng.uniform(15, 60, (false_count, 2))
+            false_dets = np.concatenate([corner, corner + extent, rng.uniform(0.3, 0.6, (false_count, 1)),
+                                         np.full((false_count, 1), -1.0)], axis=1)
+            dets = np.concatenate([dets, false_dets])
+        sequence.append(dets[rng.permutation(len(dets))])
+    return sequence
+
+
+def reset_id_counters():
+    from app.services.batch_sort import BatchSort
+    from app.services.sort import KalmanBoxTracker
+
+    KalmanBoxTracker.count = 0
+    BatchSort.count = 0
+
+
+def check_sort_equivalence(sequence: List[np.ndarray], max_age: int, min_hits: int) -> Dict[str, float]:
+    """逐帧对比两个跟踪器的输出，返回最大坐标误差和输出的轨迹数"""
+    from app.services.batch_sort import BatchSort
+    from app.services.sort import Sort
+
+    reset_id_counters()
+    reference = Sort(max_age=max_age, min_hits=min_hits, iou_threshold=0.3)
+    batch = BatchSort(max_age=max_age, min_hits=min_hits, iou_threshold=0.3)
+    max_error, tracks = 0.0, set()
+    for frame_index, dets in enumerate(sequence):
+        expected = reference.update(dets[:, :5])
+        actual = batch.update(dets[:, :5])
+        assert expected.shape == actual.shape, f"第{frame_index}帧输出数量不同: {expected.shape} != {actual.shape}"
+        assert np.array_equal(expected[:, 4], actual[:, 4]), f"第{frame_index}帧轨迹ID不同"
+        if len(expected):
+            max_error = max(max_error, float(np.abs(expected[:, :4] - actual[:, :4]).max()))
+        assert max_error <= 1e-6, f"第{frame_index}帧框坐标误差 {max_error}"
+        assert len(reference.trackers) == len(batch), f"第{frame_index}帧轨迹数不同"
+        tracks.update(actual[:, 4].astype(int).tolist())
+    return {"max_error": max_error, "tracks": len(tracks)}
+
+
+def greedy_associate_reference(service, tracked_objects, detections, class_name):
+    """原 TrackerService 逐条计算IoU的贪心关联，用于对比"""
+    def calculate_iou(box1, box2):
+        x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+        x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+        if x2 <= x1 or y2 <= y1:
+            return 0.0
+        intersection = (x2 - x1) * (y2 - y1)
+        union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection
+        return intersection / union if union > 0 else 0.0
+
+    result, used = [], set()
+    for tracked_obj in tracked_objects:
+        best, best_iou = -1, 0.0
+        for idx, detection in enumerate(detections):
+            if idx in used:
+                continue
+            iou = calculate_iou(tracked_obj[:4].tolist(), detection["bbox"])
+            if iou > best_iou:
+                best, best_iou = idx, iou
+        if best >= 0 and best_iou > 0.05:
+            sort_track_id = int(tracked_obj[4])
+            result.append(dict(detections[best], track_id=service._get_global_track_id(class_name, sort_track_id),
+                               class_track_id=sort_track_id))
+            used.add(best)
+    return result
+
+
+def to_detections(dets: np.ndarray, classes: int) -> List[Dict]:
+    return [{"bbox": row[:4].tolist(), "confidence": float(row[4]), "class_name": f"class_{int(row[5]) % classes}"}
+            for row in dets]
+
+
+def check_service_equivalence(sequence: List[np.ndarray], classes: int) -> int:
+    """TrackerService 的批量关联与原贪心关联逐帧结果相同，返回带track_id的检测总数"""
+    from app.services.tracker_service import TrackerService
+
+    reset_id_counters()
+    service = TrackerService(max_age=30, min_hits=1, iou_threshold=0.3)
+    original = service._associate_tracks_with_detections
+    mismatches, total = [], 0
+
+    def compare(tracked_objects, detections, class_name):
+        actual = original(tracked_objects, detections, class_name)
+        if actual != greedy_associate_reference(service, tracked_objects, detections, class_name):
+            mismatches.append(class_name)
+        return actual
+
+    service._associate_tracks_with_detections = compare
+    for dets in sequence:
+        total += len(service.update(to_detections(dets, classes)))
+    assert not mismatches, f"{len(mismatches)} 次关联结果与原实现不同"
+    return total
+
+
+def time_per_frame(update, sequence: List[np.ndarray], warmup: int = 5) -> float:
+    for dets in sequence[:warmup]:
+        update(dets)
+    begin = time.perf_counter()
+    for dets in sequence[warmup:]:
+        update(dets)
+    return (time.perf_counter() - begin) / max(1, len(sequence) - warmup)
+
+
+def run_timing(args) -> List[Dict[str, float]]:
+    from app.services.batch_sort import BatchSort
+    from app.services.sort import Sort
+    from app.services.tracker_service import TrackerService
+
+    rows = []
+    for num_objects in args.objects:
+        sequence = generate_sequence(num_objects, args.frames, seed=args.seed)
+        service_sequence = [to_detections(dets, args.classes) for dets in sequence]
+        sequence = [dets[:, :5] for dets in sequence]
+        reference = Sort(max_age=30, min_hits=1, iou_threshold=0.3)
+        batch = BatchSort(max_age=30, min_hits=1, iou_threshold=0.3)
+        service = TrackerService(max_age=30, min_hits=1, iou_threshold=0.3)
+        rows.append({
+            "objects": num_objects,
+            "sort": time_per_frame(reference.update, sequence),
+            "batch": time_per_frame(batch.update, sequence),
+            "service": time_per_frame(service.update, service_sequence),
+        })
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SORT跟踪器批量化的基准测试与一致性检查")
+    parser.add_argument("--objects", type=int, nargs="+", default=[10, 50, 200], help="每帧目标数")
+    parser.add_argument("--frames", type=int, default=200, help="每个序列的帧数")
+    parser.add_argument("--sequences", type=int, default=6, help="一致性检查的序列数（每种目标数）")
+    parser.add_argument("--classes", type=int, default=3, help="TrackerService 测试中的类别数")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("一致性检查（sort.Sort vs BatchSort）:")
+    for num_objects in args.objects:
+        for index in range(args.sequences):
+            max_age, min_hits = (1, 3) if index % 2 == 0 else (30, 1)
+            sequence = generate_sequence(num_objects, args.frames, seed=args.seed + index,
+                                         miss_rate=0.05 + 0.05 * index, noise=1.0 + index)
+            result = check_sort_equivalence(sequence, max_age, min_hits)
+            print(f"  目标 {num_objects:>4} 序列 {index} (max_age={max_age}, min_hits={min_hits}): "
+                  f"轨迹 {result['tracks']:>5}，最大坐标误差 {result['max_error']:.2e}")
+        tracked = check_service_equivalence(generate_sequence(num_objects, args.frames, seed=args.seed), args.classes)
+        print(f"  目标 {num_objects:>4} TrackerService 关联一致，带track_id的检测 {tracked}")
+
+    print(f"\n单帧耗时（{args.frames} 帧平均）:")
+    print(f"{'目标数':>6} {'sort.Sort':>11} {'BatchSort':>11} {'加速':>6} {'TrackerService':>15}")
+    for row in run_timing(args):
+        print(f"{row['objects']:>6} {row['sort'] * 1000:>9.2f}ms {row['batch'] * 1000:>9.2f}ms "
+              f"{row['sort'] / row['batch']:>5.1f}x {row['service'] * 1000:>13.2f}ms")
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
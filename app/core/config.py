@@ -58,6 +58,27 @@ class Settings(BaseSettings):
     TRITON_URL: str = Field(default="172.18.1.1:8201", description="Triton服务器gRPC地址")
     TRITON_TIMEOUT: int = Field(default=30, description="Triton连接超时时间（秒）")
     
+    # Triton 跨任务动态微批处理：同一模型、同一输入形状的并发请求在窗口内合并为一次批量推理
+    TRITON_DYNAMIC_BATCHING_ENABLED: bool = Field(default=True, description="是否启用跨任务动态微批处理（仅对max_batch_size>0的模型生效）")
+    TRITON_BATCH_WINDOW_MS: float = Field(default=3.0, description="动态微批处理聚合窗口（毫秒），仅在同一模型有其他请求在途时等待，建议2-5ms")
+    TRITON_MAX_BATCH_SIZE: int = Field(default=16, description="动态微批处理单批次最大请求数（不超过模型配置的max_batch_size）")
+    
+    # 同摄像头多任务推理去重：同一帧、同一模型的推理只执行一次，其他任务复用原始输出
+    INFERENCE_DEDUP_ENABLED: bool = Field(default=True, description="是否启用同摄像头多任务推理去重")
+    INFERENCE_DEDUP_GENERATIONS: int = Field(default=2, description="推理去重缓存中每个摄像头保留的帧代次数量")
+
+    # 同摄像头多任务共享跟踪：同一摄像头、同一模型和检测参数的任务共用一个跟踪器，每帧只关联一次，track_id在各任务间一致
+    SHARED_TRACKER_ENABLED: bool = Field(default=True, description="是否启用同摄像头多任务共享目标跟踪")
+    SHARED_TRACKER_GENERATIONS: int = Field(default=4, description="共享跟踪器保留跟踪结果的帧代次数量（供处理较慢的任务复用）")
+
+    # 推理后端：triton（默认，gRPC到Triton服务器）/ onnxruntime（进程内CPU推理，用于无GPU的边缘设备）
+    # 按模型选择，如 .env: INFERENCE_BACKEND_MODELS={"yolo11_coco": "onnxruntime"}
+    INFERENCE_BACKEND_DEFAULT: str = Field(default="triton", description="未单独配置的模型使用的推理后端: triton/onnxruntime")
+    INFERENCE_BACKEND_MODELS: Dict[str, str] = Field(default={}, description="按模型指定推理后端 {模型名称: 后端}")
+    ONNX_MODEL_REPOSITORY: str = Field(default="", description="ONNX模型目录（<模型名>/<版本>/model.onnx），为空时使用TRITON_MODEL_REPOSITORY")
+    ONNX_INTRA_OP_THREADS: int = Field(default=0, description="ONNX Runtime单次推理的并行线程数，0表示使用物理核数")
+    ONNX_INTER_OP_THREADS: int = Field(default=1, description="ONNX Runtime算子间并行线程数")
+    
     # Triton 模型仓库路径
     # - local模式: 后端可直接写入的本地路径，且Triton能访问（同一机器或共享目录）
     # - sftp模式: 远程Triton服务器上的模型仓库路径
@@ -349,9 +370,22 @@ class Settings(BaseSettings):
     # 🧵 线程池高性能配置 - 提升消息处理能力
     # ===================
     AI_TASK_EXECUTOR_POOL_SIZE: int = Field(default=25, description="AI任务执行线程池大小")
+    DETECTION_PIPELINE_DEPTH: int = Field(default=1, description="每个任务同时在途的检测帧数（流水线深度），1为逐帧串行；Triton网络延迟较高时可设为2-4")
+    FRAME_MAX_AGE_BEFORE_INFERENCE: float = Field(default=0.0, description="帧距采集超过该时间（秒）时推理前直接丢弃，0为不限制")
+    # 多进程任务执行：检测任务按负载分片到工作进程，帧经共享内存传递，避免纯Python后处理/跟踪争用主进程GIL
+    TASK_PROCESS_WORKERS: int = Field(default=0, description="任务工作进程数，0为所有任务以线程方式在主进程中运行（启用RTSP推流的任务和Agent技能任务始终使用线程）")
+    TASK_PROCESS_FRAME_SLOTS: int = Field(default=4, description="每个摄像头共享内存帧通道的帧槽数")
+    # 运动门控：画面静止时复用上一次检测结果，可在任务配置 motion_gate 中按任务覆盖
+    MOTION_GATE_ENABLED: bool = Field(default=False, description="是否默认启用运动门控（静止画面跳过推理）")
+    MOTION_GATE_THRESHOLD: float = Field(default=3.0, description="运动门控平均灰度差阈值（0-255），低于该值视为画面静止")
+    MOTION_GATE_MAX_REUSE_SECONDS: float = Field(default=5.0, description="运动门控检测结果最长复用时长（秒）")
+    FENCE_RASTER_MASK_ENABLED: bool = Field(default=False, description="编译电子围栏时是否生成栅格掩码（每像素1字节，1080p约2MB/围栏，编译约10ms），关键点判断直接查表，仅边经过的像素回退到射线法；外接框排除+批量射线法通常已更快，默认关闭")
+    FENCE_CACHE_SIZE: int = Field(default=4, description="每个技能实例缓存的已编译电子围栏数（按围栏内容和图像尺寸区分）")
+    FENCE_CROSS_MAX_GAP_FRAMES: int = Field(default=30, description="越线模式下轨迹最多中断的帧数，超过后重新出现的轨迹不与中断前的位置连线判断")
     ALERT_GENERATION_POOL_SIZE: int = Field(default=20, description="预警生成线程池大小")
     MESSAGE_PROCESSING_POOL_SIZE: int = Field(default=15, description="消息处理线程池大小")
     IMAGE_PROCESSING_POOL_SIZE: int = Field(default=10, description="图像处理线程池大小")
+    SKILL_GRAPH_POOL_SIZE: int = Field(default=8, description="技能执行图线程池大小（所有任务共享），线程池占满时同层节点改为在调用线程内串行执行")
 
     # 🚀 RabbitMQ连接池优化配置 - 高吞吐量实时预警
     # =========================
@@ -404,6 +438,27 @@ class Settings(BaseSettings):
 
     # 智能帧获取配置
     ADAPTIVE_FRAME_CONNECTION_OVERHEAD_THRESHOLD: float = Field(default=30.0, description="连接开销阈值（秒），超过此值使用按需截图模式")
+    ADAPTIVE_FRAME_SCALED_DECODE: bool = Field(default=False, description="持续连接模式直接解码为技能所需输入尺寸的缩放帧，预警截图按需获取原图（启用RTSP推流的任务仍使用原图）")
+    FRAME_READER_SUPERVISOR_INTERVAL: float = Field(default=0.5, description="帧读取器监督线程的健康检查间隔（秒），所有摄像头共用一个线程")
+    FRAME_READER_RESTART_RATE: float = Field(default=5.0, description="断流读取器的全局重启速率上限（次/秒），避免WVP故障恢复时同时重连")
+    FRAME_READER_RESTART_CONCURRENCY: int = Field(default=4, description="同时进行的读取器重启数")
+    FRAME_READER_RESTART_BACKOFF_MAX: float = Field(default=60.0, description="单个摄像头连续重启失败时的最大退避时间（秒）")
+    SNAPSHOT_PREFETCH_ENABLED: bool = Field(default=True, description="按需截图模式在订阅者取帧前提前截图，任务取帧时直接获得已解码的帧")
+    SNAPSHOT_PREFETCH_WORKERS: int = Field(default=8, description="同时进行的预取截图请求数上限（所有按需模式摄像头共用）")
+    SNAPSHOT_PREFETCH_LEAD_FACTOR: float = Field(default=1.5, description="预取提前量 = 实测截图耗时 × 该系数 + 固定余量")
+    SNAPSHOT_PREFETCH_LEAD_MARGIN: float = Field(default=0.2, description="预取提前量的固定余量（秒）")
+    SNAPSHOT_PREFETCH_MAX_AGE: float = Field(default=2.0, description="预取截图可直接提供给任务的最长时间（秒），不小于预取提前量")
+    ADAPTIVE_FRAME_KEYFRAME_DECODE: bool = Field(default=True, description="持续连接模式下订阅者最小帧间隔大于视频流GOP时长时只解码关键帧（GOP时长自动探测）")
+    
+    # 取帧模式按实测代价选择：持续连接为解码CPU占用，按需截图为截图耗时/取帧间隔，未实测截图耗时时按连接开销阈值选择
+    ADAPTIVE_FRAME_COST_MODE_ENABLED: bool = Field(default=True, description="是否按实测代价在持续连接和按需截图模式间切换，关闭时只按连接开销阈值选择")
+    ADAPTIVE_FRAME_MODE_HYSTERESIS: float = Field(default=0.3, description="另一模式代价比当前模式低该比例以上才切换")
+    ADAPTIVE_FRAME_MODE_MIN_DWELL: float = Field(default=120.0, description="定期复查触发切换前在当前模式的最短驻留时间（秒），也用于分摊拉流启动耗时")
+    ADAPTIVE_FRAME_MODE_EVAL_INTERVAL: float = Field(default=30.0, description="监督线程复查各摄像头取帧模式的间隔（秒）")
+    ADAPTIVE_FRAME_SNAPSHOT_PROBE_INTERVAL: float = Field(default=600.0, description="持续连接模式下试截图以更新截图耗时的间隔（秒）")
+    ADAPTIVE_FRAME_SNAPSHOT_MAX_LOAD: float = Field(default=0.8, description="截图耗时超过取帧间隔的该比例时按需截图模式不可行")
+    ADAPTIVE_FRAME_DECODE_CPU_PRIOR: float = Field(default=0.15, description="未实测时假设的单路解码CPU占用（核数）")
+    ADAPTIVE_FRAME_STREAM_STARTUP_PRIOR: float = Field(default=2.0, description="未实测时假设的拉流启动耗时（秒）")
 
       # ========== 预警合并配置（简化版） ==========
     # 核心配置：只需要配置这5个参数即可
@@ -190,10 +190,7 @@ class BeltDetectorSkill(BaseSkill):
         Returns:
             预处理后的图像张量
         """
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / np.float32(255.0)
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
     def postprocess(self, outputs, original_img):
         """后处理模型输出
@@ -205,67 +202,7 @@ class BeltDetectorSkill(BaseSkill):
         Returns:
             检测结果列表
         """
-        # 获取原始图像尺寸
-        height, width = original_img.shape[:2]
-
-        # 获取output0数据
-        detections = outputs["output0"]
-
-        # 转置并压缩输出 (1,84,8400) -> (8400,84)
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes, scores, class_ids = [], [], []
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = np.amax(classes_scores)
-
-            if max_score >= self.conf_thres:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = detections[i][0], detections[i][1], detections[i][2], detections[i][3]
-
-                # 坐标转换
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 边界检查
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                boxes.append([left, top, width_box, height_box])
-                scores.append(max_score)
-                class_ids.append(class_id)
-
-        # ✅ 修改：按类别执行NMS
-        results = []
-        unique_class_ids = set(class_ids)
-        for class_id in unique_class_ids:
-            cls_indices = [i for i, cid in enumerate(class_ids) if cid == class_id]
-            cls_boxes = [boxes[i] for i in cls_indices]
-            cls_scores = [scores[i] for i in cls_indices]
-
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-            if isinstance(nms_indices, (list, tuple, np.ndarray)):
-                nms_indices = np.array(nms_indices).flatten()
-
-            for idx_in_cls in nms_indices:
-                idx = cls_indices[idx_in_cls]
-                box = boxes[idx]
-                results.append({
-                    "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
-                    "confidence": float(cls_scores[idx_in_cls]),
-                    "class_id": int(class_id),
-                    "class_name": self.class_names.get(int(class_id), "unknown")
-                })
-
-        return results
+        return self.decode_yolo_output(outputs, original_img)
 
     def analyze_safety(self, detections):
         """分析安全状况，检查是否有人员佩戴安全带
@@ -57,6 +57,10 @@ class PlateRecognitionSkill(BaseSkill):
     def get_required_models(self) -> List[str]:
         return self.config.get("required_models")
 
+    def get_frame_input_size(self) -> Optional[Tuple[int, int]]:
+        """车牌在原图上裁剪后做二阶段识别，需要原始分辨率"""
+        return None
+
     def _load_characters(self, path: str) -> List[str]:
         """加载字符字典文件"""
         self.log("info", f"加载字符字典文件: {path}")
@@ -72,12 +76,15 @@ class PlateRecognitionSkill(BaseSkill):
             if image is None or image.size == 0:
                 return SkillResult.error_result("图像无效或加载失败")
 
-            detections = self.detect_plates(image)
+            # 车牌检测 -> 批量识别：一帧中所有车牌的识别合并为一次推理
+            graph = self.execution_graph()
+            graph.add("plates", lambda: self.detect_plates(image))
+            graph.add("texts", lambda plates: self.recognize_plates(image, plates), depends_on=["plates"])
+            graph_results = graph.run()
+            detections = graph_results["plates"]
             self.log("debug", f"检测到 {len(detections)} 个车牌")
 
-            for i, det in enumerate(detections):
-                crop_img = self.crop_plate(image, det["bbox"], expand_ratio=self.expand_ratio)
-                plate_text, plate_score = self.recognize_text(crop_img)
+            for i, (det, (plate_text, plate_score)) in enumerate(zip(detections, graph_results["texts"])):
                 det["plate_text"] = plate_text
                 det["plate_score"] = plate_score
                 self.log("debug", f"车牌{i+1}: {plate_text}, 置信度: {plate_score:.3f}, 位置: {det['bbox']}")
@@ -124,67 +131,13 @@ class PlateRecognitionSkill(BaseSkill):
         return None
 
     def detect_plates(self, image: np.ndarray) -> List[Dict]:
-        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        img_resized = cv2.resize(img, (self.input_width, self.input_height))
-        img_normalized = img_resized.astype(np.float32) / 255.0
-        input_tensor = np.expand_dims(img_normalized.transpose(2, 0, 1), axis=0)
+        input_tensor = self.preprocess_image(image)
 
         inputs = {"images": input_tensor}
         outputs = triton_client.infer(self.model_det, inputs)
-        output = outputs["output0"]
-        output = np.squeeze(output, axis=0).transpose(1, 0)
-
-        height, width = image.shape[:2]
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        boxes, scores, class_ids = [], [], []
-
-        for i in range(output.shape[0]):
-            cls_scores = output[i][4:]
-            score = np.max(cls_scores)
-            if score >= self.conf_thres:
-                class_id = int(np.argmax(cls_scores))
-                x, y, w, h = output[i][:4]
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                box_w = int(w * x_factor)
-                box_h = int(h * y_factor)
-                left = max(0, left)
-                top = max(0, top)
-                box_w = min(box_w, width - left)
-                box_h = min(box_h, height - top)
-
-                boxes.append([left, top, box_w, box_h])
-                scores.append(score)
-                class_ids.append(class_id)
-
-        results = []
-        unique_class_ids = set(class_ids)
-
-        for class_id in unique_class_ids:
-            # 当前类别的框索引
-            cls_indices = [i for i, cid in enumerate(class_ids) if cid == class_id]
-            cls_boxes = [boxes[i] for i in cls_indices]
-            cls_scores = [scores[i] for i in cls_indices]
-
-            # 对该类执行 NMS
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-            if isinstance(nms_indices, (list, tuple, np.ndarray)):
-                nms_indices = nms_indices.flatten()
-
-            for j in nms_indices:
-                idx = cls_indices[j]
-                box = boxes[idx]
-                results.append({
-                    "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
-                    "confidence": float(cls_scores[j]),
-                    "class_id": int(class_id),
-                    "class_name": self.classes[class_id] if hasattr(self, 'classes') and class_id < len(
-                        self.classes) else "plate"
-                })
-
-        return results
+        class_names = dict(enumerate(self.classes))
+        return self.decode_yolo_output(outputs["output0"], image,
+                                       class_names=class_names, default_class_name="plate")
 
     def recognize_text(self, image: np.ndarray) -> Tuple[str, float]:
         norm_img = self.preprocess_recognizer(image)
@@ -194,6 +147,41 @@ class PlateRecognitionSkill(BaseSkill):
         preds = outputs["softmax_2.tmp_0"]
         return self.postprocess_recognizer(preds)
 
+    def recognize_plates(self, image: np.ndarray, detections: List[Dict]) -> List[Tuple[str, float]]:
+        """
+        批量识别一帧中的所有车牌
+
+        所有车牌裁剪图预处理为相同尺寸后堆叠，只发起一次识别推理（模型不支持批量时逐个推理）。
+
+        Args:
+            image: 原始图像
+            detections: 车牌检测结果
+
+        Returns:
+            与detections一一对应的 (车牌文本, 置信度) 列表，裁剪图无效或推理失败时为 ("", 0.0)
+        """
+        results = [("", 0.0)] * len(detections)
+        indices = []
+        batch_inputs = []
+        for i, det in enumerate(detections):
+            crop_img = self.crop_plate(image, det["bbox"], expand_ratio=self.expand_ratio)
+            if crop_img.size == 0:
+                continue
+            norm_img = np.expand_dims(self.preprocess_recognizer(crop_img), axis=0)
+            indices.append(i)
+            batch_inputs.append({"x": norm_img})
+
+        if not batch_inputs:
+            return results
+
+        batch_outputs = triton_client.infer_batch(self.model_rec, batch_inputs)
+        for i, outputs in zip(indices, batch_outputs):
+            if outputs is None:
+                self.log("warning", f"车牌{i+1}识别推理失败")
+                continue
+            results[i] = self.postprocess_recognizer(outputs["softmax_2.tmp_0"])
+        return results
+
     def preprocess_recognizer(self, img: np.ndarray) -> np.ndarray:
         imgC, imgH, imgW = 3, 48, 320
         if len(img.shape) == 2:
@@ -117,11 +117,7 @@ class ChuteGatePositionSafetySkill(BaseSkill):
 
     def preprocess(self, img: np.ndarray) -> np.ndarray:
         """图像预处理：BGR -> RGB, resize, 归一化, CHW, 增加 batch 维度"""
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / 255.0
-        img = img.transpose(2, 0, 1)  # HWC -> CHW
-        return np.expand_dims(img, axis=0)
+        return self.preprocess_image(img)
 
     def _run_model(self, model_name: str, input_tensor: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
         """调用 Triton 执行推理"""
@@ -154,75 +150,10 @@ class ChuteGatePositionSafetySkill(BaseSkill):
             "target_type": "gate" 或 "person"
         }
         """
-        height, width = original_img.shape[:2]
-        detections = outputs.get("output0", None)
-        if detections is None:
-            return []
-
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes: List[List[int]] = []
-        scores: List[float] = []
-        class_ids: List[int] = []
-
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = float(np.amax(classes_scores))
-            if max_score < self.conf_thres:
-                continue
-
-            class_id = int(np.argmax(classes_scores))
-            x, y, w, h = detections[i][0], detections[i][1], detections[i][2], detections[i][3]
-
-            left = int((x - w / 2) * x_factor)
-            top = int((y - h / 2) * y_factor)
-            width_box = int(w * x_factor)
-            height_box = int(h * y_factor)
-
-            left = max(0, left)
-            top = max(0, top)
-            width_box = min(width_box, width - left)
-            height_box = min(height_box, height - top)
-
-            boxes.append([left, top, width_box, height_box])
-            scores.append(max_score)
-            class_ids.append(class_id)
-
-        results: List[Dict[str, Any]] = []
-        if not boxes:
-            return results
-
-        unique_class_ids = set(class_ids)
-        for cid in unique_class_ids:
-            cls_indices = [idx for idx, v in enumerate(class_ids) if v == cid]
-            cls_boxes = [boxes[idx] for idx in cls_indices]
-            cls_scores = [scores[idx] for idx in cls_indices]
-
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-            if len(nms_indices) == 0:
-                continue
-
-            for j in nms_indices:
-                idx_in_cls = j[0] if isinstance(j, (list, tuple, np.ndarray)) else j
-                x1, y1, w_box, h_box = cls_boxes[idx_in_cls]
-                x2 = x1 + w_box
-                y2 = y1 + h_box
-
-                results.append(
-                    {
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                        "confidence": float(cls_scores[idx_in_cls]),
-                        "class_id": int(cid),
-                        "class_name": class_names.get(int(cid), "unknown"),
-                        "target_type": target_type,
-                    }
-                )
-
-        return results
+        detections = self.decode_yolo_output(outputs, original_img, class_names=class_names)
+        for det in detections:
+            det["target_type"] = target_type
+        return detections
 
     def _select_gate_detection(self, gate_detections: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """多个挡板框时选择主挡板框"""
@@ -389,7 +320,7 @@ class ChuteGatePositionSafetySkill(BaseSkill):
         try:
             # 1. 解析输入
             if isinstance(input_data, np.ndarray):
-                image = input_data.copy()
+                image = self.own_frame(input_data)
             elif isinstance(input_data, str):
                 image = cv2.imread(input_data)
                 if image is None:
@@ -398,7 +329,7 @@ class ChuteGatePositionSafetySkill(BaseSkill):
                 if "image" in input_data:
                     img_val = input_data["image"]
                     if isinstance(img_val, np.ndarray):
-                        image = img_val.copy()
+                        image = self.own_frame(img_val)
                     elif isinstance(img_val, str):
                         image = cv2.imread(img_val)
                         if image is None:
@@ -471,8 +402,9 @@ class ChuteGatePositionSafetySkill(BaseSkill):
             else:
                 self.log("info", "未提供电子围栏配置，persons_in_fence 保持为空")
 
-            # 8. 挡板状态更新
-            gate_status_info = self._update_gate_state(gate_detections, image.shape)
+            # 8. 挡板状态更新：连续帧计数依赖上一帧的状态，检测流水线中按帧顺序执行
+            with self.ordered_section():
+                gate_status_info = self._update_gate_state(gate_detections, image.shape)
             gate_state = gate_status_info.get("gate_state", "up")
 
             # 9. 安全分析
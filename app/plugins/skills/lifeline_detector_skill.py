@@ -92,11 +92,7 @@ class RestrictedAreaLifelineSkill(BaseSkill):
 
     def preprocess(self, img: np.ndarray) -> np.ndarray:
         """图像预处理"""
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / 255.0
-        img = img.transpose(2, 0, 1)
-        return np.expand_dims(img, axis=0)
+        return self.preprocess_image(img)
 
     def _run_model(self, model_name: str, input_tensor: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
         """调用 Triton 执行推理"""
@@ -118,81 +114,11 @@ class RestrictedAreaLifelineSkill(BaseSkill):
         target_type: str,
     ) -> List[Dict[str, Any]]:
         """通用 YOLO 检测后处理（已包含 NMS Numpy 兼容性修复）"""
-        height, width = original_img.shape[:2]
-        detections = outputs.get("output0", None)
-        if detections is None:
-            return []
-
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes, scores, class_ids = [], [], []
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = float(np.amax(classes_scores))
-            if max_score < self.conf_thres:
-                continue
-
-            class_id = int(np.argmax(classes_scores))
-            if class_id not in class_names:
-                continue
-
-            x, y, w, h = detections[i][:4]
-
-            left = int((x - w / 2) * x_factor)
-            top = int((y - h / 2) * y_factor)
-            width_box = int(w * x_factor)
-            height_box = int(h * y_factor)
-
-            left = max(0, left)
-            top = max(0, top)
-            width_box = min(width_box, width - left)
-            height_box = min(height_box, height - top)
-
-            boxes.append([left, top, width_box, height_box])
-            scores.append(max_score)
-            class_ids.append(class_id)
-
-        results: List[Dict[str, Any]] = []
-        if not boxes:
-            return results
-
-        unique_class_ids = set(class_ids)
-        for cid in unique_class_ids:
-            cls_indices = [idx for idx, v in enumerate(class_ids) if v == cid]
-            cls_boxes = [boxes[idx] for idx in cls_indices]
-            cls_scores = [scores[idx] for idx in cls_indices]
-
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-
-            if len(nms_indices) > 0:
-                if isinstance(nms_indices, np.ndarray):
-                    nms_indices = nms_indices.flatten()
-
-                for idx in nms_indices:
-                    if isinstance(idx, (list, tuple, np.ndarray)):
-                        idx = idx[0]
-                    idx = int(idx)
-
-                    original_idx = cls_indices[idx]
-                    x1, y1, w_box, h_box = cls_boxes[original_idx]
-                    x2 = x1 + w_box
-                    y2 = y1 + h_box
-
-                    results.append(
-                        {
-                            "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                            "confidence": float(cls_scores[original_idx]),
-                            "class_id": int(cid),
-                            "class_name": class_names.get(int(cid), "unknown"),
-                            "target_type": target_type,
-                        }
-                    )
-
-        return results
+        detections = self.decode_yolo_output(outputs, original_img, class_names=class_names,
+                                             class_filter=list(class_names))
+        for det in detections:
+            det["target_type"] = target_type
+        return detections
 
     def _get_detection_point(self, detection: Dict) -> Optional[Tuple[float, float]]:
         """获取人员检测框的脚底中心点，用于判断是否踏入围栏"""
@@ -329,14 +255,14 @@ class RestrictedAreaLifelineSkill(BaseSkill):
         try:
             # 解析输入
             if isinstance(input_data, np.ndarray):
-                image = input_data.copy()
+                image = self.own_frame(input_data)
             elif isinstance(input_data, str):
                 image = cv2.imread(input_data)
             elif isinstance(input_data, dict):
                 if "image" in input_data:
                     img_val = input_data["image"]
                     if isinstance(img_val, np.ndarray):
-                        image = img_val.copy()
+                        image = self.own_frame(img_val)
                     elif isinstance(img_val, str):
                         image = cv2.imread(img_val)
                 if "fence_config" in input_data:
@@ -92,6 +92,15 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
         # 使用配置中指定的模型列表
         return self.required_models
 
+    def get_frame_input_size(self) -> Optional[Tuple[int, int]]:
+        """
+        起吊物检测和姿态检测两个模型共用同一帧，并在原图上判断关键点与起吊物的位置关系，需要原始分辨率
+
+        Returns:
+            None
+        """
+        return None
+
     def process(self, input_data: Union[np.ndarray, str, Dict[str, Any], Any], fence_config: Dict = None) -> SkillResult:
         """
         处理输入数据，检测图像中的起吊物，人体姿态检测
@@ -110,7 +119,7 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
             # 支持多种类型的输入
             if isinstance(input_data, np.ndarray):
                 # 输入为图像数组
-                image = input_data.copy()
+                image = self.own_frame(input_data)
             elif isinstance(input_data, str):
                 # 输入为图像路径
                 image = cv2.imread(input_data)
@@ -121,7 +130,7 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
                 if "image" in input_data:
                     image_data = input_data["image"]
                     if isinstance(image_data, np.ndarray):
-                        image = image_data.copy()
+                        image = self.own_frame(image_data)
                     elif isinstance(image_data, str):
                         image = cv2.imread(image_data)
                         if image is None:
@@ -142,36 +151,33 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
                 return SkillResult.error_result("无效的图像数据")
                 
             # 2. 执行检测
-            # 预处理图像
-            input_tensor_liftingload = self.preprocess_liftingload(image)
-            input_tensor_pose, ratio, (pad_w, pad_h) = self.preprocess_pose(image)
-            
-            # 设置Triton输入
-            inputs_liftingload = {
-                "images": input_tensor_liftingload
-            }
-            
-            inputs_pose = {
-                "images": input_tensor_pose
-            }
-            
-            
-            # 执行推理
-            #吊物检测
-            outputs_liftingload = triton_client.infer(self.model_liftlingload_name, inputs_liftingload)
-            #姿态估计
-            outputs_pose = triton_client.infer(self.model_pose_name, inputs_pose)
-            
-            
-            if outputs_liftingload is None:
+            # 吊物检测与姿态估计互不依赖，在执行图中并发执行（各自完成预处理、推理和后处理）
+            def detect_liftingload():
+                input_tensor_liftingload = self.preprocess_liftingload(image)
+                outputs_liftingload = triton_client.infer(self.model_liftlingload_name, {"images": input_tensor_liftingload})
+                if outputs_liftingload is None:
+                    return None
+                return self.postprocess_liftingload(outputs_liftingload, image)
+
+            def detect_pose():
+                input_tensor_pose, ratio, (pad_w, pad_h) = self.preprocess_pose(image)
+                outputs_pose = triton_client.infer(self.model_pose_name, {"images": input_tensor_pose})
+                if outputs_pose is None:
+                    return None
+                return self.postprocess_pose(outputs_pose["output0"], image, ratio, pad_w, pad_h)
+
+            graph = self.execution_graph()
+            graph.add("liftingload", detect_liftingload)
+            graph.add("pose", detect_pose)
+            graph_results = graph.run()
+            results_liftingload = graph_results["liftingload"]
+            results_pose = graph_results["pose"]
+
+            if results_liftingload is None:
                 return SkillResult.error_result("吊物模型推理失败")
-            if outputs_pose is None:
+            if results_pose is None:
                 return SkillResult.error_result("姿态模型推理失败")
             
-            # 后处理结果
-            results_liftingload = self.postprocess_liftingload(outputs_liftingload, image)
-            results_pose = self.postprocess_pose(outputs_pose["output0"], image, ratio, pad_w, pad_h )
-            
             results_all = results_liftingload + results_pose
             
             
@@ -220,10 +226,7 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
         Returns:
             预处理后的图像张量
         """
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / np.float32(255.0)
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
 
 
@@ -242,24 +245,9 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
             pad_h (float): height padding in letterbox.
         """
         # Resize and pad input image using letterbox() (Borrowed from Ultralytics)
-        shape = img.shape[:2]  # original image shape
-        new_shape = (self.input_height, self.input_width)
-        r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
-        ratio = r, r
-        new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
-        pad_w, pad_h = (new_shape[1] - new_unpad[0]) / 2, (new_shape[0] - new_unpad[1]) / 2  # wh padding
-        if shape[::-1] != new_unpad:  # resize
-            img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
-            
-        top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
-        left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
-        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))  # 填充
-
-                
-        # Transforms: HWC to CHW -> BGR to RGB -> div(255) -> contiguous -> add axis(optional)
-        img = np.ascontiguousarray(np.einsum('HWC->CHW', img)[::-1], dtype=np.single) / 255.0
-        img_process = img[None] if len(img.shape) == 3 else img
-        return img_process, ratio, (pad_w, pad_h)
+        img_process = self.preprocess_image(img, letterbox=True)
+        info = self.last_preprocess_info(letterbox=True)
+        return img_process, (info.scale_x, info.scale_y), (info.pad_x, info.pad_y)
 
 
 
@@ -273,63 +261,7 @@ class LiftingLoadPoseDetectorSkill(BaseSkill):
         Returns:
             检测结果列表
         """
-        # 获取原始图像尺寸
-        height, width = original_img.shape[:2]
-
-        # 获取output0数据
-        detections = outputs["output0"]
-
-        # 转置并压缩输出 (1,84,8400) -> (8400,84)
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes, scores, class_ids = [], [], []
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = np.amax(classes_scores)
-
-            if max_score >= self.conf_thres:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = detections[i][0], detections[i][1], detections[i][2], detections[i][3]
-
-                # 坐标转换
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 边界检查
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                boxes.append([left, top, width_box, height_box])
-                scores.append(max_score)
-                class_ids.append(class_id)
-
-        results = []
-        unique_class_ids = set(class_ids)
-        for class_id in unique_class_ids:
-            cls_indices = [i for i, cid in enumerate(class_ids) if cid == class_id]
-            cls_boxes = [boxes[i] for i in cls_indices]
-            cls_scores = [scores[i] for i in cls_indices]
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-            for j in nms_indices:
-                idx_in_cls = j[0] if isinstance(j, (list, tuple, np.ndarray)) else j
-                idx = cls_indices[idx_in_cls]
-                box = boxes[idx]
-                results.append({
-                    "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
-                    "confidence": float(scores[idx]),
-                    "class_id": int(class_id),
-                    "class_name": self.class_names.get(int(class_id), "unknown")
-                })
-
-        return results
+        return self.decode_yolo_output(outputs, original_img)
 
 
 
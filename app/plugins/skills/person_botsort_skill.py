@@ -14,87 +14,159 @@ import math
 
 logger = logging.getLogger(__name__)
 
-class KalmanFilter:
+# 外观特征: 检测框统一缩放到固定尺寸后计算颜色直方图和LBP纹理直方图
+FEATURE_CROP_SIZE = (64, 128)  # (宽, 高)
+# 合并直方图的分段: B/G/R 各16级、HSV 的 H×S 8×8 级、LBP 32级，共144维
+_HIST_OFFSETS = {"b": 0, "g": 16, "r": 32, "hsv": 48, "lbp": 112}
+_HIST_BINS = 144
+# H 通道取值 0~179，按 [0, 180) 均分8级，与 cv2.calcHist 的分级一致
+_HUE_BIN_LUT = np.array([h * 8 // 180 * 8 if h < 180 else 0 for h in range(256)], dtype=np.uint8)
+
+
+def compute_lbp_images(gray_images: np.ndarray, radius: int = 1, n_points: int = 8) -> np.ndarray:
+    """
+    批量计算LBP编码图
+
+    Args:
+        gray_images: (N, H, W) 的 uint8 灰度图
+        radius: 采样半径
+        n_points: 采样点数（不超过8）
+
+    Returns:
+        (N, H, W) 的 uint8 LBP 编码，边缘 radius 个像素为0
+    """
+    count, height, width = gray_images.shape
+    lbp = np.zeros_like(gray_images)
+    if height <= 2 * radius or width <= 2 * radius:
+        return lbp
+    rows = np.arange(radius, height - radius)
+    cols = np.arange(radius, width - radius)
+    center = gray_images[:, radius:height - radius, radius:width - radius]
+    codes = np.zeros_like(center)
+    for k in range(n_points):
+        # 采样点坐标按 int() 截断取整，第一个采样点对应最高位
+        angle = 2 * np.pi * k / n_points
+        x = (rows + radius * np.cos(angle)).astype(np.intp)
+        y = (cols + radius * np.sin(angle)).astype(np.intp)
+        # 取整后通常是整体平移，用切片代替花式索引
+        x = slice(x[0], x[-1] + 1) if np.all(np.diff(x) == 1) else x
+        y = slice(y[0], y[-1] + 1) if np.all(np.diff(y) == 1) else y
+        if not isinstance(x, slice) and not isinstance(y, slice):
+            x = x[:, None]
+        neighbor = gray_images[:, x, y]
+        codes |= (neighbor >= center).view(np.uint8) << (n_points - 1 - k)
+    lbp[:, radius:height - radius, radius:width - radius] = codes
+    return lbp
+
+
+def compute_appearance_histograms(crops: np.ndarray) -> np.ndarray:
+    """
+    批量计算外观直方图（BGR各16级、HSV的H×S 8×8级、LBP 32级）
+
+    Args:
+        crops: (N, H, W, 3) 的 uint8 BGR 图像，已缩放到相同尺寸
+
+    Returns:
+        (N, 144) 的 float32 直方图计数
     """
-    卡尔曼滤波器用于状态预测
+    count, height, width = crops.shape[:3]
+    histograms = np.zeros((count, _HIST_BINS), dtype=np.float32)
+    if not count:
+        return histograms
+    # 颜色空间转换按像素进行，拼成一张高图一次转换
+    stacked = crops.reshape(count * height, width, 3)
+    hsv = cv2.cvtColor(stacked, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(stacked, cv2.COLOR_BGR2GRAY).reshape(count, height, width)
+    lbp = compute_lbp_images(gray)
+
+    # 每个像素在合并直方图中的分级编码，每个检测框只需一次直方图统计
+    codes = np.empty((count, 5, height, width), dtype=np.uint8)
+    planes = [codes[:, index] for index in range(5)]
+    for plane, channel, name in zip(planes, cv2.split(stacked), ("b", "g", "r")):
+        np.right_shift(channel.reshape(count, height, width), 4, out=plane)
+        plane += _HIST_OFFSETS[name]
+    hue, saturation, _ = cv2.split(hsv)
+    np.right_shift(saturation.reshape(count, height, width), 5, out=planes[3])
+    planes[3] += cv2.LUT(hue, _HUE_BIN_LUT).reshape(count, height, width)
+    planes[3] += _HIST_OFFSETS["hsv"]
+    np.right_shift(lbp, 3, out=planes[4])
+    planes[4] += _HIST_OFFSETS["lbp"]
+
+    codes = codes.reshape(count, -1, 1)
+    for n in range(count):
+        histograms[n] = cv2.calcHist([codes[n]], [0], None, [_HIST_BINS], [0, _HIST_BINS]).ravel()
+    return histograms
+
+
+class BatchKalmanFilter:
+    """
+    批量卡尔曼滤波器，所有轨迹的状态堆叠存放（状态 N×8、协方差 N×8×8），预测和更新整批计算
     状态向量: [x, y, w, h, vx, vy, vw, vh]
     """
-    def __init__(self, bbox):
-        self.dt = 1.0  # 时间步长
-        
-        # 状态向量 [x, y, w, h, vx, vy, vw, vh]
-        self.x = np.array([
-            bbox[0] + bbox[2]/2,  # 中心x
-            bbox[1] + bbox[3]/2,  # 中心y
-            bbox[2],              # 宽度
-            bbox[3],              # 高度
-            0,                    # x速度
-            0,                    # y速度
-            0,                    # 宽度变化速度
-            0                     # 高度变化速度
-        ], dtype=np.float32)
-        
-        # 状态转移矩阵
-        self.F = np.array([
-            [1, 0, 0, 0, 1, 0, 0, 0],
-            [0, 1, 0, 0, 0, 1, 0, 0],
-            [0, 0, 1, 0, 0, 0, 1, 0],
-            [0, 0, 0, 1, 0, 0, 0, 1],
-            [0, 0, 0, 0, 1, 0, 0, 0],
-            [0, 0, 0, 0, 0, 1, 0, 0],
-            [0, 0, 0, 0, 0, 0, 1, 0],
-            [0, 0, 0, 0, 0, 0, 0, 1]
-        ], dtype=np.float32)
-        
-        # 观测矩阵
-        self.H = np.array([
-            [1, 0, 0, 0, 0, 0, 0, 0],
-            [0, 1, 0, 0, 0, 0, 0, 0],
-            [0, 0, 1, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0]
-        ], dtype=np.float32)
-        
-        # 过程噪声协方差
-        self.Q = np.eye(8, dtype=np.float32) * 1.0
-        self.Q[4:, 4:] *= 0.01  # 速度噪声较小
-        
-        # 观测噪声协方差
-        self.R = np.eye(4, dtype=np.float32) * 10.0
-        
-        # 误差协方差矩阵
-        self.P = np.eye(8, dtype=np.float32) * 1000.0
-        
+    # 状态转移矩阵（匀速模型，时间步长为1）
+    F = np.eye(8)
+    F[:4, 4:] = np.eye(4)
+    # 观测矩阵
+    H = np.eye(4, 8)
+    # 过程噪声协方差（速度噪声较小）
+    Q = np.eye(8)
+    Q[4:, 4:] *= 0.01
+    # 观测噪声协方差
+    R = np.eye(4) * 10.0
+    # 初始误差协方差
+    P0 = np.eye(8) * 1000.0
+
+    def __init__(self):
+        self.x = np.zeros((0, 8))
+        self.P = np.zeros((0, 8, 8))
+
+    def __len__(self):
+        return len(self.x)
+
+    @staticmethod
+    def _measurements(bboxes) -> np.ndarray:
+        """检测框 -> 观测 [中心x, 中心y, 宽, 高]（检测框按 [x, y, w, h] 解释）"""
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        return np.concatenate([bboxes[:, :2] + bboxes[:, 2:] / 2, bboxes[:, 2:]], axis=1)
+
+    def add(self, bboxes):
+        """为新轨迹追加状态（速度为0）"""
+        z = self._measurements(bboxes)
+        if not len(z):
+            return
+        self.x = np.concatenate([self.x, np.concatenate([z, np.zeros_like(z)], axis=1)])
+        self.P = np.concatenate([self.P, np.broadcast_to(self.P0, (len(z), 8, 8))])
+
     def predict(self):
-        """预测下一状态"""
-        self.x = np.dot(self.F, self.x)
-        self.P = np.dot(np.dot(self.F, self.P), self.F.T) + self.Q
-        return self.get_bbox()
-    
-    def update(self, bbox):
-        """更新状态"""
-        z = np.array([
-            bbox[0] + bbox[2]/2,  # 中心x
-            bbox[1] + bbox[3]/2,  # 中心y
-            bbox[2],              # 宽度
-            bbox[3]               # 高度
-        ], dtype=np.float32)
-        
-        # 卡尔曼增益
-        S = np.dot(np.dot(self.H, self.P), self.H.T) + self.R
-        K = np.dot(np.dot(self.P, self.H.T), np.linalg.inv(S))
-        
-        # 更新状态
-        y = z - np.dot(self.H, self.x)
-        self.x = self.x + np.dot(K, y)
-        
-        # 更新误差协方差
-        I_KH = np.eye(8) - np.dot(K, self.H)
-        self.P = np.dot(I_KH, self.P)
-    
-    def get_bbox(self):
-        """获取边界框格式 [x1, y1, x2, y2]"""
-        cx, cy, w, h = self.x[0], self.x[1], self.x[2], self.x[3]
-        return [cx - w/2, cy - h/2, cx + w/2, cy + h/2]
+        """预测所有轨迹的下一状态"""
+        if not len(self.x):
+            return
+        self.x = self.x @ self.F.T
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def update(self, rows, bboxes):
+        """用检测框更新指定行的状态"""
+        rows = np.asarray(rows, dtype=np.intp)
+        if not len(rows):
+            return
+        z = self._measurements(bboxes)
+        P = self.P[rows]
+        # H 取状态前4维: S = H P H^T + R, K = P H^T S^-1
+        S = P[:, :4, :4] + self.R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        y = z - self.x[rows, :4]
+        self.x[rows] += (K @ y[:, :, None])[:, :, 0]
+        self.P[rows] = P - K @ P[:, :4, :]
+
+    def keep(self, mask):
+        """只保留 mask 为真的行（删除轨迹）"""
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+
+    def get_bboxes(self) -> np.ndarray:
+        """获取边界框格式 [x1, y1, x2, y2]，(N, 4)"""
+        center, size = self.x[:, :2], self.x[:, 2:4]
+        return np.concatenate([center - size / 2, center + size / 2], axis=1)
 
 class Track:
     """跟踪轨迹类"""
@@ -105,10 +177,7 @@ class Track:
         self.track_id = Track.count
         Track.count += 1
         
-        # 卡尔曼滤波器
-        self.kalman = KalmanFilter(bbox)
-        
-        # 轨迹信息
+        # 轨迹信息（卡尔曼滤波状态由 BotSortTracker 批量维护）
         self.bbox = bbox
         self.confidence = confidence
         self.features = features if features is not None else []
@@ -133,16 +202,14 @@ class Track:
         self.last_seen_frame = 0
         
     def predict(self):
-        """预测下一状态"""
+        """预测下一状态（更新计数，状态预测由跟踪器批量完成）"""
         if self.time_since_update > 0:
             self.hits = 0
         self.time_since_update += 1
         self.age += 1
-        return self.kalman.predict()
     
     def update(self, bbox, confidence, features=None, frame_id=0):
         """更新轨迹"""
-        self.kalman.update(bbox)
         self.bbox = bbox
         self.confidence = confidence
         self.hits += 1
@@ -193,6 +260,7 @@ class BotSortTracker:
         self.lambda_param = lambda_param  # 外观和运动的权重平衡
         
         self.tracks = []
+        self.kalman = BatchKalmanFilter()  # 与 self.tracks 按行对应
         self.frame_count = 0
         
     def update(self, detections, features=None):
@@ -211,6 +279,7 @@ class BotSortTracker:
         # 预测所有轨迹的下一状态
         for track in self.tracks:
             track.predict()
+        self.kalman.predict()
         
         # 数据关联
         matched_tracks, unmatched_detections, unmatched_tracks = self._associate(
@@ -218,6 +287,8 @@ class BotSortTracker:
         )
         
         # 更新匹配的轨迹
+        self.kalman.update([track_idx for track_idx, _ in matched_tracks],
+                           [detections[det_idx][:4] for _, det_idx in matched_tracks])
         for track_idx, det_idx in matched_tracks:
             bbox = detections[det_idx][:4]
             conf = detections[det_idx][4]
@@ -233,13 +304,17 @@ class BotSortTracker:
             track.first_seen_frame = self.frame_count
             track.last_seen_frame = self.frame_count
             self.tracks.append(track)
+        self.kalman.add([detections[det_idx][:4] for det_idx in unmatched_detections])
         
         # 标记未匹配的轨迹
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         
         # 删除过期轨迹
-        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        alive = [not t.is_deleted() for t in self.tracks]
+        if not all(alive):
+            self.tracks = [t for t, keep in zip(self.tracks, alive) if keep]
+            self.kalman.keep(np.array(alive, dtype=bool))
         
         # 返回确认的轨迹
         results = []
@@ -285,10 +360,10 @@ class BotSortTracker:
                 if cost_matrix[t_idx, d_idx] < 0.8:  # 阈值
                     matches.append((t_idx, d_idx))
             
-            unmatched_tracks = [i for i in range(len(self.tracks)) 
-                              if i not in [m[0] for m in matches]]
-            unmatched_detections = [i for i in range(len(detections)) 
-                                  if i not in [m[1] for m in matches]]
+            matched_track_set = {m[0] for m in matches}
+            matched_det_set = {m[1] for m in matches}
+            unmatched_tracks = [i for i in range(len(self.tracks)) if i not in matched_track_set]
+            unmatched_detections = [i for i in range(len(detections)) if i not in matched_det_set]
             
             return matches, unmatched_detections, unmatched_tracks
             
@@ -297,23 +372,24 @@ class BotSortTracker:
             return [], list(range(len(detections))), list(range(len(self.tracks)))
     
     def _compute_iou_distance(self, detections):
-        """计算IoU距离矩阵"""
+        """计算IoU距离矩阵（轨迹预测位置 × 检测框）"""
         if not self.tracks:
             return np.array([])
         
-        # 获取轨迹预测位置
-        track_bboxes = [track.kalman.get_bbox() for track in self.tracks]
-        det_bboxes = [det[:4] for det in detections]
-        
-        # 计算IoU矩阵
-        iou_matrix = np.zeros((len(track_bboxes), len(det_bboxes)))
+        track_bboxes = self.kalman.get_bboxes()[:, None, :]
+        det_bboxes = np.asarray([det[:4] for det in detections], dtype=np.float64).reshape(1, -1, 4)
         
-        for i, track_bbox in enumerate(track_bboxes):
-            for j, det_bbox in enumerate(det_bboxes):
-                iou = self._calculate_iou(track_bbox, det_bbox)
-                iou_matrix[i, j] = 1.0 - iou  # 转换为距离
+        w = np.minimum(track_bboxes[..., 2], det_bboxes[..., 2]) - np.maximum(track_bboxes[..., 0], det_bboxes[..., 0])
+        h = np.minimum(track_bboxes[..., 3], det_bboxes[..., 3]) - np.maximum(track_bboxes[..., 1], det_bboxes[..., 1])
+        overlap = (w > 0) & (h > 0)
+        intersection = np.where(overlap, w * h, 0.0)
+        area1 = (track_bboxes[..., 2] - track_bboxes[..., 0]) * (track_bboxes[..., 3] - track_bboxes[..., 1])
+        area2 = (det_bboxes[..., 2] - det_bboxes[..., 0]) * (det_bboxes[..., 3] - det_bboxes[..., 1])
+        union = area1 + area2 - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            iou = np.where(overlap & (union > 0), intersection / union, 0.0)
         
-        return iou_matrix
+        return 1.0 - iou  # 转换为距离
     
     def _compute_appearance_distance(self, features):
         """计算外观距离矩阵"""
@@ -345,23 +421,6 @@ class BotSortTracker:
         
         return distance_matrix
     
-    def _calculate_iou(self, box1, box2):
-        """计算两个边界框的IoU"""
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-        
-        intersection = (x2 - x1) * (y2 - y1)
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
-
 class PersonBotSortSkill(BaseSkill):
     DEFAULT_CONFIG = {
         "type": "detection",
@@ -484,66 +543,32 @@ class PersonBotSortSkill(BaseSkill):
         """获取所需模型列表"""
         return self.config["required_models"]
 
+    def get_frame_input_size(self) -> Optional[Tuple[int, int]]:
+        """外观特征在原图上裁剪人员区域计算，需要原始分辨率"""
+        return None
+
     def preprocess(self, img: np.ndarray) -> np.ndarray:
         """图像预处理"""
         self.original_shape = img.shape
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / 255.0
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
     def postprocess(self, detections: np.ndarray, original_img: np.ndarray) -> List[List]:
         """后处理检测结果，返回BoTSORT格式"""
-        height, width = original_img.shape[:2]
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        results = []
+        # 只处理person类别（class_id=0）
+        results = self.decode_yolo_output(detections, original_img, class_filter=[0])
 
-        for i in range(detections.shape[0]):
-            class_scores = detections[i][4:]
-            score = np.amax(class_scores)
-            class_id = np.argmax(class_scores)
-            
-            # 只处理person类别（class_id=0）
-            if class_id == 0 and score >= self.conf_thres:
-                x, y, w, h = detections[i][:4]
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 边界检查
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                # BoTSORT格式: [x1, y1, x2, y2, confidence]
-                results.append([left, top, left + width_box, top + height_box, float(score)])
-
-        # NMS处理
-        if results:
-            boxes = [[r[0], r[1], r[2] - r[0], r[3] - r[1]] for r in results]
-            scores = [r[4] for r in results]
-            indices = cv2.dnn.NMSBoxes(boxes, scores, self.conf_thres, self.iou_thres)
-            
-            if isinstance(indices, (list, tuple, np.ndarray)):
-                indices = np.array(indices).flatten()
-                results = [results[i] for i in indices]
-
-        return results
+        # BoTSORT格式: [x1, y1, x2, y2, confidence]
+        return [det["bbox"] + [det["confidence"]] for det in results]
 
     def _extract_appearance_features(self, image: np.ndarray, detections: List[List]) -> List[np.ndarray]:
-        """提取外观特征"""
+        """提取外观特征（所有检测框缩放到固定尺寸后批量计算）"""
         if not self.enable_appearance_features or not detections:
             return [np.random.rand(self.feature_dim) for _ in detections]
         
-        features = []
-        for det in detections:
+        features = [None] * len(detections)
+        crops = []
+        crop_indices = []
+        for index, det in enumerate(detections):
             x1, y1, x2, y2 = [int(coord) for coord in det[:4]]
             
             # 边界检查
@@ -552,75 +577,40 @@ class PersonBotSortSkill(BaseSkill):
             y2 = min(image.shape[0], y2)
             
             if x2 <= x1 or y2 <= y1:
-                features.append(np.random.rand(self.feature_dim))
+                features[index] = np.random.rand(self.feature_dim)
                 continue
             
-            # 提取ROI
-            roi = image[y1:y2, x1:x2]
-            
             try:
-                # 简化的特征提取（实际应用中可使用深度学习特征）
-                # 这里使用颜色直方图和纹理特征
-                
-                # 颜色直方图特征
-                roi_resized = cv2.resize(roi, (64, 128))  # 标准化尺寸
-                
-                # BGR直方图
-                color_features = []
-                for i in range(3):
-                    hist = cv2.calcHist([roi_resized], [i], None, [16], [0, 256])
-                    color_features.extend(hist.flatten())
-                
-                # HSV直方图
-                hsv_roi = cv2.cvtColor(roi_resized, cv2.COLOR_BGR2HSV)
-                hsv_hist = cv2.calcHist([hsv_roi], [0, 1], None, [8, 8], [0, 180, 0, 256])
-                color_features.extend(hsv_hist.flatten())
-                
-                # LBP纹理特征（简化版）
-                gray_roi = cv2.cvtColor(roi_resized, cv2.COLOR_BGR2GRAY)
-                lbp_features = self._compute_lbp_features(gray_roi)
-                
-                # 合并特征
-                all_features = np.concatenate([color_features, lbp_features])
-                
-                # 归一化并调整到指定维度
-                all_features = all_features / (np.linalg.norm(all_features) + 1e-6)
-                
-                if len(all_features) > self.feature_dim:
-                    features.append(all_features[:self.feature_dim])
-                else:
-                    # 填充到指定维度
-                    padded = np.zeros(self.feature_dim)
-                    padded[:len(all_features)] = all_features
-                    features.append(padded)
-                    
+                crops.append(cv2.resize(image[y1:y2, x1:x2], FEATURE_CROP_SIZE))  # 标准化尺寸
+                crop_indices.append(index)
+            except Exception as e:
+                self.log("debug", f"特征提取失败: {e}")
+                features[index] = np.random.rand(self.feature_dim)
+        
+        if crops:
+            try:
+                # 简化的特征提取（实际应用中可使用深度学习特征）：颜色直方图和LBP纹理特征
+                histograms = compute_appearance_histograms(np.stack(crops))
+                for index, all_features in zip(crop_indices, histograms):
+                    # 归一化并调整到指定维度
+                    all_features = all_features / (np.linalg.norm(all_features) + 1e-6)
+                    if len(all_features) > self.feature_dim:
+                        features[index] = all_features[:self.feature_dim]
+                    else:
+                        # 填充到指定维度
+                        padded = np.zeros(self.feature_dim)
+                        padded[:len(all_features)] = all_features
+                        features[index] = padded
             except Exception as e:
                 self.log("debug", f"特征提取失败: {e}")
-                features.append(np.random.rand(self.feature_dim))
+                for index in crop_indices:
+                    features[index] = np.random.rand(self.feature_dim)
         
         return features
 
     def _compute_lbp_features(self, gray_image, radius=1, n_points=8):
         """计算LBP特征"""
-        height, width = gray_image.shape
-        lbp = np.zeros_like(gray_image)
-        
-        for i in range(radius, height - radius):
-            for j in range(radius, width - radius):
-                center = gray_image[i, j]
-                binary_string = ''
-                
-                for k in range(n_points):
-                    angle = 2 * np.pi * k / n_points
-                    x = int(i + radius * np.cos(angle))
-                    y = int(j + radius * np.sin(angle))
-                    
-                    if gray_image[x, y] >= center:
-                        binary_string += '1'
-                    else:
-                        binary_string += '0'
-                
-                lbp[i, j] = int(binary_string, 2)
+        lbp = compute_lbp_images(gray_image[None], radius, n_points)[0]
         
         # 计算LBP直方图
         hist, _ = np.histogram(lbp.ravel(), bins=32, range=(0, 256))
@@ -634,9 +624,6 @@ class PersonBotSortSkill(BaseSkill):
             if image is None or image.size == 0:
                 return SkillResult.error_result("无效图像输入")
 
-            # 更新帧计数
-            self.frame_id += 1
-
             # 模型推理
             input_tensor = self.preprocess(image)
             
@@ -664,16 +651,21 @@ class PersonBotSortSkill(BaseSkill):
             # 提取外观特征
             features = self._extract_appearance_features(image, detections)
 
-            # BoTSORT跟踪
-            tracked_results = self.tracker.update(detections, features)
-            
-            if self.enable_debug_log:
-                self.log("debug", f"BoTSORT跟踪后结果数量: {len(tracked_results)}")
+            # 帧计数、BoTSORT跟踪和停留时间分析依赖帧间状态，检测流水线中按帧顺序执行
+            with self.ordered_section():
+                # 更新帧计数（区外使用局部变量，避免读到后续帧的计数）
+                self.frame_id += 1
+                frame_id = self.frame_id
+
+                tracked_results = self.tracker.update(detections, features)
+                
+                if self.enable_debug_log:
+                    self.log("debug", f"BoTSORT跟踪后结果数量: {len(tracked_results)}")
 
-            # 停留时间分析
-            dwell_events = []
-            if self.enable_dwell_analysis:
-                dwell_events = self._analyze_dwell_time(tracked_results)
+                # 停留时间分析
+                dwell_events = []
+                if self.enable_dwell_analysis:
+                    dwell_events = self._analyze_dwell_time(tracked_results)
 
             # 电子围栏过滤
             if self.is_fence_config_valid(fence_config):
@@ -689,7 +681,7 @@ class PersonBotSortSkill(BaseSkill):
             # 安全指标分析
             safety_metrics = {}
             if self.enable_safety_metrics:
-                safety_metrics = self._analyze_safety_metrics(tracked_results, dwell_events)
+                safety_metrics = self._analyze_safety_metrics(tracked_results, dwell_events, frame_id)
 
             # 组装结果
             result_data = {
@@ -711,13 +703,13 @@ class PersonBotSortSkill(BaseSkill):
     def _load_image(self, input_data):
         """加载图像数据"""
         if isinstance(input_data, np.ndarray):
-            return input_data.copy()
+            return self.own_frame(input_data)
         elif isinstance(input_data, str):
             return cv2.imread(input_data)
         elif isinstance(input_data, dict):
             image_data = input_data.get("image")
             if isinstance(image_data, np.ndarray):
-                return image_data.copy()
+                return self.own_frame(image_data)
             elif isinstance(image_data, str):
                 return cv2.imread(image_data)
         return None
@@ -758,7 +750,8 @@ class PersonBotSortSkill(BaseSkill):
 
         return dwell_events
 
-    def _analyze_safety_metrics(self, detections: List[Dict], dwell_events: List[Dict]) -> Dict[str, Any]:
+    def _analyze_safety_metrics(self, detections: List[Dict], dwell_events: List[Dict],
+                                frame_id: int) -> Dict[str, Any]:
         """分析安全指标"""
         person_count = len([d for d in detections if d.get("class_name") == "person"])
         
@@ -792,7 +785,7 @@ class PersonBotSortSkill(BaseSkill):
             "alert_triggered": alert_level > 0,
             "alert_level": alert_level,
             "alerts": alerts,
-            "frame_id": self.frame_id,
+            "frame_id": frame_id,
             "tracking_algorithm": "BoTSORT"
         }
 
@@ -82,14 +82,14 @@ class PersonIntrusionSkill(BaseSkill):
         try:
             # 1. 解析图像输入 (保持原有逻辑)
             if isinstance(input_data, np.ndarray):
-                image = input_data.copy()
+                image = self.own_frame(input_data)
             elif isinstance(input_data, str):
                 image = cv2.imread(input_data)
             elif isinstance(input_data, dict):
                 if "image" in input_data:
                     img_data = input_data["image"]
                     if isinstance(img_data, np.ndarray):
-                        image = img_data.copy()
+                        image = self.own_frame(img_data)
                     elif isinstance(img_data, str):
                         image = cv2.imread(img_data)
                 if "fence_config" in input_data:
@@ -155,96 +155,16 @@ class PersonIntrusionSkill(BaseSkill):
 
     def preprocess(self, img):
         """预处理：BGR->RGB, Resize, Normalize, CHW"""
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / 255.0
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
     def postprocess(self, outputs, original_img):
         """
         后处理：解析YOLO输出 -> 过滤类别 -> NMS
         """
-        height, width = original_img.shape[:2]
-        detections = outputs.get("output0")  # 安全获取
-        if detections is None:
-            return []
-
-        # (1, 84, 8400) -> (8400, 84)
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes, scores, class_ids = [], [], []
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = float(np.amax(classes_scores))
-
-            if max_score >= self.conf_thres:
-                class_id = int(np.argmax(classes_scores))
-
-                # 严格过滤：如果检测到的不是我们要的类别，直接跳过
-                if class_id not in self.class_names:
-                    continue
-
-                x, y, w, h = detections[i][:4]
-
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 简单的边界处理
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                boxes.append([left, top, width_box, height_box])
-                scores.append(max_score)
-                class_ids.append(class_id)
-
-        # NMS
-        results = []
-        if not boxes:
-            return results
-
-        # 针对每个类别做NMS
-        unique_classes = set(class_ids)
-        for cls_id in unique_classes:
-            cls_indices = [i for i, c in enumerate(class_ids) if c == cls_id]
-            cls_boxes = [boxes[i] for i in cls_indices]
-            cls_scores = [scores[i] for i in cls_indices]
-
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-
-            # --- 修复开始：兼容性处理 NMS 返回值 ---
-            if len(nms_indices) > 0:
-                # 1. 如果是 numpy 数组，先将其展平为一维
-                if isinstance(nms_indices, np.ndarray):
-                    nms_indices = nms_indices.flatten()
-
-                # 2. 遍历
-                for idx in nms_indices:
-                    # 3. 二次检查：兼容极少数旧版本返回 [[1]] 的情况
-                    if isinstance(idx, (list, tuple, np.ndarray)):
-                        idx = idx[0]
-
-                    # 4. 强制转换为 Python int，解决 numpy.int32 导致的类型问题
-                    idx = int(idx)
-
-                    original_idx = cls_indices[idx]
-                    box = boxes[original_idx]
-
-                    results.append({
-                        "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],  # xyxy
-                        "confidence": scores[original_idx],
-                        "class_id": cls_id,
-                        "class_name": self.class_names.get(cls_id, "person")
-                    })
-
-        return results
+        # 严格过滤：只保留配置中的类别
+        return self.decode_yolo_output(outputs, original_img,
+                                       class_filter=list(self.class_names),
+                                       default_class_name="person")
 
     def analyze_safety(self, intrusion_list: List, total_count: int):
         """根据闯入人数生成报警信息"""
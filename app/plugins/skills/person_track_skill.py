@@ -171,64 +171,20 @@ class PersonTrackSkill(BaseSkill):
     def get_required_models(self) -> List[str]:
         return self.config["required_models"]
 
+    def get_frame_input_size(self) -> Optional[Tuple[int, int]]:
+        """外观特征在原图上裁剪人员区域计算，需要原始分辨率"""
+        return None
+
     def preprocess(self, img: np.ndarray) -> np.ndarray:
         """图像预处理"""
         self.original_shape = img.shape
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = img.astype(np.float32) / 255.0
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
     def postprocess(self, detections: np.ndarray, original_img: np.ndarray) -> List[Dict]:
         """后处理检测结果"""
-        height, width = original_img.shape[:2]
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        boxes = []
-        scores = []
-
-        for i in range(detections.shape[0]):
-            class_scores = detections[i][4:]
-            score = np.amax(class_scores)
-            class_id = np.argmax(class_scores)
-            
-            # 只处理person类别（class_id=0）
-            if class_id == 0 and score >= self.conf_thres:
-                x, y, w, h = detections[i][:4]
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 边界检查
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                boxes.append([left, top, width_box, height_box])
-                scores.append(float(score))
-
-        # NMS处理
-        results = []
-        if boxes:
-            indices = cv2.dnn.NMSBoxes(boxes, scores, self.conf_thres, self.iou_thres)
-            if isinstance(indices, (list, tuple, np.ndarray)):
-                indices = np.array(indices).flatten()
-                for i in indices:
-                    box = boxes[i]
-                    results.append({
-                        "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
-                        "confidence": scores[i],
-                        "class_id": 0,
-                        "class_name": "person"
-                    })
-
-        return results
+        # 只处理person类别（class_id=0）
+        return self.decode_yolo_output(detections, original_img,
+                                       class_names={0: "person"}, class_filter=[0])
 
     def process(self, input_data: Union[np.ndarray, str, Dict[str, Any]], fence_config: Dict = None) -> SkillResult:
         try:
@@ -237,9 +193,6 @@ class PersonTrackSkill(BaseSkill):
             if image is None or image.size == 0:
                 return SkillResult.error_result("无效图像输入")
 
-            # 更新帧计数
-            self.frame_id += 1
-
             # 模型推理
             input_tensor = self.preprocess(image)
                         
@@ -271,15 +224,21 @@ class PersonTrackSkill(BaseSkill):
             if self.enable_debug_log:
                 self.log("debug", f"检测到 {len(results)} 个人员")
 
-            # 使用改进的跟踪机制
-            tracked_results = self._improved_tracking(results, image)
-            if self.enable_debug_log:
-                self.log("debug", f"改进跟踪后结果数量: {len(tracked_results)}")
+            # 帧计数、跟踪和停留时间分析依赖帧间状态，检测流水线中按帧顺序执行
+            with self.ordered_section():
+                # 更新帧计数（区外使用局部变量，避免读到后续帧的计数）
+                self.frame_id += 1
+                frame_id = self.frame_id
+
+                # 使用改进的跟踪机制
+                tracked_results = self._improved_tracking(results, image)
+                if self.enable_debug_log:
+                    self.log("debug", f"改进跟踪后结果数量: {len(tracked_results)}")
 
-            # 停留时间分析
-            dwell_events = []
-            if self.enable_dwell_analysis:
-                dwell_events = self._analyze_dwell_time(tracked_results)
+                # 停留时间分析
+                dwell_events = []
+                if self.enable_dwell_analysis:
+                    dwell_events = self._analyze_dwell_time(tracked_results)
 
             # 电子围栏过滤（支持trigger_mode和归一化坐标）
             if self.is_fence_config_valid(fence_config):
@@ -293,7 +252,7 @@ class PersonTrackSkill(BaseSkill):
             # 安全指标分析
             safety_metrics = {}
             if self.enable_safety_metrics:
-                safety_metrics = self._analyze_safety_metrics(tracked_results, dwell_events)
+                safety_metrics = self._analyze_safety_metrics(tracked_results, dwell_events, frame_id)
 
             # 组装结果
             result_data = {
@@ -315,13 +274,13 @@ class PersonTrackSkill(BaseSkill):
     def _load_image(self, input_data):
         """加载图像数据"""
         if isinstance(input_data, np.ndarray):
-            return input_data.copy()
+            return self.own_frame(input_data)
         elif isinstance(input_data, str):
             return cv2.imread(input_data)
         elif isinstance(input_data, dict):
             image_data = input_data.get("image")
             if isinstance(image_data, np.ndarray):
-                return image_data.copy()
+                return self.own_frame(image_data)
             elif isinstance(image_data, str):
                 return cv2.imread(image_data)
         return None
@@ -362,7 +321,8 @@ class PersonTrackSkill(BaseSkill):
 
         return dwell_events
 
-    def _analyze_safety_metrics(self, detections: List[Dict], dwell_events: List[Dict]) -> Dict[str, Any]:
+    def _analyze_safety_metrics(self, detections: List[Dict], dwell_events: List[Dict],
+                                frame_id: int) -> Dict[str, Any]:
         """分析安全指标"""
         person_count = len([d for d in detections if d.get("class_name") == "person"])
         
@@ -396,7 +356,7 @@ class PersonTrackSkill(BaseSkill):
             "alert_triggered": alert_level > 0,
             "alert_level": alert_level,
             "alerts": alerts,
-            "frame_id": self.frame_id
+            "frame_id": frame_id
         }
 
     def _detect_crowding(self, detections: List[Dict]) -> List[Dict]:
@@ -133,7 +133,7 @@ class PStopCocoSkill(BaseSkill):
         image = None
         try:
             if isinstance(input_data, np.ndarray):
-                image = input_data.copy()
+                image = self.own_frame(input_data)
             elif isinstance(input_data, str):
                 image = cv2.imread(input_data)
                 if image is None:
@@ -142,7 +142,7 @@ class PStopCocoSkill(BaseSkill):
                 if "image" in input_data:
                     image_data = input_data["image"]
                     if isinstance(image_data, np.ndarray):
-                        image = image_data.copy()
+                        image = self.own_frame(image_data)
                     elif isinstance(image_data, str):
                         image = cv2.imread(image_data)
                         if image is None:
@@ -159,8 +159,6 @@ class PStopCocoSkill(BaseSkill):
             if image is None or image.size == 0:
                 return SkillResult.error_result("无效的图像数据")
 
-            self.frame_id += 1
-
             # 1. 检测
             input_tensor = self.preprocess(image)
             inputs = {"images": input_tensor}
@@ -172,229 +170,233 @@ class PStopCocoSkill(BaseSkill):
             results = self.postprocess(detections, image)
 
             # 2. 跟踪（只跟踪目标类别）
-            tracked_results = []
-            dwell_events = []
-            if self.enable_tracking:
-                # BYTETracker输入: [[x1, y1, x2, y2, score], ...]
-                dets = []
-                for det in results:
-                    # 只跟踪目标类别（人员）
-                    if det["class_name"] in self.target_classes:
-                        x1, y1, x2, y2 = det["bbox"]
-                        score = det["confidence"]
-                        dets.append([x1, y1, x2, y2, score])
-                
-                # 记录检测到的目标类别分布
-                class_counts = {}
-                for det in results:
-                    class_name = det["class_name"]
-                    class_counts[class_name] = class_counts.get(class_name, 0) + 1
+            # 帧计数和跟踪器属于帧间状态，检测流水线中按帧顺序执行
+            with self.ordered_section():
+                self.frame_id += 1
+
+                tracked_results = []
+                dwell_events = []
+                if self.enable_tracking:
+                    # BYTETracker输入: [[x1, y1, x2, y2, score], ...]
+                    dets = []
+                    for det in results:
+                        # 只跟踪目标类别（人员）
+                        if det["class_name"] in self.target_classes:
+                            x1, y1, x2, y2 = det["bbox"]
+                            score = det["confidence"]
+                            dets.append([x1, y1, x2, y2, score])
                 
-                if self.enable_debug_log:
-                    self.log("debug", f"帧{self.frame_id}: 检测到目标类别分布: {class_counts}")
+                    # 记录检测到的目标类别分布
+                    class_counts = {}
+                    for det in results:
+                        class_name = det["class_name"]
+                        class_counts[class_name] = class_counts.get(class_name, 0) + 1
                 
-                if len(dets) > 0:
-                    dets_np = np.array(dets, dtype=np.float32)
-                    if self.enable_debug_log:
-                        self.log("debug", f"帧{self.frame_id}: 准备跟踪{len(dets)}个人员目标")
-                else:
-                    dets_np = np.zeros((0, 5), dtype=np.float32)
                     if self.enable_debug_log:
-                        self.log("debug", f"帧{self.frame_id}: 没有检测到人员目标")
+                        self.log("debug", f"帧{self.frame_id}: 检测到目标类别分布: {class_counts}")
                 
-                img_info = (image.shape[0], image.shape[1])
-                img_size = (self.input_height, self.input_width)
-                tracks = self.tracker.update(dets_np, img_info, img_size)
+                    if len(dets) > 0:
+                        dets_np = np.array(dets, dtype=np.float32)
+                        if self.enable_debug_log:
+                            self.log("debug", f"帧{self.frame_id}: 准备跟踪{len(dets)}个人员目标")
+                    else:
+                        dets_np = np.zeros((0, 5), dtype=np.float32)
+                        if self.enable_debug_log:
+                            self.log("debug", f"帧{self.frame_id}: 没有检测到人员目标")
                 
-                if self.enable_debug_log:
-                    self.log("debug", f"帧{self.frame_id}: BYTETracker返回{len(tracks)}个跟踪轨迹")
+                    img_info = (image.shape[0], image.shape[1])
+                    img_size = (self.input_height, self.input_width)
+                    tracks = self.tracker.update(dets_np, img_info, img_size)
                 
-                # 为每个原始检测结果分配跟踪ID
-                matched_detections = set()
-                matched_tracks = []  # 只保存真正匹配成功的跟踪轨迹
-                unmatched_tracks = []  # 保存未匹配的跟踪轨迹
+                    if self.enable_debug_log:
+                        self.log("debug", f"帧{self.frame_id}: BYTETracker返回{len(tracks)}个跟踪轨迹")
                 
-                # 第一步：尝试将跟踪轨迹匹配到检测结果
-                for track in tracks:
-                    track_id = int(track.track_id)
-                    track_tlwh = track.tlwh
-                    track_x1, track_y1, track_w, track_h = track_tlwh
-                    track_x2, track_y2 = track_x1 + track_w, track_y1 + track_h
-                    track_center = [(track_x1 + track_x2) / 2, (track_y1 + track_y2) / 2]
+                    # 为每个原始检测结果分配跟踪ID
+                    matched_detections = set()
+                    matched_tracks = []  # 只保存真正匹配成功的跟踪轨迹
+                    unmatched_tracks = []  # 保存未匹配的跟踪轨迹
+                
+                    # 第一步：尝试将跟踪轨迹匹配到检测结果
+                    for track in tracks:
+                        track_id = int(track.track_id)
+                        track_tlwh = track.tlwh
+                        track_x1, track_y1, track_w, track_h = track_tlwh
+                        track_x2, track_y2 = track_x1 + track_w, track_y1 + track_h
+                        track_center = [(track_x1 + track_x2) / 2, (track_y1 + track_y2) / 2]
                     
-                    # 找到最近的原始检测结果
-                    best_match = None
-                    best_distance = float('inf')
+                        # 找到最近的原始检测结果
+                        best_match = None
+                        best_distance = float('inf')
                     
-                    for i, det in enumerate(results):
-                        # 只匹配目标类别
-                        if det["class_name"] in self.target_classes and i not in matched_detections:
-                            det_bbox = det["bbox"]
-                            det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
+                        for i, det in enumerate(results):
+                            # 只匹配目标类别
+                            if det["class_name"] in self.target_classes and i not in matched_detections:
+                                det_bbox = det["bbox"]
+                                det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
                             
-                            # 计算中心点距离
-                            distance = ((track_center[0] - det_center[0]) ** 2 + 
-                                      (track_center[1] - det_center[1]) ** 2) ** 0.5
+                                # 计算中心点距离
+                                distance = ((track_center[0] - det_center[0]) ** 2 + 
+                                          (track_center[1] - det_center[1]) ** 2) ** 0.5
                             
-                            # 使用配置的距离阈值，但允许更大的匹配范围
-                            max_distance = max(self.track_distance_threshold, 100)  # 至少100像素
-                            if distance < best_distance and distance < max_distance:
-                                best_distance = distance
-                                best_match = i
+                                # 使用配置的距离阈值，但允许更大的匹配范围
+                                max_distance = max(self.track_distance_threshold, 100)  # 至少100像素
+                                if distance < best_distance and distance < max_distance:
+                                    best_distance = distance
+                                    best_match = i
                     
-                    if best_match is not None:
-                        matched_detections.add(best_match)
-                        original_det = results[best_match]
+                        if best_match is not None:
+                            matched_detections.add(best_match)
+                            original_det = results[best_match]
                         
-                        # 更新track_id出现时间
-                        if track_id not in self.track_id_first_seen:
-                            self.track_id_first_seen[track_id] = self.frame_id
+                            # 更新track_id出现时间
+                            if track_id not in self.track_id_first_seen:
+                                self.track_id_first_seen[track_id] = self.frame_id
                         
-                        self.track_id_last_seen[track_id] = self.frame_id
-                        # 保存跟踪ID的位置信息
-                        det_bbox = original_det["bbox"]
-                        det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
-                        self.track_id_positions[track_id] = det_center
-                        dwell_time = self.frame_id - self.track_id_first_seen[track_id]
+                            self.track_id_last_seen[track_id] = self.frame_id
+                            # 保存跟踪ID的位置信息
+                            det_bbox = original_det["bbox"]
+                            det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
+                            self.track_id_positions[track_id] = det_center
+                            dwell_time = self.frame_id - self.track_id_first_seen[track_id]
                         
-                        # 使用原始检测框，只添加跟踪信息
-                        tracked_result = {
-                            "bbox": original_det["bbox"],  # 保持原始检测框
-                            "confidence": original_det["confidence"],  # 保持原始置信度
-                            "class_id": original_det["class_id"],
-                            "class_name": original_det["class_name"],
-                            "track_id": track_id,
-                            "dwell_time": dwell_time,
-                            "matched": True  # 标记为匹配成功
-                        }
+                            # 使用原始检测框，只添加跟踪信息
+                            tracked_result = {
+                                "bbox": original_det["bbox"],  # 保持原始检测框
+                                "confidence": original_det["confidence"],  # 保持原始置信度
+                                "class_id": original_det["class_id"],
+                                "class_name": original_det["class_name"],
+                                "track_id": track_id,
+                                "dwell_time": dwell_time,
+                                "matched": True  # 标记为匹配成功
+                            }
                         
-                        tracked_results.append(tracked_result)
-                        matched_tracks.append(track)  # 记录匹配成功的轨迹
+                            tracked_results.append(tracked_result)
+                            matched_tracks.append(track)  # 记录匹配成功的轨迹
                         
-                        # 停留事件判定
-                        if dwell_time >= self.dwell_time_thresh:
-                            dwell_events.append({
-                                "track_id": track_id,
-                                "bbox": original_det["bbox"],
-                                "dwell_time": dwell_time
-                            })
+                            # 停留事件判定
+                            if dwell_time >= self.dwell_time_thresh:
+                                dwell_events.append({
+                                    "track_id": track_id,
+                                    "bbox": original_det["bbox"],
+                                    "dwell_time": dwell_time
+                                })
                         
-                        if self.enable_debug_log:
-                            self.log("debug", f"帧{self.frame_id}: 跟踪ID{track_id}匹配成功，距离={best_distance:.1f}像素")
-                    else:
-                        # 未匹配的跟踪轨迹
-                        unmatched_tracks.append(track)
+                            if self.enable_debug_log:
+                                self.log("debug", f"帧{self.frame_id}: 跟踪ID{track_id}匹配成功，距离={best_distance:.1f}像素")
+                        else:
+                            # 未匹配的跟踪轨迹
+                            unmatched_tracks.append(track)
                         
-                        # 如果启用显示未匹配轨迹，则添加到结果中
-                        if self.show_unmatched_tracks:
-                            # 使用跟踪器预测的框位置
-                            track_bbox = [track_x1, track_y1, track_x2, track_y2]
+                            # 如果启用显示未匹配轨迹，则添加到结果中
+                            if self.show_unmatched_tracks:
+                                # 使用跟踪器预测的框位置
+                                track_bbox = [track_x1, track_y1, track_x2, track_y2]
                             
-                            # 更新track_id出现时间（如果之前见过）
-                            if track_id in self.track_id_first_seen:
-                                dwell_time = self.frame_id - self.track_id_first_seen[track_id]
-                            else:
-                                # 新轨迹，设置首次出现时间
-                                self.track_id_first_seen[track_id] = self.frame_id
-                                dwell_time = 0
+                                # 更新track_id出现时间（如果之前见过）
+                                if track_id in self.track_id_first_seen:
+                                    dwell_time = self.frame_id - self.track_id_first_seen[track_id]
+                                else:
+                                    # 新轨迹，设置首次出现时间
+                                    self.track_id_first_seen[track_id] = self.frame_id
+                                    dwell_time = 0
                             
-                            self.track_id_last_seen[track_id] = self.frame_id
+                                self.track_id_last_seen[track_id] = self.frame_id
                             
-                            tracked_result = {
-                                "bbox": track_bbox,  # 使用跟踪器预测的框
-                                "confidence": 0.5,  # 默认置信度
-                                "class_id": 0,  # person类别ID
-                                "class_name": "person",
-                                "track_id": track_id,
-                                "dwell_time": dwell_time,
-                                "matched": False  # 标记为未匹配
-                            }
+                                tracked_result = {
+                                    "bbox": track_bbox,  # 使用跟踪器预测的框
+                                    "confidence": 0.5,  # 默认置信度
+                                    "class_id": 0,  # person类别ID
+                                    "class_name": "person",
+                                    "track_id": track_id,
+                                    "dwell_time": dwell_time,
+                                    "matched": False  # 标记为未匹配
+                                }
                             
-                            tracked_results.append(tracked_result)
+                                tracked_results.append(tracked_result)
                         
-                        if self.enable_debug_log:
-                            self.log("debug", f"帧{self.frame_id}: 跟踪ID{track_id}未找到匹配的检测结果，跳过此轨迹")
+                            if self.enable_debug_log:
+                                self.log("debug", f"帧{self.frame_id}: 跟踪ID{track_id}未找到匹配的检测结果，跳过此轨迹")
                 
-                # 第二步：为未匹配的检测结果分配新的跟踪ID
-                unmatched_detections = []
-                for i, det in enumerate(results):
-                    if det["class_name"] in self.target_classes and i not in matched_detections:
-                        unmatched_detections.append((i, det))
+                    # 第二步：为未匹配的检测结果分配新的跟踪ID
+                    unmatched_detections = []
+                    for i, det in enumerate(results):
+                        if det["class_name"] in self.target_classes and i not in matched_detections:
+                            unmatched_detections.append((i, det))
                 
-                if unmatched_detections and self.enable_debug_log:
-                    self.log("debug", f"帧{self.frame_id}: 发现{len(unmatched_detections)}个未匹配的人员检测结果")
+                    if unmatched_detections and self.enable_debug_log:
+                        self.log("debug", f"帧{self.frame_id}: 发现{len(unmatched_detections)}个未匹配的人员检测结果")
                 
-                # 为未匹配的检测结果分配临时跟踪ID
-                for i, det in unmatched_detections:
-                    # 生成临时跟踪ID（使用负数避免与BYTETracker的ID冲突）
-                    temp_track_id = -(i + 1)
+                    # 为未匹配的检测结果分配临时跟踪ID
+                    for i, det in unmatched_detections:
+                        # 生成临时跟踪ID（使用负数避免与BYTETracker的ID冲突）
+                        temp_track_id = -(i + 1)
                     
-                    # 检查是否之前见过这个检测结果（通过位置判断）
-                    det_bbox = det["bbox"]
-                    det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
+                        # 检查是否之前见过这个检测结果（通过位置判断）
+                        det_bbox = det["bbox"]
+                        det_center = [(det_bbox[0] + det_bbox[2]) / 2, (det_bbox[1] + det_bbox[3]) / 2]
                     
-                    # 查找最近的已知跟踪ID
-                    best_existing_id = None
-                    best_distance = float('inf')
+                        # 查找最近的已知跟踪ID
+                        best_existing_id = None
+                        best_distance = float('inf')
                     
-                    for existing_id, last_seen_frame in self.track_id_last_seen.items():
-                        # 只考虑最近几帧的跟踪ID
-                        if self.frame_id - last_seen_frame <= 10:  # 最近10帧
-                            if existing_id in self.track_id_positions:
-                                existing_pos = self.track_id_positions[existing_id]
-                                distance = ((det_center[0] - existing_pos[0]) ** 2 + 
-                                          (det_center[1] - existing_pos[1]) ** 2) ** 0.5
+                        for existing_id, last_seen_frame in self.track_id_last_seen.items():
+                            # 只考虑最近几帧的跟踪ID
+                            if self.frame_id - last_seen_frame <= 10:  # 最近10帧
+                                if existing_id in self.track_id_positions:
+                                    existing_pos = self.track_id_positions[existing_id]
+                                    distance = ((det_center[0] - existing_pos[0]) ** 2 + 
+                                              (det_center[1] - existing_pos[1]) ** 2) ** 0.5
                                 
-                                # 使用较小的距离阈值进行匹配
-                                if distance < best_distance and distance < 50:  # 50像素阈值
-                                    best_distance = distance
-                                    best_existing_id = existing_id
+                                    # 使用较小的距离阈值进行匹配
+                                    if distance < best_distance and distance < 50:  # 50像素阈值
+                                        best_distance = distance
+                                        best_existing_id = existing_id
                     
-                    # 如果没有找到合适的现有ID，使用临时ID
-                    if best_existing_id is None:
-                        best_existing_id = temp_track_id
+                        # 如果没有找到合适的现有ID，使用临时ID
+                        if best_existing_id is None:
+                            best_existing_id = temp_track_id
                     
-                    # 更新跟踪时间
-                    if best_existing_id not in self.track_id_first_seen:
-                        self.track_id_first_seen[best_existing_id] = self.frame_id
+                        # 更新跟踪时间
+                        if best_existing_id not in self.track_id_first_seen:
+                            self.track_id_first_seen[best_existing_id] = self.frame_id
                     
-                    self.track_id_last_seen[best_existing_id] = self.frame_id
-                    # 保存位置信息
-                    self.track_id_positions[best_existing_id] = det_center
-                    dwell_time = self.frame_id - self.track_id_first_seen[best_existing_id]
+                        self.track_id_last_seen[best_existing_id] = self.frame_id
+                        # 保存位置信息
+                        self.track_id_positions[best_existing_id] = det_center
+                        dwell_time = self.frame_id - self.track_id_first_seen[best_existing_id]
                     
-                    tracked_result = {
-                        "bbox": det["bbox"],
-                        "confidence": det["confidence"],
-                        "class_id": det["class_id"],
-                        "class_name": det["class_name"],
-                        "track_id": best_existing_id,
-                        "dwell_time": dwell_time,
-                        "matched": True,  # 标记为匹配成功（虽然是临时匹配）
-                        "temp_track": True  # 标记为临时跟踪
-                    }
+                        tracked_result = {
+                            "bbox": det["bbox"],
+                            "confidence": det["confidence"],
+                            "class_id": det["class_id"],
+                            "class_name": det["class_name"],
+                            "track_id": best_existing_id,
+                            "dwell_time": dwell_time,
+                            "matched": True,  # 标记为匹配成功（虽然是临时匹配）
+                            "temp_track": True  # 标记为临时跟踪
+                        }
                     
-                    tracked_results.append(tracked_result)
+                        tracked_results.append(tracked_result)
                     
-                    if self.enable_debug_log:
-                        if best_existing_id == temp_track_id:
-                            self.log("debug", f"帧{self.frame_id}: 为未匹配检测结果分配新跟踪ID{best_existing_id}")
-                        else:
-                            self.log("debug", f"帧{self.frame_id}: 未匹配检测结果复用跟踪ID{best_existing_id}，距离={best_distance:.1f}像素")
+                        if self.enable_debug_log:
+                            if best_existing_id == temp_track_id:
+                                self.log("debug", f"帧{self.frame_id}: 为未匹配检测结果分配新跟踪ID{best_existing_id}")
+                            else:
+                                self.log("debug", f"帧{self.frame_id}: 未匹配检测结果复用跟踪ID{best_existing_id}，距离={best_distance:.1f}像素")
                 
-                # 记录检测结果和跟踪ID
-                track_ids = [det["track_id"] for det in tracked_results]
-                if self.enable_debug_log:
-                    self.log("debug", f"帧{self.frame_id}: BYTETracker总轨迹: {len(tracks)}个, 匹配成功: {len(matched_tracks)}个, 未匹配: {len(unmatched_tracks)}个, 临时跟踪: {len(unmatched_detections)}个")
-                self.log("info", f"帧{self.frame_id}: 检测到{len(results)}个目标，跟踪{len(tracked_results)}个人员，跟踪ID: {track_ids}")
+                    # 记录检测结果和跟踪ID
+                    track_ids = [det["track_id"] for det in tracked_results]
+                    if self.enable_debug_log:
+                        self.log("debug", f"帧{self.frame_id}: BYTETracker总轨迹: {len(tracks)}个, 匹配成功: {len(matched_tracks)}个, 未匹配: {len(unmatched_tracks)}个, 临时跟踪: {len(unmatched_detections)}个")
+                    self.log("info", f"帧{self.frame_id}: 检测到{len(results)}个目标，跟踪{len(tracked_results)}个人员，跟踪ID: {track_ids}")
                 
-                if dwell_events:
-                    dwell_ids = [event["track_id"] for event in dwell_events]
-                    self.log("warning", f"停留事件: 跟踪ID {dwell_ids} 停留时间超过阈值")
-            else:
-                # 如果不启用跟踪，只返回目标类别的检测结果
-                tracked_results = [det for det in results if det["class_name"] in self.target_classes]
-                self.log("info", f"帧{self.frame_id}: 检测到{len(results)}个目标，其中{len(tracked_results)}个人员")
+                    if dwell_events:
+                        dwell_ids = [event["track_id"] for event in dwell_events]
+                        self.log("warning", f"停留事件: 跟踪ID {dwell_ids} 停留时间超过阈值")
+                else:
+                    # 如果不启用跟踪，只返回目标类别的检测结果
+                    tracked_results = [det for det in results if det["class_name"] in self.target_classes]
+                    self.log("info", f"帧{self.frame_id}: 检测到{len(results)}个目标，其中{len(tracked_results)}个人员")
 
             # 3. 电子围栏过滤（支持trigger_mode和归一化坐标）
             if self.is_fence_config_valid(fence_config):
@@ -426,77 +428,11 @@ class PStopCocoSkill(BaseSkill):
         """预处理图像"""
         # 获取原始图像尺寸用于后处理
         self.original_shape = img.shape
-
-        # 转换到RGB并调整大小
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (self.input_width, self.input_height))
-
-        # 归一化到[0,1]
-        img = img.astype(np.float32) / np.float32(255.0)
-
-        # 调整为NCHW格式 (1, 3, height, width)
-        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+        return self.preprocess_image(img)
 
     def postprocess(self, detections, original_img):
         """后处理模型输出"""
-        # 获取原始图像尺寸
-        height, width = original_img.shape[:2]
-
-        # 处理模型输出 (1, 84, 8400) -> (8400, 84)
-        detections = np.squeeze(detections, axis=0)
-        detections = np.transpose(detections, (1, 0))
-
-        boxes, scores, class_ids = [], [], []
-        x_factor = width / self.input_width
-        y_factor = height / self.input_height
-
-        for i in range(detections.shape[0]):
-            classes_scores = detections[i][4:]
-            max_score = np.amax(classes_scores)
-
-            if max_score >= self.conf_thres:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = detections[i][0], detections[i][1], detections[i][2], detections[i][3]
-
-                # 坐标转换
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width_box = int(w * x_factor)
-                height_box = int(h * y_factor)
-
-                # 边界检查
-                left = max(0, left)
-                top = max(0, top)
-                width_box = min(width_box, width - left)
-                height_box = min(height_box, height - top)
-
-                boxes.append([left, top, width_box, height_box])
-                scores.append(max_score)
-                class_ids.append(class_id)
-
-        # 按类别执行 NMS
-        results = []
-        unique_class_ids = set(class_ids)
-        for class_id in unique_class_ids:
-            cls_indices = [i for i, cid in enumerate(class_ids) if cid == class_id]
-            cls_boxes = [boxes[i] for i in cls_indices]
-            cls_scores = [scores[i] for i in cls_indices]
-
-            nms_indices = cv2.dnn.NMSBoxes(cls_boxes, cls_scores, self.conf_thres, self.iou_thres)
-            if isinstance(nms_indices, (list, tuple, np.ndarray)):
-                nms_indices = np.array(nms_indices).flatten()
-
-            for idx_in_cls in nms_indices:
-                idx = cls_indices[idx_in_cls]
-                box = boxes[idx]
-                results.append({
-                    "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
-                    "confidence": float(cls_scores[idx_in_cls]),
-                    "class_id": int(class_id),
-                    "class_name": self.class_names.get(int(class_id), "unknown")
-                })
-
-        return results
+        return self.decode_yolo_output(detections, original_img)
 
     def analyze_safety(self, detections: List[Dict], dwell_events: List[Dict]) -> Dict:
         """
@@ -10,102 +10,409 @@
 - 线程安全的帧分发机制
 """
 import cv2
+import itertools
+import math
 import numpy as np
+import os
+import random
+import re
 import time
 import logging
 import threading
 import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any, Tuple, Set
 from io import BytesIO
 from PIL import Image
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from app.services.wvp_client import wvp_client
+from app.services.inference_cache import inference_cache
+from app.services.frame_pipeline import FrameInfo
+from app.services.frame_mode_selector import FrameModeSelector, ON_DEMAND, PERSISTENT
+from app.services.frame_ring_buffer import FrameRingBuffer
+from app.services.snapshot_prefetcher import snapshot_prefetcher
+from app.services.synthetic_frame_source import SyntheticFrameSource, is_synthetic_url
 
 logger = logging.getLogger(__name__)
 
+# 全局帧代次计数器：每解码/截取一帧分配一个进程内唯一的代次，用于标识"同一帧"
+_frame_generation_counter = itertools.count(1)
+
+# 解码限速：按订阅者所需的最小帧间隔控制读取器实际输出的帧率，输出帧率为所需帧率的若干倍，保证任务取到的帧足够新
+_DECODE_RATE_HEADROOM = 2.0
+# FFmpeg fps滤镜档位（帧/秒）：修改滤镜需要重启FFmpeg进程，按档位取整以减少重启，超过最高档位时不限速
+_FFMPEG_FPS_LADDER = (1, 2, 5, 10, 15)
+# FFmpeg降档前所需帧率需持续降低的时间（秒），避免订阅者频繁加入/离开导致反复重连
+_FFMPEG_FPS_DOWNGRADE_DELAY = 10.0
+# 缩放解码时全分辨率重新抓帧的超时（秒），RTSP需要等到下一个关键帧
+_FULL_RESOLUTION_GRAB_TIMEOUT = 10.0
+# OpenCV缩放解码时保留的最近几帧原图（按帧代次），预警截图取与检测帧同一代次的原图；
+# 输出帧率按任务所需帧率限速，检测完成时读取器通常只前进了流水线深度以内的帧数（1080p每帧约6MB）
+_FULL_FRAME_HISTORY = 3
+# 关键帧解码：订阅者最小帧间隔大于GOP时长时只解码关键帧（-skip_frame nokey）
+# 最小帧间隔达到该值（秒）才探测GOP，高频任务不会使用关键帧解码，无需额外连接
+_KEYFRAME_PROBE_MIN_INTERVAL = 2.0
+# GOP探测读取的关键帧数和超时（秒），RTSP为实时流，探测耗时约为 (关键帧数-1) × GOP时长
+_GOP_PROBE_KEYFRAMES = 4
+_GOP_PROBE_TIMEOUT = 60.0
+_SHOWINFO_PTS_PATTERN = re.compile(rb"pts_time:\s*(-?[\d.]+)")
+
+# 摄像头流地址覆盖 {camera_id: stream_url}，设置后不再向WVP请求播放地址（用于基准测试的合成视频源）
+_stream_url_overrides: Dict[int, str] = {}
+
+# 已探测的GOP时长 {stream_url: 秒}，同一地址的读取器重启后无需再次探测
+_gop_duration_cache: Dict[str, float] = {}
+
+# NVDEC可用性每个进程只检测一次（检测需要启动2~3个FFmpeg进程，大量读取器同时启动时开销很大）
+_nvdec_available: Optional[bool] = None
+_nvdec_probe_lock = threading.Lock()
+
+
+def register_stream_url(camera_id: int, stream_url: Optional[str]):
+    """
+    为摄像头指定流地址，绕过WVP（如 synthetic:// 合成视频源）
+
+    Args:
+        camera_id: 摄像头ID
+        stream_url: 流地址，为None时取消覆盖
+    """
+    if stream_url is None:
+        _stream_url_overrides.pop(camera_id, None)
+    else:
+        _stream_url_overrides[camera_id] = stream_url
+
+
+def probe_gop_duration(stream_url: str, max_keyframes: int = _GOP_PROBE_KEYFRAMES,
+                       timeout: float = _GOP_PROBE_TIMEOUT) -> Optional[float]:
+    """
+    探测视频流的GOP时长（相邻关键帧的时间间隔）
+    
+    FFmpeg只解码关键帧（-skip_frame nokey），由showinfo滤镜输出关键帧时间戳，取相邻间隔的中位数。
+    
+    Args:
+        stream_url: 流地址
+        max_keyframes: 读取的关键帧数
+        timeout: 超时（秒）
+    
+    Returns:
+        GOP时长（秒），探测失败时返回None
+    """
+    import subprocess
+    
+    cmd = ['ffmpeg', '-hide_banner', '-nostats']
+    if stream_url.startswith('rtsp://'):
+        cmd += ['-rtsp_transport', 'tcp', '-timeout', '3000000']
+    cmd += ['-skip_frame', 'nokey', '-i', stream_url, '-an', '-sn', '-vf', 'showinfo', '-f', 'null', '-']
+    
+    timestamps = []
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except Exception as e:
+        logger.debug(f"GOP探测失败: {e}")
+        return None
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        for line in iter(process.stderr.readline, b''):
+            match = _SHOWINFO_PTS_PATTERN.search(line)
+            if match:
+                timestamps.append(float(match.group(1)))
+                if len(timestamps) >= max_keyframes:
+                    break
+    finally:
+        timer.cancel()
+        process.kill()
+        process.wait()
+        process.stderr.close()
+    
+    intervals = sorted(b - a for a, b in zip(timestamps, timestamps[1:]) if b > a)
+    if not intervals:
+        logger.warning(f"GOP探测失败，{timeout}s内只读到 {len(timestamps)} 个关键帧: {stream_url}")
+        return None
+    return intervals[len(intervals) // 2]
+
+
+def _probe_nvdec() -> bool:
+    """
+    检测 NVDEC 硬件解码是否可用
+    
+    检查 H.264 (h264_cuvid) 和 H.265 (hevc_cuvid) 解码器，
+    并实际测试是否能工作
+    """
+    try:
+        import subprocess
+        
+        # 首先检查解码器是否存在
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-decoders'],
+            capture_output=True, text=True, timeout=5
+        )
+        
+        has_h264_cuvid = 'h264_cuvid' in result.stdout
+        has_hevc_cuvid = 'hevc_cuvid' in result.stdout
+        
+        if not has_h264_cuvid and not has_hevc_cuvid:
+            logger.debug("FFmpeg 未包含 NVDEC 解码器 (h264_cuvid/hevc_cuvid)")
+            return False
+        
+        # 实际测试 NVDEC 是否能工作（使用 H.264 测试）
+        # 使用 lavfi 生成测试视频，用 h264_nvenc 编码后再用 h264_cuvid 解码
+        test_result = subprocess.run(
+            [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1',
+                '-c:v', 'h264_nvenc', '-f', 'h264', '-',
+            ],
+            capture_output=True, timeout=10
+        )
+        
+        if test_result.returncode == 0 and test_result.stdout:
+            # 尝试用 h264_cuvid 解码
+            decode_result = subprocess.run(
+                [
+                    'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                    '-hwaccel', 'cuda',
+                    '-c:v', 'h264_cuvid',
+                    '-f', 'h264', '-i', '-',
+                    '-frames:v', '1',
+                    '-f', 'null', '-'
+                ],
+                input=test_result.stdout,
+                capture_output=True, timeout=10
+            )
+            
+            if decode_result.returncode == 0:
+                logger.info(f"✅ 检测到 NVDEC 硬件解码器可用 (H.264: {has_h264_cuvid}, H.265: {has_hevc_cuvid})")
+                return True
+            else:
+                stderr = decode_result.stderr.decode('utf-8', errors='ignore')
+                logger.warning(f"NVDEC 解码测试失败: {stderr[:200]}")
+                return False
+        else:
+            logger.debug("无法生成测试视频流")
+            return False
+            
+    except subprocess.TimeoutExpired:
+        logger.warning("NVDEC 检测超时")
+        return False
+    except Exception as e:
+        logger.debug(f"NVDEC 检测失败: {e}")
+    return False
+
+
+def check_nvdec_available() -> bool:
+    """NVDEC 硬件解码是否可用，结果在进程内缓存，并发调用只检测一次"""
+    global _nvdec_available
+    if _nvdec_available is None:
+        with _nvdec_probe_lock:
+            if _nvdec_available is None:
+                _nvdec_available = _probe_nvdec()
+    return _nvdec_available
+
+
+def _process_cpu_seconds(pid: int) -> float:
+    """子进程累计CPU时间（秒），进程已退出时返回0"""
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except Exception:
+        return 0.0
+
 
 class ThreadedFrameReader:
-    """多线程帧读取器 - 支持NVDEC硬件解码和OpenCV软件解码"""
+    """多线程帧读取器 - 支持NVDEC硬件解码和OpenCV软件解码，低频订阅时可只解码关键帧"""
+    
+    # 本地文件按原始帧率读取（模拟实时流）；基准测试可关闭以不限速读完文件
+    pace_local_files = True
     
-    def __init__(self, stream_url: str):
+    def __init__(self, stream_url: str, frame_interval: Optional[float] = None,
+                 output_size: Optional[Tuple[int, int]] = None, keyframe_decode: bool = False):
+        """
+        Args:
+            stream_url: 流地址（RTSP/FLV/本地文件/synthetic://）
+            frame_interval: 订阅者所需的最小帧间隔（秒），读取器据此限制输出帧率，None表示按源帧率输出
+            output_size: 订阅者所需的最大输入尺寸 (宽, 高)，输出帧按比例缩放到两个方向都不小于该尺寸，None表示输出原始分辨率
+            keyframe_decode: 是否允许关键帧解码，允许时最小帧间隔大于GOP时长则自动切换为只解码关键帧
+        """
         self.stream_url = stream_url
-        self.latest_frame = None
+        self.latest_frame = None  # 最新帧的只读视图（指向帧环形缓冲区的帧槽）
+        self.frame_generation = 0  # 最新帧的代次
+        self.frame_capture_time = 0.0  # 最新帧的采集时间
         self.frame_lock = threading.Lock()
+        # 解码数据直接写入预分配的帧槽，订阅者取得只读视图，帧槽在没有视图引用后才会复用
+        self.frame_ring = FrameRingBuffer(generation_counter=_frame_generation_counter)
         self.running = False
         self.read_thread = None
         self.cap = None
         self.ffmpeg_process = None
         self.use_nvdec = False
-        self.width = 1920
+        self.width = 1920   # 输出帧分辨率（缩放解码时为缩放后的分辨率）
         self.height = 1080
+        self.source_width = 1920   # 视频流原始分辨率
+        self.source_height = 1080
         
-    def _check_nvdec_available(self) -> bool:
+        # 缩放解码：FFmpeg由scale滤镜直接输出缩放帧，OpenCV在retrieve后缩放并缓存最近几帧原图供预警截图使用
+        self.output_size = output_size
+        self._ffmpeg_size = None  # 当前FFmpeg scale滤镜输出尺寸，None表示原始分辨率
+        self._full_frames = deque(maxlen=_FULL_FRAME_HISTORY)  # (帧代次, 原图)
+        
+        # 解码限速：未到输出时间的帧不做颜色转换和拷贝（OpenCV只grab不retrieve，FFmpeg由fps滤镜丢弃）
+        self.frame_interval = frame_interval
+        self._output_interval = self._compute_output_interval(frame_interval)
+        self._next_output_time = 0.0
+        self._source_interval = 0.0  # 本地文件按原始帧率读取（模拟实时流），0表示不限速
+        self._next_grab_time = 0.0
+        self._ffmpeg_decoder = None
+        self._ffmpeg_fps = None  # 当前FFmpeg fps滤镜档位，None表示不限速
+        self._ffmpeg_downgrade_since = None
+        
+        # 关键帧解码：GOP时长由后台探测（同一地址只探测一次），切换后由FFmpeg软件解码关键帧（不占用NVDEC会话）
+        self.keyframe_decode = keyframe_decode
+        self.keyframe_only = False  # 当前是否只解码关键帧
+        self.gop_duration: Optional[float] = _gop_duration_cache.get(stream_url)
+        self._gop_probe_thread = None
+        self._gop_probe_failed = False
+        
+        # 解码CPU统计：OpenCV为读取线程的CPU时间，FFmpeg为子进程的CPU时间（已结束的进程累加到 decoder_cpu_time）
+        self._started_at = None
+        
+        self.stats = {
+            "frames_grabbed": 0,     # 从解码器收到的帧数
+            "frames_retrieved": 0,   # 转换为BGR并发布为最新帧的帧数
+            "ffmpeg_restarts": 0,    # 调整fps/scale滤镜导致的FFmpeg重启次数
+            "pipe_bytes": 0,         # 从FFmpeg管道读取的字节数
+            "full_resolution_grabs": 0,  # 缩放解码时为预警截图重新抓取全分辨率帧的次数
+            "bytes_copied": 0,       # 读取器内部的整帧拷贝字节数（解码数据无法直接写入帧槽时）
+            "decoder_cpu_time": 0.0,  # 解码累计CPU时间（秒），FFmpeg运行中进程的部分在 get_stats 中累加
+            "decode_mode_switches": 0,  # 全帧解码与关键帧解码之间的切换次数
+        }
+    
+    @staticmethod
+    def _compute_output_interval(frame_interval: Optional[float]) -> float:
+        """订阅者帧间隔 -> 读取器输出间隔（秒），0表示不限速"""
+        if not frame_interval or frame_interval <= 0:
+            return 0.0
+        return frame_interval / _DECODE_RATE_HEADROOM
+    
+    @staticmethod
+    def _ffmpeg_fps_for_interval(frame_interval: Optional[float]) -> Optional[int]:
+        """订阅者帧间隔 -> FFmpeg fps滤镜档位，None表示不限速"""
+        if not frame_interval or frame_interval <= 0:
+            return None
+        required_fps = _DECODE_RATE_HEADROOM / frame_interval
+        for fps in _FFMPEG_FPS_LADDER:
+            if fps >= required_fps:
+                return fps
+        return None
+    
+    @staticmethod
+    def _compute_scaled_size(source_width: int, source_height: int,
+                             output_size: Optional[Tuple[int, int]]) -> Tuple[int, int]:
         """
-        检测 NVDEC 硬件解码是否可用
+        按比例缩放到覆盖输出尺寸（两个方向都不小于输出尺寸，不放大），宽高向上取偶数以满足像素格式要求
+        
+        技能默认直接拉伸到模型输入尺寸，缩放到输出尺寸以内会让较短的方向（如1080p的高度）被再次拉伸放大，
+        损失的像素无法恢复；覆盖输出尺寸时拉伸只会缩小，与从原图缩放的效果一致。
         
-        检查 H.264 (h264_cuvid) 和 H.265 (hevc_cuvid) 解码器，
-        并实际测试是否能工作
+        Returns:
+            (宽, 高)，无需缩放时返回原始分辨率
         """
-        try:
-            import subprocess
-            
-            # 首先检查解码器是否存在
-            result = subprocess.run(
-                ['ffmpeg', '-hide_banner', '-decoders'],
-                capture_output=True, text=True, timeout=5
-            )
-            
-            has_h264_cuvid = 'h264_cuvid' in result.stdout
-            has_hevc_cuvid = 'hevc_cuvid' in result.stdout
-            
-            if not has_h264_cuvid and not has_hevc_cuvid:
-                logger.debug("FFmpeg 未包含 NVDEC 解码器 (h264_cuvid/hevc_cuvid)")
-                return False
-            
-            # 实际测试 NVDEC 是否能工作（使用 H.264 测试）
-            # 使用 lavfi 生成测试视频，用 h264_nvenc 编码后再用 h264_cuvid 解码
-            test_result = subprocess.run(
-                [
-                    'ffmpeg', '-hide_banner', '-loglevel', 'error',
-                    '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1',
-                    '-c:v', 'h264_nvenc', '-f', 'h264', '-',
-                ],
-                capture_output=True, timeout=10
-            )
-            
-            if test_result.returncode == 0 and test_result.stdout:
-                # 尝试用 h264_cuvid 解码
-                decode_result = subprocess.run(
-                    [
-                        'ffmpeg', '-hide_banner', '-loglevel', 'error',
-                        '-hwaccel', 'cuda',
-                        '-c:v', 'h264_cuvid',
-                        '-f', 'h264', '-i', '-',
-                        '-frames:v', '1',
-                        '-f', 'null', '-'
-                    ],
-                    input=test_result.stdout,
-                    capture_output=True, timeout=10
-                )
-                
-                if decode_result.returncode == 0:
-                    logger.info(f"✅ 检测到 NVDEC 硬件解码器可用 (H.264: {has_h264_cuvid}, H.265: {has_hevc_cuvid})")
-                    return True
-                else:
-                    stderr = decode_result.stderr.decode('utf-8', errors='ignore')
-                    logger.warning(f"NVDEC 解码测试失败: {stderr[:200]}")
-                    return False
-            else:
-                logger.debug("无法生成测试视频流")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            logger.warning("NVDEC 检测超时")
+        if not output_size:
+            return source_width, source_height
+        scale = max(output_size[0] / source_width, output_size[1] / source_height)
+        if scale >= 1.0:
+            return source_width, source_height
+        # 向上取偶数（减去微小量避免浮点误差多进一档），不超过原始分辨率
+        width = min(source_width, max(2, math.ceil(source_width * scale / 2 - 1e-6) * 2))
+        height = min(source_height, max(2, math.ceil(source_height * scale / 2 - 1e-6) * 2))
+        return width, height
+    
+    @property
+    def is_scaled(self) -> bool:
+        """输出帧是否为缩放后的帧"""
+        return (self.width, self.height) != (self.source_width, self.source_height)
+    
+    def set_output_size(self, output_size: Optional[Tuple[int, int]]):
+        """
+        调整输出尺寸（订阅者加入/离开导致所需最大输入尺寸变化时调用）
+        
+        OpenCV解码立即生效；FFmpeg解码由读取线程重启进程以应用新的scale滤镜。
+        
+        Args:
+            output_size: 最大输入尺寸 (宽, 高)，None表示输出原始分辨率
+        """
+        with self.frame_lock:
+            self.output_size = output_size
+            if self.ffmpeg_process is None:
+                self.width, self.height = self._compute_scaled_size(
+                    self.source_width, self.source_height, output_size)
+                if not self.is_scaled:
+                    self._full_frames.clear()
+        logger.info(f"帧读取器输出尺寸调整为 {output_size or '原始分辨率'}: {self.stream_url}")
+    
+    def set_frame_interval(self, frame_interval: Optional[float]):
+        """
+        实时调整输出帧率（订阅者加入/离开导致最小帧间隔变化时调用）
+        
+        OpenCV解码立即生效；FFmpeg解码同时调整fps滤镜档位，升档立即重启FFmpeg，
+        降档需持续一段时间后才重启。
+        
+        Args:
+            frame_interval: 订阅者所需的最小帧间隔（秒），None表示按源帧率输出
+        """
+        with self.frame_lock:
+            self.frame_interval = frame_interval
+            self._output_interval = self._compute_output_interval(frame_interval)
+            self._next_output_time = 0.0
+        logger.info(f"帧读取器输出间隔调整为 {self._output_interval:.3f}s（订阅者间隔 {frame_interval}s）: {self.stream_url}")
+        self._maybe_start_gop_probe()
+    
+    def _keyframe_mode_due(self) -> bool:
+        """是否应只解码关键帧：允许关键帧解码、GOP已知且订阅者最小帧间隔大于GOP时长"""
+        return bool(self.keyframe_decode and self.gop_duration and self.frame_interval
+                    and self.frame_interval > self.gop_duration)
+    
+    def _maybe_start_gop_probe(self):
+        """低频订阅时在后台探测GOP时长，探测完成后读取线程自动切换解码模式"""
+        if not self.keyframe_decode or self.gop_duration is not None or self._gop_probe_failed:
+            return
+        if is_synthetic_url(self.stream_url):
+            return
+        if not self.frame_interval or self.frame_interval < _KEYFRAME_PROBE_MIN_INTERVAL:
+            return
+        if self._gop_probe_thread is not None and self._gop_probe_thread.is_alive():
+            return
+        self._gop_probe_thread = threading.Thread(target=self._probe_gop, daemon=True, name="GOPProbe")
+        self._gop_probe_thread.start()
+    
+    def _probe_gop(self):
+        gop_duration = probe_gop_duration(self.stream_url)
+        if gop_duration is None:
+            self._gop_probe_failed = True
+            return
+        _gop_duration_cache[self.stream_url] = gop_duration
+        self.gop_duration = gop_duration
+        logger.info(f"视频流GOP时长 {gop_duration:.2f}s，订阅者间隔 {self.frame_interval}s，"
+                    f"{'切换为关键帧解码' if self._keyframe_mode_due() else '保持全帧解码'}: {self.stream_url}")
+    
+    def _take_output_slot(self, now: float) -> bool:
+        """当前帧是否需要输出，按固定节拍推进，落后超过一个间隔时不追帧"""
+        interval = self._output_interval
+        if interval <= 0:
+            return True
+        if now < self._next_output_time:
             return False
-        except Exception as e:
-            logger.debug(f"NVDEC 检测失败: {e}")
-        return False
+        if self._next_output_time + interval < now:
+            self._next_output_time = now + interval
+        else:
+            self._next_output_time += interval
+        return True
+        
+    def _check_nvdec_available(self) -> bool:
+        """检测 NVDEC 硬件解码是否可用（每个进程只检测一次）"""
+        return check_nvdec_available()
     
     def _get_stream_info(self) -> Tuple[int, int, str]:
         """获取视频流分辨率和编码格式"""
@@ -141,15 +448,24 @@ class ThreadedFrameReader:
     def start(self) -> bool:
         """启动帧读取线程（优先使用NVDEC硬件解码）"""
         try:
+            self._started_at = time.time()
+            if is_synthetic_url(self.stream_url):
+                # 合成视频源不需要解码
+                self.use_nvdec = False
+                return self._start_opencv()
+            
             # 检测 NVDEC 是否可用
             self.use_nvdec = self._check_nvdec_available()
             
             if self.use_nvdec:
                 # 使用 FFmpeg + NVDEC 硬件解码
-                return self._start_ffmpeg_nvdec()
+                started = self._start_ffmpeg_nvdec()
             else:
-                # 回退到 OpenCV 软件解码
-                return self._start_opencv()
+                # 回退到 OpenCV 软件解码（需要关键帧解码时由读取线程切换到FFmpeg）
+                started = self._start_opencv()
+            if started:
+                self._maybe_start_gop_probe()
+            return started
                 
         except Exception as e:
             logger.error(f"启动帧读取器失败: {str(e)}")
@@ -161,46 +477,24 @@ class ThreadedFrameReader:
             import subprocess
             
             # 获取视频流分辨率和编码格式
-            self.width, self.height, codec_name = self._get_stream_info()
-            logger.info(f"视频流分辨率: {self.width}x{self.height}, 编码: {codec_name}")
+            self.source_width, self.source_height, codec_name = self._get_stream_info()
+            logger.info(f"视频流分辨率: {self.source_width}x{self.source_height}, 编码: {codec_name}")
+            if self.source_width <= 0 or self.source_height <= 0:
+                raise RuntimeError("无法获取视频流分辨率")
             
             # 根据源视频编码选择解码器
-            if codec_name in ('hevc', 'h265'):
-                decoder = 'hevc_cuvid'
-            else:
-                decoder = 'h264_cuvid'  # 默认使用 H.264 解码器
-            
+            decoder = self._select_ffmpeg_decoder(codec_name)
             logger.info(f"使用 NVDEC 解码器: {decoder}")
-            
-            # 构建 FFmpeg 命令 - 使用 NVDEC 硬件解码
-            # 注意：不使用 hwaccel_output_format cuda，因为需要输出到 CPU
-            cmd = [
-                'ffmpeg',
-                '-rtsp_transport', 'tcp',     # 使用 TCP 传输（更稳定）
-                '-timeout', '3000000',        # 超时 3秒（微秒）
-                '-hwaccel', 'cuda',           # 使用 CUDA 硬件加速
-                '-c:v', decoder,              # 根据源视频选择 NVDEC 解码器
-                '-i', self.stream_url,
-                '-f', 'rawvideo',
-                '-pix_fmt', 'bgr24',          # OpenCV 使用 BGR 格式
-                '-an',                         # 不处理音频
-                '-sn',                         # 不处理字幕
-                '-'
-            ]
-            
-            self.ffmpeg_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                bufsize=self.width * self.height * 3 * 2  # 2帧缓冲
-            )
+            self._ffmpeg_decoder = decoder
+            self.ffmpeg_process = self._spawn_ffmpeg(self._ffmpeg_fps_for_interval(self.frame_interval),
+                                                     keyframe_only=self._keyframe_mode_due())
             
             self.running = True
             self.read_thread = threading.Thread(target=self._read_frames_ffmpeg, daemon=True)
             self.read_thread.start()
             
-            # 等待第一帧
-            max_wait_time = 5.0
+            # 等待第一帧（关键帧解码时最长需要等待一个GOP）
+            max_wait_time = self._no_frame_timeout()
             wait_start = time.time()
             while self.latest_frame is None and (time.time() - wait_start) < max_wait_time:
                 # 检查进程是否还在运行
@@ -229,21 +523,160 @@ class ThreadedFrameReader:
             self.use_nvdec = False
             return self._start_opencv()
     
+    def _select_ffmpeg_decoder(self, codec_name: str) -> Optional[str]:
+        """根据源视频编码选择 NVDEC 解码器，返回None时FFmpeg使用软件解码"""
+        if codec_name in ('hevc', 'h265'):
+            return 'hevc_cuvid'
+        return 'h264_cuvid'  # 默认使用 H.264 解码器
+    
+    def _spawn_ffmpeg(self, fps: Optional[int], keyframe_only: bool = False):
+        """
+        启动 FFmpeg NVDEC 解码进程
+        
+        Args:
+            fps: fps滤镜档位，None表示按源帧率输出；滤镜在转换为bgr24之前丢帧，减少颜色转换和管道带宽
+            keyframe_only: 只解码关键帧（软件解码，不使用fps滤镜）
+        """
+        import subprocess
+        
+        if keyframe_only:
+            fps = None
+        
+        # 按当前所需输出尺寸确定scale滤镜，缩放在转换为bgr24之前完成，管道只传输缩放后的帧
+        width, height = self._compute_scaled_size(self.source_width, self.source_height, self.output_size)
+        filters = []
+        if fps:
+            filters.append(f'fps={fps}')  # 解码端限速
+        if (width, height) != (self.source_width, self.source_height):
+            filters.append(f'scale={width}:{height}:flags=area')
+        
+        # 构建 FFmpeg 命令 - 使用 NVDEC 硬件解码
+        # 注意：不使用 hwaccel_output_format cuda，因为需要输出到 CPU
+        # stderr 只在启动失败时读取，只输出错误、关闭进度统计，避免长时间运行时写满管道阻塞FFmpeg
+        cmd = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error']
+        if self.stream_url.startswith('rtsp://'):
+            # RTSP专用选项，用于FLV/本地文件时FFmpeg会报 Option not found
+            cmd += [
+                '-rtsp_transport', 'tcp',     # 使用 TCP 传输（更稳定）
+                '-timeout', '3000000',        # 超时 3秒（微秒）
+            ]
+        elif self.pace_local_files and os.path.isfile(self.stream_url):
+            cmd += ['-re']                    # 本地文件按原始帧率读取，与实时流行为一致
+        if keyframe_only:
+            cmd += ['-skip_frame', 'nokey']   # 解码器跳过所有非关键帧
+        elif self._ffmpeg_decoder:
+            cmd += [
+                '-hwaccel', 'cuda',           # 使用 CUDA 硬件加速
+                '-c:v', self._ffmpeg_decoder, # 根据源视频选择 NVDEC 解码器
+            ]
+        cmd += ['-i', self.stream_url]
+        if filters:
+            cmd += ['-vf', ','.join(filters)]
+        if keyframe_only:
+            cmd += ['-fps_mode', 'passthrough']  # 按解码出的关键帧输出，不按源帧率补帧
+        cmd += [
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',          # OpenCV 使用 BGR 格式
+            '-an',                         # 不处理音频
+            '-sn',                         # 不处理字幕
+            '-'
+        ]
+        
+        self._ffmpeg_fps = fps
+        self._ffmpeg_size = (width, height)
+        self._ffmpeg_downgrade_since = None
+        self.keyframe_only = keyframe_only
+        self.width, self.height = width, height
+        mode = "只解码关键帧" if keyframe_only else f"fps滤镜: {fps or '不限速'}"
+        logger.info(f"启动FFmpeg解码进程，{mode}，输出分辨率: {width}x{height}")
+        return subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=width * height * 3 * 2  # 2帧缓冲
+        )
+    
+    def _ffmpeg_restart_due(self) -> bool:
+        """
+        FFmpeg是否需要重启以应用新的参数：解码模式（全帧/关键帧）和输出尺寸变化立即重启，
+        fps档位见 _ffmpeg_fps_change_due（关键帧解码不使用fps滤镜）
+        """
+        if self._keyframe_mode_due() != self.keyframe_only:
+            return True
+        target_size = self._compute_scaled_size(self.source_width, self.source_height, self.output_size)
+        if target_size != self._ffmpeg_size:
+            return True
+        if self.keyframe_only:
+            return False
+        return self._ffmpeg_fps_change_due()
+    
+    def _ffmpeg_fps_change_due(self) -> bool:
+        """FFmpeg fps滤镜档位是否需要调整：升档立即调整，降档需持续一段时间"""
+        target_fps = self._ffmpeg_fps_for_interval(self.frame_interval)
+        if target_fps == self._ffmpeg_fps:
+            self._ffmpeg_downgrade_since = None
+            return False
+        
+        if self._ffmpeg_fps is not None and (target_fps is None or target_fps > self._ffmpeg_fps):
+            return True
+        
+        now = time.time()
+        if self._ffmpeg_downgrade_since is None:
+            self._ffmpeg_downgrade_since = now
+        return now - self._ffmpeg_downgrade_since >= _FFMPEG_FPS_DOWNGRADE_DELAY
+    
+    def _restart_ffmpeg(self):
+        """按新的解码模式、fps档位和输出尺寸重启FFmpeg：先启动新进程再结束旧进程，监控线程只检查当前进程"""
+        old_process = self.ffmpeg_process
+        was_keyframe_only = self.keyframe_only
+        new_process = self._spawn_ffmpeg(self._ffmpeg_fps_for_interval(self.frame_interval),
+                                         keyframe_only=self._keyframe_mode_due())
+        with self.frame_lock:
+            self.ffmpeg_process = new_process
+            self._last_frame_update_time = time.time()
+        self.stats["ffmpeg_restarts"] += 1
+        if self.keyframe_only != was_keyframe_only:
+            self.stats["decode_mode_switches"] += 1
+        
+        if old_process:
+            self.stats["decoder_cpu_time"] += _process_cpu_seconds(old_process.pid)
+            try:
+                old_process.stdout.close()
+                old_process.stderr.close()
+            except Exception:
+                pass
+            try:
+                old_process.kill()
+                old_process.wait(timeout=3)
+            except Exception:
+                pass
+        return new_process
+    
     def _start_opencv(self) -> bool:
         """使用 OpenCV 软件解码启动"""
         try:
-            # 设置 RTSP 超时参数（通过环境变量传递给 FFmpeg 后端）
-            import os
-            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp|timeout;3000000'
-            
-            self.cap = cv2.VideoCapture(self.stream_url, cv2.CAP_FFMPEG)
+            if is_synthetic_url(self.stream_url):
+                # 合成视频源，接口与VideoCapture一致
+                self.cap = SyntheticFrameSource.from_url(self.stream_url)
+            else:
+                # 设置 RTSP 超时参数（通过环境变量传递给 FFmpeg 后端）
+                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp|timeout;3000000'
+                
+                self.cap = cv2.VideoCapture(self.stream_url, cv2.CAP_FFMPEG)
             if not self.cap.isOpened():
                 logger.error(f"无法打开视频流: {self.stream_url}")
                 return False
             
+            # 本地文件没有实时节拍，按原始帧率读取，与实时流行为一致
+            if self.pace_local_files and os.path.isfile(self.stream_url):
+                source_fps = self.cap.get(cv2.CAP_PROP_FPS)
+                self._source_interval = 1.0 / source_fps if source_fps and source_fps > 0 else 1.0 / 25
+            
             # 获取实际分辨率
-            self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.source_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.source_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.width, self.height = self._compute_scaled_size(
+                self.source_width, self.source_height, self.output_size)
                 
             # 设置缓冲区为1以减少延迟
             self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
@@ -293,59 +726,96 @@ class ThreadedFrameReader:
             except:
                 pass
     
-    def _monitor_ffmpeg_process(self):
-        """监控 FFmpeg 进程状态"""
-        no_new_frame_timeout = 5.0  # 5秒没有新帧认为流断开
+    def _no_frame_timeout(self) -> float:
+        """多长时间没有新帧认为流断开（秒），关键帧解码时两帧之间相隔一个GOP"""
+        if self._keyframe_mode_due() and self.gop_duration:
+            return max(5.0, self.gop_duration * 2 + 2.0)
+        return 5.0
+    
+    def check_health(self) -> bool:
+        """
+        检查读取器状态，由 FrameReaderManager 的监督线程对所有读取器按统一节拍调用（不再为每个读取器启动监控线程）
         
-        while self.running and self.ffmpeg_process:
-            time.sleep(0.5)
-            
-            # 使用局部变量避免竞态条件（其他线程可能将 ffmpeg_process 设为 None）
-            process = self.ffmpeg_process
-            if process is None:
-                break
-            
-            # 检查进程是否退出
-            if process.poll() is not None:
-                logger.warning("FFmpeg 进程已退出，流已断开")
-                self._force_stop_ffmpeg()
-                break
-            
-            # 检查是否长时间没有新帧（通过 _last_frame_update_time 判断）
-            with self.frame_lock:
-                last_update = getattr(self, '_last_frame_update_time', time.time())
-            
-            if time.time() - last_update > no_new_frame_timeout:
-                logger.warning(f"FFmpeg 超过{no_new_frame_timeout}秒没有新帧，认为流已断开")
-                self._force_stop_ffmpeg()
-                break
+        FFmpeg进程退出或长时间没有新帧时强制停止，关闭管道让阻塞在读取上的读取线程立即返回。
+        
+        Returns:
+            读取器是否仍在运行
+        """
+        if not self.running:
+            return False
         
-        logger.info("FFmpeg 监控线程已退出")
+        # 使用局部变量避免竞态条件（其他线程可能将 ffmpeg_process 设为 None）
+        process = self.ffmpeg_process
+        if process is None:
+            # OpenCV 解码：读取线程退出时会清除 running
+            return True
+        
+        # 检查进程是否退出（调整fps档位时被替换的旧进程除外）
+        if process.poll() is not None:
+            if process is not self.ffmpeg_process:
+                return True
+            logger.warning("FFmpeg 进程已退出，流已断开")
+            self._force_stop_ffmpeg()
+            return False
+        
+        # 检查是否长时间没有新帧（通过 _last_frame_update_time 判断）
+        with self.frame_lock:
+            last_update = getattr(self, '_last_frame_update_time', time.time())
+        
+        no_new_frame_timeout = self._no_frame_timeout()
+        if time.time() - last_update > no_new_frame_timeout:
+            logger.warning(f"FFmpeg 超过{no_new_frame_timeout}秒没有新帧，认为流已断开")
+            self._force_stop_ffmpeg()
+            return False
+        return True
     
     def _read_frames_ffmpeg(self):
         """FFmpeg NVDEC 帧读取线程"""
-        frame_size = self.width * self.height * 3
+        width, height = self.width, self.height
+        frame_size = width * height * 3
         
-        # 初始化帧更新时间
+        # 初始化帧更新时间（进程退出和断流由 check_health 检测）
         self._last_frame_update_time = time.time()
         
-        # 启动监控线程
-        monitor_thread = threading.Thread(target=self._monitor_ffmpeg_process, daemon=True)
-        monitor_thread.start()
-        
-        while self.running and self.ffmpeg_process:
+        process = self.ffmpeg_process
+        buffer = None  # 当前写入的帧槽，未发布的帧槽留给下一帧继续使用
+        while self.running and process:
             try:
-                # 从 FFmpeg stdout 读取原始帧数据
-                raw_frame = self.ffmpeg_process.stdout.read(frame_size)
+                # 订阅者帧间隔或输入尺寸变化导致滤镜变化时重启FFmpeg
+                if self._ffmpeg_restart_due():
+                    process = self._restart_ffmpeg()
+                    width, height = self.width, self.height
+                    frame_size = width * height * 3
+                    if buffer is not None:
+                        self.frame_ring.discard(buffer)
+                        buffer = None
+                    continue
+                
+                # 从 FFmpeg stdout 直接读入帧槽，不经过中间bytes对象
+                if buffer is None:
+                    buffer = self.frame_ring.acquire((height, width, 3))
+                bytes_read = process.stdout.readinto(buffer) or 0
                 if not self.running:
                     # 被监控线程终止
                     break
-                if len(raw_frame) == frame_size:
-                    frame = np.frombuffer(raw_frame, dtype=np.uint8).reshape((self.height, self.width, 3))
+                self.stats["pipe_bytes"] += bytes_read
+                if bytes_read == frame_size:
+                    self.stats["frames_grabbed"] += 1
+                    now = time.time()
+                    if not self._take_output_slot(now):
+                        # fps档位高于所需帧率时，多余的帧不发布，帧槽留给下一帧
+                        with self.frame_lock:
+                            self._last_frame_update_time = now
+                        continue
+                    frame, generation = self.frame_ring.publish(buffer, now)
+                    buffer = None
                     with self.frame_lock:
-                        self.latest_frame = frame.copy()
-                        self._last_frame_update_time = time.time()  # 更新帧时间戳
-                elif len(raw_frame) == 0:
+                        self.latest_frame = frame
+                        self.frame_generation = generation
+                        self.frame_capture_time = now
+                        self._last_frame_update_time = now  # 更新帧时间戳
+                    self.stats["frames_retrieved"] += 1
+                elif bytes_read == 0:
                     # FFmpeg 进程已退出或流结束
                     logger.warning("FFmpeg 输出流已关闭")
                     self.running = False
@@ -359,6 +829,8 @@ class ThreadedFrameReader:
                     logger.error(f"FFmpeg读取帧出错: {str(e)}")
                 break
         
+        if buffer is not None:
+            self.frame_ring.discard(buffer)
         logger.info("FFmpeg 帧读取线程已退出")
     
     def _read_frames_opencv(self):
@@ -368,12 +840,31 @@ class ThreadedFrameReader:
         
         while self.running:
             try:
+                if self._keyframe_mode_due() and self._switch_to_keyframe_decode():
+                    # 之后由FFmpeg关键帧解码读取（订阅间隔变小时FFmpeg切回全帧解码）
+                    self._read_frames_ffmpeg()
+                    return
+                
                 if self.cap and self.cap.isOpened():
-                    ret, frame = self.cap.read()
+                    cpu_start = time.thread_time()
+                    if self._source_interval > 0:
+                        wait = self._next_grab_time - time.time()
+                        if wait > 0:
+                            time.sleep(wait)
+                        self._next_grab_time = max(self._next_grab_time, time.time() - self._source_interval) \
+                            + self._source_interval
+                    
+                    # 每帧都grab以跟上流，只有到输出时间的帧才retrieve（颜色转换）并写入帧槽
+                    ret = self.cap.grab()
+                    grab_time = time.time()
+                    published = False
+                    if ret and self._take_output_slot(grab_time):
+                        ret, published = self._retrieve_to_ring(grab_time)
+                    self.stats["decoder_cpu_time"] += time.thread_time() - cpu_start
                     if ret:
-                        # 只保留最新帧，线程安全更新
-                        with self.frame_lock:
-                            self.latest_frame = frame.copy()
+                        self.stats["frames_grabbed"] += 1
+                        if published:
+                            self.stats["frames_retrieved"] += 1
                         consecutive_failures = 0  # 重置失败计数
                     else:
                         # 读取失败
@@ -401,27 +892,205 @@ class ThreadedFrameReader:
         
         logger.info("OpenCV 帧读取线程已退出")
     
+    def _switch_to_keyframe_decode(self) -> bool:
+        """OpenCV解码切换为FFmpeg关键帧解码（OpenCV无法跳过非关键帧的解码）"""
+        try:
+            process = self._spawn_ffmpeg(None, keyframe_only=True)
+        except Exception as e:
+            logger.warning(f"启动FFmpeg关键帧解码失败，继续使用OpenCV全帧解码: {e}")
+            self.keyframe_decode = False
+            return False
+        with self.frame_lock:
+            self.ffmpeg_process = process
+            cap, self.cap = self.cap, None
+            self._full_frames.clear()
+        if cap:
+            cap.release()
+        self.stats["decode_mode_switches"] += 1
+        return True
+    
+    def _retrieve_to_ring(self, capture_time: float) -> Tuple[bool, bool]:
+        """
+        OpenCV解码当前帧并发布到帧环形缓冲区
+        
+        不缩放时retrieve直接写入帧槽；缩放时原图由retrieve新分配（保留引用供预警截图），缩放结果写入帧槽。
+        
+        Args:
+            capture_time: 该帧grab完成的时间，作为帧的采集时间
+        
+        Returns:
+            (是否解码成功, 是否发布了新帧)
+        """
+        width, height = self.width, self.height
+        buffer = self.frame_ring.acquire((height, width, 3))
+        full_frame = None
+        try:
+            if (width, height) == (self.source_width, self.source_height):
+                ret, frame = self.cap.retrieve(buffer)
+                if ret and frame is not buffer:
+                    # 实际解码尺寸与探测结果不一致时retrieve会另行分配，按实际尺寸重新取帧槽
+                    self.frame_ring.discard(buffer)
+                    self.source_width, self.source_height = frame.shape[1], frame.shape[0]
+                    self.width, self.height = self._compute_scaled_size(
+                        self.source_width, self.source_height, self.output_size)
+                    buffer = self.frame_ring.acquire(frame.shape)
+                    np.copyto(buffer, frame)
+                    self.stats["bytes_copied"] += frame.nbytes
+            else:
+                ret, full_frame = self.cap.retrieve()
+                if ret:
+                    cv2.resize(full_frame, (width, height), dst=buffer, interpolation=cv2.INTER_AREA)
+            if not ret:
+                self.frame_ring.discard(buffer)
+                return False, False
+        except Exception:
+            self.frame_ring.discard(buffer)
+            raise
+        
+        frame, generation = self.frame_ring.publish(buffer, capture_time)
+        with self.frame_lock:
+            self.latest_frame = frame
+            if full_frame is not None:
+                self._full_frames.append((generation, full_frame))
+            else:
+                self._full_frames.clear()
+            self.frame_generation = generation
+            self.frame_capture_time = capture_time
+        return True, True
+    
     def get_latest_frame(self) -> Optional[np.ndarray]:
-        """获取最新帧"""
+        """获取最新帧（只读视图）"""
+        return self.get_latest_frame_with_generation()[0]
+    
+    def get_latest_frame_with_generation(self) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """
+        获取最新帧及其代次
+        
+        返回帧环形缓冲区中帧槽的只读视图，不做拷贝；持有期间该帧槽不会被复用。
+        需要修改帧内容（绘制等）的调用方应自行拷贝。
+        """
+        frame, info = self.get_latest_frame_with_info()
+        return frame, info.generation if info else None
+    
+    def get_latest_frame_with_info(self) -> Tuple[Optional[np.ndarray], Optional[FrameInfo]]:
+        """获取最新帧（只读视图）及其采集信息（代次和采集时间）"""
         try:
             # 检查读取器是否还在运行
             if not self.running:
                 # 读取器已停止，清空缓存并返回 None
                 with self.frame_lock:
                     self.latest_frame = None
-                return None
+                return None, None
             
             with self.frame_lock:
                 if self.latest_frame is not None:
-                    return self.latest_frame.copy()
-                return None
+                    return self.latest_frame, FrameInfo(self.frame_generation, self.frame_capture_time)
+                return None, None
         except Exception as e:
             logger.error(f"获取最新帧时出错: {str(e)}")
+            return None, None
+    
+    def get_full_resolution_frame(self, generation: Optional[int] = None,
+                                  allow_later: bool = False) -> Optional[np.ndarray]:
+        """
+        获取原始分辨率的帧（用于预警截图）
+        
+        未缩放时即最新帧；OpenCV缩放解码返回缓存的原图；FFmpeg缩放解码的管道中没有原图，
+        临时启动一次FFmpeg重新抓取一帧，耗时可能达数秒（需等待关键帧），应在预警线程中调用。
+        
+        Args:
+            generation: 指定时只返回该帧代次的原图（缓存中没有时返回None，不重新抓帧），
+                保证截图与检测框属于同一帧；为None时返回最新的原图
+            allow_later: 指定帧代次但缓存中没有时（FFmpeg缩放解码总是如此），改为返回之后的原图
+                （最新的缓存原图或重新抓帧），调用方需将截图标记为检测帧之后的帧
+        
+        Returns:
+            原始分辨率的BGR图像（前两种情况为只读视图），获取失败时返回None
+        """
+        if not self.running:
+            return None
+        with self.frame_lock:
+            for full_generation, cached in reversed(self._full_frames):
+                if generation is None or full_generation == generation:
+                    full_frame = cached.view()
+                    full_frame.flags.writeable = False
+                    return full_frame
+            if not self.is_scaled and (generation is None or generation == self.frame_generation):
+                return self.latest_frame
+            if generation is not None:
+                if not allow_later or not self.is_scaled:
+                    return None
+                if self._full_frames:
+                    full_frame = self._full_frames[-1][1].view()
+                    full_frame.flags.writeable = False
+                    return full_frame
+        if self.ffmpeg_process is None:
             return None
+        return self._grab_full_resolution_frame()
+    
+    def _grab_full_resolution_frame(self) -> Optional[np.ndarray]:
+        """临时启动FFmpeg（软件解码，不占用NVDEC会话）从流中抓取一帧原始分辨率图像"""
+        import subprocess
+        
+        width, height = self.source_width, self.source_height
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+        if self.stream_url.startswith('rtsp://'):
+            cmd += ['-rtsp_transport', 'tcp', '-timeout', '3000000']
+        cmd += [
+            '-i', self.stream_url,
+            '-frames:v', '1',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-an', '-sn',
+            '-'
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=_FULL_RESOLUTION_GRAB_TIMEOUT)
+            if len(result.stdout) < width * height * 3:
+                stderr = result.stderr.decode('utf-8', errors='ignore')
+                logger.warning(f"全分辨率抓帧失败: {stderr[-200:]}")
+                return None
+            self.stats["full_resolution_grabs"] += 1
+            return np.frombuffer(result.stdout, dtype=np.uint8, count=width * height * 3) \
+                .reshape((height, width, 3)).copy()
+        except subprocess.TimeoutExpired:
+            logger.warning(f"全分辨率抓帧超时（{_FULL_RESOLUTION_GRAB_TIMEOUT}s）: {self.stream_url}")
+            return None
+        except Exception as e:
+            logger.warning(f"全分辨率抓帧失败: {e}")
+            return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取解码统计信息（含解码模式、已解码帧数和解码CPU占用）"""
+        process = self.ffmpeg_process
+        if process is None:
+            decoder = "OpenCV"
+        elif self.keyframe_only:
+            decoder = "FFmpeg-keyframe"
+        else:
+            decoder = "NVDEC" if self.use_nvdec and self._ffmpeg_decoder else "FFmpeg"
+        decoder_cpu_time = self.stats["decoder_cpu_time"] + (_process_cpu_seconds(process.pid) if process else 0.0)
+        uptime = time.time() - self._started_at if self._started_at else 0.0
+        return {
+            **self.stats,
+            "decoder": decoder,
+            "decode_mode": "keyframe" if self.keyframe_only else "full",
+            "gop_duration": self.gop_duration,
+            "decoder_cpu_time": decoder_cpu_time,
+            "decoder_cpu_percent": decoder_cpu_time / uptime * 100 if uptime > 0 else 0.0,
+            "decode_fps": self.stats["frames_grabbed"] / uptime if uptime > 0 else 0.0,
+            "frame_interval": self.frame_interval,
+            "output_fps": 1.0 / self._output_interval if self._output_interval > 0 else None,
+            "ffmpeg_fps": self._ffmpeg_fps,
+            "source_resolution": (self.source_width, self.source_height),
+            "output_resolution": (self.width, self.height),
+            "frame_ring": self.frame_ring.get_stats(),
+        }
     
     def _stop_ffmpeg(self):
         """停止 FFmpeg 进程"""
         if self.ffmpeg_process:
+            self.stats["decoder_cpu_time"] += _process_cpu_seconds(self.ffmpeg_process.pid)
             try:
                 self.ffmpeg_process.terminate()
                 self.ffmpeg_process.wait(timeout=3)
@@ -445,7 +1114,8 @@ class ThreadedFrameReader:
 class SharedFrameReader:
     """共享帧读取器 - 为多个任务提供同一摄像头的帧数据"""
     
-    def __init__(self, camera_id: int, connection_overhead_threshold: float = 30.0):
+    def __init__(self, camera_id: int, connection_overhead_threshold: float = 30.0,
+                 mode_selector: Optional[FrameModeSelector] = None):
         self.camera_id = camera_id
         self.connection_overhead_threshold = connection_overhead_threshold
         
@@ -453,10 +1123,12 @@ class SharedFrameReader:
         self.ref_count = 0
         self.subscribers: Set[int] = set()  # 存储订阅者的哈希ID
         self.subscriber_intervals: Dict[int, float] = {}  # 存储每个订阅者的帧间隔需求
+        self.subscriber_input_sizes: Dict[int, Optional[Tuple[int, int]]] = {}  # 每个订阅者所需的输入尺寸，None表示需要原图
         self.lock = threading.RLock()
         
         # 当前工作参数
         self.current_frame_interval = None  # 当前使用的最小帧间隔
+        self.current_output_size = None  # 当前输出尺寸（所有订阅者所需的最大输入尺寸），None表示原始分辨率
         
         # 帧读取组件
         self.threaded_reader = None
@@ -470,18 +1142,56 @@ class SharedFrameReader:
             "failed_requests": 0,
             "avg_request_time": 0.0,
             "last_request_time": 0.0,
-            "subscribers_count": 0
+            "subscribers_count": 0,
+            "restarts": 0,           # 断流后由监督线程重启的次数
+            "restart_failures": 0,
         }
         
         # 最后访问时间，用于清理
         self.last_access_time = time.time()
+        
+        # 断流重启状态（由 FrameReaderManager 的监督线程维护），连续失败时按指数退避推迟下次重启
+        self.restart_pending = False
+        self.consecutive_restart_failures = 0
+        self.next_restart_time = 0.0
+        
+        # 取帧模式代价模型：实测截图耗时、拉流启动耗时和解码CPU，据此选择模式（由管理器按摄像头保留，读取器重建后沿用）
+        self.mode_selector = mode_selector or FrameModeSelector(camera_id, connection_overhead_threshold)
+        self.mode_job_pending = False      # 监督线程已提交的模式切换或试截图尚未完成
+        self._decode_sample: Optional[Tuple[float, float]] = None  # 上次采样的 (解码累计CPU时间, 时间)
+    
+    def _compute_output_size(self) -> Optional[Tuple[int, int]]:
+        """所有订阅者所需的最大输入尺寸，任一订阅者需要原图时返回None"""
+        sizes = list(self.subscriber_input_sizes.values())
+        if not sizes or any(size is None for size in sizes):
+            return None
+        return max(size[0] for size in sizes), max(size[1] for size in sizes)
+    
+    def _update_output_size(self):
+        """订阅者变化后重新计算输出尺寸，持续连接模式下通知解码器"""
+        output_size = self._compute_output_size()
+        if output_size == self.current_output_size:
+            return
+        logger.info(f"摄像头 {self.camera_id} 输出尺寸从 {self.current_output_size} 调整为 {output_size}")
+        self.current_output_size = output_size
+        if self.mode == "persistent" and self.threaded_reader:
+            self.threaded_reader.set_output_size(output_size)
     
-    def add_subscriber(self, subscriber_id: int, frame_interval: float) -> bool:
-        """添加订阅者（支持最小间隔优先策略）"""
+    def add_subscriber(self, subscriber_id: int, frame_interval: float,
+                       input_size: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        添加订阅者（支持最小间隔优先策略）
+        
+        Args:
+            subscriber_id: 订阅者ID
+            frame_interval: 订阅者所需的帧间隔（秒）
+            input_size: 订阅者所需的最大输入尺寸 (宽, 高)，None表示需要原始分辨率
+        """
         with self.lock:
             was_empty = len(self.subscribers) == 0
             self.subscribers.add(subscriber_id)
             self.subscriber_intervals[subscriber_id] = frame_interval
+            self.subscriber_input_sizes[subscriber_id] = tuple(input_size) if input_size else None
             self.ref_count += 1
             self.stats["subscribers_count"] = len(self.subscribers)
             self.last_access_time = time.time()
@@ -493,10 +1203,12 @@ class SharedFrameReader:
             
             if was_empty:
                 # 第一个订阅者，需要启动帧读取器
+                self.current_output_size = self._compute_output_size()
                 if not self._start_reading(new_min_interval):
                     # 启动失败，回滚订阅者添加
                     self.subscribers.discard(subscriber_id)
                     self.subscriber_intervals.pop(subscriber_id, None)
+                    self.subscriber_input_sizes.pop(subscriber_id, None)
                     self.ref_count = max(0, self.ref_count - 1)
                     self.stats["subscribers_count"] = len(self.subscribers)
                     logger.error(f"摄像头 {self.camera_id} 帧读取器启动失败，已移除订阅者 {subscriber_id}")
@@ -508,12 +1220,16 @@ class SharedFrameReader:
                     # 之前的订阅者启动失败，当前共享读取器不可用
                     self.subscribers.discard(subscriber_id)
                     self.subscriber_intervals.pop(subscriber_id, None)
+                    self.subscriber_input_sizes.pop(subscriber_id, None)
                     self.ref_count = max(0, self.ref_count - 1)
                     self.stats["subscribers_count"] = len(self.subscribers)
                     logger.error(f"摄像头 {self.camera_id} 共享读取器不可用(mode=None)，拒绝订阅者 {subscriber_id}")
                     return False
-                # 检查是否需要调整模式
-                return self._maybe_adjust_mode(new_min_interval)
+                # 检查是否需要调整模式和输出尺寸
+                if not self._maybe_adjust_mode(new_min_interval):
+                    return False
+                self._update_output_size()
+                return True
     
     def remove_subscriber(self, subscriber_id: int):
         """移除订阅者（支持最小间隔优先策略）"""
@@ -522,6 +1238,7 @@ class SharedFrameReader:
                 self.subscribers.remove(subscriber_id)
                 # 移除订阅者的间隔记录
                 removed_interval = self.subscriber_intervals.pop(subscriber_id, None)
+                self.subscriber_input_sizes.pop(subscriber_id, None)
                 self.ref_count = max(0, self.ref_count - 1)
                 self.stats["subscribers_count"] = len(self.subscribers)
                 self.last_access_time = time.time()
@@ -538,50 +1255,83 @@ class SharedFrameReader:
                     if new_min_interval != self.current_frame_interval:
                         logger.info(f"摄像头 {self.camera_id} 最小间隔从 {self.current_frame_interval}s 调整为 {new_min_interval}s")
                         self._maybe_adjust_mode(new_min_interval)
+                    self._update_output_size()
+    
+    def _select_mode(self, frame_interval: float, trigger: str) -> str:
+        """选择取帧模式：启用代价模式时按实测代价（含滞回），否则按连接开销阈值"""
+        from app.core.config import settings
+        if settings.ADAPTIVE_FRAME_COST_MODE_ENABLED:
+            return self.mode_selector.choose(frame_interval, self.mode, trigger)["mode"]
+        return ON_DEMAND if frame_interval >= self.connection_overhead_threshold else PERSISTENT
     
     def _start_reading(self, frame_interval: float) -> bool:
-        """启动帧读取"""
+        """启动帧读取，所选模式启动失败时回退到另一可行的模式"""
         try:
             # 记录当前工作间隔
             self.current_frame_interval = frame_interval
+            self.mode = None
             
-            # 确定工作模式
-            if frame_interval >= self.connection_overhead_threshold:
-                # 低帧率：使用截图模式，但先验证截图功能可用
-                logger.info(f"摄像头 {self.camera_id} 尝试启动按需截图模式，间隔: {frame_interval}s")
-                
-                # 测试截图是否可用
-                test_frame = self._get_snapshot_frame()
-                if test_frame is None:
-                    logger.error(f"摄像头 {self.camera_id} 截图模式启动失败，无法获取截图")
-                    self.mode = None
-                    return False
-                
-                self.mode = "on_demand"
-                logger.info(f"摄像头 {self.camera_id} ✅ 按需截图模式已启动")
+            mode = self._select_mode(frame_interval, "start")
+            if self._start_mode(mode, frame_interval):
                 return True
-            else:
-                # 高帧率：必须使用持续连接模式
-                if self._try_start_persistent_mode():
+            
+            # 启动失败已计入代价模型（该模式暂不可行），重新选择
+            from app.core.config import settings
+            if settings.ADAPTIVE_FRAME_COST_MODE_ENABLED:
+                fallback = self.mode_selector.choose(frame_interval, None, "fallback")["mode"]
+                if fallback != mode and self._start_mode(fallback, frame_interval):
                     return True
-                
-                # 持续连接模式启动失败，直接返回失败（不回退到截图模式）
-                logger.error(f"摄像头 {self.camera_id} 持续连接模式启动失败，高帧率任务无法使用截图模式")
-                self.mode = None
-                return False
+            self.mode = None
+            return False
                 
         except Exception as e:
             logger.error(f"启动摄像头 {self.camera_id} 共享帧读取器失败: {str(e)}")
             self.mode = None
             return False
     
+    def _start_mode(self, mode: str, frame_interval: float) -> bool:
+        """以指定模式启动帧读取"""
+        if mode == ON_DEMAND:
+            # 按需截图模式，先验证截图功能可用
+            logger.info(f"摄像头 {self.camera_id} 尝试启动按需截图模式，间隔: {frame_interval}s")
+            
+            # 测试截图是否可用
+            test_frame = self._get_snapshot_frame()
+            if test_frame is None:
+                logger.error(f"摄像头 {self.camera_id} 截图模式启动失败，无法获取截图")
+                return False
+            
+            self.mode = ON_DEMAND
+            from app.core.config import settings
+            if settings.SNAPSHOT_PREFETCH_ENABLED:
+                # 按订阅者的取帧截止时间提前截图，启动时的测试截图直接提供给第一次取帧
+                snapshot_prefetcher.register(self.camera_id, self._fetch_snapshot, frame_interval,
+                                             test_frame, next(_frame_generation_counter))
+            self.mode_selector.mark_switched()
+            logger.info(f"摄像头 {self.camera_id} ✅ 按需截图模式已启动")
+            return True
+        
+        if self._try_start_persistent_mode():
+            self.mode_selector.mark_switched()
+            return True
+        logger.error(f"摄像头 {self.camera_id} 持续连接模式启动失败")
+        return False
+    
     def _try_start_persistent_mode(self) -> bool:
-        """尝试启动持续连接模式"""
+        """尝试启动持续连接模式，启动耗时和成败计入代价模型"""
+        start_time = time.time()
+        started = self._start_persistent_reader()
+        self.mode_selector.record_stream_start(time.time() - start_time, started)
+        self._decode_sample = None
+        return started
+    
+    def _start_persistent_reader(self) -> bool:
         try:
             logger.info(f"摄像头 {self.camera_id} 尝试启动持续连接模式，间隔: {self.current_frame_interval}s")
             
-            # 获取流播放信息
-            play_info = wvp_client.play_channel(self.camera_id)
+            # 获取流播放信息（已指定流地址时直接使用）
+            play_info = {"rtsp": _stream_url_overrides[self.camera_id]} \
+                if self.camera_id in _stream_url_overrides else wvp_client.play_channel(self.camera_id)
             if not play_info:
                 logger.warning(f"摄像头 {self.camera_id} 无法获取流播放信息")
                 return False
@@ -602,7 +1352,10 @@ class SharedFrameReader:
             logger.info(f"摄像头 {self.camera_id} 共享流地址: {self.stream_url}")
             
             # 启动ThreadedFrameReader
-            self.threaded_reader = ThreadedFrameReader(self.stream_url)
+            from app.core.config import settings
+            self.threaded_reader = ThreadedFrameReader(self.stream_url, frame_interval=self.current_frame_interval,
+                                                       output_size=self.current_output_size,
+                                                       keyframe_decode=settings.ADAPTIVE_FRAME_KEYFRAME_DECODE)
             if not self.threaded_reader.start():
                 logger.warning(f"摄像头 {self.camera_id} ThreadedFrameReader启动失败")
                 self.threaded_reader = None
@@ -631,24 +1384,24 @@ class SharedFrameReader:
                 return True
             
             # 计算新的工作模式
-            new_mode = "on_demand" if new_min_interval >= self.connection_overhead_threshold else "persistent"
+            new_mode = self._select_mode(new_min_interval, "interval_change")
             
-            # 如果模式需要改变，重启帧读取器
+            # 如果模式需要改变，切换帧读取器
             if new_mode != self.mode:
                 logger.info(f"摄像头 {self.camera_id} 需要从 {self.mode} 模式切换到 {new_mode} 模式")
-                self._stop_reading()
-                return self._start_reading(new_min_interval)
+                return self._switch_mode(new_mode, new_min_interval)
             else:
                 # 模式不变，但间隔改变，更新持续连接模式的间隔
                 if self.mode == "persistent" and self.threaded_reader:
                     logger.info(f"摄像头 {self.camera_id} 持续连接模式间隔从 {self.current_frame_interval}s 调整为 {new_min_interval}s")
                     self.current_frame_interval = new_min_interval
-                    self.threaded_reader.frame_interval = new_min_interval
+                    self.threaded_reader.set_frame_interval(new_min_interval)
                     return True
                 elif self.mode == "on_demand":
                     # 按需模式下，只需要更新记录的间隔
                     logger.info(f"摄像头 {self.camera_id} 按需模式间隔从 {self.current_frame_interval}s 调整为 {new_min_interval}s")
                     self.current_frame_interval = new_min_interval
+                    snapshot_prefetcher.update_interval(self.camera_id, new_min_interval)
                     return True
                 else:
                     # 其他情况，重启
@@ -659,6 +1412,63 @@ class SharedFrameReader:
             logger.error(f"摄像头 {self.camera_id} 调整模式失败: {str(e)}", exc_info=True)
             return False
     
+    def _switch_mode(self, new_mode: str, frame_interval: float) -> bool:
+        """停止当前模式并以新模式启动，失败时恢复原模式"""
+        old_mode = self.mode
+        self._stop_reading()
+        self.mode = None
+        self.current_frame_interval = frame_interval
+        if self._start_mode(new_mode, frame_interval):
+            return True
+        logger.warning(f"摄像头 {self.camera_id} 切换到 {new_mode} 模式失败，恢复 {old_mode} 模式")
+        if old_mode and self._start_mode(old_mode, frame_interval):
+            return True
+        self.mode = None
+        return False
+    
+    def reevaluate_mode(self) -> Optional[str]:
+        """
+        定期复查取帧模式（由 FrameReaderManager 的监督线程调用）：先采样解码CPU，再按代价模型决策
+        
+        Returns:
+            需要切换到的模式，无需切换时为None
+        """
+        if self.mode is None or not self.subscribers or self.current_frame_interval is None:
+            return None
+        self.sample_decode_cost()
+        decision = self.mode_selector.choose(self.current_frame_interval, self.mode, "periodic")
+        return decision["mode"] if decision["switch"] else None
+    
+    def apply_mode(self, new_mode: str) -> bool:
+        """执行定期复查决定的模式切换（在监督线程的工作线程池中执行）"""
+        with self.lock:
+            if self.mode is None or self.mode == new_mode or not self.subscribers:
+                return True
+            logger.info(f"摄像头 {self.camera_id} 按实测代价从 {self.mode} 模式切换到 {new_mode} 模式")
+            return self._switch_mode(new_mode, self.current_frame_interval)
+    
+    def sample_decode_cost(self):
+        """持续连接模式下采样解码CPU占用（两次采样之间的解码CPU时间 / 经过时间）"""
+        reader = self.threaded_reader
+        if self.mode != PERSISTENT or reader is None:
+            return
+        stats = reader.get_stats()
+        now = time.time()
+        previous, self._decode_sample = self._decode_sample, (stats["decoder_cpu_time"], now)
+        if previous is not None:
+            self.mode_selector.record_decode(stats["decode_mode"], stats["decoder_cpu_time"] - previous[0],
+                                             now - previous[1], stats.get("gop_duration"))
+    
+    def needs_snapshot_probe(self) -> bool:
+        """持续连接模式下是否需要试截一张图以实测截图耗时"""
+        interval = self.current_frame_interval
+        return bool(self.subscribers) and interval is not None \
+            and self.mode_selector.needs_snapshot_probe(interval, self.mode)
+    
+    def probe_snapshot(self):
+        """试截一张图，截图耗时计入代价模型"""
+        self._get_snapshot_frame()
+    
     def _stop_reading(self):
         """停止帧读取"""
         try:
@@ -667,13 +1477,60 @@ class SharedFrameReader:
                 self.threaded_reader = None
                 logger.info(f"摄像头 {self.camera_id} 共享持续连接模式已停止")
             else:
+                snapshot_prefetcher.unregister(self.camera_id)
                 logger.info(f"摄像头 {self.camera_id} 共享按需截图模式已停止")
                 
         except Exception as e:
             logger.error(f"停止摄像头 {self.camera_id} 共享帧读取器失败: {str(e)}")
     
+    def needs_restart(self) -> bool:
+        """
+        健康检查（由 FrameReaderManager 的监督线程调用）
+        
+        Returns:
+            持续连接模式下仍有订阅者但读取器已断开（或上次重启失败），需要重启
+        """
+        if self.mode != "persistent" or not self.subscribers:
+            return False
+        reader = self.threaded_reader
+        if reader is None:
+            return True
+        return not reader.check_health()
+    
+    def restart(self) -> bool:
+        """重新获取流地址并重启持续连接模式的读取器"""
+        with self.lock:
+            if self.mode != "persistent" or not self.subscribers:
+                return True
+            logger.info(f"摄像头 {self.camera_id} 持续连接已断开，重启帧读取器")
+            self.stats["restarts"] += 1
+            self._stop_reading()
+            if self._try_start_persistent_mode():
+                return True
+            self.stats["restart_failures"] += 1
+            return False
+    
     def get_latest_frame(self) -> Optional[np.ndarray]:
         """获取最新帧"""
+        return self.get_latest_frame_with_generation()[0]
+    
+    def get_latest_frame_with_generation(self, frame_interval: Optional[float] = None
+                                         ) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """
+        获取最新帧及其代次
+        
+        持续连接模式下，订阅同一摄像头的任务拿到同一解码帧时代次相同，可据此复用推理结果；
+        按需模式下每次截图都是新的一帧（启用预取时同一次预取的截图代次相同）。
+        
+        Args:
+            frame_interval: 调用方的取帧间隔（秒），按需模式据此安排下一次预取，None表示使用最小订阅间隔
+        """
+        frame, info = self.get_latest_frame_with_info(frame_interval)
+        return frame, info.generation if info else None
+    
+    def get_latest_frame_with_info(self, frame_interval: Optional[float] = None
+                                   ) -> Tuple[Optional[np.ndarray], Optional[FrameInfo]]:
+        """获取最新帧及其采集信息（代次和采集时间），参数同 get_latest_frame_with_generation"""
         start_time = time.time()
         self.stats["total_requests"] += 1
         self.last_access_time = time.time()
@@ -684,36 +1541,45 @@ class SharedFrameReader:
                 if not self.threaded_reader:
                     logger.error(f"摄像头 {self.camera_id} 共享ThreadedFrameReader未初始化")
                     self.stats["failed_requests"] += 1
-                    return None
+                    return None, None
                 
-                frame = self.threaded_reader.get_latest_frame()
+                frame, info = self.threaded_reader.get_latest_frame_with_info()
                 if frame is not None:
                     self.stats["successful_requests"] += 1
                 else:
                     self.stats["failed_requests"] += 1
                     
-                return frame
+                return frame, info
                 
             elif self.mode == "on_demand":
-                # 按需模式：调用WVP截图接口
+                if snapshot_prefetcher.is_registered(self.camera_id):
+                    # 按需模式（预取）：截图已在取帧前提前完成，或等待进行中的截图
+                    frame, generation, capture_time = snapshot_prefetcher.get_frame(self.camera_id, frame_interval)
+                    if frame is not None:
+                        self.stats["successful_requests"] += 1
+                        return frame, FrameInfo(generation, capture_time)
+                    self.stats["failed_requests"] += 1
+                    return None, None
+                
+                # 按需模式：调用WVP截图接口（截图在请求期间完成，以请求发出时间作为采集时间）
                 frame = self._get_snapshot_frame()
                 if frame is not None:
                     self.stats["successful_requests"] += 1
-                else:
-                    self.stats["failed_requests"] += 1
-                    
-                return frame
+                    return frame, FrameInfo(next(_frame_generation_counter), start_time)
+                
+                self.stats["failed_requests"] += 1
+                return None, None
             
             else:
                 # mode 为 None，说明启动失败，不应该继续运行
                 logger.error(f"摄像头 {self.camera_id} 共享帧读取器未正确初始化 (mode={self.mode})")
                 self.stats["failed_requests"] += 1
-                return None
+                return None, None
                 
         except Exception as e:
             logger.error(f"获取摄像头 {self.camera_id} 共享帧数据失败: {str(e)}")
             self.stats["failed_requests"] += 1
-            return None
+            return None, None
             
         finally:
             # 更新性能统计
@@ -725,8 +1591,42 @@ class SharedFrameReader:
                 total_time = (self.stats["avg_request_time"] * (self.stats["total_requests"] - 1) + request_time)
                 self.stats["avg_request_time"] = total_time / self.stats["total_requests"]
     
+    def get_full_resolution_frame(self, generation: Optional[int] = None,
+                                  allow_later: bool = False) -> Optional[np.ndarray]:
+        """
+        获取原始分辨率的帧（用于预警截图）
+        
+        持续连接模式下由解码器提供（缩放解码时为缓存原图或重新抓帧）；按需模式下截图本身就是原始分辨率，
+        不指定帧代次时重新截取一张，指定时（新截图不是同一帧，检测帧本身已是原图）返回None。
+        
+        Args:
+            generation: 指定时只返回该帧代次的原图，见 ThreadedFrameReader.get_full_resolution_frame
+            allow_later: 没有该帧代次的原图时返回之后的原图，见 ThreadedFrameReader.get_full_resolution_frame
+        """
+        try:
+            if self.mode == "persistent":
+                reader = self.threaded_reader
+                return reader.get_full_resolution_frame(generation, allow_later) if reader else None
+            if self.mode == "on_demand":
+                return self._get_snapshot_frame() if generation is None else None
+            return None
+        except Exception as e:
+            logger.error(f"获取摄像头 {self.camera_id} 全分辨率帧失败: {str(e)}")
+            return None
+    
+    def _fetch_snapshot(self) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """预取调度器使用的截图函数，每次截图分配新的帧代次"""
+        frame = self._get_snapshot_frame()
+        return (frame, next(_frame_generation_counter)) if frame is not None else (None, None)
+    
     def _get_snapshot_frame(self) -> Optional[np.ndarray]:
-        """通过WVP一步到位截图接口获取帧"""
+        """通过WVP一步到位截图接口获取帧，截图耗时和成败计入代价模型"""
+        start_time = time.time()
+        frame = self._request_snapshot_frame()
+        self.mode_selector.record_snapshot(time.time() - start_time, frame is not None)
+        return frame
+    
+    def _request_snapshot_frame(self) -> Optional[np.ndarray]:
         try:
             # 直接获取截图数据
             image_data = wvp_client.get_channel_snap_stream(self.camera_id)
@@ -784,7 +1684,9 @@ class SharedFrameReader:
                     height, width = frame.shape[:2]
                     return width, height
             else:
-                frame = self._get_snapshot_frame()
+                frame = snapshot_prefetcher.peek_frame(self.camera_id)
+                if frame is None:
+                    frame = self._get_snapshot_frame()
                 if frame is not None:
                     height, width = frame.shape[:2]
                     return width, height
@@ -802,17 +1704,33 @@ class SharedFrameReader:
         if self.stats["total_requests"] > 0:
             success_rate = self.stats["successful_requests"] / self.stats["total_requests"]
         
-        return {
+        result = {
             "camera_id": self.camera_id,
             "mode": self.mode,
             "ref_count": self.ref_count,
             "subscribers_count": len(self.subscribers),
+            "current_frame_interval": self.current_frame_interval,
+            "current_output_size": self.current_output_size,
             "last_access_time": self.last_access_time,
+            "next_restart_time": self.next_restart_time if self.consecutive_restart_failures else None,
             "stats": {
                 **self.stats,
                 "success_rate": success_rate
             }
         }
+        
+        if self.subscribers:
+            result["mode_selection"] = self.mode_selector.get_stats(self.current_frame_interval)
+        
+        reader = self.threaded_reader
+        if self.mode == "persistent" and reader:
+            result["decoder"] = reader.get_stats()
+        elif self.mode == "on_demand":
+            prefetch_stats = snapshot_prefetcher.get_camera_stats(self.camera_id)
+            if prefetch_stats:
+                result["snapshot_prefetch"] = prefetch_stats
+        
+        return result
 
 
 class FrameReaderManager:
@@ -832,34 +1750,58 @@ class FrameReaderManager:
     def __init__(self):
         if not getattr(self, '_initialized', False):
             self.shared_readers: Dict[int, SharedFrameReader] = {}
+            self.mode_selectors: Dict[int, FrameModeSelector] = {}  # 各摄像头的取帧模式代价模型，读取器清理后保留实测值
             self.lock = threading.RLock()
-            self.cleanup_thread = None
+            self.supervisor_thread = None
             self.running = True
+            self._stop_event = threading.Event()
             self._initialized = True
             
-            # 启动清理线程
-            self._start_cleanup_thread()
+            # 断流重启：全局令牌桶限制重启速率，线程池限制同时进行的重启数，避免WVP故障恢复时所有摄像头同时重连
+            # 取帧模式切换和试截图同样交给该线程池执行，不阻塞监督线程
+            self._executor: Optional[ThreadPoolExecutor] = None
+            self._restart_tokens = 0.0
+            self._restart_tokens_time = time.time()
+            self.stats = {
+                "health_checks": 0,      # 监督线程的检查轮数
+                "restarts_scheduled": 0,
+                "restarts_succeeded": 0,
+                "restarts_failed": 0,
+                "restarts_waiting": 0,   # 最近一轮检查中因全局限速等待重启的读取器数
+                "mode_switches": 0,      # 定期复查按实测代价触发的模式切换
+                "mode_switch_failures": 0,
+                "snapshot_probes": 0,    # 持续连接模式下为实测截图耗时的试截图
+                "last_check_duration": 0.0,
+            }
+            
+            # 启动监督线程（健康检查、断流重启、空闲清理）
+            self._start_supervisor_thread()
             
             logger.info("全局帧读取器管理池已初始化")
     
     def get_frame_reader(self, camera_id: int, frame_interval: float, 
-                        connection_overhead_threshold: float = 30.0) -> Optional['SharedFrameReader']:
-        """获取或创建共享帧读取器"""
+                        connection_overhead_threshold: float = 30.0,
+                        input_size: Optional[Tuple[int, int]] = None) -> Optional['SharedFrameReader']:
+        """获取或创建共享帧读取器（input_size为订阅者所需的最大输入尺寸，None表示需要原图）"""
         # 生成唯一的订阅者ID，使用线程ID和对象ID确保唯一性
         subscriber_id = hash((threading.current_thread().ident, camera_id, id(object())))
         
         with self.lock:
             if camera_id not in self.shared_readers:
                 # 创建新的共享读取器
+                mode_selector = self.mode_selectors.get(camera_id)
+                if mode_selector is None:
+                    mode_selector = self.mode_selectors[camera_id] = FrameModeSelector(
+                        camera_id, connection_overhead_threshold)
                 self.shared_readers[camera_id] = SharedFrameReader(
-                    camera_id, connection_overhead_threshold
+                    camera_id, connection_overhead_threshold, mode_selector
                 )
                 logger.info(f"为摄像头 {camera_id} 创建新的共享帧读取器")
             
             shared_reader = self.shared_readers[camera_id]
             
             # 添加订阅者
-            if shared_reader.add_subscriber(subscriber_id, frame_interval):
+            if shared_reader.add_subscriber(subscriber_id, frame_interval, input_size):
                 # 在共享读取器上记录订阅者ID以便后续释放
                 if not hasattr(shared_reader, '_thread_subscribers'):
                     shared_reader._thread_subscribers = {}
@@ -888,41 +1830,154 @@ class FrameReaderManager:
                     # 如果没有订阅者了，删除共享读取器
                     if len(shared_reader.subscribers) == 0:
                         del self.shared_readers[camera_id]
+                        inference_cache.release_camera(camera_id)
                         logger.info(f"摄像头 {camera_id} 共享帧读取器已清理")
                 else:
                     logger.warning(f"无法找到线程 {thread_id} 对摄像头 {camera_id} 的订阅者ID")
     
-    def _start_cleanup_thread(self):
-        """启动清理线程"""
-        def cleanup_worker():
-            while self.running:
-                try:
-                    current_time = time.time()
-                    cameras_to_cleanup = []
-                    
-                    with self.lock:
-                        for camera_id, reader in self.shared_readers.items():
-                            # 清理超过5分钟无访问的读取器
-                            if (len(reader.subscribers) == 0 and 
-                                current_time - reader.last_access_time > 300):
-                                cameras_to_cleanup.append(camera_id)
-                    
-                    for camera_id in cameras_to_cleanup:
-                        with self.lock:
-                            if camera_id in self.shared_readers:
-                                self.shared_readers[camera_id]._stop_reading()
-                                del self.shared_readers[camera_id]
-                                logger.info(f"自动清理摄像头 {camera_id} 的共享帧读取器")
-                    
-                    time.sleep(60)  # 每分钟检查一次
-                    
-                except Exception as e:
-                    logger.error(f"清理线程出错: {str(e)}")
-                    time.sleep(60)
+    def _start_supervisor_thread(self):
+        """启动监督线程：所有读取器共用一个线程做健康检查，取代每个读取器的监控线程和独立的清理线程"""
+        self.supervisor_thread = threading.Thread(target=self._supervise, daemon=True, name="FrameReaderSupervisor")
+        self.supervisor_thread.start()
+        logger.info("帧读取器监督线程已启动")
+    
+    def _supervise(self):
+        from app.core.config import settings
         
-        self.cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        self.cleanup_thread.start()
-        logger.info("帧读取器清理线程已启动")
+        last_cleanup_time = time.time()
+        last_mode_eval_time = time.time()
+        while not self._stop_event.wait(settings.FRAME_READER_SUPERVISOR_INTERVAL):
+            try:
+                check_start = time.time()
+                with self.lock:
+                    readers = list(self.shared_readers.values())
+                due = []
+                for reader in readers:
+                    try:
+                        if not reader.restart_pending and reader.needs_restart() \
+                                and check_start >= reader.next_restart_time:
+                            due.append(reader)
+                    except Exception as e:
+                        logger.error(f"摄像头 {reader.camera_id} 健康检查出错: {str(e)}")
+                
+                # 从未重试过的读取器优先，其余按应重试的时间先后，避免退避较短的读取器反复占用重启名额
+                due.sort(key=lambda r: r.next_restart_time)
+                scheduled = 0
+                for reader in due:
+                    if not self._take_restart_token(settings):
+                        break
+                    self._schedule_restart(reader, settings)
+                    scheduled += 1
+                self.stats["health_checks"] += 1
+                self.stats["restarts_waiting"] = len(due) - scheduled
+                
+                if settings.ADAPTIVE_FRAME_COST_MODE_ENABLED \
+                        and check_start - last_mode_eval_time >= settings.ADAPTIVE_FRAME_MODE_EVAL_INTERVAL:
+                    last_mode_eval_time = check_start
+                    self._reevaluate_modes(readers, settings)
+                self.stats["last_check_duration"] = time.time() - check_start
+                
+                if check_start - last_cleanup_time >= 60:  # 每分钟清理一次
+                    last_cleanup_time = check_start
+                    self._cleanup_idle_readers(check_start)
+            except Exception as e:
+                logger.error(f"帧读取器监督线程出错: {str(e)}")
+        logger.info("帧读取器监督线程已退出")
+    
+    def _reevaluate_modes(self, readers, settings):
+        """按实测代价复查各读取器的取帧模式，需要切换或试截图时交给工作线程池"""
+        for reader in readers:
+            if reader.restart_pending or reader.mode_job_pending:
+                continue
+            try:
+                new_mode = reader.reevaluate_mode()
+                if new_mode is not None:
+                    self._submit_mode_job(reader, settings, self._apply_mode, reader, new_mode)
+                elif reader.needs_snapshot_probe():
+                    self.stats["snapshot_probes"] += 1
+                    self._submit_mode_job(reader, settings, reader.probe_snapshot)
+            except Exception as e:
+                logger.error(f"摄像头 {reader.camera_id} 复查取帧模式出错: {str(e)}")
+    
+    def _submit_mode_job(self, reader: SharedFrameReader, settings, func, *args):
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"摄像头 {reader.camera_id} 取帧模式任务出错: {str(e)}")
+            finally:
+                reader.mode_job_pending = False
+        
+        reader.mode_job_pending = True
+        self._get_executor(settings).submit(run)
+    
+    def _apply_mode(self, reader: SharedFrameReader, new_mode: str):
+        if self.running and reader.apply_mode(new_mode):
+            self.stats["mode_switches"] += 1
+        else:
+            self.stats["mode_switch_failures"] += 1
+    
+    def _get_executor(self, settings) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=settings.FRAME_READER_RESTART_CONCURRENCY,
+                                                thread_name_prefix="FrameReaderWorker")
+        return self._executor
+    
+    def _take_restart_token(self, settings) -> bool:
+        """全局重启令牌桶：每秒补充 FRAME_READER_RESTART_RATE 个令牌，最多积累1秒的量"""
+        now = time.time()
+        rate = settings.FRAME_READER_RESTART_RATE
+        self._restart_tokens = min(max(rate, 1.0), self._restart_tokens + (now - self._restart_tokens_time) * rate)
+        self._restart_tokens_time = now
+        if self._restart_tokens < 1.0:
+            return False
+        self._restart_tokens -= 1.0
+        return True
+    
+    def _schedule_restart(self, reader: SharedFrameReader, settings):
+        """把断开的读取器交给重启线程池（线程池大小限制同时进行的重启数）"""
+        reader.restart_pending = True
+        self.stats["restarts_scheduled"] += 1
+        self._get_executor(settings).submit(self._restart_reader, reader, settings)
+    
+    def _restart_reader(self, reader: SharedFrameReader, settings):
+        try:
+            succeeded = self.running and reader.restart()
+        except Exception as e:
+            logger.error(f"摄像头 {reader.camera_id} 重启帧读取器出错: {str(e)}")
+            succeeded = False
+        
+        if succeeded:
+            self.stats["restarts_succeeded"] += 1
+            reader.consecutive_restart_failures = 0
+            reader.next_restart_time = 0.0
+        else:
+            # 指数退避并加入随机抖动，避免同时断开的摄像头在同一时刻重试
+            self.stats["restarts_failed"] += 1
+            reader.consecutive_restart_failures += 1
+            backoff = min(settings.FRAME_READER_RESTART_BACKOFF_MAX,
+                          2.0 ** (reader.consecutive_restart_failures - 1))
+            reader.next_restart_time = time.time() + backoff * random.uniform(0.5, 1.0)
+            logger.warning(f"摄像头 {reader.camera_id} 重启失败（连续{reader.consecutive_restart_failures}次），"
+                           f"{reader.next_restart_time - time.time():.1f}s 后重试")
+        reader.restart_pending = False
+    
+    def _cleanup_idle_readers(self, current_time: float):
+        """清理超过5分钟无订阅者的读取器"""
+        cameras_to_cleanup = []
+        with self.lock:
+            for camera_id, reader in self.shared_readers.items():
+                if (len(reader.subscribers) == 0 and
+                        current_time - reader.last_access_time > 300):
+                    cameras_to_cleanup.append(camera_id)
+        
+        for camera_id in cameras_to_cleanup:
+            with self.lock:
+                if camera_id in self.shared_readers:
+                    self.shared_readers[camera_id]._stop_reading()
+                    del self.shared_readers[camera_id]
+                    inference_cache.release_camera(camera_id)
+                    logger.info(f"自动清理摄像头 {camera_id} 的共享帧读取器")
     
     def get_all_stats(self) -> Dict[int, Dict[str, Any]]:
         """获取所有共享读取器的统计信息"""
@@ -946,22 +2001,27 @@ class FrameReaderManager:
             return {
                 "total_cameras": len(self.shared_readers),
                 "running": self.running,
-                "cleanup_thread_alive": self.cleanup_thread.is_alive() if self.cleanup_thread else False,
+                "supervisor_thread_alive": self.supervisor_thread.is_alive() if self.supervisor_thread else False,
+                "nvdec_available": _nvdec_available,
+                "snapshot_prefetch": snapshot_prefetcher.get_stats(),
+                "supervisor": dict(self.stats),
                 "cameras": list(self.shared_readers.keys())
             }
     
     def shutdown(self):
         """关闭管理器"""
         self.running = False
+        self._stop_event.set()
+        if self.supervisor_thread and self.supervisor_thread.is_alive():
+            self.supervisor_thread.join(timeout=5)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
         
         with self.lock:
             for reader in self.shared_readers.values():
                 reader._stop_reading()
             self.shared_readers.clear()
         
-        if self.cleanup_thread and self.cleanup_thread.is_alive():
-            self.cleanup_thread.join(timeout=5)
-        
         logger.info("全局帧读取器管理池已关闭")
 
 
@@ -972,7 +2032,8 @@ frame_reader_manager = FrameReaderManager()
 class AdaptiveFrameReader:
     """智能自适应帧读取器 - 优化版本使用全局共享管理器"""
     
-    def __init__(self, camera_id: int, frame_interval: float, connection_overhead_threshold: float = 30.0):
+    def __init__(self, camera_id: int, frame_interval: float, connection_overhead_threshold: float = 30.0,
+                 input_size: Optional[Tuple[int, int]] = None):
         """
         初始化自适应帧读取器
         
@@ -980,10 +2041,13 @@ class AdaptiveFrameReader:
             camera_id: 摄像头ID
             frame_interval: 帧获取间隔（秒）
             connection_overhead_threshold: 连接开销阈值（秒），超过此值使用按需模式
+            input_size: 所需的最大输入尺寸 (宽, 高)，设置后持续连接模式直接解码为覆盖该尺寸的缩放帧
+                （同一摄像头取所有订阅者的最大值），原图通过 get_full_resolution_frame 按需获取；None表示需要原图
         """
         self.camera_id = camera_id
         self.frame_interval = frame_interval
         self.connection_overhead_threshold = connection_overhead_threshold
+        self.input_size = input_size
         
         # 共享帧读取器引用
         self.shared_reader: Optional[SharedFrameReader] = None
@@ -1006,7 +2070,8 @@ class AdaptiveFrameReader:
             self.shared_reader = frame_reader_manager.get_frame_reader(
                 self.camera_id, 
                 self.frame_interval, 
-                self.connection_overhead_threshold
+                self.connection_overhead_threshold,
+                self.input_size
             )
             
             if self.shared_reader:
@@ -1022,6 +2087,15 @@ class AdaptiveFrameReader:
     
     def get_latest_frame(self) -> Optional[np.ndarray]:
         """获取最新帧 - 通过共享读取器"""
+        return self.get_latest_frame_with_generation()[0]
+    
+    def get_latest_frame_with_generation(self) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """获取最新帧及其代次 - 通过共享读取器"""
+        frame, info = self.get_latest_frame_with_info()
+        return frame, info.generation if info else None
+    
+    def get_latest_frame_with_info(self) -> Tuple[Optional[np.ndarray], Optional[FrameInfo]]:
+        """获取最新帧及其采集信息（代次和采集时间） - 通过共享读取器"""
         start_time = time.time()
         self.stats["total_requests"] += 1
         
@@ -1029,22 +2103,22 @@ class AdaptiveFrameReader:
             if not self.shared_reader:
                 logger.error(f"摄像头 {self.camera_id} 共享帧读取器未初始化")
                 self.stats["failed_requests"] += 1
-                return None
+                return None, None
             
             # 从共享读取器获取帧
-            frame = self.shared_reader.get_latest_frame()
+            frame, info = self.shared_reader.get_latest_frame_with_info(self.frame_interval)
             
             if frame is not None:
                 self.stats["successful_requests"] += 1
             else:
                 self.stats["failed_requests"] += 1
                 
-            return frame
+            return frame, info
                 
         except Exception as e:
             logger.error(f"获取摄像头 {self.camera_id} 帧数据失败: {str(e)}")
             self.stats["failed_requests"] += 1
-            return None
+            return None, None
             
         finally:
             # 更新性能统计
@@ -1056,6 +2130,19 @@ class AdaptiveFrameReader:
                 total_time = (self.stats["avg_request_time"] * (self.stats["total_requests"] - 1) + request_time)
                 self.stats["avg_request_time"] = total_time / self.stats["total_requests"]
     
+    def get_full_resolution_frame(self, generation: Optional[int] = None,
+                                  allow_later: bool = False) -> Optional[np.ndarray]:
+        """
+        获取原始分辨率的帧（用于预警截图，缩放解码时可能需要重新抓帧，应在预警线程中调用）
+        
+        Args:
+            generation: 指定时只返回该帧代次的原图，没有时返回None
+            allow_later: 没有该帧代次的原图时返回之后的原图（最新缓存原图或重新抓帧）
+        """
+        if not self.shared_reader:
+            return None
+        return self.shared_reader.get_full_resolution_frame(generation, allow_later)
+    
     def stop(self):
         """停止帧读取器 - 释放共享读取器"""
         try:
@@ -1079,6 +2166,7 @@ class AdaptiveFrameReader:
             "camera_id": self.camera_id,
             "frame_interval": self.frame_interval,
             "connection_overhead_threshold": self.connection_overhead_threshold,
+            "input_size": self.input_size,
             "local_stats": {
                 **self.stats,
                 "success_rate": success_rate
@@ -1105,3 +2193,103 @@ class AdaptiveFrameReader:
         except Exception as e:
             logger.error(f"获取摄像头 {self.camera_id} 分辨率失败: {str(e)}")
             return 1920, 1080 
+
+
+# 测试代码：用本地样例视频验证解码限速随订阅者帧间隔实时调整
+if __name__ == "__main__":
+    import tempfile
+    
+    logging.basicConfig(level=logging.WARNING)
+    camera_id = 990001
+    source_fps = 25
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 生成25fps、30秒的样例视频
+        sample_path = os.path.join(tmp_dir, "sample.avi")
+        writer = cv2.VideoWriter(sample_path, cv2.VideoWriter_fourcc(*"MJPG"), source_fps, (320, 240))
+        for i in range(source_fps * 30):
+            image = np.full((240, 320, 3), 40, dtype=np.uint8)
+            cv2.circle(image, (i * 3 % 320, 120), 20, (0, 0, 255), -1)
+            writer.write(image)
+        writer.release()
+        
+        register_stream_url(camera_id, sample_path)
+        shared_reader = SharedFrameReader(camera_id, connection_overhead_threshold=30.0)
+        
+        def measure(seconds):
+            before = dict(shared_reader.threaded_reader.stats)
+            time.sleep(seconds)
+            after = shared_reader.threaded_reader.stats
+            return (after["frames_grabbed"] - before["frames_grabbed"]) / seconds, \
+                (after["frames_retrieved"] - before["frames_retrieved"]) / seconds
+        
+        # 订阅者加入/离开时，输出帧率 = 最小订阅间隔对应帧率 × 余量
+        steps = [
+            ("订阅者A(1s)加入", lambda: shared_reader.add_subscriber(1, 1.0), 2.0),
+            ("订阅者B(0.2s)加入", lambda: shared_reader.add_subscriber(2, 0.2), 10.0),
+            ("订阅者B离开", lambda: shared_reader.remove_subscriber(2), 2.0),
+            ("订阅者C(0.05s)加入", lambda: shared_reader.add_subscriber(3, 0.05), float(source_fps)),
+        ]
+        for label, action, expected_fps in steps:
+            action()
+            time.sleep(0.5)
+            grabbed_fps, retrieved_fps = measure(4.0)
+            print(f"{label:<18} 解码 {grabbed_fps:5.1f} fps, 转换输出 {retrieved_fps:5.1f} fps（期望 {expected_fps:.0f}）")
+            assert abs(grabbed_fps - source_fps) <= 2, "本地文件应按原始帧率读取"
+            assert abs(retrieved_fps - expected_fps) <= max(1.0, expected_fps * 0.15), label
+        
+        print("解码统计:", shared_reader.get_stats()["decoder"])
+        for subscriber_id in (1, 3):
+            shared_reader.remove_subscriber(subscriber_id)
+        register_stream_url(camera_id, None)
+        
+        # 关键帧解码：生成GOP为2秒的H.264视频，订阅者最小帧间隔大于GOP时只解码关键帧
+        import shutil
+        import subprocess
+        if shutil.which("ffmpeg"):
+            gop_seconds = 2
+            h264_path = os.path.join(tmp_dir, "gop.mp4")
+            subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                            "-i", f"testsrc=size=640x360:rate={source_fps}", "-t", "60", "-c:v", "libx264",
+                            "-preset", "ultrafast", "-g", str(source_fps * gop_seconds),
+                            "-keyint_min", str(source_fps * gop_seconds), "-sc_threshold", "0",
+                            "-pix_fmt", "yuv420p", h264_path], check=True)
+            gop_duration = probe_gop_duration(h264_path)
+            print(f"探测GOP时长: {gop_duration}s（期望 {gop_seconds}s）")
+            assert gop_duration is not None and abs(gop_duration - gop_seconds) < 0.05
+            
+            register_stream_url(camera_id, h264_path)
+            shared_reader = SharedFrameReader(camera_id, connection_overhead_threshold=30.0)
+            
+            def measure_decoder(seconds):
+                reader = shared_reader.threaded_reader
+                before = reader.get_stats()
+                time.sleep(seconds)
+                after = reader.get_stats()
+                return after["decode_mode"], \
+                    (after["frames_grabbed"] - before["frames_grabbed"]) / seconds, \
+                    (after["decoder_cpu_time"] - before["decoder_cpu_time"]) / seconds * 100
+            
+            # 订阅间隔5s > GOP 2s 只解码关键帧；加入1s订阅者后恢复全帧解码，离开后再次切换为关键帧解码
+            steps = [
+                ("订阅者A(5s)加入", lambda: shared_reader.add_subscriber(1, 5.0), "keyframe"),
+                ("订阅者B(1s)加入", lambda: shared_reader.add_subscriber(2, 1.0), "full"),
+                ("订阅者B离开", lambda: shared_reader.remove_subscriber(2), "keyframe"),
+            ]
+            cpu_percent = {}
+            for label, action, expected_mode in steps:
+                action()
+                time.sleep(1.0)
+                mode, decoded_fps, cpu = measure_decoder(8.0)
+                cpu_percent.setdefault(mode, []).append(cpu)
+                print(f"{label:<16} 解码模式 {mode:<8} 输出 {decoded_fps:5.2f} fps, 解码CPU {cpu:5.1f}%")
+                assert mode == expected_mode, label
+                if mode == "keyframe":
+                    assert abs(decoded_fps - 1.0 / gop_seconds) <= 0.2, "关键帧解码应只输出关键帧"
+            assert max(cpu_percent["keyframe"]) < min(cpu_percent["full"]), "关键帧解码的CPU占用应低于全帧解码"
+            
+            print("解码统计:", {key: shared_reader.get_stats()["decoder"][key]
+                               for key in ("decoder", "gop_duration", "decode_mode_switches")})
+            shared_reader.remove_subscriber(1)
+            register_stream_url(camera_id, None)
+    print("测试通过")
@@ -12,6 +12,7 @@ import logging
 import subprocess
 import signal
 import queue
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
@@ -25,18 +26,60 @@ from app.db.session import get_db
 from app.services.camera_service import CameraService
 from app.services.minio_client import minio_client
 from app.services.alert_merge_manager import alert_merge_manager
+from app.services.inference_cache import inference_cache
+from app.services.frame_pipeline import FrameInfo, PipelineSequencer, StageTimer, frame_info_scope
+from app.services.motion_gate import MotionGate
 from app.services.rtsp_streamer import FFmpegFrameStreamer, PyAVFrameStreamer
 
 logger = logging.getLogger(__name__)
 
 
+def _add_frame_to_alert_video_buffer(task_id: int, frame: np.ndarray):
+    """添加帧到预警视频缓冲区（用于生成预警视频），失败不影响主流程"""
+    try:
+        if frame is not None and frame.size > 0:
+            height, width = frame.shape[:2]
+            
+            # 先缩放到目标分辨率以减少存储压力
+            from app.core.config import settings
+            target_width = getattr(settings, 'ALERT_VIDEO_WIDTH', 1280)
+            target_height = getattr(settings, 'ALERT_VIDEO_HEIGHT', 720)
+            video_quality = getattr(settings, 'ALERT_VIDEO_QUALITY', 75)
+            
+            if width != target_width or height != target_height:
+                frame = cv2.resize(frame, (target_width, target_height))
+                width, height = target_width, target_height
+            
+            # 编码为低质量JPEG字节数据用于视频缓冲
+            success, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, video_quality])
+            if success:
+                frame_bytes = encoded.tobytes()
+                alert_merge_manager.add_frame_to_buffer(task_id, frame_bytes, width, height)
+    except Exception as e:
+        logger.debug(f"添加帧到视频缓冲区失败: {str(e)}")
+
+
 class OptimizedAsyncProcessor:
     """优化的异步帧处理器 - 减少拷贝，提升性能"""
     
-    def __init__(self, task_id: int, max_queue_size: int = 2):
+    def __init__(self, task_id: int, max_queue_size: int = 2, camera_id: Optional[int] = None,
+                 pipeline_depth: int = 1, motion_gate: Optional[MotionGate] = None, max_frame_age: float = 0.0):
         self.task_id = task_id
+        self.camera_id = camera_id  # 用于同摄像头多任务推理去重
         self.max_queue_size = max_queue_size
         
+        # 检测流水线：同时在途的检测帧数，>1时多个检测线程并发处理，结果按帧顺序交付
+        self.pipeline_depth = max(1, int(pipeline_depth))
+        self.sequencer = PipelineSequencer()
+        self.stage_timer = StageTimer()
+        self._dequeue_lock = threading.Lock()
+        
+        # 运动门控（可选）：画面相对上一次推理帧静止时复用上一次检测结果
+        self.motion_gate = motion_gate
+        
+        # 帧距采集超过该时间（秒）时推理前丢弃，0为不限制
+        self.max_frame_age = max_frame_age
+        
         # 使用更高效的数据结构
         self.frame_buffer = queue.Queue(maxsize=max_queue_size)  # 统一帧缓冲区
         self.result_buffer = queue.Queue(maxsize=2)  # 推流/OSD用的结果缓冲区
@@ -45,12 +88,14 @@ class OptimizedAsyncProcessor:
         # 线程控制
         self.running = False
         self.detection_thread = None
+        self.detection_threads = []
         self.streaming_thread = None
         
         # 共享状态 - 使用原子操作减少锁竞争
         self.latest_detection_result = None
         self.latest_annotated_frame = None
         self.latest_raw_frame = None
+        self.latest_frame_info: Optional[FrameInfo] = None  # 最新交付结果对应帧的采集信息
         self.frame_timestamp = 0
         self.result_lock = threading.RLock()
         
@@ -60,14 +105,19 @@ class OptimizedAsyncProcessor:
             "frames_detected": 0,
             "frames_streamed": 0,
             "frames_dropped": 0,
+            "frames_stale": 0,
+            "frames_motion_skipped": 0,
+            "frames_expired": 0,  # 距采集超过 max_frame_age 而在推理前丢弃的帧
+            "detection_cpu_time": 0.0,  # 检测线程累计CPU时间（秒）
             "detection_fps": 0.0,
             "streaming_fps": 0.0,
             "avg_detection_time": 0.0,
             "memory_usage_mb": 0.0
         }
         
-        # 性能监控：存储检测完成的时间戳（而非耗时），用于计算FPS
-        self.detection_times = []
+        # 性能监控：存储最近检测完成的时间戳（而非耗时），用于计算FPS
+        # 流水线深度>1时多个检测线程并发更新，检测线程对 stats 和 detection_times 的更新都在 result_lock 内进行
+        self.detection_times = deque(maxlen=100)
         self.last_stats_update = time.time()
         self.start_time = time.time()
         
@@ -78,13 +128,18 @@ class OptimizedAsyncProcessor:
         self.rtsp_streamer = rtsp_streamer
         self.running = True
         
-        # 启动检测线程
-        self.detection_thread = threading.Thread(
-            target=self._detection_worker, 
-            daemon=True, 
-            name=f"Detection-{self.task_id}"
-        )
-        self.detection_thread.start()
+        # 启动检测线程（流水线深度为N时启动N个检测线程）
+        self.detection_threads = [
+            threading.Thread(
+                target=self._detection_worker, 
+                daemon=True, 
+                name=f"Detection-{self.task_id}" if i == 0 else f"Detection-{self.task_id}-{i}"
+            )
+            for i in range(self.pipeline_depth)
+        ]
+        self.detection_thread = self.detection_threads[0]
+        for thread in self.detection_threads:
+            thread.start()
         
         # 启动推流线程（如果启用了RTSP推流）
         if self.rtsp_streamer:
@@ -95,10 +150,17 @@ class OptimizedAsyncProcessor:
             )
             self.streaming_thread.start()
             
-        logger.info(f"任务 {self.task_id} 异步帧处理器已启动")
+        logger.info(f"任务 {self.task_id} 异步帧处理器已启动，流水线深度={self.pipeline_depth}")
         
-    def put_raw_frame(self, frame: np.ndarray) -> bool:
-        """优化的帧投递 - 减少内存拷贝，同时添加到视频缓冲区"""
+    def put_raw_frame(self, frame: np.ndarray, frame_generation: Optional[int] = None,
+                      capture_time: Optional[float] = None) -> bool:
+        """优化的帧投递 - 减少内存拷贝，同时添加到视频缓冲区
+        
+        Args:
+            frame: 视频帧
+            frame_generation: 帧代次（来自共享帧读取器），同摄像头的任务据此复用同一帧的推理结果
+            capture_time: 帧的采集时间（来自共享帧读取器），默认为投递时间
+        """
         try:
             current_time = time.time()
             
@@ -115,7 +177,9 @@ class OptimizedAsyncProcessor:
             frame_data = {
                 "frame": frame,  # 直接引用，避免不必要拷贝
                 "timestamp": current_time,
-                "frame_id": self.stats["frames_captured"]
+                "frame_id": self.stats["frames_captured"],
+                "frame_generation": frame_generation,
+                "frame_info": FrameInfo(frame_generation, current_time if capture_time is None else capture_time)
             }
             
             self.frame_buffer.put(frame_data, block=False)
@@ -127,28 +191,7 @@ class OptimizedAsyncProcessor:
                 self.frame_timestamp = current_time
             
             # 🎬 添加帧到预警视频缓冲区（用于生成预警视频）
-            try:
-                if frame is not None and frame.size > 0:
-                    height, width = frame.shape[:2]
-                    
-                    # 先缩放到目标分辨率以减少存储压力
-                    from app.core.config import settings
-                    target_width = getattr(settings, 'ALERT_VIDEO_WIDTH', 1280)
-                    target_height = getattr(settings, 'ALERT_VIDEO_HEIGHT', 720)
-                    video_quality = getattr(settings, 'ALERT_VIDEO_QUALITY', 75)
-                    
-                    if width != target_width or height != target_height:
-                        frame = cv2.resize(frame, (target_width, target_height))
-                        width, height = target_width, target_height
-                    
-                    # 编码为低质量JPEG字节数据用于视频缓冲
-                    success, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, video_quality])
-                    if success:
-                        frame_bytes = encoded.tobytes()
-                        alert_merge_manager.add_frame_to_buffer(self.task_id, frame_bytes, width, height)
-            except Exception as e:
-                # 视频缓冲失败不影响主流程
-                logger.debug(f"添加帧到视频缓冲区失败: {str(e)}")
+            _add_frame_to_alert_video_buffer(self.task_id, frame)
             
             return True
             
@@ -157,79 +200,111 @@ class OptimizedAsyncProcessor:
             return False
     
     def _detection_worker(self):
-        """优化的检测工作线程"""
+        """优化的检测工作线程（流水线深度>1时多个线程并发执行）"""
         logger.info(f"任务 {self.task_id} 检测线程已启动")
         
         while self.running:
             try:
-                # 获取帧数据（超时1秒）
-                frame_data = self.frame_buffer.get(timeout=1.0)
+                # 获取帧数据（超时1秒），取帧、分配帧序号和运动门控判断需保持一致的顺序
+                with self._dequeue_lock:
+                    frame_data = self.frame_buffer.get(timeout=1.0)
+                    frame_info = frame_data["frame_info"]
+                    if self.max_frame_age > 0 and frame_info.age() > self.max_frame_age:
+                        # 帧已超过延迟预算（检测积压或读取器输出旧帧），推理结果已无意义
+                        self.stats["frames_expired"] += 1
+                        continue
+                    seq = self.sequencer.next_seq()
+                    reused_result = None
+                    if self.motion_gate is not None:
+                        gate_start = time.time()
+                        with self.result_lock:
+                            previous_result = self.latest_detection_result
+                        if not self.motion_gate.should_infer(frame_data["frame"], can_reuse=previous_result is not None):
+                            reused_result = previous_result
+                        gate_duration = time.time() - gate_start
                 frame = frame_data["frame"]
                 frame_timestamp = frame_data["timestamp"]
                 
                 # 记录检测开始时间
                 detection_start = time.time()
+                cpu_start = time.thread_time()
                 
                 # 执行检测：根据技能类型传递不同参数
                 skill_config = self.skill_instance.config if hasattr(self.skill_instance, 'config') else {}
-                if skill_config.get('type') == 'agent':
-                    # Agent技能：传完整task_context（含task_id, camera_id, fence_config）
-                    result = self.skill_instance.process(frame, self.task_config)
-                else:
-                    # 普通技能（YOLO等）：只传fence_config
-                    fence_config = self.task_config.get("fence_config", {})
-                    result = self.skill_instance.process(frame, fence_config)
+                with self.sequencer.frame(seq) as stages, frame_info_scope(frame_info):
+                    if reused_result is not None:
+                        # 画面静止：复用上一次检测结果，不调用技能
+                        result = reused_result
+                        with self.result_lock:
+                            self.stats["frames_motion_skipped"] += 1
+                    elif skill_config.get('type') == 'agent':
+                        # Agent技能：传完整task_context（含task_id, camera_id, fence_config）
+                        result = self.skill_instance.process(frame, self.task_config)
+                    else:
+                        # 普通技能（YOLO等）：只传fence_config
+                        # 传入只读视图：帧在检测期间不会被修改，技能无需再做整帧防御性拷贝
+                        fence_config = self.task_config.get("fence_config", {})
+                        frame_view = frame.view()
+                        frame_view.flags.writeable = False
+                        with inference_cache.frame_scope(self.camera_id, frame_data.get("frame_generation")):
+                            result = self.skill_instance.process(frame_view, fence_config)
                 
                 # 记录检测耗时和完成时间戳
                 detection_end = time.time()
                 detection_duration = detection_end - detection_start
-                self.detection_times.append(detection_end)
+                with self.result_lock:
+                    self.detection_times.append(detection_end)
+                    self.stats["detection_cpu_time"] += time.thread_time() - cpu_start
                 
-                # 保持检测时间列表大小合理
-                if len(self.detection_times) > 100:
-                    self.detection_times = self.detection_times[-50:]
+                # 分阶段计时：采集到投递、排队等待、预处理、推理、有序区等待，其余计入后处理
+                stages["frame_age"] = max(0.0, frame_timestamp - frame_info.capture_time)
+                stages["queue_wait"] = detection_start - frame_timestamp
+                if self.motion_gate is not None:
+                    stages["motion_gate"] = gate_duration
+                stages["postprocess"] = max(0.0, detection_duration - sum(
+                    stages.get(stage, 0.0) for stage in ("preprocess", "inference", "ordered_wait")
+                ))
                 
                 if result.success:
+                    # 更新的帧已经交付时，本帧结果已过期，无需绘制
+                    if self.sequencer.is_stale(seq):
+                        with self.result_lock:
+                            self.stats["frames_stale"] += 1
+                        self.stage_timer.record(stages)
+                        continue
+                    
                     # 根据是否启用推流决定是否绘制检测框
+                    deliver_start = time.time()
                     if self.rtsp_streamer:
-                        annotated_frame = self._draw_detections_with_skill(frame, result.data)
+                        # 读取器给出的是只读的共享帧，绘制前拷贝
+                        annotated_frame = self._draw_detections_with_skill(
+                            frame if frame.flags.writeable else frame.copy(), result.data)
                     else:
                         annotated_frame = frame
                     
-                    # 原子更新共享状态
-                    with self.result_lock:
-                        self.latest_detection_result = result
-                        self.latest_annotated_frame = annotated_frame
-                        self._latest_detection_duration = detection_duration
-                    
                     result_data = {
                         "result": result,
                         "frame": annotated_frame,
+                        "source_frame": frame,  # 检测所用的原始帧（未绘制），预警截图使用
                         "timestamp": detection_end,
-                        "frame_timestamp": frame_timestamp
+                        "frame_timestamp": frame_timestamp,
+                        "frame_info": frame_info
                     }
                     
-                    # 投递到推流/OSD缓冲区
-                    try:
-                        if self.result_buffer.full():
-                            self.result_buffer.get_nowait()
-                        self.result_buffer.put(result_data, block=False)
-                    except queue.Full:
-                        pass
-                    
-                    # 投递到告警专用缓冲区（独立于推流，确保告警不丢失）
-                    try:
-                        if self.alert_buffer.full():
-                            self.alert_buffer.get_nowait()
-                        self.alert_buffer.put(result_data, block=False)
-                    except queue.Full:
-                        pass
-                    
-                    self.stats["frames_detected"] += 1
+                    # 按帧顺序交付，更新的帧已交付时丢弃
+                    delivered = self.sequencer.deliver(seq, lambda: self._deliver_result(result_data, detection_duration))
+                    with self.result_lock:
+                        self.stats["frames_detected" if delivered else "frames_stale"] += 1
+                    if delivered:
+                        # 采集到结果交付的端到端延迟
+                        stages["end_to_end"] = frame_info.age()
+                    stages["deliver"] = time.time() - deliver_start
                     
                     # 动态统计更新
                     self._update_stats()
                 
+                self.stage_timer.record(stages)
+                
             except queue.Empty:
                 continue
             except Exception as e:
@@ -238,6 +313,31 @@ class OptimizedAsyncProcessor:
                 
         logger.info(f"任务 {self.task_id} 检测线程已停止")
     
+    def _deliver_result(self, result_data: Dict[str, Any], detection_duration: float):
+        """交付检测结果：更新共享状态并投递到推流/告警缓冲区（在交付锁内按帧顺序调用）"""
+        # 原子更新共享状态
+        with self.result_lock:
+            self.latest_detection_result = result_data["result"]
+            self.latest_annotated_frame = result_data["frame"]
+            self.latest_frame_info = result_data["frame_info"]
+            self._latest_detection_duration = detection_duration
+        
+        # 投递到推流/OSD缓冲区
+        try:
+            if self.result_buffer.full():
+                self.result_buffer.get_nowait()
+            self.result_buffer.put(result_data, block=False)
+        except (queue.Full, queue.Empty):
+            pass
+        
+        # 投递到告警专用缓冲区（独立于推流，确保告警不丢失）
+        try:
+            if self.alert_buffer.full():
+                self.alert_buffer.get_nowait()
+            self.alert_buffer.put(result_data, block=False)
+        except (queue.Full, queue.Empty):
+            pass
+    
     def _streaming_worker(self):
         """优化的推流工作线程 - 智能帧率调整"""
         logger.info(f"任务 {self.task_id} 推流线程已启动")
@@ -264,11 +364,14 @@ class OptimizedAsyncProcessor:
                     continue
                 
                 # 智能获取推流帧
-                frame_to_stream = self._get_optimal_streaming_frame()
+                frame_to_stream, frame_info = self._get_optimal_streaming_frame()
                 
                 # 推流
                 if frame_to_stream is not None and self.rtsp_streamer and self.rtsp_streamer.is_running:
                     if self.rtsp_streamer.push_frame(frame_to_stream):
+                        if frame_info is not None:
+                            # 推流画面距采集的延迟（检测跟不上推流帧率时同一帧会被重复推送，延迟随之增大）
+                            self.stage_timer.record({"stream": frame_info.age()})
                         streaming_count += 1
                         self.stats["frames_streamed"] += 1
                         last_push_time = current_time
@@ -308,12 +411,10 @@ class OptimizedAsyncProcessor:
                 
         logger.info(f"任务 {self.task_id} 推流线程已停止")
     
-    def _get_optimal_streaming_frame(self):
-        """智能获取最优推流帧 — 使用共享状态，不消费队列"""
+    def _get_optimal_streaming_frame(self) -> Tuple[Optional[np.ndarray], Optional[FrameInfo]]:
+        """智能获取最优推流帧及其采集信息 — 使用共享状态，不消费队列"""
         with self.result_lock:
-            if self.latest_annotated_frame is not None:
-                return self.latest_annotated_frame
-        return None
+            return self.latest_annotated_frame, self.latest_frame_info
     
     def _update_stats(self):
         """动态更新统计信息"""
@@ -323,16 +424,13 @@ class OptimizedAsyncProcessor:
         if current_time - self.last_stats_update < 2.0:
             return
         
-        # 计算平均检测耗时（从共享状态获取）
-        with self.result_lock:
-            avg_duration = getattr(self, '_latest_detection_duration', 0)
-        self.stats["avg_detection_time"] = avg_duration
-        
-        # 计算检测FPS：统计最近5秒内完成的检测次数
+        # 计算平均检测耗时（从共享状态获取）和检测FPS（最近5秒内完成的检测次数）
         fps_window = 5.0
         cutoff = current_time - fps_window
-        recent = [t for t in self.detection_times if t >= cutoff]
-        self.stats["detection_fps"] = len(recent) / fps_window if recent else 0.0
+        with self.result_lock:
+            self.stats["avg_detection_time"] = getattr(self, '_latest_detection_duration', 0)
+            recent = sum(1 for t in self.detection_times if t >= cutoff)
+            self.stats["detection_fps"] = recent / fps_window
         
         # 估算内存使用
         queue_sizes = (
@@ -481,9 +579,20 @@ class OptimizedAsyncProcessor:
             logger.error(f"绘制检测框时出错: {str(e)}")
             return frame
     
+    def record_latency(self, stage: str, seconds: float):
+        """记录检测线程之外的阶段延迟（如预警截图距采集的时间）"""
+        self.stage_timer.record({stage: seconds})
+    
     def get_stats(self):
-        """获取统计信息"""
-        return self.stats.copy()
+        """获取统计信息（含流水线状态和各阶段耗时）"""
+        with self.result_lock:
+            stats = self.stats.copy()
+        stats["pipeline_depth"] = self.pipeline_depth
+        stats["pipeline"] = self.sequencer.get_stats()
+        stats["stage_timings"] = self.stage_timer.get_stats()
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.get_stats()
+        return stats
     
     def stop(self):
         """优雅停止异步处理"""
@@ -492,8 +601,9 @@ class OptimizedAsyncProcessor:
         
         # 等待线程结束（增加超时时间）
         threads_to_wait = []
-        if self.detection_thread and self.detection_thread.is_alive():
-            threads_to_wait.append(("检测", self.detection_thread))
+        for thread in self.detection_threads:
+            if thread.is_alive():
+                threads_to_wait.append(("检测", thread))
         if self.streaming_thread and self.streaming_thread.is_alive():
             threads_to_wait.append(("推流", self.streaming_thread))
         
@@ -542,7 +652,7 @@ class OptimizedAsyncProcessor:
                 "result_buffer_size": self.result_buffer.qsize(),
                 "max_queue_size": self.max_queue_size
             },
-            "performance": self.stats.copy(),
+            "performance": self.get_stats(),
             "efficiency": {
                 "processing_rate": self.stats["frames_detected"] / max(self.stats["frames_captured"], 1),
                 "streaming_rate": self.stats["frames_streamed"] / max(self.stats["frames_detected"], 1),
@@ -551,6 +661,122 @@ class OptimizedAsyncProcessor:
         }
 
 
+class ProcessPoolTaskProcessor:
+    """多进程模式的帧处理器：帧写入摄像头的共享内存帧通道，检测在工作进程中执行
+    
+    接口与 OptimizedAsyncProcessor 一致（put_raw_frame / get_alert_result / get_latest_result / get_stats / stop），
+    任务主循环无需区分运行模式。
+    """
+    
+    def __init__(self, task_id: int, pool, camera_id: int):
+        from app.core.config import settings
+        
+        self.task_id = task_id
+        self.camera_id = camera_id
+        self.pool = pool
+        self.worker_id = None
+        self.skill_instance = None  # 主进程中的技能实例，只用于预警截图绘制
+        
+        self.alert_buffer = queue.Queue(maxsize=8)
+        self.latest_detection_result = None
+        self.frame_timestamp = 0
+        self.result_lock = threading.Lock()
+        self.stage_timer = StageTimer()
+        # 最近投递的帧（帧代次 -> 帧），结果返回时取检测所用的帧作为预警截图
+        self._recent_frames: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._recent_frames_size = max(2, settings.TASK_PROCESS_FRAME_SLOTS)
+        self.stats = {
+            "frames_captured": 0,
+            "frames_published": 0,    # 由本任务写入帧通道的帧数（同摄像头其他任务已写入的帧不重复写入）
+            "frames_detected": 0,
+            "frames_motion_skipped": 0,
+            "detection_cpu_time": 0.0,
+        }
+    
+    def start(self, skill_instance, task_spec: Dict[str, Any]):
+        """提交任务到工作进程池"""
+        self.skill_instance = skill_instance
+        self.worker_id = self.pool.submit_task(task_spec, self._on_result)
+        logger.info(f"任务 {self.task_id} 已分配到工作进程 {self.worker_id}")
+    
+    def put_raw_frame(self, frame: np.ndarray, frame_generation: Optional[int] = None,
+                      capture_time: Optional[float] = None) -> bool:
+        """把帧写入共享内存帧通道（附带采集时间），并添加到预警视频缓冲区"""
+        self.stats["frames_captured"] += 1
+        if self.pool.publish_frame(self.camera_id, frame, frame_generation, capture_time):
+            self.stats["frames_published"] += 1
+        if frame_generation is not None:
+            with self.result_lock:
+                self._recent_frames[frame_generation] = frame
+                while len(self._recent_frames) > self._recent_frames_size:
+                    self._recent_frames.popitem(last=False)
+        _add_frame_to_alert_video_buffer(self.task_id, frame)
+        return True
+    
+    def _on_result(self, message: Dict[str, Any]):
+        """工作进程返回的结果（在进程池的结果分发线程中调用）"""
+        if message.get("type") != "result":
+            return
+        worker_stats = message.get("stats", {})
+        for key in ("frames_detected", "frames_motion_skipped", "frames_expired", "detection_cpu_time"):
+            if key in worker_stats:
+                self.stats[key] = worker_stats[key]
+        if not message["success"]:
+            return
+        
+        from app.skills.skill_base import SkillResult
+        width, height = message.get("frame_size", (0, 0))
+        frame_info = FrameInfo(message["frame_generation"], message["frame_timestamp"])
+        with self.result_lock:
+            source_frame = self._recent_frames.get(message["frame_generation"])
+        result_data = {
+            "result": SkillResult(True, message["data"]),
+            "frame": None,
+            "source_frame": source_frame,  # 检测所用的帧，已不在最近投递的帧中时为None
+            "timestamp": message["timestamp"],
+            "frame_timestamp": message["frame_timestamp"],
+            "frame_info": frame_info,
+            "frame_width": width,
+            "frame_height": height,
+        }
+        self.stage_timer.record({"end_to_end": frame_info.age(), **message.get("stages", {})})
+        with self.result_lock:
+            self.latest_detection_result = result_data
+            self.frame_timestamp = message["frame_timestamp"]
+        try:
+            if self.alert_buffer.full():
+                self.alert_buffer.get_nowait()
+            self.alert_buffer.put(result_data, block=False)
+        except (queue.Full, queue.Empty):
+            pass
+    
+    def get_latest_result(self):
+        """获取最新的检测结果（非破坏性读取，供OSD/API使用）"""
+        with self.result_lock:
+            return self.latest_detection_result
+    
+    def get_alert_result(self):
+        """获取告警专用的检测结果（破坏性读取，每个结果只消费一次）"""
+        try:
+            return self.alert_buffer.get_nowait()
+        except queue.Empty:
+            return None
+    
+    def record_latency(self, stage: str, seconds: float):
+        """记录主进程中的阶段延迟（如预警截图距采集的时间）"""
+        self.stage_timer.record({stage: seconds})
+    
+    def get_stats(self):
+        """获取统计信息"""
+        return {**self.stats, "worker_id": self.worker_id, "stage_timings": self.stage_timer.get_stats()}
+    
+    def stop(self):
+        """从工作进程池中移除任务"""
+        self.pool.stop_task(self.task_id)
+        logger.info(f"任务 {self.task_id} 已从工作进程 {self.worker_id} 移除，"
+                    f"采集帧数={self.stats['frames_captured']}, 检测帧数={self.stats['frames_detected']}")
+
+
 class AITaskExecutor:
     """基于精确调度的AI任务执行器"""
     
@@ -564,6 +790,10 @@ class AITaskExecutor:
         self.frame_processors = {}  # 存储任务的帧处理器 {task_id: OptimizedAsyncProcessor}
         self.task_camera_mapping = {}  # 存储任务与摄像头的映射 {task_id: camera_id}
         
+        # 多进程任务执行（TASK_PROCESS_WORKERS > 0 时在首个符合条件的任务启动时创建）
+        self.task_process_pool = None
+        self._process_pool_lock = threading.Lock()
+        
         # 创建任务调度器
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
@@ -874,11 +1104,13 @@ class AITaskExecutor:
             from app.core.config import settings
             
             frame_interval = 1.0 / task.frame_rate if task.frame_rate > 0 else 1.0
+            task_config = json.loads(task.config) if isinstance(task.config, str) else (task.config or {})
             
             frame_reader = AdaptiveFrameReader(
                 camera_id=task.camera_id,
                 frame_interval=frame_interval,
-                connection_overhead_threshold=settings.ADAPTIVE_FRAME_CONNECTION_OVERHEAD_THRESHOLD
+                connection_overhead_threshold=settings.ADAPTIVE_FRAME_CONNECTION_OVERHEAD_THRESHOLD,
+                input_size=self._get_frame_input_size(task_config, skill_instance, settings)
             )
             
             if not frame_reader.start():
@@ -886,25 +1118,36 @@ class AITaskExecutor:
                 self._pause_task_on_failure(task.id, f"无法获取摄像头 {task.camera_id} 视频流")
                 return
             
-            frame_processor = OptimizedAsyncProcessor(task.id, max_queue_size=2)
+            skill_config = skill_instance.config if hasattr(skill_instance, 'config') else {}
+            skill_type = skill_config.get('type', 'yolo')
+            global_rtsp_enabled = settings.RTSP_STREAMING_ENABLED
+            task_rtsp_enabled = task_config.get("rtsp_streaming", {}).get("enabled", False)
+            motion_gate = self._create_motion_gate(task, task_config)
+            
+            # 多进程模式：检测在工作进程中执行（推流和Agent技能需要主进程中的推流器/上下文，仍使用线程）
+            process_pool = None
+            if skill_type != 'agent' and not (global_rtsp_enabled and task_rtsp_enabled):
+                process_pool = self._get_task_process_pool(settings)
+            
+            if process_pool is not None:
+                frame_processor = ProcessPoolTaskProcessor(task.id, process_pool, task.camera_id)
+            else:
+                frame_processor = OptimizedAsyncProcessor(
+                    task.id, max_queue_size=2, camera_id=task.camera_id,
+                    pipeline_depth=settings.DETECTION_PIPELINE_DEPTH,
+                    motion_gate=motion_gate,
+                    max_frame_age=settings.FRAME_MAX_AGE_BEFORE_INFERENCE
+                )
             
             with self._state_lock:
                 self.frame_processors[task.id] = frame_processor
                 self.task_camera_mapping[task.id] = task.camera_id
             
             # RTSP推流初始化
-            task_config = json.loads(task.config) if isinstance(task.config, str) else (task.config or {})
-            
-            global_rtsp_enabled = settings.RTSP_STREAMING_ENABLED
-            task_rtsp_enabled = task_config.get("rtsp_streaming", {}).get("enabled", False)
-
             if global_rtsp_enabled and task_rtsp_enabled:
                 rtsp_streamer = self._init_rtsp_streamer(task, frame_reader, settings)
             
             # 启动异步帧处理器
-            skill_config = skill_instance.config if hasattr(skill_instance, 'config') else {}
-            skill_type = skill_config.get('type', 'yolo')
-            
             if skill_type == 'agent':
                 task_processor_config = {
                     "fence_config": self._parse_fence_config(task),
@@ -916,7 +1159,11 @@ class AITaskExecutor:
                     "fence_config": self._parse_fence_config(task)
                 }
             
-            frame_processor.start(skill_instance, task_processor_config, rtsp_streamer)
+            if process_pool is not None:
+                frame_processor.start(skill_instance, self._build_process_task_spec(
+                    task, skill_instance, task_processor_config["fence_config"], frame_interval, motion_gate))
+            else:
+                frame_processor.start(skill_instance, task_processor_config, rtsp_streamer)
             
             # ===== 主循环阶段 =====
             frame_interval = 1.0 / task.frame_rate if task.frame_rate > 0 else 1.0
@@ -933,7 +1180,7 @@ class AITaskExecutor:
                     
                 last_frame_time = current_time
                 
-                frame = frame_reader.get_latest_frame()
+                frame, frame_info = frame_reader.get_latest_frame_with_info()
                 if frame is None:
                     consecutive_no_frame += 1
                     if consecutive_no_frame <= 3 or consecutive_no_frame % 20 == 0:
@@ -949,7 +1196,7 @@ class AITaskExecutor:
                 
                 consecutive_no_frame = 0
                 
-                if not frame_processor.put_raw_frame(frame):
+                if not frame_processor.put_raw_frame(frame, frame_info.generation, frame_info.capture_time):
                     continue
                 
                 # 从告警专用缓冲区获取结果（不与推流线程竞争）
@@ -957,7 +1204,12 @@ class AITaskExecutor:
                 if detection_result:
                     result = detection_result["result"]
                     if result.success:
-                        self._handle_skill_result(result, task, frame)
+                        # 预警使用检测结果对应的帧和采集信息（流水线或异步检测时结果对应的帧早于当前帧）
+                        detected_info = detection_result.get("frame_info") or frame_info
+                        detected_frame = detection_result.get("source_frame")
+                        if detected_frame is None:
+                            detected_frame = frame
+                        self._handle_skill_result(result, task, detected_frame, frame_reader, detected_info)
             
         except Exception as e:
             logger.error(f"执行任务 {task.id} 时出错: {str(e)}", exc_info=True)
@@ -987,6 +1239,57 @@ class AITaskExecutor:
                 
             logger.info(f"任务 {task.id} 执行已停止，资源已释放")
     
+    def _get_task_process_pool(self, settings):
+        """
+        获取任务工作进程池（首次调用时创建），未启用多进程模式或启动失败时返回None（任务以线程方式运行）
+        """
+        if settings.TASK_PROCESS_WORKERS <= 0:
+            return None
+        with self._process_pool_lock:
+            if self.task_process_pool is None:
+                from app.services.task_process_pool import TaskProcessPool
+                pool = TaskProcessPool(settings.TASK_PROCESS_WORKERS,
+                                       channel_slots=settings.TASK_PROCESS_FRAME_SLOTS)
+                if not pool.start():
+                    logger.error("任务工作进程池启动失败，任务以线程方式运行")
+                    return None
+                self.task_process_pool = pool
+            return self.task_process_pool
+    
+    def _build_process_task_spec(self, task: AITask, skill_instance, fence_config: Dict, frame_interval: float,
+                                 motion_gate: Optional[MotionGate]) -> Dict[str, Any]:
+        """构造提交给工作进程的任务描述（工作进程按技能名称和配置重新创建技能实例）"""
+        return {
+            "task_id": task.id,
+            "camera_id": task.camera_id,
+            "skill_name": getattr(type(skill_instance), "DEFAULT_CONFIG", {}).get("name"),
+            "skill_config": skill_instance.config,
+            "fence_config": fence_config,
+            "frame_interval": frame_interval,
+            "max_frame_age": settings.FRAME_MAX_AGE_BEFORE_INFERENCE,
+            "motion_gate": {
+                "threshold": motion_gate.threshold,
+                "max_reuse_seconds": motion_gate.max_reuse_seconds,
+            } if motion_gate is not None else None,
+        }
+    
+    def _get_frame_input_size(self, task_config: Dict, skill_instance, settings) -> Optional[Tuple[int, int]]:
+        """
+        任务向帧读取器声明的最大输入尺寸
+        
+        启用缩放解码时取技能的模型输入尺寸；Agent技能和启用RTSP推流的任务（推流画面需要原始分辨率）返回None。
+        """
+        if not settings.ADAPTIVE_FRAME_SCALED_DECODE:
+            return None
+        skill_config = skill_instance.config if hasattr(skill_instance, 'config') else {}
+        if skill_config.get('type') == 'agent':
+            return None
+        if settings.RTSP_STREAMING_ENABLED and task_config.get("rtsp_streaming", {}).get("enabled", False):
+            return None
+        if not hasattr(skill_instance, 'get_frame_input_size'):
+            return None
+        return skill_instance.get_frame_input_size()
+    
     def _get_video_resolution(self, frame_reader) -> Tuple[int, int]:
         """获取视频流的分辨率
         
@@ -1153,6 +1456,24 @@ class AITaskExecutor:
         
         return merged
     
+    def _create_motion_gate(self, task: AITask, task_config: Dict) -> Optional[MotionGate]:
+        """
+        根据任务配置创建运动门控
+        
+        任务配置示例: {"motion_gate": {"enabled": true, "threshold": 3.0, "max_reuse_seconds": 5.0}}
+        未配置的项使用全局默认值（MOTION_GATE_*）
+        """
+        from app.core.config import settings
+        
+        gate_config = task_config.get("motion_gate", {}) or {}
+        if not gate_config.get("enabled", settings.MOTION_GATE_ENABLED):
+            return None
+        
+        threshold = float(gate_config.get("threshold", settings.MOTION_GATE_THRESHOLD))
+        max_reuse_seconds = float(gate_config.get("max_reuse_seconds", settings.MOTION_GATE_MAX_REUSE_SECONDS))
+        logger.info(f"任务 {task.id} 启用运动门控: 阈值={threshold}, 最长复用={max_reuse_seconds}秒")
+        return MotionGate(threshold=threshold, max_reuse_seconds=max_reuse_seconds)
+    
     def _parse_fence_config(self, task: AITask) -> Dict:
         """解析任务的电子围栏配置"""
         try:
@@ -1168,26 +1489,6 @@ class AITaskExecutor:
             logger.error(f"解析电子围栏配置失败: {str(e)}")
             return {}
     
-    def _point_in_polygon(self, point, polygon):
-        """使用射线法判断点是否在多边形内"""
-        x, y = point
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
-    
     def _is_in_running_period(self, running_period: Dict) -> bool:
         """判断当前时间是否在任务运行时段内"""
         # 如果未启用时段限制，返回False
@@ -1225,8 +1526,17 @@ class AITaskExecutor:
                 
         return False
     
-    def _handle_skill_result(self, result, task: AITask, frame):
-        """处理技能结果（支持普通检测技能和Agent技能两种格式）"""
+    def _handle_skill_result(self, result, task: AITask, frame, frame_reader=None,
+                             frame_info: Optional[FrameInfo] = None):
+        """处理技能结果（支持普通检测技能和Agent技能两种格式）
+        
+        Args:
+            result: 技能结果
+            task: AI任务对象
+            frame: 检测结果对应的帧（缩放解码时为缩放后的帧）
+            frame_reader: 帧读取器，用于预警截图时获取原始分辨率的帧
+            frame_info: 检测结果对应帧的采集信息，预警时间和预警截图距采集的延迟据此计算
+        """
         try:
             data = result.data
             if not data:
@@ -1241,14 +1551,15 @@ class AITaskExecutor:
                 skill_config = si.config if hasattr(si, 'config') else {}
             
             if skill_config.get('type') == 'agent' or data.get('phase') is not None:
-                self._handle_agent_skill_result(data, task, frame)
+                self._handle_agent_skill_result(data, task, frame, frame_reader, frame_info)
             else:
-                self._handle_detection_skill_result(data, task, frame)
+                self._handle_detection_skill_result(data, task, frame, frame_reader, frame_info)
             
         except Exception as e:
             logger.error(f"处理技能结果时出错: {str(e)}", exc_info=True)
     
-    def _handle_detection_skill_result(self, data: Dict, task: AITask, frame):
+    def _handle_detection_skill_result(self, data: Dict, task: AITask, frame, frame_reader=None,
+                                       frame_info: Optional[FrameInfo] = None):
         """处理普通检测技能（YOLO）的结果"""
         detections = data.get("detections", [])
         if not detections:
@@ -1262,10 +1573,11 @@ class AITaskExecutor:
             alert_level = task.alert_level
 
             if alert_triggered:
-                self._schedule_alert_generation(task, data, frame.copy(), alert_level)
+                self._schedule_alert_generation(task, data, frame.copy(), alert_level, frame_reader, frame_info)
                 logger.info(f"任务 {task.id} 触发预警（异步处理中）: 任务预警等级阈值={task.alert_level}")
     
-    def _handle_agent_skill_result(self, data: Dict, task: AITask, frame):
+    def _handle_agent_skill_result(self, data: Dict, task: AITask, frame, frame_reader=None,
+                                   frame_info: Optional[FrameInfo] = None):
         """
         处理Agent技能的结果
         
@@ -1325,14 +1637,15 @@ class AITaskExecutor:
             }
         }
         
-        self._schedule_alert_generation(task, agent_alert_data, frame.copy(), alert_level)
+        self._schedule_alert_generation(task, agent_alert_data, frame.copy(), alert_level, frame_reader, frame_info)
         logger.info(
             f"任务 {task.id} Agent检测到违规（异步处理中）: "
             f"类型={violation_type}, 预警等级={alert_level}(用户配置), "
             f"决策路径={decision_type}"
         )
     
-    def _schedule_alert_generation(self, task: AITask, alert_data: Dict, frame: np.ndarray, level: int):
+    def _schedule_alert_generation(self, task: AITask, alert_data: Dict, frame: np.ndarray, level: int,
+                                   frame_reader=None, frame_info: Optional[FrameInfo] = None):
         """异步调度预警生成
         
         Args:
@@ -1340,12 +1653,14 @@ class AITaskExecutor:
             alert_data: 报警数据（安全分析结果）
             frame: 报警截图帧（已复制）
             level: 预警等级
+            frame_reader: 帧读取器，帧为缩放帧时在预警线程中获取原图
+            frame_info: 截图帧的采集信息
         """
         try:
             # 提交到线程池异步执行
             future = self.alert_executor.submit(
                 self._generate_alert_async,
-                task, alert_data, frame, level
+                task, alert_data, frame, level, frame_reader, frame_info
             )
             
             # 可选：添加回调处理结果
@@ -1365,7 +1680,8 @@ class AITaskExecutor:
         except Exception as e:
             logger.error(f"预警生成异常: {str(e)}")
     
-    def _generate_alert_async(self, task: AITask, alert_data: Dict, frame: np.ndarray, level: int) -> Optional[Dict]:
+    def _generate_alert_async(self, task: AITask, alert_data: Dict, frame: np.ndarray, level: int,
+                              frame_reader=None, frame_info: Optional[FrameInfo] = None) -> Optional[Dict]:
         """异步生成预警（在独立线程中执行） - 集成预警合并机制
         
         Args:
@@ -1373,18 +1689,83 @@ class AITaskExecutor:
             alert_data: 报警数据（安全分析结果）
             frame: 报警截图帧
             level: 预警等级
+            frame_reader: 帧读取器，帧为缩放帧时用于获取原图
+            frame_info: 截图帧的采集信息
             
         Returns:
             生成的预警信息字典，失败时返回None
         """
+        if frame_reader is not None:
+            frame, alert_data = self._restore_alert_resolution(frame, alert_data, frame_reader, frame_info)
+        
         # 创建新的数据库会话（因为在新线程中）
         db = next(get_db())
         try:
-            return self._generate_alert_with_merge(task, alert_data, frame, db, level)
+            return self._generate_alert_with_merge(task, alert_data, frame, db, level, frame_info)
         finally:
             db.close()
     
-    def _generate_alert_with_merge(self, task: AITask, alert_data, frame, db: Session, level: int):
+    @staticmethod
+    def _restore_alert_resolution(frame: np.ndarray, alert_data: Dict, frame_reader,
+                                  frame_info: Optional[FrameInfo] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        缩放解码时将预警截图换成原始分辨率图像，并把检测框坐标映射回原图
+        
+        优先使用与检测帧同一帧代次的原图。取不到时（FFmpeg缩放解码的管道中没有原图，OpenCV缓存的原图已淘汰）
+        使用之后的原图（最新缓存原图或重新抓帧），检测框按分辨率比例映射，并在 alert_data["screenshot_frame"]
+        中标记截图是检测帧之后的帧；仍取不到时保留检测分辨率的截图。
+        
+        Args:
+            frame: 技能处理的帧
+            alert_data: 报警数据
+            frame_reader: 帧读取器
+            frame_info: 检测帧的采集信息（提供帧代次）
+            
+        Returns:
+            (截图帧, 报警数据)，无需或无法获取原图时原样返回
+        """
+        input_size = getattr(frame_reader, 'input_size', None)
+        if not input_size or frame is None:
+            return frame, alert_data
+        generation = frame_info.generation if frame_info is not None else None
+        if generation is None:
+            return frame, alert_data
+        height, width = frame.shape[:2]
+        
+        later_frame = False
+        full_frame = frame_reader.get_full_resolution_frame(generation)
+        if full_frame is None:
+            full_frame = frame_reader.get_full_resolution_frame(generation, allow_later=True)
+            later_frame = full_frame is not None
+        if full_frame is None or full_frame.shape[0] * full_frame.shape[1] <= height * width:
+            # 检测帧已是原始分辨率时，之后的帧分辨率相同，保留同一帧的截图
+            if full_frame is None:
+                logger.info(f"摄像头 {frame_reader.camera_id} 没有帧代次 {generation} 的原始分辨率帧，"
+                            f"预警截图使用检测分辨率")
+            return frame, alert_data
+        
+        full_height, full_width = full_frame.shape[:2]
+        scale_x, scale_y = full_width / width, full_height / height
+        detections = []
+        for detection in alert_data.get("detections", []):
+            bbox = detection.get("bbox")
+            if bbox and len(bbox) >= 4:
+                x1, y1, x2, y2 = bbox[:4]
+                detection = {**detection, "bbox": [x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y]}
+            detections.append(detection)
+        alert_data = {**alert_data, "detections": detections}
+        if later_frame:
+            logger.info(f"摄像头 {frame_reader.camera_id} 没有帧代次 {generation} 的原始分辨率帧，"
+                        f"预警截图使用之后的原图，检测框按分辨率映射")
+            alert_data["screenshot_frame"] = {
+                "later_frame": True,              # 截图不是检测帧，检测框为检测帧中的位置
+                "detection_generation": generation,
+                "capture_time": time.time(),
+            }
+        return full_frame, alert_data
+    
+    def _generate_alert_with_merge(self, task: AITask, alert_data, frame, db: Session, level: int,
+                                   frame_info: Optional[FrameInfo] = None):
         """生成预警并发送到合并管理器
         
         Args:
@@ -1393,6 +1774,7 @@ class AITaskExecutor:
             frame: 报警截图帧
             db: 数据库会话
             level: 预警等级（技能返回的实际预警等级）
+            frame_info: 截图帧的采集信息，预警时间取帧的采集时间
         """
         try:
             from app.services.camera_service import CameraService
@@ -1474,8 +1856,9 @@ class AITaskExecutor:
             skill_name_zh = skill_class["name_zh"] if skill_class else "未知技能"
             
             # 构建完整的预警信息（alert_id 由合并管理器在最终发送时生成）
+            alert_time = datetime.fromtimestamp(frame_info.capture_time) if frame_info else datetime.now()
             complete_alert = {
-                "alert_time": datetime.now().isoformat(),
+                "alert_time": alert_time.isoformat(),
                 "alert_level": level,
                 "alert_name": alert_info["name"],
                 "alert_type": alert_info["type"],
@@ -1491,6 +1874,9 @@ class AITaskExecutor:
                 "minio_video_object_name": minio_video_object_name,  # TODO: 实现视频录制和上传 传递object_name而不是URL
                 "result": formatted_results,
             }
+            if alert_data.get("screenshot_frame"):
+                # 截图为检测帧之后的原图（缩放解码取不到同一帧的原图时），告知下游截图与检测框不是同一帧
+                complete_alert["screenshot_frame"] = alert_data["screenshot_frame"]
             
             # 🚀 使用预警合并管理器处理预警
             # 集成预警合并机制，包含：
@@ -1528,6 +1914,14 @@ class AITaskExecutor:
             )
             
             if success:
+                if frame_info is not None:
+                    # 预警截图帧距采集的延迟（含检测、预警调度、原图获取和上传）
+                    alert_latency = frame_info.age()
+                    with self._state_lock:
+                        processor = self.frame_processors.get(task.id)
+                    if processor is not None and hasattr(processor, 'record_latency'):
+                        processor.record_latency("alert", alert_latency)
+                    logger.info(f"预警截图帧 #{frame_info.generation} 距采集 {alert_latency:.2f}s")
                 logger.info(f"✅ 预警已添加到合并管理器: task_id={task.id}, camera_id={task.camera_id}, level={level}")
                 logger.info(f"预警详情: {alert_info['name']} - {alert_info['description']}")
                 logger.info(f"MinIO截图对象名: {minio_frame_object_name}")
@@ -1941,6 +2335,15 @@ class AITaskExecutor:
             else:
                 logger.info("当前没有正在执行的任务")
             
+            # 停止任务工作进程
+            if self.task_process_pool is not None:
+                try:
+                    self.task_process_pool.shutdown()
+                    logger.info("✅ 任务工作进程池已关闭")
+                except Exception as e:
+                    logger.error(f"❌ 关闭任务工作进程池失败: {str(e)}")
+                self.task_process_pool = None
+            
             # 停止调度器
             if hasattr(self, 'scheduler') and self.scheduler.running:
                 self.scheduler.shutdown(wait=True)
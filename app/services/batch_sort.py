@@ -0,0 +1,215 @@
+"""
+批量化的SORT跟踪器
+
+sort.Sort 为每条轨迹维护一个 filterpy KalmanFilter 对象，预测和更新都在Python循环中逐条做7x7的小矩阵运算，
+关联时还用 `d not in matched_indices` 逐个查找；画面中有上百个目标时仅跟踪就要数十毫秒。
+
+BatchSort 把所有轨迹的状态堆叠在numpy数组中（状态 N×7、协方差 N×7×7、计数器 N），
+预测、更新、输出和删除都是整批的数组运算；IoU矩阵一次计算，冲突时用线性分配求解。
+
+算法与 sort.Sort 逐步一致（相同的滤波参数、filterpy的Joseph形式协方差更新、相同的关联与新建轨迹顺序），
+轨迹ID同样来自进程内全局递增的计数器、输出时加1，输出行顺序也相同，可直接替换 Sort。
+"""
+from typing import Tuple
+
+import numpy as np
+
+# 匀速模型: 状态 [x, y, s, r, vx, vy, vs]，观测 [x, y, s, r]（中心点、面积、宽高比）
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_R = np.eye(4)
+_R[2:, 2:] *= 10.0
+_P0 = np.eye(7)
+_P0[4:, 4:] *= 1000.0  # 初始速度不可观测，给较大的不确定度
+_P0 *= 10.0
+_Q = np.eye(7)
+_Q[-1, -1] *= 0.01
+_Q[4:, 4:] *= 0.01
+_I7 = np.eye(7)
+
+
+def linear_assignment(cost_matrix: np.ndarray) -> np.ndarray:
+    """线性分配（优先使用lap，未安装时使用scipy），返回 (K, 2) 的 [行, 列] 匹配"""
+    try:
+        import lap
+        _, x, _ = lap.lapjv(cost_matrix, extend_cost=True)
+        return np.array([[row, col] for row, col in enumerate(x) if col >= 0], dtype=int).reshape(-1, 2)
+    except ImportError:
+        from scipy.optimize import linear_sum_assignment
+        rows, cols = linear_sum_assignment(cost_matrix)
+        return np.stack([rows, cols], axis=1)
+
+
+def iou_batch(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """两组 [x1, y1, x2, y2, ...] 边界框的IoU矩阵 (len(a), len(b))"""
+    a = boxes_a[:, None, :4]
+    b = boxes_b[None, :, :4]
+    w = np.maximum(0.0, np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]))
+    h = np.maximum(0.0, np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]))
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return inter / (area_a + area_b - inter)
+
+
+def boxes_to_z(boxes: np.ndarray) -> np.ndarray:
+    """[x1, y1, x2, y2] -> [x, y, s, r]（批量）"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.stack([boxes[:, 0] + w / 2.0, boxes[:, 1] + h / 2.0, w * h, w / h], axis=1)
+
+
+def x_to_boxes(x: np.ndarray) -> np.ndarray:
+    """状态 [x, y, s, r, ...] -> [x1, y1, x2, y2]（批量），面积与宽高比异号时为NaN"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w = np.sqrt(x[:, 2] * x[:, 3])
+        h = x[:, 2] / w
+    return np.stack([x[:, 0] - w / 2.0, x[:, 1] - h / 2.0, x[:, 0] + w / 2.0, x[:, 1] + h / 2.0], axis=1)
+
+
+def associate(detections: np.ndarray, predicted: np.ndarray,
+              iou_threshold: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    检测框与预测框关联
+
+    返回:
+        (matches, unmatched_detections): matches 为 (K, 2) 的 [检测索引, 轨迹索引]；
+        unmatched_detections 的顺序与 sort.associate_detections_to_trackers 相同
+        （先是未分配的检测，再是分配后IoU低于阈值的检测），新轨迹按此顺序分配ID
+    """
+    num_dets = len(detections)
+    if len(predicted) == 0:
+        return np.empty((0, 2), dtype=int), np.arange(num_dets)
+
+    iou_matrix = iou_batch(detections, predicted)
+    if min(iou_matrix.shape) > 0:
+        above = iou_matrix > iou_threshold
+        if above.sum(1).max() == 1 and above.sum(0).max() == 1:
+            matched = np.stack(np.nonzero(above), axis=1)
+        else:
+            matched = linear_assignment(-iou_matrix)
+    else:
+        matched = np.empty((0, 2), dtype=int)
+    matched = matched.astype(int).reshape(-1, 2)
+
+    assigned = np.zeros(num_dets, dtype=bool)
+    assigned[matched[:, 0]] = True
+    low_iou = iou_matrix[matched[:, 0], matched[:, 1]] < iou_threshold
+    unmatched = np.concatenate([np.flatnonzero(~assigned), matched[low_iou, 0]])
+    return matched[~low_iou], unmatched
+
+
+class BatchSort:
+    """状态堆叠在numpy数组中的SORT跟踪器，接口与 sort.Sort 相同"""
+
+    # 进程内全局的轨迹ID计数器（与 sort.KalmanBoxTracker.count 语义相同）
+    count = 0
+
+    def __init__(self, max_age: int = 1, min_hits: int = 3, iou_threshold: float = 0.3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.frame_count = 0
+
+        self.x = np.empty((0, 7))                   # 状态
+        self.P = np.empty((0, 7, 7))                # 协方差
+        self.ids = np.empty(0, dtype=np.int64)
+        self.time_since_update = np.empty(0, dtype=np.int64)
+        self.hits = np.empty(0, dtype=np.int64)
+        self.hit_streak = np.empty(0, dtype=np.int64)
+        self.age = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        """当前轨迹数"""
+        return len(self.ids)
+
+    def _keep(self, mask: np.ndarray):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.ids = self.ids[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+
+    def _predict(self) -> np.ndarray:
+        """所有轨迹前进一帧，返回预测框；预测框无效（NaN）的轨迹被删除"""
+        x = self.x
+        x[(x[:, 6] + x[:, 2]) <= 0, 6] = 0.0  # 面积不能预测为负
+        self.x = x @ _F.T
+        self.P = _F @ self.P @ _F.T + _Q
+        self.age += 1
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+
+        boxes = x_to_boxes(self.x)
+        valid = ~np.isnan(boxes).any(axis=1)
+        if not valid.all():
+            self._keep(valid)
+            boxes = boxes[valid]
+        return boxes
+
+    def _update(self, track_indices: np.ndarray, boxes: np.ndarray):
+        """用匹配的检测框更新轨迹（filterpy KalmanFilter.update 的批量形式）"""
+        x = self.x[track_indices]
+        P = self.P[track_indices]
+        y = boxes_to_z(boxes) - x[:, :4]
+        PHT = P[:, :, :4]
+        S = PHT[:, :4, :] + _R
+        K = PHT @ np.linalg.inv(S)
+        x = x + (K @ y[:, :, None])[:, :, 0]
+        I_KH = np.broadcast_to(_I7, P.shape).copy()
+        I_KH[:, :, :4] -= K
+        P = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ _R @ K.transpose(0, 2, 1)
+
+        self.x[track_indices] = x
+        self.P[track_indices] = P
+        self.time_since_update[track_indices] = 0
+        self.hits[track_indices] += 1
+        self.hit_streak[track_indices] += 1
+
+    def _create(self, boxes: np.ndarray):
+        """为未匹配的检测新建轨迹，按顺序分配ID"""
+        count = len(boxes)
+        x = np.zeros((count, 7))
+        x[:, :4] = boxes_to_z(boxes)
+        ids = np.arange(BatchSort.count, BatchSort.count + count, dtype=np.int64)
+        BatchSort.count += count
+        zeros = np.zeros(count, dtype=np.int64)
+
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(_P0, (count, 7, 7))])
+        self.ids = np.concatenate([self.ids, ids])
+        self.time_since_update = np.concatenate([self.time_since_update, zeros])
+        self.hits = np.concatenate([self.hits, zeros])
+        self.hit_streak = np.concatenate([self.hit_streak, zeros])
+        self.age = np.concatenate([self.age, zeros])
+
+    def update(self, dets: np.ndarray = np.empty((0, 5))) -> np.ndarray:
+        """
+        参数:
+            dets: 检测框 [[x1, y1, x2, y2, score], ...]，没有检测的帧也必须调用（传入 np.empty((0, 5))）
+
+        返回:
+            [[x1, y1, x2, y2, track_id], ...]，按轨迹创建顺序倒序（与 sort.Sort 相同）
+        """
+        self.frame_count += 1
+        dets = np.asarray(dets, dtype=np.float64).reshape(-1, 5)
+        predicted = self._predict()
+        matches, unmatched = associate(dets, predicted, self.iou_threshold)
+
+        if len(matches):
+            self._update(matches[:, 1], dets[matches[:, 0]])
+        if len(unmatched):
+            self._create(dets[unmatched])
+
+        output = (self.time_since_update < 1) & \
+            ((self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+        result = np.concatenate([x_to_boxes(self.x[output]), (self.ids[output] + 1)[:, None]], axis=1)[::-1]
+
+        alive = self.time_since_update <= self.max_age
+        if not alive.all():
+            self._keep(alive)
+        return result if len(result) else np.empty((0, 5))
@@ -182,7 +182,8 @@ class FrameBufferService:
         if frame_index is None:
             frame_index = buffer["frame_count"]
         
-        # 添加到缓冲区
+        # 添加到缓冲区：缓冲区最多持有 max_frames 帧、跨越数十秒，直接持有帧读取器的共享帧槽视图会长期占住帧槽，
+        # 使帧读取器退化为每帧新分配缓冲区；按采样帧率拷贝一次（默认2帧/秒）代价远小于此
         buffer["frames"].append(frame.copy())
         buffer["timestamps"].append(timestamp)
         buffer["frame_indices"].append(frame_index)
@@ -0,0 +1,324 @@
+"""
+取帧模式选择：按实测代价在持续连接模式和按需截图模式之间切换
+
+共享帧读取器原先按固定阈值选择模式（最小订阅间隔 >= ADAPTIVE_FRAME_CONNECTION_OVERHEAD_THRESHOLD 时按需截图），
+不同摄像头、不同WVP负载下两种模式的实际代价差别很大，固定阈值往往选错。
+
+本模块为每个摄像头记录实测代价，代价统一为"每秒占用的资源秒数":
+- 持续连接: 解码CPU占用（核数，按解码方式分别统计，关键帧解码明显更低），切入时另有一次性的拉流启动耗时
+- 按需截图: 截图耗时 / 取帧间隔（每次截图WVP都要向设备拉流并截取一帧，耗时近似反映这部分资源占用）
+按需截图模式下无法实测本摄像头的解码CPU和拉流启动耗时，使用其他摄像头实测值的平均（均无实测时使用配置的先验值）。
+
+模式选择规则:
+1. 截图耗时超过取帧间隔的 ADAPTIVE_FRAME_SNAPSHOT_MAX_LOAD 倍时按需截图跟不上，只能持续连接；拉流最近失败时持续连接不可用
+2. 尚未实测截图耗时时沿用固定阈值；持续连接模式下由监督线程定期试截一张图补全截图耗时
+3. 只有另一模式的代价比当前模式低 ADAPTIVE_FRAME_MODE_HYSTERESIS 以上才切换（切入持续连接时计入分摊的启动耗时），
+   避免代价接近时来回切换；定期复查触发的切换还需在当前模式驻留满 ADAPTIVE_FRAME_MODE_MIN_DWELL
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 实测值的指数移动平均系数
+_EWMA_ALPHA = 0.3
+# 可能的最短截图耗时（秒），持续连接折算后低于此值时按需截图不可能更便宜，不必试截图
+_MIN_SNAPSHOT_LATENCY = 0.05
+# 每个摄像头保留的决策记录数
+_MAX_DECISIONS = 20
+
+PERSISTENT = "persistent"
+ON_DEMAND = "on_demand"
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else current + _EWMA_ALPHA * (sample - current)
+
+
+# 所有摄像头实测值的移动平均，作为尚未实测的摄像头的估计
+_fleet_lock = threading.Lock()
+_fleet_decode_cpu: Dict[str, float] = {}
+_fleet_stream_startup: Optional[float] = None
+
+
+class FrameModeSelector:
+    """单个摄像头的取帧模式代价模型与切换决策"""
+
+    def __init__(self, camera_id: Any, connection_overhead_threshold: float):
+        """
+        参数:
+            camera_id: 摄像头ID
+            connection_overhead_threshold: 固定阈值（秒），尚未实测截图耗时时按此选择模式
+        """
+        self.camera_id = camera_id
+        self.connection_overhead_threshold = connection_overhead_threshold
+        self._lock = threading.Lock()
+
+        # 实测代价
+        self.snapshot_latency: Optional[float] = None   # 截图耗时（秒）
+        self.snapshot_measured_at = 0.0
+        self.snapshot_failed_at = 0.0                    # 最近一次截图失败时间（之后有成功则清零）
+        self.stream_startup: Optional[float] = None      # 拉流启动耗时（秒）
+        self.stream_failed_at = 0.0                      # 最近一次拉流失败时间（之后有成功则清零）
+        self.decode_cpu: Dict[str, float] = {}           # 解码方式 -> 解码CPU占用（核数）
+        self.gop_duration: Optional[float] = None
+
+        self.last_switch_time = 0.0
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=_MAX_DECISIONS)
+        self.stats = {
+            "evaluations": 0,
+            "switches": 0,
+            "held_by_hysteresis": 0,
+            "held_by_dwell": 0,
+            "snapshot_samples": 0,
+            "decode_samples": 0,
+        }
+
+    # ---------------------------------------------------------------- 实测
+
+    def record_snapshot(self, latency: float, success: bool):
+        """记录一次截图（含按需取帧、预取和试截图）"""
+        with self._lock:
+            now = time.time()
+            if success:
+                self.snapshot_latency = _ewma(self.snapshot_latency, latency)
+                self.snapshot_measured_at = now
+                self.snapshot_failed_at = 0.0
+                self.stats["snapshot_samples"] += 1
+            else:
+                self.snapshot_failed_at = now
+
+    def record_stream_start(self, seconds: float, success: bool):
+        """记录一次拉流启动（持续连接模式启动或断流重启）"""
+        with self._lock:
+            if success:
+                self.stream_startup = _ewma(self.stream_startup, seconds)
+                self.stream_failed_at = 0.0
+            else:
+                self.stream_failed_at = time.time()
+        if success:
+            global _fleet_stream_startup
+            with _fleet_lock:
+                _fleet_stream_startup = _ewma(_fleet_stream_startup, seconds)
+
+    def record_decode(self, decode_mode: str, cpu_seconds: float, wall_seconds: float,
+                      gop_duration: Optional[float] = None):
+        """记录一段时间内的解码CPU占用，无法统计CPU（累计为0）时忽略"""
+        if wall_seconds <= 0 or cpu_seconds <= 0:
+            return
+        usage = cpu_seconds / wall_seconds
+        with self._lock:
+            self.decode_cpu[decode_mode] = _ewma(self.decode_cpu.get(decode_mode), usage)
+            if gop_duration:
+                self.gop_duration = gop_duration
+            self.stats["decode_samples"] += 1
+        with _fleet_lock:
+            _fleet_decode_cpu[decode_mode] = _ewma(_fleet_decode_cpu.get(decode_mode), usage)
+
+    # ---------------------------------------------------------------- 代价估计
+
+    def _decode_cpu_for(self, interval: float) -> float:
+        """该取帧间隔下持续连接的解码CPU占用，本摄像头未实测时依次使用其他摄像头的实测平均和先验值"""
+        keyframe = settings.ADAPTIVE_FRAME_KEYFRAME_DECODE and self.gop_duration is not None \
+            and interval > self.gop_duration
+        preferred = ("keyframe", "full") if keyframe else ("full", "keyframe")
+        for decode_mode in preferred:
+            if decode_mode in self.decode_cpu:
+                return self.decode_cpu[decode_mode]
+        # 其他摄像头的实测值：不知道本摄像头的GOP，按全帧解码保守估计
+        with _fleet_lock:
+            if "full" in _fleet_decode_cpu:
+                return _fleet_decode_cpu["full"]
+        return settings.ADAPTIVE_FRAME_DECODE_CPU_PRIOR
+
+    def estimate(self, interval: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """估计给定取帧间隔下两种模式的代价与可行性"""
+        now = time.time() if now is None else now
+        retry_window = settings.ADAPTIVE_FRAME_MODE_MIN_DWELL
+        snapshot_latency = self.snapshot_latency
+        if snapshot_latency is None:
+            on_demand_cost = None
+            on_demand_feasible = interval >= self.connection_overhead_threshold
+        else:
+            on_demand_cost = snapshot_latency / interval
+            on_demand_feasible = snapshot_latency <= interval * settings.ADAPTIVE_FRAME_SNAPSHOT_MAX_LOAD
+        if self.snapshot_failed_at and now - self.snapshot_failed_at < retry_window:
+            on_demand_feasible = False
+        stream_startup = self.stream_startup
+        if stream_startup is None:
+            stream_startup = _fleet_stream_startup if _fleet_stream_startup is not None \
+                else settings.ADAPTIVE_FRAME_STREAM_STARTUP_PRIOR
+        return {
+            "interval": interval,
+            "persistent_cost": self._decode_cpu_for(interval),
+            "persistent_feasible": not (self.stream_failed_at and now - self.stream_failed_at < retry_window),
+            "stream_startup": stream_startup,
+            "on_demand_cost": on_demand_cost,
+            "on_demand_feasible": on_demand_feasible,
+        }
+
+    # ---------------------------------------------------------------- 决策
+
+    def choose(self, interval: float, current_mode: Optional[str], trigger: str,
+               now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        选择取帧模式
+
+        参数:
+            interval: 订阅者最小取帧间隔（秒）
+            current_mode: 当前模式，None表示尚未启动
+            trigger: 触发原因 start（启动）/ interval_change（订阅间隔变化）/ periodic（定期复查）/ fallback（启动失败回退）
+            now: 当前时间
+
+        返回:
+            决策记录 {"mode", "switch", "reason", 代价估计...}
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            costs = self.estimate(interval, now)
+            mode, reason = self._decide(costs, current_mode, trigger, now)
+            switch = current_mode is not None and mode != current_mode
+            decision = {
+                "time": now,
+                "trigger": trigger,
+                "from": current_mode,
+                "mode": mode,
+                "switch": switch,
+                "reason": reason,
+                **costs,
+            }
+            self.stats["evaluations"] += 1
+            if switch:
+                self.stats["switches"] += 1
+            # 定期复查结果不变时不记录，避免淹没有意义的决策
+            if trigger != "periodic" or switch or reason.startswith("驻留"):
+                self.decisions.append(decision)
+        if switch or current_mode is None:
+            logger.info(f"摄像头 {self.camera_id} 取帧模式决策({trigger}): {current_mode} -> {mode}，{reason}")
+        return decision
+
+    def _decide(self, costs: Dict[str, Any], current_mode: Optional[str], trigger: str, now: float):
+        persistent_cost = costs["persistent_cost"]
+        on_demand_cost = costs["on_demand_cost"]
+        feasible = {PERSISTENT: costs["persistent_feasible"], ON_DEMAND: costs["on_demand_feasible"]}
+
+        if current_mode is None:
+            if not feasible[ON_DEMAND]:
+                return PERSISTENT, "按需截图不可行（间隔小于截图耗时或阈值）"
+            if not feasible[PERSISTENT]:
+                return ON_DEMAND, "拉流最近失败"
+            if on_demand_cost is None:
+                return ON_DEMAND, "未实测截图耗时，按固定阈值"
+            startup_share = costs["stream_startup"] / settings.ADAPTIVE_FRAME_MODE_MIN_DWELL
+            if persistent_cost + startup_share < on_demand_cost:
+                return PERSISTENT, f"持续连接代价 {persistent_cost:.3f} < 按需截图 {on_demand_cost:.3f}"
+            return ON_DEMAND, f"按需截图代价 {on_demand_cost:.3f} <= 持续连接 {persistent_cost:.3f}"
+
+        other = ON_DEMAND if current_mode == PERSISTENT else PERSISTENT
+        if not feasible[current_mode]:
+            if feasible[other]:
+                return other, f"{current_mode} 不可行"
+            return current_mode, "两种模式均不可行，保持当前模式"
+        if not feasible[other]:
+            return current_mode, f"{other} 不可行"
+        if on_demand_cost is None:
+            return current_mode, "截图耗时未实测，保持当前模式"
+
+        if current_mode == PERSISTENT:
+            current_cost, other_cost = persistent_cost, on_demand_cost
+        else:
+            startup_share = costs["stream_startup"] / settings.ADAPTIVE_FRAME_MODE_MIN_DWELL
+            current_cost, other_cost = on_demand_cost, persistent_cost + startup_share
+        if other_cost >= current_cost * (1 - settings.ADAPTIVE_FRAME_MODE_HYSTERESIS):
+            if other_cost < current_cost:
+                self.stats["held_by_hysteresis"] += 1
+            return current_mode, f"{current_mode} 代价 {current_cost:.3f}，{other} 代价 {other_cost:.3f}，未超过滞回"
+        if trigger == "periodic" and now - self.last_switch_time < settings.ADAPTIVE_FRAME_MODE_MIN_DWELL:
+            self.stats["held_by_dwell"] += 1
+            return current_mode, f"驻留未满 {settings.ADAPTIVE_FRAME_MODE_MIN_DWELL:.0f}s，暂不切换到 {other}"
+        return other, f"{other} 代价 {other_cost:.3f} < {current_mode} 代价 {current_cost:.3f}"
+
+    def mark_switched(self, now: Optional[float] = None):
+        """模式切换（或首次启动）完成后调用，开始计算驻留时间"""
+        self.last_switch_time = time.time() if now is None else now
+
+    def needs_snapshot_probe(self, interval: float, current_mode: Optional[str], now: Optional[float] = None) -> bool:
+        """持续连接模式下截图耗时未实测或已过期，且按需截图有可能更便宜时，需要试截一张图"""
+        if current_mode != PERSISTENT:
+            return False
+        now = time.time() if now is None else now
+        if self.snapshot_latency is not None \
+                and now - self.snapshot_measured_at < settings.ADAPTIVE_FRAME_SNAPSHOT_PROBE_INTERVAL:
+            return False
+        if self.snapshot_failed_at and now - self.snapshot_failed_at < settings.ADAPTIVE_FRAME_SNAPSHOT_PROBE_INTERVAL:
+            return False
+        # 持续连接代价折算为每个取帧间隔内的资源秒数，低于最短截图耗时则按需截图不可能更便宜
+        return self._decode_cpu_for(interval) * interval > _MIN_SNAPSHOT_LATENCY
+
+    def get_stats(self, interval: Optional[float] = None) -> Dict[str, Any]:
+        """实测代价、当前间隔下的代价估计和最近的决策记录"""
+        with self._lock:
+            result = {
+                "snapshot_latency": self.snapshot_latency,
+                "stream_startup": self.stream_startup,
+                "decode_cpu": dict(self.decode_cpu),
+                "gop_duration": self.gop_duration,
+                "last_switch_time": self.last_switch_time,
+                "stats": dict(self.stats),
+                "decisions": list(self.decisions),
+            }
+            if interval:
+                result["estimate"] = self.estimate(interval)
+            return result
+
+
+# 自检：按实测代价在短间隔和长间隔下选择更便宜的模式，代价接近时不来回切换
+if __name__ == "__main__":
+    settings.ADAPTIVE_FRAME_MODE_MIN_DWELL = 60.0
+    selector = FrameModeSelector(camera_id=1, connection_overhead_threshold=30.0)
+
+    # 未实测时沿用固定阈值
+    assert selector.choose(5.0, None, "start")["mode"] == PERSISTENT
+    assert selector.choose(60.0, None, "start")["mode"] == ON_DEMAND
+
+    # 实测：截图 0.4s，全帧解码 0.05 核，拉流启动 1.5s
+    selector.record_snapshot(0.4, True)
+    selector.record_decode("full", 0.5, 10.0)
+    selector.record_stream_start(1.5, True)
+    for interval, expected in ((1.0, PERSISTENT), (5.0, PERSISTENT), (20.0, ON_DEMAND), (120.0, ON_DEMAND)):
+        decision = selector.choose(interval, None, "start")
+        assert decision["mode"] == expected, decision
+        print(f"间隔 {interval:6.1f}s -> {decision['mode']:<10} {decision['reason']}")
+
+    # 截图耗时超过间隔的上限时按需截图不可行
+    decision = selector.choose(0.3, ON_DEMAND, "interval_change")
+    assert decision["switch"] and decision["mode"] == PERSISTENT, decision
+
+    # 滞回：代价接近（0.4/7.5 ≈ 0.053 vs 0.05）时不切换
+    selector.mark_switched(now=0.0)
+    decision = selector.choose(7.5, PERSISTENT, "interval_change", now=1000.0)
+    assert not decision["switch"], decision
+
+    # 驻留：定期复查触发的切换需驻留满最短时间，订阅间隔变化触发的切换不受限制
+    selector.mark_switched(now=1000.0)
+    assert not selector.choose(60.0, PERSISTENT, "periodic", now=1010.0)["switch"]
+    assert selector.choose(60.0, PERSISTENT, "periodic", now=1100.0)["switch"]
+    assert selector.choose(60.0, PERSISTENT, "interval_change", now=1010.0)["switch"]
+
+    # 关键帧解码降低持续连接代价，长间隔下也可能优于截图
+    selector.record_decode("keyframe", 0.01, 10.0, gop_duration=2.0)
+    decision = selector.choose(8.0, ON_DEMAND, "interval_change", now=2000.0)
+    assert decision["switch"] and decision["mode"] == PERSISTENT, decision
+    print(f"关键帧解码后间隔 8.0s -> {decision['mode']}，{decision['reason']}")
+
+    # 未实测的摄像头使用其他摄像头的实测平均
+    other = FrameModeSelector(camera_id=2, connection_overhead_threshold=30.0)
+    assert other.estimate(10.0)["persistent_cost"] == selector.decode_cpu["full"]
+
+    assert selector.needs_snapshot_probe(120.0, PERSISTENT, now=selector.snapshot_measured_at + 10000)
+    print("自检通过，决策记录数:", len(selector.get_stats()["decisions"]))
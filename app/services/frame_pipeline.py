@@ -0,0 +1,434 @@
+"""
+检测流水线：单个任务内多帧并发检测的顺序协调与分阶段计时
+
+任务的检测线程原先逐帧处理：阻塞在技能的 process 中等待Triton返回，期间帧读取器早已前进，
+网络往返期间GPU处于空闲。流水线允许每个任务同时有多帧在途（流水线深度），
+使不同帧的预处理、推理RPC和后处理相互重叠。
+
+并发带来两个顺序问题，由 PipelineSequencer 解决：
+1. 有状态的步骤（如跟踪器更新）必须按帧顺序执行：技能在 ordered_section() 中执行这些步骤，
+   一帧可依次进入多个有序区（如先更新跟踪器、再更新越线状态），有序区按名称（未命名的按进入次序）区分，
+   第k帧进入某个有序区前会等待更早的帧都通过同一有序区（或处理结束）
+2. 结果按帧顺序交付：较新的帧已经交付后，较旧帧的结果视为过期直接丢弃
+
+分阶段计时：帧处理期间通过 add_stage_time() 记录预处理、推理等阶段耗时，
+StageTimer 汇总各阶段平均耗时、分位数和直方图，用于验证流水线的收益。
+
+帧采集信息：FrameInfo 记录帧代次（帧序号）和采集时间，随帧从读取器经过处理器、技能到预警和推流，
+据此统计各阶段距采集的延迟；技能在处理期间可通过 current_frame_info() 取得当前帧的采集信息。
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 等待有序区的最长时间（秒），超时后不再等待，避免异常帧阻塞整个任务
+_ORDERED_WAIT_TIMEOUT = 5.0
+# 耗时直方图的桶上界（毫秒），最后一个桶收集超过最大上界的样本
+_HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class FrameInfo(NamedTuple):
+    """帧的采集信息"""
+
+    generation: Optional[int]   # 帧代次（进程内单调递增，作为帧序号）
+    capture_time: float         # 采集时间戳（time.time()，解码器取得该帧或截图请求发出的时间）
+
+    def age(self, now: Optional[float] = None) -> float:
+        """距采集的时间（秒）"""
+        return (time.time() if now is None else now) - self.capture_time
+
+
+class _FrameTicket:
+    """单帧在流水线中的状态"""
+
+    __slots__ = ("sequencer", "seq", "depth", "sections", "finished", "stages", "lock")
+
+    def __init__(self, sequencer: "PipelineSequencer", seq: int):
+        self.sequencer = sequencer
+        self.seq = seq
+        self.depth = 0          # 有序区重入深度
+        self.sections: Dict[Optional[str], int] = {}    # 各名称已进入的（最外层）有序区次数
+        self.finished = False   # 帧是否已处理结束
+        self.stages: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+
+# 当前线程（及执行图派发的子任务）正在处理的帧
+_current_ticket: contextvars.ContextVar = contextvars.ContextVar("pipeline_frame_ticket", default=None)
+_current_frame_info: contextvars.ContextVar = contextvars.ContextVar("pipeline_frame_info", default=None)
+
+
+@contextmanager
+def frame_info_scope(frame_info: Optional[FrameInfo]):
+    """声明当前正在处理的帧的采集信息"""
+    token = _current_frame_info.set(frame_info)
+    try:
+        yield
+    finally:
+        _current_frame_info.reset(token)
+
+
+def current_frame_info() -> Optional[FrameInfo]:
+    """当前正在处理的帧的采集信息，不在帧处理中或来源未提供时为None"""
+    return _current_frame_info.get()
+
+
+@contextmanager
+def ordered_section(name: Optional[str] = None):
+    """
+    有序区：按帧顺序执行有状态步骤（跟踪器更新、帧间差分等）
+
+    不在流水线帧处理中（如单帧调用、流水线深度为1）时直接执行。
+    同一帧内可重入（嵌套的有序区不单独排序）；同一帧依次进入的多个有序区分别排序，
+    由 (名称, 该名称在帧内的进入次数) 区分：某帧进入有序区时等待更早的帧都通过同一有序区或处理结束。
+    各帧不一定都进入的有序区（如只在有检测时更新的状态）应命名，避免与其他有序区错位。
+
+    Args:
+        name: 有序区名称，同一名称的有序区之间按帧顺序执行
+    """
+    ticket = _current_ticket.get()
+    if ticket is None or ticket.depth > 0:
+        if ticket is not None:
+            ticket.depth += 1
+        try:
+            yield
+        finally:
+            if ticket is not None:
+                ticket.depth -= 1
+        return
+
+    sequencer = ticket.sequencer
+    occurrence = ticket.sections.get(name, 0)
+    ticket.sections[name] = occurrence + 1
+    key = (name, occurrence)
+    wait_start = time.perf_counter()
+    sequencer._wait_turn(key, ticket.seq)
+    add_stage_time("ordered_wait", time.perf_counter() - wait_start)
+
+    ticket.depth += 1
+    try:
+        yield
+    finally:
+        ticket.depth -= 1
+        sequencer._mark_section_passed(key, ticket.seq)
+
+
+def add_stage_time(stage: str, seconds: float):
+    """累加当前帧某个阶段的耗时，不在流水线帧处理中时忽略"""
+    ticket = _current_ticket.get()
+    if ticket is None:
+        return
+    with ticket.lock:
+        ticket.stages[stage] = ticket.stages.get(stage, 0.0) + seconds
+
+
+class PipelineSequencer:
+    """单个任务的流水线顺序协调器"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_seq = 0
+        self._done_turn = 0         # 最小的尚未处理结束的帧序号
+        self._done = set()          # 已处理结束、但序号大于 _done_turn 的帧
+        self._turns: Dict[tuple, int] = {}      # 各有序区当前允许进入的帧序号
+        self._passed: Dict[tuple, set] = {}     # 已通过各有序区、但尚未轮到的帧序号
+        self._deliver_lock = threading.Lock()
+        self._last_delivered = -1
+
+        self.stats = {
+            "frames": 0,
+            "delivered": 0,
+            "stale_dropped": 0,
+            "ordered_timeouts": 0,
+        }
+
+    def next_seq(self) -> int:
+        """分配下一个帧序号，调用方需保证分配顺序与取帧顺序一致"""
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            self.stats["frames"] += 1
+            return seq
+
+    @contextmanager
+    def frame(self, seq: int):
+        """
+        声明当前正在处理的帧，退出时该帧视为已通过所有有序区
+
+        返回:
+            该帧的阶段耗时字典（可在退出后读取）
+        """
+        ticket = _FrameTicket(self, seq)
+        token = _current_ticket.set(ticket)
+        try:
+            yield ticket.stages
+        finally:
+            _current_ticket.reset(token)
+            self._mark_finished(ticket)
+
+    def _section(self, key: tuple):
+        # 新出现的有序区：已处理结束的帧都视为已通过
+        if key not in self._turns:
+            self._turns[key] = self._done_turn
+            self._passed[key] = set()
+            self._advance(key)
+
+    def _advance(self, key: tuple):
+        turn = max(self._turns[key], self._done_turn)
+        passed = self._passed[key]
+        while turn in passed or turn in self._done:
+            passed.discard(turn)
+            turn += 1
+        self._turns[key] = turn
+
+    def _wait_turn(self, key: tuple, seq: int):
+        with self._cond:
+            self._section(key)
+            if not self._cond.wait_for(lambda: self._turns[key] >= seq, timeout=_ORDERED_WAIT_TIMEOUT):
+                self.stats["ordered_timeouts"] += 1
+                logger.warning(f"帧 {seq} 等待有序区 {key} 超时（当前轮次 {self._turns[key]}），不再等待")
+
+    def _mark_section_passed(self, key: tuple, seq: int):
+        with self._cond:
+            self._section(key)
+            if seq < self._turns[key]:
+                return
+            self._passed[key].add(seq)
+            self._advance(key)
+            self._cond.notify_all()
+
+    def _mark_finished(self, ticket: _FrameTicket):
+        with self._cond:
+            if ticket.finished:
+                return
+            ticket.finished = True
+            if ticket.seq < self._done_turn:
+                return
+            self._done.add(ticket.seq)
+            while self._done_turn in self._done:
+                self._done.discard(self._done_turn)
+                self._done_turn += 1
+            for key in self._turns:
+                self._advance(key)
+            self._cond.notify_all()
+
+    def is_stale(self, seq: int) -> bool:
+        """是否已有更新的帧交付"""
+        return seq < self._last_delivered
+
+    def deliver(self, seq: int, deliver_func: Callable[[], None]) -> bool:
+        """
+        按帧顺序交付结果
+
+        参数:
+            seq: 帧序号
+            deliver_func: 实际交付结果的函数，在交付锁内执行
+
+        返回:
+            是否已交付；更新的帧已交付时丢弃并返回False
+        """
+        with self._deliver_lock:
+            if seq < self._last_delivered:
+                self.stats["stale_dropped"] += 1
+                return False
+            self._last_delivered = seq
+            deliver_func()
+            self.stats["delivered"] += 1
+            return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取流水线统计信息"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats["in_flight"] = self._next_seq - self._done_turn - len(self._done)
+        return stats
+
+
+class StageTimer:
+    """各阶段耗时统计（平均值、最大值、直方图，以及最近若干帧的分位数）"""
+
+    def __init__(self, window: int = 1024):
+        """
+        参数:
+            window: 计算分位数时保留的最近样本数
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._totals: Dict[str, float] = {}
+        self._maxima: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self._histograms: Dict[str, List[int]] = {}
+
+    def record(self, stages: Dict[str, float]):
+        """记录一帧的各阶段耗时（秒）"""
+        with self._lock:
+            for stage, seconds in stages.items():
+                self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+                self._maxima[stage] = max(self._maxima.get(stage, 0.0), seconds)
+                self._counts[stage] = self._counts.get(stage, 0) + 1
+                samples = self._samples.get(stage)
+                if samples is None:
+                    samples = self._samples[stage] = deque(maxlen=self.window)
+                samples.append(seconds)
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = [0] * (len(_HISTOGRAM_BOUNDS_MS) + 1)
+                histogram[bisect.bisect_left(_HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """各阶段平均/分位数/最大耗时（毫秒），histogram 为各桶（上界毫秒 -> 样本数）的计数"""
+        with self._lock:
+            stats = {}
+            for stage in self._totals:
+                p50, p99 = np.percentile(np.fromiter(self._samples[stage], dtype=np.float64), [50, 99])
+                stats[stage] = {
+                    "avg_ms": self._totals[stage] / self._counts[stage] * 1000,
+                    "p50_ms": p50 * 1000,
+                    "p99_ms": p99 * 1000,
+                    "max_ms": self._maxima[stage] * 1000,
+                    "count": self._counts[stage],
+                    "histogram": {
+                        **{f"le_{bound}ms": n for bound, n in zip(_HISTOGRAM_BOUNDS_MS, self._histograms[stage])},
+                        f"gt_{_HISTOGRAM_BOUNDS_MS[-1]}ms": self._histograms[stage][-1],
+                    },
+                }
+            return stats
+
+
+# 基准测试代码：模拟慢速Triton，对比不同流水线深度下单任务的检测帧率
+if __name__ == "__main__":
+    import queue
+
+    rpc_latency = 0.030     # 推理RPC往返（秒）
+    cpu_stage = 0.004       # 预处理/后处理CPU耗时（秒）
+    num_frames = 60
+
+    def busy(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    class FakeSkill:
+        """模拟技能：预处理 -> 推理RPC -> 后处理 -> 有序的跟踪器更新"""
+
+        def __init__(self):
+            self.tracked = []
+
+        def process(self, frame_id):
+            start = time.perf_counter()
+            busy(cpu_stage)
+            add_stage_time("preprocess", time.perf_counter() - start)
+            start = time.perf_counter()
+            time.sleep(rpc_latency)
+            add_stage_time("inference", time.perf_counter() - start)
+            busy(cpu_stage)
+            with ordered_section():
+                self.tracked.append(frame_id)
+            return frame_id
+
+    for depth in (1, 2, 4):
+        skill = FakeSkill()
+        sequencer = PipelineSequencer()
+        timer = StageTimer()
+        frames = queue.Queue()
+        dequeue_lock = threading.Lock()
+        delivered = []
+
+        for frame_id in range(num_frames):
+            frames.put((frame_id, time.perf_counter()))
+
+        def worker():
+            while True:
+                with dequeue_lock:
+                    try:
+                        frame_id, put_time = frames.get_nowait()
+                    except queue.Empty:
+                        return
+                    seq = sequencer.next_seq()
+                process_start = time.perf_counter()
+                with sequencer.frame(seq) as stages:
+                    result = skill.process(frame_id)
+                process_time = time.perf_counter() - process_start
+                stages["postprocess"] = max(0.0, process_time - sum(stages.values()))
+                timer.record(stages)
+                sequencer.deliver(seq, lambda: delivered.append(result))
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(depth)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        assert skill.tracked == list(range(num_frames)), "有序区执行顺序错误"
+        assert delivered == sorted(delivered), "结果交付顺序错误"
+        stage_text = ", ".join(f"{k}={v['p50_ms']:.1f}/{v['p99_ms']:.1f}ms" for k, v in timer.get_stats().items())
+        print(f"流水线深度={depth}: {num_frames / elapsed:6.1f} fps, "
+              f"交付={len(delivered)}, 过期丢弃={sequencer.stats['stale_dropped']} | p50/p99: {stage_text}")
+
+    # 每帧依次进入两个有序区（跟踪器更新、越线状态更新，部分帧跳过前者），两段之间的耗时随机，
+    # 两个有序区都应按帧顺序执行，且同一有序区不会被两帧同时进入
+    import random
+
+    class TwoSectionSkill:
+        def __init__(self):
+            self.logs = ([], [])
+            self.active = [0, 0]
+            self.overlaps = 0
+            self.lock = threading.Lock()
+
+        def section(self, index, frame_id):
+            with ordered_section(("tracking", "crossing")[index]):
+                with self.lock:
+                    self.active[index] += 1
+                    self.overlaps += self.active[index] > 1
+                time.sleep(random.uniform(0, 0.002))
+                self.logs[index].append(frame_id)
+                with self.lock:
+                    self.active[index] -= 1
+
+        def process(self, frame_id):
+            time.sleep(random.uniform(0, 0.004))
+            if frame_id % 7 != 3:
+                self.section(0, frame_id)
+            time.sleep(random.uniform(0, 0.004))
+            self.section(1, frame_id)
+
+    for depth in (2, 4):
+        skill = TwoSectionSkill()
+        sequencer = PipelineSequencer()
+        frame_ids = iter(range(200))
+        dequeue_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with dequeue_lock:
+                    frame_id = next(frame_ids, None)
+                    if frame_id is None:
+                        return
+                    seq = sequencer.next_seq()
+                with sequencer.frame(seq):
+                    skill.process(frame_id)
+
+        threads = [threading.Thread(target=worker) for _ in range(depth)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert skill.logs[0] == [i for i in range(200) if i % 7 != 3], "第1个有序区执行顺序错误"
+        assert skill.logs[1] == list(range(200)), "第2个有序区执行顺序错误"
+        assert skill.overlaps == 0, "同一有序区被多帧同时进入"
+        assert sequencer.get_stats()["in_flight"] == 0 and sequencer.stats["ordered_timeouts"] == 0
+        print(f"流水线深度={depth}: 每帧两个有序区，200帧均按帧顺序执行")
+    print("检查通过")
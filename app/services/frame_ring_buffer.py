@@ -0,0 +1,287 @@
+"""
+零拷贝帧环形缓冲区：帧读取器与各任务之间共享的预分配帧槽
+
+帧读取器原先在写入最新帧时拷贝一次、每个任务取帧时再拷贝一次，1080p下每路摄像头每秒数百MB的内存拷贝。
+环形缓冲区改为:
+1. 生产者（解码线程）从 acquire() 取得一个可写帧槽，解码/管道数据直接写入帧槽，publish() 后分配单调递增的代次
+2. 消费者通过 get_latest() 取得最新帧的只读视图和代次，不做拷贝，可以跨线程、跨队列持有
+3. 帧槽只有在没有任何视图引用时才会被复用：numpy视图（包括视图的切片、再视图）都以帧槽数组为base，
+   帧槽数组的引用计数即为在途视图数，消费者无需显式释放，视图被回收后帧槽自动可用
+   （依赖CPython的 sys.getrefcount 语义；其他解释器上帧槽不复用，每帧新分配缓冲区，正确性不受影响）
+4. 帧槽都被占用时按需新增帧槽（不超过上限），超过上限时分配临时缓冲区，保证生产者不会覆盖在途帧
+
+帧槽只在所有视图都释放后才能复用，零拷贝的前提是消费者只短暂持有视图（检测、队列中的少量在途帧）。
+需要修改帧或长期缓存帧的消费者（绘制检测框、帧缓冲区等）应自行拷贝，否则帧槽被占满后每帧都会
+退化为新分配临时缓冲区（见 stats["overflow_allocations"]）。
+"""
+import itertools
+import logging
+import platform
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 帧槽数组只被帧槽对象引用时 sys.getrefcount 的返回值（帧槽属性 + 调用参数）
+_IDLE_REFCOUNT = 2
+# 只有CPython的引用计数能准确反映在途视图数，其他解释器上不复用帧槽
+_REFCOUNT_RELIABLE = platform.python_implementation() == "CPython"
+
+
+class _FrameSlot:
+    """预分配的帧槽"""
+
+    __slots__ = ("array", "writing", "generation", "timestamp")
+
+    def __init__(self, shape: Tuple[int, ...], dtype):
+        self.array = np.empty(shape, dtype=dtype)
+        self.writing = False     # 已交给生产者，尚未发布或放弃
+        self.generation = None
+        self.timestamp = 0.0
+
+    def is_idle(self) -> bool:
+        """没有生产者在写入，也没有任何视图引用"""
+        return _REFCOUNT_RELIABLE and not self.writing and sys.getrefcount(self.array) <= _IDLE_REFCOUNT
+
+
+class FrameRingBuffer:
+    """多生产者/多消费者的零拷贝帧环形缓冲区"""
+
+    def __init__(self, slots: int = 4, max_slots: int = 16, generation_counter: Optional[Iterator[int]] = None):
+        """
+        Args:
+            slots: 初始帧槽数（首次acquire时按帧尺寸分配）
+            max_slots: 帧槽上限，消费者持有的帧过多时超出部分使用临时缓冲区
+            generation_counter: 代次计数器，默认从1开始；多个缓冲区共用同一计数器时代次在进程内唯一
+        """
+        self.initial_slots = max(2, int(slots))
+        self.max_slots = max(self.initial_slots, int(max_slots))
+        self._generation_counter = generation_counter or itertools.count(1)
+        self._slots: List[_FrameSlot] = []
+        self._writing: Dict[int, _FrameSlot] = {}  # id(帧槽数组) -> 生产者正在写入的帧槽
+        self._latest: Optional[np.ndarray] = None   # 最新帧的只读视图（同时使该帧槽保持占用）
+        self._latest_generation = None
+        self._latest_timestamp = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "frames_published": 0,
+            "bytes_published": 0,
+            "slot_reuses": 0,         # 复用已有帧槽的次数
+            "slot_allocations": 0,    # 新分配帧槽的次数（含尺寸变化重新分配）
+            "overflow_allocations": 0,  # 帧槽全部被占用且达到上限时分配临时缓冲区的次数
+        }
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        取得一个可写帧槽，生产者写入后调用 publish() 发布，或调用 discard() 放弃
+
+        Args:
+            shape: 帧形状，如 (高, 宽, 3)
+            dtype: 数据类型
+
+        Returns:
+            可写的帧槽数组（内容未初始化）
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            slot = None
+            resize_candidate = None
+            for candidate in self._slots:
+                if not candidate.is_idle():
+                    continue
+                if candidate.array.shape == shape and candidate.array.dtype == dtype:
+                    slot = candidate
+                    break
+                if resize_candidate is None:
+                    resize_candidate = candidate
+
+            if slot is not None:
+                self.stats["slot_reuses"] += 1
+            elif resize_candidate is not None and len(self._slots) >= self.initial_slots:
+                # 帧尺寸变化（如调整缩放解码尺寸）：旧尺寸的空闲帧槽按新尺寸重新分配
+                slot = resize_candidate
+                slot.array = np.empty(shape, dtype=dtype)
+                self.stats["slot_allocations"] += 1
+            elif len(self._slots) < self.max_slots:
+                slot = _FrameSlot(shape, dtype)
+                self._slots.append(slot)
+                self.stats["slot_allocations"] += 1
+            else:
+                # 达到上限：使用不属于缓冲区的临时帧槽，发布后由视图的生命周期管理
+                slot = _FrameSlot(shape, dtype)
+                self.stats["overflow_allocations"] += 1
+
+            slot.writing = True
+            self._writing[id(slot.array)] = slot
+            return slot.array
+
+    def publish(self, buffer: np.ndarray, timestamp: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """
+        发布生产者写好的帧槽，成为最新帧
+
+        Args:
+            buffer: acquire() 返回的帧槽数组
+            timestamp: 帧时间戳，默认当前时间
+
+        Returns:
+            (只读视图, 代次)
+        """
+        with self._lock:
+            slot = self._writing.pop(id(buffer), None)
+            if slot is None or slot.array is not buffer:
+                raise ValueError("只能发布由 acquire() 取得的帧槽")
+            view = buffer.view()
+            view.flags.writeable = False
+            slot.generation = next(self._generation_counter)
+            slot.timestamp = time.time() if timestamp is None else timestamp
+            slot.writing = False
+            self._latest = view
+            self._latest_generation = slot.generation
+            self._latest_timestamp = slot.timestamp
+            self.stats["frames_published"] += 1
+            self.stats["bytes_published"] += buffer.nbytes
+            return view, slot.generation
+
+    def discard(self, buffer: np.ndarray):
+        """放弃未发布的帧槽（如管道读到不完整的帧）"""
+        with self._lock:
+            slot = self._writing.pop(id(buffer), None)
+            if slot is not None:
+                slot.writing = False
+
+    def get_latest(self) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """
+        获取最新帧的只读视图及代次（不拷贝）
+
+        Returns:
+            (只读视图, 代次)，尚无帧时返回 (None, None)
+        """
+        with self._lock:
+            return self._latest, self._latest_generation
+
+    def get_latest_timestamp(self) -> float:
+        """最新帧的时间戳，尚无帧时为0"""
+        return self._latest_timestamp
+
+    def clear(self):
+        """清除最新帧（流断开时调用），在途视图不受影响"""
+        with self._lock:
+            self._latest = None
+            self._latest_generation = None
+            self._latest_timestamp = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            in_use = sum(1 for slot in self._slots if not slot.is_idle())
+            return {
+                **self.stats,
+                "slots": len(self._slots),
+                "slots_in_use": in_use,
+                "slot_bytes": sum(slot.array.nbytes for slot in self._slots),
+            }
+
+
+# 测试代码：多生产者/多消费者并发读写，验证在途视图不会被覆盖、代次单调递增
+if __name__ == "__main__":
+    import random
+
+    ring = FrameRingBuffer(slots=3, max_slots=8)
+    shape = (270, 480, 3)
+    duration = 3.0
+    stop_event = threading.Event()
+    errors: List[str] = []
+    consumer_stats: Dict[int, Dict[str, int]] = {}
+
+    def producer(producer_id: int):
+        """每帧写入 (生产者编号, 帧号) 组成的标记，整帧内容一致"""
+        frame_no = 0
+        while not stop_event.is_set():
+            buffer = ring.acquire(shape)
+            frame_no += 1
+            marker = (producer_id * 37 + frame_no) % 251
+            buffer[...] = marker
+            buffer[0, 0, 0] = producer_id
+            if random.random() < 0.05:
+                ring.discard(buffer)
+                continue
+            ring.publish(buffer)
+            time.sleep(random.uniform(0, 0.002))
+
+    def consumer(consumer_id: int):
+        """持有一段时间的视图，期间内容必须保持不变；部分视图放入队列长期持有"""
+        held = []
+        last_generation = 0
+        checked = 0
+        while not stop_event.is_set():
+            frame, generation = ring.get_latest()
+            if frame is None:
+                time.sleep(0.001)
+                continue
+            if generation < last_generation:
+                errors.append(f"消费者{consumer_id} 代次回退: {last_generation} -> {generation}")
+            last_generation = generation
+            if frame.flags.writeable:
+                errors.append("get_latest 返回了可写视图")
+            crop = frame[10:100, 20:200]  # 视图的切片同样占用帧槽
+            expected = int(frame[1, 1, 0])
+            time.sleep(random.uniform(0, 0.003))
+            if not (np.all(crop == expected) and np.all(frame[1:] == expected)):
+                errors.append(f"消费者{consumer_id} 持有的帧 {generation} 被覆盖")
+            checked += 1
+            held.append((crop, expected))
+            if len(held) > random.randint(1, 6):
+                old_crop, old_expected = held.pop(0)
+                if not np.all(old_crop == old_expected):
+                    errors.append(f"消费者{consumer_id} 长期持有的帧被覆盖")
+        consumer_stats[consumer_id] = {"checked": checked}
+
+    threads = [threading.Thread(target=producer, args=(i,)) for i in range(1, 3)]
+    threads += [threading.Thread(target=consumer, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    stats = ring.get_stats()
+    print("消费者校验帧数:", {k: v["checked"] for k, v in consumer_stats.items()})
+    print("缓冲区统计:", stats)
+    assert not errors, errors[:5]
+    assert stats["frames_published"] > 0 and stats["slots"] <= ring.max_slots
+
+    # 所有视图释放后帧槽全部可复用，不再分配
+    del threads
+    allocations = stats["slot_allocations"] + stats["overflow_allocations"]
+    ring.clear()
+    for _ in range(100):
+        ring.publish(ring.acquire(shape))
+    stats = ring.get_stats()
+    assert stats["slot_allocations"] + stats["overflow_allocations"] == allocations, stats
+
+    # 上面的并发测试中消费者各自长期持有多达6个视图，帧槽被占满后大量临时分配属于预期；
+    # 消费者只短暂持有视图（每个消费者最多同时持有2帧）时，稳态下应全部复用帧槽
+    steady = FrameRingBuffer(slots=3, max_slots=8)
+    holders = [[] for _ in range(3)]
+    for _ in range(20):
+        steady.publish(steady.acquire(shape))
+    warm = dict(steady.get_stats())
+    for i in range(1000):
+        steady.publish(steady.acquire(shape))
+        frame, _ = steady.get_latest()
+        held = holders[i % len(holders)]
+        held.append(frame)
+        if len(held) > 2:
+            held.pop(0)
+    del frame, held
+    stats = steady.get_stats()
+    print("短暂持有视图时的缓冲区统计:", stats)
+    assert stats["overflow_allocations"] == warm["overflow_allocations"], stats
+    assert stats["slot_reuses"] - warm["slot_reuses"] >= 990, stats
+    print("测试通过")
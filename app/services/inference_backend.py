@@ -0,0 +1,313 @@
+"""
+推理后端抽象
+
+技能统一通过 TritonClient.infer 推理，TritonClient 按模型配置选择后端：
+- triton: 默认，经gRPC发送到Triton服务器（含微批处理、绑定计划缓存）
+- onnxruntime: 进程内ONNX Runtime CPU推理，用于没有GPU的小型边缘设备，省去Triton往返
+
+非Triton后端实现 InferenceBackend 接口，输入输出格式与Triton一致（输入名称 -> ndarray，输出名称 -> ndarray），
+元数据也按Triton的JSON格式返回，TritonClient 的绑定计划、批量推理等逻辑无需区分后端。
+
+本模块不依赖全局配置，后端参数通过构造参数注入，便于独立测试和基准测试。
+"""
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ONNX类型 -> Triton数据类型
+_ONNX_TO_TRITON_DTYPE = {
+    "tensor(float)": "FP32",
+    "tensor(float16)": "FP16",
+    "tensor(double)": "FP64",
+    "tensor(int64)": "INT64",
+    "tensor(int32)": "INT32",
+    "tensor(int8)": "INT8",
+    "tensor(uint8)": "UINT8",
+    "tensor(bool)": "BOOL",
+}
+
+# ONNX类型 -> numpy数据类型（输入类型不一致时转换）
+_ONNX_TO_NUMPY_DTYPE = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int64)": np.int64,
+    "tensor(int32)": np.int32,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(bool)": np.bool_,
+}
+
+
+class InferenceBackend(ABC):
+    """推理后端接口"""
+
+    name = ""
+
+    @abstractmethod
+    def infer(self, model_name: str, inputs: Dict[str, np.ndarray], model_version: str = "",
+              timeout: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        执行一次推理
+
+        参数:
+            model_name: 模型名称
+            inputs: 模型输入，键为输入名称
+            model_version: 模型版本，空字符串表示最新版本
+            timeout: 超时时间（毫秒），进程内后端可忽略
+
+        返回:
+            输出名称 -> 输出数据，失败时返回None
+        """
+
+    @abstractmethod
+    def is_model_ready(self, model_name: str, model_version: str = "") -> bool:
+        """模型是否可用"""
+
+    @abstractmethod
+    def get_model_metadata(self, model_name: str, model_version: str = "") -> Optional[Dict[str, Any]]:
+        """模型元数据，格式与Triton get_model_metadata(as_json=True) 一致，失败时返回None"""
+
+    def get_model_config(self, model_name: str, model_version: str = "") -> Optional[Dict[str, Any]]:
+        """模型配置，格式与Triton get_model_config(as_json=True) 一致；默认不声明批处理能力"""
+        if not self.is_model_ready(model_name, model_version):
+            return None
+        return {"config": {"name": model_name, "max_batch_size": 0, "backend": self.name}}
+
+    def unload_model(self, model_name: str):
+        """释放模型占用的资源"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """后端统计信息"""
+        return {}
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    ONNX Runtime CPU推理后端
+
+    - 每个模型版本只创建一次会话并在所有任务间复用（InferenceSession.run 线程安全）
+    - 模型文件沿用Triton模型仓库目录结构: <仓库>/<模型名>/<版本>/model.onnx，
+      未指定版本时使用数字最大的版本；也支持直接放置 <仓库>/<模型名>.onnx
+    - intra_op_threads 控制单次推理的并行线程数，多任务并发时应适当调小，避免线程过度订阅
+    """
+
+    name = "onnxruntime"
+
+    def __init__(self, model_repository: str, intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 providers: Optional[List[str]] = None):
+        """
+        参数:
+            model_repository: 模型仓库目录
+            intra_op_threads: 单个算子内部的并行线程数，0表示由ONNX Runtime决定（物理核数）
+            inter_op_threads: 算子间并行线程数（顺序执行模式下仅在图中存在并行分支时生效）
+            providers: 执行提供者，默认仅使用CPU
+        """
+        self.model_repository = model_repository
+        self.intra_op_threads = max(0, int(intra_op_threads))
+        self.inter_op_threads = max(0, int(inter_op_threads))
+        self.providers = providers or ["CPUExecutionProvider"]
+
+        # 会话缓存 {(model_name, model_version): _OnnxSession}
+        self._sessions: Dict[Tuple[str, str], "_OnnxSession"] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+        self.stats = {"sessions_created": 0, "infer_count": 0, "infer_errors": 0}
+
+    def resolve_model_path(self, model_name: str, model_version: str = "") -> Optional[str]:
+        """
+        查找模型文件路径
+
+        返回:
+            ONNX模型文件路径，不存在时返回None
+        """
+        model_dir = os.path.join(self.model_repository, model_name)
+        if os.path.isdir(model_dir):
+            if model_version:
+                versions = [model_version]
+            else:
+                versions = sorted((d for d in os.listdir(model_dir) if d.isdigit()), key=int, reverse=True)
+            for version in versions:
+                path = os.path.join(model_dir, version, "model.onnx")
+                if os.path.isfile(path):
+                    return path
+
+        path = os.path.join(self.model_repository, f"{model_name}.onnx")
+        return path if os.path.isfile(path) else None
+
+    def _create_session(self, model_path: str):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("未安装onnxruntime，无法使用ONNX Runtime推理后端（pip install onnxruntime）") from e
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(model_path, sess_options=options, providers=self.providers)
+
+    def _get_session(self, model_name: str, model_version: str = "") -> Optional["_OnnxSession"]:
+        """获取模型会话，首次调用时加载（同一模型并发加载时只加载一次）"""
+        key = (model_name, model_version)
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session
+
+            model_path = self.resolve_model_path(model_name, model_version)
+            if model_path is None:
+                logger.error(f"ONNX模型 {model_name} 不存在（仓库: {self.model_repository}）")
+                return None
+
+            session = _OnnxSession(self._create_session(model_path), model_path)
+            with self._lock:
+                self._sessions[key] = session
+                self.stats["sessions_created"] += 1
+            logger.info(f"已加载ONNX模型 {model_name}: {model_path}, 输入={list(session.input_types)}, "
+                        f"输出={session.output_names}, intra_op_threads={self.intra_op_threads}")
+            return session
+
+    def infer(self, model_name: str, inputs: Dict[str, np.ndarray], model_version: str = "",
+              timeout: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            session = self._get_session(model_name, model_version)
+            if session is None:
+                return None
+
+            feed = {}
+            for input_name, input_data in inputs.items():
+                dtype = session.input_types.get(input_name)
+                if dtype is None:
+                    logger.error(f"模型 {model_name} 没有名为 {input_name} 的输入")
+                    return None
+                feed[input_name] = input_data if input_data.dtype == dtype else input_data.astype(dtype)
+
+            outputs = session.session.run(session.output_names, feed)
+            self.stats["infer_count"] += 1
+            return dict(zip(session.output_names, outputs))
+        except Exception as e:
+            self.stats["infer_errors"] += 1
+            logger.error(f"ONNX Runtime推理模型 {model_name} 失败: {e}")
+            return None
+
+    def is_model_ready(self, model_name: str, model_version: str = "") -> bool:
+        if (model_name, model_version) in self._sessions:
+            return True
+        return self.resolve_model_path(model_name, model_version) is not None
+
+    def get_model_metadata(self, model_name: str, model_version: str = "") -> Optional[Dict[str, Any]]:
+        try:
+            session = self._get_session(model_name, model_version)
+        except Exception as e:
+            logger.error(f"加载ONNX模型 {model_name} 失败: {e}")
+            return None
+        if session is None:
+            return None
+
+        def tensor_metadata(arg):
+            return {
+                "name": arg.name,
+                "datatype": _ONNX_TO_TRITON_DTYPE.get(arg.type, arg.type),
+                # 符号维度（如batch）按Triton惯例表示为-1
+                "shape": [d if isinstance(d, int) else -1 for d in arg.shape],
+            }
+
+        return {
+            "name": model_name,
+            "versions": [model_version] if model_version else [],
+            "platform": "onnxruntime_onnx",
+            "inputs": [tensor_metadata(arg) for arg in session.session.get_inputs()],
+            "outputs": [tensor_metadata(arg) for arg in session.session.get_outputs()],
+        }
+
+    def unload_model(self, model_name: str):
+        with self._lock:
+            for key in [k for k in self._sessions if k[0] == model_name]:
+                self._sessions.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["loaded_models"] = [name for name, _ in self._sessions]
+        stats["intra_op_threads"] = self.intra_op_threads
+        return stats
+
+
+class _OnnxSession:
+    """ONNX Runtime会话及其输入输出信息"""
+
+    __slots__ = ("session", "model_path", "input_types", "output_names")
+
+    def __init__(self, session, model_path: str):
+        self.session = session
+        self.model_path = model_path
+        self.input_types = {arg.name: _ONNX_TO_NUMPY_DTYPE.get(arg.type, np.float32) for arg in session.get_inputs()}
+        self.output_names = [arg.name for arg in session.get_outputs()]
+
+
+# 测试代码：构造一个小型卷积模型，验证会话复用、元数据格式和推理结果
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    weight = rng.normal(0, 0.1, (16, 3, 3, 3)).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["images", "w"], ["conv"], pads=[1, 1, 1, 1], strides=[2, 2]),
+            helper.make_node("Relu", ["conv"], ["output0"]),
+        ],
+        "test_model",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, 320, 320])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", 16, 160, 160])],
+        initializer=[numpy_helper.from_array(weight, "w")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+
+    with tempfile.TemporaryDirectory() as repo:
+        os.makedirs(os.path.join(repo, "test_model", "1"))
+        onnx.save(model, os.path.join(repo, "test_model", "1", "model.onnx"))
+
+        backend = OnnxRuntimeBackend(repo, intra_op_threads=1)
+        assert backend.is_model_ready("test_model") and not backend.is_model_ready("missing")
+        metadata = backend.get_model_metadata("test_model")
+        print("元数据:", metadata["inputs"], metadata["outputs"])
+        assert metadata["inputs"][0] == {"name": "images", "datatype": "FP32", "shape": [-1, 3, 320, 320]}
+
+        images = rng.random((2, 3, 320, 320), dtype=np.float32)
+        outputs = backend.infer("test_model", {"images": images})
+        assert outputs["output0"].shape == (2, 16, 160, 160)
+        # 与numpy计算的第一个通道左上角结果对比
+        padded = np.pad(images[0], ((0, 0), (1, 1), (1, 1)))
+        expected = max(0.0, float(np.sum(padded[:, 0:3, 0:3] * weight[0])))
+        assert abs(outputs["output0"][0, 0, 0, 0] - expected) < 1e-4
+
+        # 输入类型不一致时自动转换；会话只创建一次
+        assert backend.infer("test_model", {"images": images.astype(np.float64)}) is not None
+        assert backend.infer("missing", {"images": images}) is None
+        assert backend.stats["sessions_created"] == 1
+
+        start = time.perf_counter()
+        for _ in range(20):
+            backend.infer("test_model", {"images": images[:1]})
+        print(f"单帧推理耗时: {(time.perf_counter() - start) / 20 * 1000:.2f}ms")
+        print("统计:", backend.get_stats())
+        print("测试通过")
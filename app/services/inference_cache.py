@@ -0,0 +1,219 @@
+"""
+同摄像头多任务推理去重缓存
+
+同一摄像头上经常同时运行多个任务，其中不少使用同一个底层模型（如COCO/人员检测模型）。
+每个任务有独立的技能实例，同一帧会被重复推理多次。
+
+本模块按 (摄像头, 帧代次) 划分缓存，键为模型名、版本及输入签名（输入的形状、类型和全部内容的校验和）：
+1. 检测线程在处理某一帧前通过 frame_scope() 声明当前摄像头和帧代次
+2. 该作用域内的推理请求先查缓存，第一个请求者执行推理，其余并发请求等待并复用原始输出
+3. 每个摄像头只保留最近几代帧的结果，旧帧结果自动淘汰
+
+缓存的输出数组被设置为只读，多个技能共享同一份原始输出。
+"""
+import contextvars
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    """单个推理结果，支持并发请求等待同一次推理"""
+
+    __slots__ = ("event", "outputs")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.outputs: Optional[Dict[str, np.ndarray]] = None
+
+
+class InferenceCache:
+    """按摄像头和帧代次划分的推理结果缓存"""
+
+    def __init__(self, max_generations: int = 2):
+        """
+        初始化推理缓存
+
+        参数:
+            max_generations: 每个摄像头保留的帧代次数量
+        """
+        self.max_generations = max(1, int(max_generations))
+        self._lock = threading.Lock()
+        self._cameras: Dict[Any, "OrderedDict[Hashable, Dict[Tuple, _Entry]]"] = {}
+        # 使用上下文变量而非线程局部变量，技能执行图派发到线程池的子任务可以继承作用域
+        self._scope: contextvars.ContextVar = contextvars.ContextVar(f"inference_scope_{id(self)}", default=None)
+
+        self.stats = {
+            "requests": 0,
+            "hits": 0,
+            "misses": 0,
+            "evicted_generations": 0,
+        }
+
+    @contextmanager
+    def frame_scope(self, camera_id: Any, frame_generation: Optional[Hashable]):
+        """
+        声明当前正在处理的摄像头帧，作用域内的推理请求参与去重
+
+        camera_id 或 frame_generation 为空时不启用去重。
+        """
+        if camera_id is not None and frame_generation is not None:
+            token = self._scope.set((camera_id, frame_generation))
+        else:
+            token = self._scope.set(None)
+        try:
+            yield
+        finally:
+            self._scope.reset(token)
+
+    def current_scope(self) -> Optional[Tuple[Any, Hashable]]:
+        """当前上下文的 (摄像头, 帧代次)，不在作用域内时返回None"""
+        return self._scope.get()
+
+    @staticmethod
+    def make_key(model_name: str, model_version: str, inputs: Dict[str, np.ndarray]) -> Tuple:
+        """
+        生成推理请求的缓存键
+
+        同一帧、同一模型下，不同技能的预处理方式可能不同（如拉伸与letterbox、不同的裁剪区域），
+        因此除输入形状和类型外，还对输入的全部内容计算CRC32：稀疏采样会让只在未采样位置不同的两个输入
+        互相拿到对方的检测结果。zlib计算大缓冲区时释放GIL，640x640输入约1~2ms，远小于一次推理。
+        """
+        signature = []
+        for name, data in sorted(inputs.items()):
+            checksum = zlib.crc32(np.ascontiguousarray(data).reshape(-1).view(np.uint8))
+            signature.append((name, data.shape, data.dtype.str, checksum))
+        return (model_name, model_version, tuple(signature))
+
+    def get_or_infer(self, scope: Tuple[Any, Hashable], key: Tuple,
+                     infer_func: Callable[[], Optional[Dict[str, np.ndarray]]]) -> Optional[Dict[str, np.ndarray]]:
+        """
+        获取缓存的推理结果，不存在时执行推理并写入缓存
+
+        参数:
+            scope: (摄像头, 帧代次)
+            key: make_key 生成的缓存键
+            infer_func: 实际执行推理的函数
+
+        返回:
+            推理输出（只读数组），推理失败时返回None
+        """
+        camera_id, generation = scope
+        with self._lock:
+            self.stats["requests"] += 1
+            generations = self._cameras.setdefault(camera_id, OrderedDict())
+            entries = generations.get(generation)
+            if entries is None:
+                entries = {}
+                generations[generation] = entries
+                while len(generations) > self.max_generations:
+                    generations.popitem(last=False)
+                    self.stats["evicted_generations"] += 1
+            entry = entries.get(key)
+            is_owner = entry is None
+            if is_owner:
+                entry = _Entry()
+                entries[key] = entry
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+
+        if not is_owner:
+            entry.event.wait()
+            if entry.outputs is not None:
+                return entry.outputs
+            # 首个请求者推理失败，自行重试一次
+            return infer_func()
+
+        outputs = None
+        try:
+            outputs = infer_func()
+            if outputs is not None:
+                for data in outputs.values():
+                    data.flags.writeable = False
+            return outputs
+        finally:
+            entry.outputs = outputs
+            if outputs is None:
+                with self._lock:
+                    if entries.get(key) is entry:
+                        del entries[key]
+            entry.event.set()
+
+    def release_camera(self, camera_id: Any):
+        """释放摄像头的全部缓存结果"""
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cameras"] = len(self._cameras)
+        stats["hit_rate"] = stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+
+# 全局推理缓存实例
+inference_cache = InferenceCache(max_generations=settings.INFERENCE_DEDUP_GENERATIONS)
+
+
+# 测试代码：缓存本身的并发去重和缓存键（技能 -> TritonClient -> 假Triton服务的完整链路见 app/benchmark/inference_dedup_benchmark.py）
+if __name__ == "__main__":
+    import time
+
+    cache = InferenceCache()
+    infer_calls = []
+    infer_lock = threading.Lock()
+
+    def fake_infer(generation):
+        with infer_lock:
+            infer_calls.append(generation)
+        time.sleep(0.005)
+        return {"output0": np.zeros((1, 84, 8400), dtype=np.float32)}
+
+    num_tasks = 4
+    num_frames = 50
+    barrier = threading.Barrier(num_tasks)
+    tensor = np.random.default_rng(0).random((1, 3, 640, 640), dtype=np.float32)
+
+    def task_worker():
+        for generation in range(num_frames):
+            # 四个请求者同时请求同一代帧
+            barrier.wait()
+            with cache.frame_scope(camera_id=1, frame_generation=generation):
+                scope = cache.current_scope()
+                key = cache.make_key("yolo11_coco", "", {"images": tensor})
+                outputs = cache.get_or_infer(scope, key, lambda: fake_infer(generation))
+                assert outputs is not None and not outputs["output0"].flags.writeable
+
+    threads = [threading.Thread(target=task_worker) for _ in range(num_tasks)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"{num_tasks}个并发请求者 x {num_frames}帧: 实际推理 {len(infer_calls)} 次，"
+          f"每帧推理 {len(infer_calls) / num_frames:.2f} 次")
+    print(f"缓存统计: {cache.get_stats()}")
+    assert len(infer_calls) == num_frames and sorted(infer_calls) == list(range(num_frames))
+
+    # 同一帧的两个输入只在个别像素不同（如不同裁剪区域的填充部分相同）时不能共用结果
+    other = tensor.copy()
+    other[0, 1, 320, 321] += 1.0
+    assert cache.make_key("yolo11_coco", "", {"images": tensor}) != cache.make_key("yolo11_coco", "", {"images": other})
+    assert cache.make_key("yolo11_coco", "", {"images": tensor}) == cache.make_key("yolo11_coco", "", {"images": tensor.copy()})
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cache.make_key("yolo11_coco", "", {"images": tensor})
+    print(f"缓存键计算耗时: {(time.perf_counter() - start) / rounds * 1000:.2f}ms/次 (输入 {tensor.shape})")
+    print("测试通过")
@@ -89,6 +89,10 @@ def sync_models_from_triton() -> Dict[str, Any]:
                 
                 # 检查模型是否已存在
                 if model_name in existing_models:
+                    # 模型版本变化或不再就绪时，使推理客户端缓存的I/O绑定计划失效
+                    if str(existing_models[model_name].version) != str(model_data["version"]) or not is_ready:
+                        triton_client.invalidate_model_binding(model_name)
+                    
                     # 更新现有模型
                     logger.info(f"更新现有模型: {model_name}")
                     ModelDAO.update_model(existing_models[model_name].id, model_data, db)
@@ -0,0 +1,125 @@
+"""
+运动门控：静止画面跳过推理
+
+很多摄像头长时间拍摄空走廊或停转的传送带，逐帧推理得到的结果几乎不变。
+运动门控在技能处理前，将当前帧缩小为低分辨率灰度签名，与上一次实际推理的帧比较
+（与皮带启停技能基于上一帧灰度图 prev_gray 做帧间差分的思路相同）：
+- 平均灰度差低于阈值时，复用上一次的检测结果
+- 距上一次推理超过最大复用时长时，无论画面是否变化都重新推理，限制结果的陈旧程度
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """基于低分辨率灰度签名的推理门控"""
+
+    def __init__(self, threshold: float = 3.0, max_reuse_seconds: float = 5.0,
+                 signature_size: Tuple[int, int] = (64, 36)):
+        """
+        初始化运动门控
+
+        参数:
+            threshold: 平均灰度差阈值（0-255），低于该值视为画面静止
+            max_reuse_seconds: 检测结果最长复用时长（秒）
+            signature_size: 灰度签名尺寸 (宽, 高)
+        """
+        self.threshold = float(threshold)
+        self.max_reuse_seconds = float(max_reuse_seconds)
+        self.signature_size = tuple(signature_size)
+
+        self._lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None  # 上一次推理帧的灰度签名
+        self._reference_time = 0.0
+
+        self.stats = {
+            "inferred": 0,
+            "skipped": 0,
+            "forced_by_age": 0,
+        }
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        """计算帧的低分辨率灰度签名（先隔行隔列抽样再缩小、转灰度，开销与原图分辨率基本无关）"""
+        width, height = self.signature_size
+        step = max(1, min(frame.shape[0] // (height * 4), frame.shape[1] // (width * 4)))
+        small = cv2.resize(frame[::step, ::step], self.signature_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def should_infer(self, frame: np.ndarray, can_reuse: bool = True, now: Optional[float] = None) -> bool:
+        """
+        判断当前帧是否需要推理，需要推理时以当前帧作为新的参考帧
+
+        参数:
+            frame: BGR图像
+            can_reuse: 是否存在可复用的上一次检测结果
+            now: 当前时间，默认为time.time()
+
+        返回:
+            True表示需要推理，False表示可复用上一次结果
+        """
+        now = time.time() if now is None else now
+        current = self.signature(frame)
+
+        with self._lock:
+            reference = self._reference
+            if can_reuse and reference is not None and reference.shape == current.shape:
+                if now - self._reference_time >= self.max_reuse_seconds:
+                    self.stats["forced_by_age"] += 1
+                elif float(np.mean(np.abs(current - reference))) < self.threshold:
+                    self.stats["skipped"] += 1
+                    return False
+
+            self._reference = current
+            self._reference_time = now
+            self.stats["inferred"] += 1
+            return True
+
+    def reset(self):
+        """清除参考帧，下一帧必定推理"""
+        with self._lock:
+            self._reference = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取门控统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["inferred"] + stats["skipped"]
+        stats["skip_rate"] = stats["skipped"] / total if total else 0.0
+        return stats
+
+
+# 测试代码：静止画面应被跳过，有运动或超过复用时长时应重新推理
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    gate = MotionGate(threshold=3.0, max_reuse_seconds=5.0)
+
+    decisions = []
+    for i in range(60):
+        frame = background.copy()
+        # 加入传感器噪声
+        noise = rng.integers(-3, 4, frame.shape, dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        if 20 <= i < 25:
+            # 第20-24帧有目标进入画面
+            x = 200 + (i - 20) * 150
+            frame[300:800, x:x + 300] = 255
+        decisions.append(gate.should_infer(frame, now=i * 0.2))
+
+    inferred = [i for i, infer in enumerate(decisions) if infer]
+    print("推理帧:", inferred)
+    print("统计:", gate.get_stats())
+    # 首帧、运动段及其恢复静止的第一帧推理；第25帧后静止满5秒（第50帧）强制推理一次
+    assert inferred == [0, 20, 21, 22, 23, 24, 25, 50], inferred
+    print("测试通过")
+
+    start = time.perf_counter()
+    for _ in range(200):
+        gate.signature(background)
+    print(f"签名计算耗时: {(time.perf_counter() - start) / 200 * 1000:.2f}ms (1920x1080)")
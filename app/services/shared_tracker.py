@@ -0,0 +1,282 @@
+"""
+同摄像头多任务共享目标跟踪
+
+同一摄像头上经常同时运行停留、入侵、人群等多个任务，并使用同一个人员检测模型（推理已由 inference_cache 去重）。
+每个任务的技能实例原先各自持有 TrackerService，对同一批人分别维护卡尔曼状态、分别关联，
+同一个人在不同任务中的track_id也不相同。
+
+本模块按 (摄像头, 跟踪键) 共享跟踪器，跟踪键由技能给出（技能类型、模型、检测阈值、类别、跟踪参数等，相同则检测结果相同）：
+1. 技能在 inference_cache.frame_scope() 作用域内（检测线程处理摄像头帧）调用 add_tracking_ids 时，
+   按作用域的 (摄像头, 帧代次) 使用共享跟踪器
+2. 每个帧代次只更新一次跟踪器: 第一个到达的任务用自己的检测执行预测和关联，跟踪框按帧代次缓存
+3. 所有订阅的任务（包括第一个）都用该帧代次缓存的跟踪框按IoU给自己的检测分配track_id，
+   单个任务时结果与独立的 TrackerService 完全相同；多个任务时同一个人的track_id相同；
+   该帧代次没有跟踪的类别（第一个任务没有该类别的检测）原样返回，track_id为None
+4. 处理较慢的任务拿到的帧代次已被跟踪器越过且不在缓存中时，update 返回None，由技能改用自己的跟踪器
+   （不能用更新一代的跟踪框给旧帧的检测分配ID）
+5. 停留计时、越线状态等任务逻辑仍保存在各技能实例中，只是使用共享的track_id
+
+技能实例以弱引用订阅，任务停止、技能实例释放后共享跟踪器随之清理。
+"""
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SharedTracker:
+    """一个摄像头上、同一跟踪键的共享跟踪器，每个帧代次只更新一次"""
+
+    def __init__(self, max_age: int = 30, min_hits: int = 1, iou_threshold: float = 0.3, max_generations: int = 4):
+        from app.services.tracker_service import TrackerService
+
+        self.service = TrackerService(max_age=max_age, min_hits=min_hits, iou_threshold=iou_threshold)
+        self.max_generations = max(1, int(max_generations))
+        self.subscribers: "weakref.WeakSet" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        # 帧代次 -> {类别: 跟踪框}，按帧代次递增排列
+        self._generations: "OrderedDict[Hashable, Dict[str, np.ndarray]]" = OrderedDict()
+
+        self.stats = {
+            "requests": 0,
+            "updates": 0,   # 跟踪器实际更新（预测+关联）次数
+            "reused": 0,    # 复用同一帧代次跟踪结果的请求数
+            "late": 0,      # 帧代次已被越过、交回技能自己跟踪的请求数
+            "untracked": 0,  # 该帧代次没有跟踪的类别、原样返回的检测数
+        }
+
+    def update(self, generation: Hashable, detections: List[Dict]) -> Optional[List[Dict]]:
+        """
+        为一帧的检测结果分配track_id（与 TrackerService.update 的返回格式相同）
+
+        Args:
+            generation: 帧代次
+            detections: 检测结果列表
+
+        Returns:
+            带跟踪ID的检测结果列表；帧代次已被越过时返回None（调用方应使用自己的跟踪器）
+        """
+        try:
+            detections_by_class = self.service.group_by_class(detections)
+            tracked_by_class = self._tracked_for_generation(generation, detections_by_class)
+            if tracked_by_class is None:
+                return None
+
+            tracked_detections = []
+            for class_name, class_detections in detections_by_class.items():
+                tracked_objects = tracked_by_class.get(class_name)
+                if tracked_objects is not None:
+                    tracked_detections.extend(
+                        self.service.assign_track_ids(tracked_objects, class_detections, class_name))
+                else:
+                    # 该帧代次由其他任务更新，没有这个类别的跟踪结果：原样返回，不带跟踪ID
+                    with self._lock:
+                        self.stats["untracked"] += len(class_detections)
+                    tracked_detections.extend({**detection, "track_id": None} for detection in class_detections)
+            return tracked_detections
+        except Exception as e:
+            logger.error(f"共享跟踪器更新失败: {str(e)}")
+            # 出错时返回原始检测结果，但不带track_id
+            return detections
+
+    def _tracked_for_generation(self, generation: Hashable,
+                                detections_by_class: Dict[str, List[Dict]]) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            self.stats["requests"] += 1
+            tracked_by_class = self._generations.get(generation)
+            if tracked_by_class is not None:
+                self.stats["reused"] += 1
+                return tracked_by_class
+
+            if any(g > generation for g in self._generations):
+                self.stats["late"] += 1
+                return None
+
+            tracked_by_class = self.service.track(detections_by_class)
+            self.stats["updates"] += 1
+            self._generations[generation] = tracked_by_class
+            while len(self._generations) > self.max_generations:
+                self._generations.popitem(last=False)
+            return tracked_by_class
+
+    def reset(self):
+        """重置跟踪状态"""
+        with self._lock:
+            self.service.reset()
+            self._generations.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["subscribers"] = len(self.subscribers)
+        stats["tracker"] = self.service.get_tracker_info()
+        return stats
+
+
+class SharedTrackerRegistry:
+    """按 (摄像头, 跟踪键) 管理共享跟踪器"""
+
+    def __init__(self, max_generations: int = 4):
+        self.max_generations = max_generations
+        self._lock = threading.Lock()
+        self._trackers: Dict[Tuple[Any, Hashable], SharedTracker] = {}
+
+    def acquire(self, camera_id: Any, key: Hashable, subscriber: Any,
+                max_age: int = 30, min_hits: int = 1, iou_threshold: float = 0.3) -> SharedTracker:
+        """
+        获取共享跟踪器并登记订阅者，不存在时创建
+
+        Args:
+            camera_id: 摄像头ID
+            key: 跟踪键，相同跟踪键的任务检测结果相同
+            subscriber: 订阅的技能实例（弱引用）
+            max_age / min_hits / iou_threshold: 新建跟踪器的参数（应包含在跟踪键中）
+        """
+        with self._lock:
+            # 清理已没有订阅者的跟踪器（任务已停止）
+            for stale in [k for k, tracker in self._trackers.items() if not len(tracker.subscribers)]:
+                del self._trackers[stale]
+            tracker = self._trackers.get((camera_id, key))
+            if tracker is None:
+                tracker = SharedTracker(max_age=max_age, min_hits=min_hits, iou_threshold=iou_threshold,
+                                        max_generations=self.max_generations)
+                self._trackers[(camera_id, key)] = tracker
+                logger.info(f"创建摄像头 {camera_id} 的共享跟踪器: {key}")
+            tracker.subscribers.add(subscriber)
+            return tracker
+
+    def release_camera(self, camera_id: Any):
+        """释放摄像头的全部共享跟踪器"""
+        with self._lock:
+            for key in [k for k in self._trackers if k[0] == camera_id]:
+                del self._trackers[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各共享跟踪器的统计信息"""
+        with self._lock:
+            trackers = list(self._trackers.items())
+        return {f"{camera_id}:{key}": tracker.get_stats() for (camera_id, key), tracker in trackers}
+
+
+# 全局共享跟踪器注册表
+shared_trackers = SharedTrackerRegistry(max_generations=settings.SHARED_TRACKER_GENERATIONS)
+
+
+# 测试代码：单个模拟摄像头上的三个任务（停留、入侵、人群），每帧应只更新一次跟踪器，各任务的track_id一致
+if __name__ == "__main__":
+    import gc
+
+    # 以模块方式导入，与技能使用同一个全局注册表
+    from app.services.batch_sort import BatchSort
+    from app.services.inference_cache import inference_cache
+    from app.services.shared_tracker import shared_trackers as registry
+    from app.services.tracker_service import TrackerService
+    from app.skills.skill_base import _TRACKER_UNSET, BaseSkill
+
+    num_frames = 120
+    num_persons = 12
+    rng = np.random.default_rng(0)
+    size = rng.uniform([30, 60], [80, 160], (num_persons, 2))
+    center = rng.uniform([100, 100], [1800, 1000], (num_persons, 2))
+    velocity = rng.normal(0, 5, (num_persons, 2))
+    frames = []
+    for _ in range(num_frames):
+        center += velocity
+        visible = rng.random(num_persons) > 0.05  # 偶尔漏检
+        frames.append([{"bbox": [float(x - w / 2), float(y - h / 2), float(x + w / 2), float(y + h / 2)],
+                        "confidence": 0.9, "class_id": 0, "class_name": "person"}
+                       for (x, y), (w, h), shown in zip(center, size, visible) if shown])
+
+    class PersonTaskSkill(BaseSkill):
+        DEFAULT_CONFIG = {"type": "detection", "name": "person_task", "name_zh": "人员任务",
+                          "required_models": ["yolo11_coco"], "params": {"classes": ["person"], "conf_thres": 0.5}}
+
+        def _initialize(self):
+            self.model_name = self.config["required_models"][0]
+            self.classes = self.config["params"]["classes"]
+            self.conf_thres = self.config["params"]["conf_thres"]
+            self.first_seen = {}  # 停留计时等任务逻辑保存在各自实例中
+
+        def process(self, input_data, context=None, **kwargs):
+            tracked = self.add_tracking_ids([dict(d) for d in input_data])
+            for detection in tracked:
+                self.first_seen.setdefault(detection["track_id"], kwargs["generation"])
+            return tracked
+
+    # 对照：单个任务独立的 TrackerService
+    BatchSort.count = 0
+    private = TrackerService(max_age=30, min_hits=1, iou_threshold=0.3)
+    expected = [private.update([dict(d) for d in detections]) for detections in frames]
+
+    BatchSort.count = 0
+    tasks = [PersonTaskSkill({"name": name}) for name in ("dwell", "intrusion", "crowd")]
+    outputs = {index: [] for index in range(len(tasks))}
+    barrier = threading.Barrier(len(tasks))
+
+    def task_worker(index):
+        for generation, detections in enumerate(frames):
+            # 各任务从同一个共享读取器拿到同一代帧
+            barrier.wait()
+            with inference_cache.frame_scope(camera_id=1, frame_generation=generation):
+                outputs[index].append(tasks[index].process(detections, generation=generation))
+
+    threads = [threading.Thread(target=task_worker, args=(index,)) for index in range(len(tasks))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    (_, tracker), = registry._trackers.items()
+    stats = tracker.get_stats()
+    print(f"{len(tasks)}个任务 x {num_frames}帧: 跟踪器更新 {stats['updates']} 次，"
+          f"每帧 {stats['updates'] / num_frames:.2f} 次，复用 {stats['reused']} 次")
+    assert stats["updates"] == num_frames and stats["reused"] == (len(tasks) - 1) * num_frames
+    assert all(task._tracker is _TRACKER_UNSET for task in tasks), "任务不应再创建各自的跟踪器"
+
+    def ids(tracked):
+        return [(d["track_id"], tuple(d["bbox"])) for d in tracked]
+
+    for generation in range(num_frames):
+        assert ids(outputs[0][generation]) == ids(outputs[1][generation]) == ids(outputs[2][generation]) == \
+            ids(expected[generation]), f"第{generation}帧各任务track_id不一致"
+    assert tasks[0].first_seen.keys() == tasks[1].first_seen.keys() == tasks[2].first_seen.keys()
+    print(f"各任务track_id一致，共 {len(tasks[0].first_seen)} 个轨迹，与独立跟踪器的结果相同")
+
+    # 该帧代次没有跟踪的类别原样返回（track_id为None），不丢弃
+    person, car = frames[0][0], {**frames[0][1], "class_name": "car"}
+    first, second = PersonTaskSkill({"name": "first"}), PersonTaskSkill({"name": "second"})
+    with inference_cache.frame_scope(camera_id=3, frame_generation=0):
+        assert [d["class_name"] for d in first.add_tracking_ids([dict(person)])] == ["person"]
+        mixed = second.add_tracking_ids([dict(person), dict(car)])
+    assert [(d["class_name"], d["track_id"] is None) for d in mixed] == [("person", False), ("car", True)]
+
+    # 帧代次已被越过的任务改用自己的跟踪器，不用更新一代的跟踪框分配ID
+    with inference_cache.frame_scope(camera_id=3, frame_generation=5):
+        first.add_tracking_ids([dict(person)])
+    with inference_cache.frame_scope(camera_id=3, frame_generation=4):
+        late = second.add_tracking_ids([dict(person)])
+    assert len(late) == 1 and second._tracker is not _TRACKER_UNSET and first._tracker is _TRACKER_UNSET
+    shared_stats = first._shared_tracker[2].get_stats()
+    assert shared_stats["late"] == 1 and shared_stats["untracked"] == 1
+    print("未跟踪类别原样返回，过期帧代次改用任务自己的跟踪器")
+
+    # 不同技能类型的默认跟踪键不同，不共用跟踪器
+    class OtherTaskSkill(PersonTaskSkill):
+        pass
+
+    assert OtherTaskSkill().shared_tracking_key() != first.shared_tracking_key()
+
+    # 任务停止、技能实例释放后共享跟踪器随之清理
+    del tasks, threads, first, second
+    gc.collect()
+    other = PersonTaskSkill()
+    registry.acquire(2, "other", other)
+    assert [camera_id for camera_id, _ in registry._trackers] == [2]
+    print("测试通过")
@@ -0,0 +1,314 @@
+"""
+按需截图模式的预取调度器
+
+按需截图模式下，任务取帧时才同步请求WVP截图并解码，截图耗时（通常数百毫秒）直接计入检测延迟。
+
+本模块为每个按需模式的摄像头维护下一次取帧的截止时间：
+1. 订阅者每次取帧时告知自己的取帧间隔，调度器据此记录该订阅者下一次取帧的截止时间
+2. 调度线程在最早的截止时间之前提前发起截图（提前量按该摄像头实测截图耗时自适应调整）
+3. 截图由有界线程池并发执行，大量摄像头同时到期时不会无限制地并发请求WVP
+4. 任务取帧时直接拿到已解码的新鲜帧；截图仍在进行时等待该次截图，不重复请求；没有可用帧时回退为同步截图
+
+同一次截图分配一个帧代次，同一摄像头上截止时间相近的多个订阅者拿到同一帧，可复用推理结果。
+"""
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 截图函数：返回 (帧, 帧代次)，失败时返回 (None, None)
+SnapshotFetcher = Callable[[], Tuple[Optional[np.ndarray], Optional[int]]]
+
+# 截图耗时的指数移动平均系数
+_LATENCY_EWMA_ALPHA = 0.3
+# 截止时间容差（秒）：取帧时间与截止时间相差在此范围内视为同一次取帧
+_DEADLINE_TOLERANCE = 0.05
+
+
+class _CameraSchedule:
+    """单个摄像头的预取状态"""
+
+    def __init__(self, camera_id: Any, fetch: SnapshotFetcher, interval: float):
+        self.camera_id = camera_id
+        self.fetch = fetch
+        self.interval = interval
+        self.lock = threading.Lock()
+
+        # 最近一次截图结果
+        self.frame: Optional[np.ndarray] = None
+        self.generation: Optional[int] = None
+        self.fetched_at = 0.0
+        self.captured_at = 0.0  # 截图请求发出的时间，作为帧的采集时间
+
+        # 进行中的截图，取帧方可等待它完成
+        self.in_flight: Optional[threading.Event] = None
+        # 各订阅者下一次取帧的截止时间（小顶堆）
+        self.deadlines: List[float] = []
+        # 已安排的预取时间，调度堆中与此不一致的条目已失效
+        self.scheduled_at: Optional[float] = None
+        self.latency = 0.0
+
+        self.stats = {
+            "requests": 0,
+            "prefetch_hits": 0,     # 直接拿到预取的新鲜帧
+            "in_flight_joins": 0,   # 截图进行中，等待其完成
+            "sync_fetches": 0,      # 没有可用帧，同步截图
+            "prefetches": 0,
+            "fetch_failures": 0,
+            "deadline_misses": 0,   # 到截止时间时预取的帧尚未就绪
+            "avg_wait_time": 0.0,   # 取帧等待时间的平均值（秒）
+            "avg_frame_age": 0.0,   # 取到的帧距截图完成的平均时间（秒）
+        }
+
+    def lead_time(self) -> float:
+        """预取提前量：实测截图耗时乘以余量系数再加固定余量，不超过取帧间隔"""
+        lead = self.latency * settings.SNAPSHOT_PREFETCH_LEAD_FACTOR + settings.SNAPSHOT_PREFETCH_LEAD_MARGIN
+        return min(lead, self.interval)
+
+    def max_frame_age(self) -> float:
+        """帧被视为新鲜的最长时间：不超过半个取帧间隔（上一轮的帧不会被当作本轮的帧），但至少覆盖一次预取提前量"""
+        return max(min(settings.SNAPSHOT_PREFETCH_MAX_AGE, self.interval / 2), self.lead_time())
+
+
+class SnapshotPrefetcher:
+    """按截止时间提前截图的调度器，所有按需模式的摄像头共用一个调度线程和一个有界截图线程池"""
+
+    def __init__(self, max_workers: int = 8):
+        """
+        初始化预取调度器
+
+        参数:
+            max_workers: 同时进行的截图请求数上限
+        """
+        self.max_workers = max(1, int(max_workers))
+        self._cameras: Dict[Any, _CameraSchedule] = {}
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, camera_id: Any, fetch: SnapshotFetcher, interval: float,
+                 initial_frame: Optional[np.ndarray] = None, initial_generation: Optional[int] = None):
+        """
+        注册按需模式摄像头
+
+        参数:
+            camera_id: 摄像头ID
+            fetch: 截图函数
+            interval: 订阅者的最小取帧间隔（秒），用于首次取帧前安排预取
+            initial_frame: 启动时已获取的截图，可直接提供给第一次取帧
+            initial_generation: initial_frame 的帧代次
+        """
+        entry = _CameraSchedule(camera_id, fetch, interval)
+        now = time.time()
+        if initial_frame is not None:
+            entry.frame, entry.generation = initial_frame, initial_generation
+            entry.fetched_at = entry.captured_at = now
+        with self._cond:
+            self._cameras[camera_id] = entry
+            self._ensure_started()
+        self._add_deadline(entry, now + interval)
+        logger.info(f"摄像头 {camera_id} 已注册截图预取，间隔: {interval}s")
+
+    def unregister(self, camera_id: Any):
+        """注销摄像头，堆中该摄像头的条目在弹出时丢弃"""
+        with self._cond:
+            entry = self._cameras.pop(camera_id, None)
+        if entry is not None:
+            logger.info(f"摄像头 {camera_id} 已注销截图预取")
+
+    def is_registered(self, camera_id: Any) -> bool:
+        return camera_id in self._cameras
+
+    def update_interval(self, camera_id: Any, interval: float):
+        """订阅者最小间隔变化"""
+        entry = self._cameras.get(camera_id)
+        if entry is not None:
+            with entry.lock:
+                entry.interval = interval
+
+    def get_frame(self, camera_id: Any, next_request_in: Optional[float] = None,
+                  timeout: float = 30.0) -> Tuple[Optional[np.ndarray], Optional[int], float]:
+        """
+        获取摄像头的最新截图
+
+        参数:
+            camera_id: 摄像头ID
+            next_request_in: 调用方下一次取帧距现在的时间（秒），None表示使用摄像头的最小间隔
+            timeout: 等待进行中截图的超时（秒）
+
+        返回:
+            (帧, 帧代次, 采集时间)，失败时为 (None, None, 0.0)
+        """
+        entry = self._cameras.get(camera_id)
+        if entry is None:
+            return None, None, 0.0
+
+        start = time.time()
+        with entry.lock:
+            entry.stats["requests"] += 1
+            fresh = entry.frame is not None and start - entry.fetched_at <= entry.max_frame_age()
+            # 本次取帧满足的截止时间出堆，之后记录调用方下一次的截止时间
+            due = 0
+            while entry.deadlines and entry.deadlines[0] <= start + _DEADLINE_TOLERANCE:
+                heapq.heappop(entry.deadlines)
+                due += 1
+            if due and not fresh:
+                entry.stats["deadline_misses"] += 1
+            in_flight = entry.in_flight
+            if fresh:
+                entry.stats["prefetch_hits"] += 1
+                frame, generation, fetched_at, captured_at = \
+                    entry.frame, entry.generation, entry.fetched_at, entry.captured_at
+            elif in_flight is None:
+                in_flight = self._begin_fetch(entry)
+                entry.stats["sync_fetches"] += 1
+                own_fetch = True
+            else:
+                entry.stats["in_flight_joins"] += 1
+                own_fetch = False
+        self._add_deadline(entry, start + (next_request_in if next_request_in else entry.interval))
+
+        if not fresh:
+            if own_fetch:
+                self._run_fetch(entry, in_flight, start)
+            else:
+                in_flight.wait(timeout)
+            with entry.lock:
+                if entry.fetched_at < start - entry.max_frame_age():
+                    frame, generation, fetched_at, captured_at = None, None, 0.0, 0.0
+                else:
+                    frame, generation, fetched_at, captured_at = \
+                        entry.frame, entry.generation, entry.fetched_at, entry.captured_at
+
+        now = time.time()
+        with entry.lock:
+            self._update_average(entry, "avg_wait_time", now - start)
+            if frame is not None:
+                self._update_average(entry, "avg_frame_age", max(0.0, now - fetched_at))
+        return frame, generation, captured_at
+
+    def peek_frame(self, camera_id: Any) -> Optional[np.ndarray]:
+        """最近一次截图（不触发截图，不计入统计）"""
+        entry = self._cameras.get(camera_id)
+        return entry.frame if entry is not None else None
+
+    def _add_deadline(self, entry: _CameraSchedule, deadline: float):
+        with entry.lock:
+            heapq.heappush(entry.deadlines, deadline)
+            fire_at = entry.deadlines[0] - entry.lead_time()
+            if entry.scheduled_at is not None and entry.scheduled_at <= fire_at:
+                return
+            entry.scheduled_at = fire_at
+        with self._cond:
+            self._sequence += 1
+            heapq.heappush(self._heap, (fire_at, self._sequence, entry.camera_id))
+            self._cond.notify()
+
+    def _begin_fetch(self, entry: _CameraSchedule) -> threading.Event:
+        """标记截图开始（调用方持有 entry.lock）"""
+        entry.in_flight = threading.Event()
+        return entry.in_flight
+
+    def _run_fetch(self, entry: _CameraSchedule, done: threading.Event, submitted_at: float):
+        started = time.time()
+        try:
+            frame, generation = entry.fetch()
+        except Exception as e:
+            logger.error(f"摄像头 {entry.camera_id} 截图失败: {str(e)}")
+            frame, generation = None, None
+        finished = time.time()
+        with entry.lock:
+            if frame is not None:
+                entry.frame, entry.generation = frame, generation
+                entry.fetched_at, entry.captured_at = finished, started
+            else:
+                entry.stats["fetch_failures"] += 1
+            # 耗时含线程池排队时间，线程池饱和时预取会自动提前
+            elapsed = finished - submitted_at
+            entry.latency = elapsed if entry.latency == 0.0 else \
+                entry.latency + _LATENCY_EWMA_ALPHA * (elapsed - entry.latency)
+            entry.in_flight = None
+        done.set()
+
+    def _prefetch(self, entry: _CameraSchedule):
+        """调度线程到点后提交预取（截图进行中或已有足够新鲜的帧时跳过）"""
+        now = time.time()
+        with entry.lock:
+            entry.scheduled_at = None
+            # 超过一个间隔仍未取帧的截止时间（订阅者已离开）不再预取
+            while entry.deadlines and entry.deadlines[0] < now - entry.interval:
+                heapq.heappop(entry.deadlines)
+            if not entry.deadlines:
+                return
+            deadline = entry.deadlines[0]
+            # 已有帧在截止时间时仍然新鲜，无需再次截图
+            if entry.in_flight is not None or \
+                    (entry.frame is not None and deadline - entry.fetched_at <= entry.max_frame_age()):
+                return
+            done = self._begin_fetch(entry)
+            entry.stats["prefetches"] += 1
+        self._executor.submit(self._run_fetch, entry, done, now)
+
+    def _ensure_started(self):
+        """首次注册时启动调度线程和截图线程池（调用方持有 self._cond）"""
+        if self._thread is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="SnapshotPrefetch")
+        self._thread = threading.Thread(target=self._schedule_loop, daemon=True, name="SnapshotPrefetchScheduler")
+        self._thread.start()
+
+    def _schedule_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._cond.wait(None if not self._heap else self._heap[0][0] - time.time())
+                fire_at, _, camera_id = heapq.heappop(self._heap)
+                entry = self._cameras.get(camera_id)
+            # 摄像头已注销或条目已被更早的预取取代
+            if entry is None or entry.scheduled_at != fire_at:
+                continue
+            try:
+                self._prefetch(entry)
+            except Exception as e:
+                logger.error(f"摄像头 {camera_id} 截图预取调度出错: {str(e)}")
+
+    @staticmethod
+    def _update_average(entry: _CameraSchedule, key: str, value: float):
+        count = entry.stats["requests"]
+        entry.stats[key] += (value - entry.stats[key]) / max(1, count)
+
+    def get_camera_stats(self, camera_id: Any) -> Optional[Dict[str, Any]]:
+        entry = self._cameras.get(camera_id)
+        if entry is None:
+            return None
+        with entry.lock:
+            requests = entry.stats["requests"]
+            return {
+                **entry.stats,
+                "hit_rate": entry.stats["prefetch_hits"] / requests if requests else 0.0,
+                "snapshot_latency": entry.latency,
+                "lead_time": entry.lead_time(),
+                "next_deadline": entry.deadlines[0] if entry.deadlines else None,
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            cameras = list(self._cameras)
+        return {
+            "cameras": len(cameras),
+            "max_workers": self.max_workers,
+            "scheduled": len(self._heap),
+        }
+
+
+snapshot_prefetcher = SnapshotPrefetcher(max_workers=settings.SNAPSHOT_PREFETCH_WORKERS)
@@ -0,0 +1,705 @@
+"""
+多进程任务执行：检测任务按进程分片运行，帧通过共享内存传递
+
+所有任务原先都以线程形式运行在同一进程中（每个任务一个主循环线程、检测线程，启用推流时还有推流线程），
+纯Python的后处理、跟踪和绘制争用同一个GIL，任务数达到几十个后无论有多少CPU核心都会遇到CPU瓶颈。多进程模式下:
+1. 主进程仍为每个摄像头保留唯一的解码器（共享帧读取器），任务主循环把新帧写入该摄像头的共享内存帧通道，
+   同一帧（代次）只写入一次，与订阅该摄像头的任务数无关
+2. 检测任务按负载分片到若干工作进程，同一摄像头的任务优先放在同一工作进程（推理去重、帧通道复用），
+   工作进程内创建技能实例，从帧通道读取最新帧并执行检测
+3. 检测结果经结果队列返回主进程（只有结果数据，不带帧），预警生成、合并和存储仍在主进程完成
+4. 工作进程异常退出时自动重启，并重新提交其上的任务
+
+共享内存帧通道使用顺序锁：写入方先写帧槽的起始序号、再写帧数据、最后写结束序号，读取方拷贝前后分别校验
+结束序号和起始序号，读到正在被覆盖的帧槽时重试，因此无需跨进程的锁。
+"""
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 控制区: [帧槽数, 单帧容量(字节), 最新序号]
+_CONTROL_FIELDS = 3
+_CONTROL_SLOTS, _CONTROL_CAPACITY, _CONTROL_LATEST = range(_CONTROL_FIELDS)
+# 帧槽头: [起始序号, 结束序号, 帧代次, 高, 宽, 通道数]
+_HEADER_FIELDS = 6
+_HEADER_BEGIN, _HEADER_END, _HEADER_GENERATION, _HEADER_HEIGHT, _HEADER_WIDTH, _HEADER_CHANNELS = range(_HEADER_FIELDS)
+_DATA_ALIGNMENT = 64
+
+# 读取到正在写入的帧槽时的重试次数
+_READ_RETRIES = 3
+# 工作进程存活检查间隔（秒）
+_WORKER_CHECK_INTERVAL = 1.0
+
+
+class SharedFrameChannel:
+    """单个摄像头的共享内存帧通道：主进程单写入方，工作进程多读取方"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        control = np.ndarray((_CONTROL_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.slots = int(control[_CONTROL_SLOTS])
+        self.capacity = int(control[_CONTROL_CAPACITY])
+        offset = control.nbytes
+        self._control = control
+        self._headers = np.ndarray((self.slots, _HEADER_FIELDS), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self._headers.nbytes
+        self._timestamps = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self._timestamps.nbytes
+        offset = -(-offset // _DATA_ALIGNMENT) * _DATA_ALIGNMENT
+        self._data = np.ndarray((self.slots, self.capacity), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+        # 写入方状态（只在主进程中使用）
+        self._write_lock = threading.Lock()
+        self._sequence = int(control[_CONTROL_LATEST])
+        self.last_generation: Optional[int] = None
+        self.frames_written = 0
+
+    @staticmethod
+    def _layout_size(slots: int, capacity: int) -> int:
+        header_bytes = 8 * _CONTROL_FIELDS + 8 * _HEADER_FIELDS * slots + 8 * slots
+        return -(-header_bytes // _DATA_ALIGNMENT) * _DATA_ALIGNMENT + slots * capacity
+
+    @classmethod
+    def create(cls, capacity: int, slots: int = 4) -> "SharedFrameChannel":
+        """
+        创建帧通道（主进程）
+
+        Args:
+            capacity: 单帧最大字节数
+            slots: 帧槽数，读取方拷贝期间写入方最多可以再写入 slots-1 帧而不影响该次读取
+        """
+        slots = max(2, int(slots))
+        capacity = max(1, int(capacity))
+        shm = shared_memory.SharedMemory(create=True, size=cls._layout_size(slots, capacity))
+        control = np.ndarray((_CONTROL_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        control[:] = (slots, capacity, 0)
+        del control
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameChannel":
+        """按名称连接已创建的帧通道（工作进程）"""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def publish(self, frame: np.ndarray, generation: Optional[int] = None,
+                timestamp: Optional[float] = None) -> bool:
+        """
+        写入一帧（主进程）
+
+        Args:
+            frame: BGR帧（uint8）
+            generation: 帧代次，与上一次写入的代次相同时不重复写入
+            timestamp: 帧时间戳，默认当前时间
+
+        Returns:
+            是否写入
+        """
+        if frame.dtype != np.uint8:
+            raise ValueError(f"帧通道只支持uint8帧: {frame.dtype}")
+        if frame.nbytes > self.capacity:
+            raise ValueError(f"帧大小 {frame.nbytes} 超过帧通道容量 {self.capacity}")
+        with self._write_lock:
+            if generation is not None and self.last_generation is not None and generation <= self.last_generation:
+                return False
+            self._sequence += 1
+            sequence = self._sequence
+            index = (sequence - 1) % self.slots
+            header = self._headers[index]
+            header[_HEADER_BEGIN] = sequence
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            np.copyto(self._data[index, :frame.nbytes].reshape(frame.shape), frame)
+            header[_HEADER_GENERATION] = -1 if generation is None else generation
+            header[_HEADER_HEIGHT] = height
+            header[_HEADER_WIDTH] = width
+            header[_HEADER_CHANNELS] = channels
+            self._timestamps[index] = time.time() if timestamp is None else timestamp
+            header[_HEADER_END] = sequence
+            self._control[_CONTROL_LATEST] = sequence
+            self.last_generation = generation
+            self.frames_written += 1
+            return True
+
+    def read(self, last_sequence: int = 0) -> Optional[Tuple[np.ndarray, int, Optional[int], float]]:
+        """
+        读取最新帧（工作进程），返回帧的拷贝
+
+        Args:
+            last_sequence: 上一次读取到的序号，没有更新的帧时返回None
+
+        Returns:
+            (帧, 序号, 帧代次, 时间戳)，没有新帧时返回None
+        """
+        for _ in range(_READ_RETRIES):
+            sequence = int(self._control[_CONTROL_LATEST])
+            if sequence == 0 or sequence == last_sequence:
+                return None
+            index = (sequence - 1) % self.slots
+            header = self._headers[index]
+            if header[_HEADER_END] != sequence:
+                continue
+            height, width, channels = (int(v) for v in header[_HEADER_HEIGHT:_HEADER_CHANNELS + 1])
+            generation = int(header[_HEADER_GENERATION])
+            timestamp = float(self._timestamps[index])
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            frame = self._data[index, :height * width * channels].reshape(shape).copy()
+            # 拷贝期间帧槽被新的写入覆盖时起始序号会变化
+            if header[_HEADER_BEGIN] == sequence:
+                return frame, sequence, (None if generation < 0 else generation), timestamp
+        return None
+
+    def close(self):
+        """断开帧通道，创建方同时删除共享内存"""
+        self._control = self._headers = self._timestamps = self._data = None
+        try:
+            self._shm.close()
+            if self.owner:
+                self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"关闭帧通道 {self.name} 出错: {str(e)}")
+
+
+class _WorkerTask:
+    """工作进程中运行的单个检测任务"""
+
+    def __init__(self, spec: Dict[str, Any], worker: "_TaskWorker"):
+        self.spec = spec
+        self.task_id = spec["task_id"]
+        self.camera_id = spec["camera_id"]
+        self.worker = worker
+        self.stop_event = threading.Event()
+        self.stats = {
+            "frames_captured": 0,
+            "frames_detected": 0,
+            "frames_motion_skipped": 0,
+            "frames_expired": 0,
+            "detection_cpu_time": 0.0,
+        }
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"WorkerTask-{self.task_id}")
+
+    def _run(self):
+        from app.services.frame_pipeline import FrameInfo, frame_info_scope
+        from app.services.inference_cache import inference_cache
+        from app.services.motion_gate import MotionGate
+        from app.skills.skill_factory import skill_factory
+
+        skill_instance = skill_factory.create_skill(self.spec["skill_name"], self.spec["skill_config"])
+        if skill_instance is None:
+            self.worker.send({"type": "error", "task_id": self.task_id,
+                              "error": f"无法创建技能对象: {self.spec['skill_name']}"})
+            return
+
+        gate_config = self.spec.get("motion_gate")
+        motion_gate = MotionGate(**gate_config) if gate_config else None
+        fence_config = self.spec.get("fence_config", {})
+        frame_interval = self.spec["frame_interval"]
+        max_frame_age = self.spec.get("max_frame_age", 0.0)
+        last_sequence = 0
+        previous_result = None
+
+        while not self.stop_event.is_set():
+            start = time.time()
+            channel = self.worker.channels.get(self.camera_id)
+            read = channel.read(last_sequence) if channel is not None else None
+            if read is None:
+                # 尚无新帧：短暂等待，不按完整帧间隔休眠，避免新帧到达后延迟过大
+                self.stop_event.wait(min(frame_interval, 0.02))
+                continue
+            frame, last_sequence, frame_generation, frame_timestamp = read
+            frame.flags.writeable = False
+            self.stats["frames_captured"] += 1
+            frame_info = FrameInfo(frame_generation, frame_timestamp)
+            frame_age = frame_info.age(start)
+            if max_frame_age > 0 and frame_age > max_frame_age:
+                # 帧已超过延迟预算，推理结果已无意义
+                self.stats["frames_expired"] += 1
+                continue
+
+            cpu_start = time.thread_time()
+            try:
+                if motion_gate is not None and not motion_gate.should_infer(
+                        frame, can_reuse=previous_result is not None):
+                    result = previous_result
+                    self.stats["frames_motion_skipped"] += 1
+                else:
+                    with inference_cache.frame_scope(self.camera_id, frame_generation), frame_info_scope(frame_info):
+                        result = skill_instance.process(frame, fence_config)
+            except Exception as e:
+                logger.error(f"任务 {self.task_id} 检测出错: {str(e)}")
+                self.stop_event.wait(0.1)
+                continue
+            self.stats["detection_cpu_time"] += time.thread_time() - cpu_start
+
+            if result.success:
+                previous_result = result
+                self.stats["frames_detected"] += 1
+            self.worker.send({
+                "type": "result",
+                "task_id": self.task_id,
+                "success": result.success,
+                "data": result.data if result.success else None,
+                "error_message": result.error_message,
+                "frame_generation": frame_generation,
+                "frame_timestamp": frame_timestamp,
+                "frame_size": (frame.shape[1], frame.shape[0]),
+                "timestamp": time.time(),
+                "stages": {"frame_age": max(0.0, frame_age), "detect": time.time() - start},
+                "stats": dict(self.stats),
+            })
+            self.stop_event.wait(max(0.0, frame_interval - (time.time() - start)))
+
+
+class _TaskWorker:
+    """工作进程内的任务集合与帧通道"""
+
+    def __init__(self, worker_id: int, result_queue):
+        self.worker_id = worker_id
+        self.result_queue = result_queue
+        self.tasks: Dict[int, _WorkerTask] = {}
+        self.channels: Dict[Any, SharedFrameChannel] = {}
+        self._retired: Dict[Any, List[SharedFrameChannel]] = {}  # 已被替换、可能仍在读取中的帧通道
+
+    def send(self, message: Dict[str, Any]):
+        message["worker_id"] = self.worker_id
+        self.result_queue.put(message)
+
+    def attach_channel(self, camera_id, name: str):
+        old = self.channels.get(camera_id)
+        if old is not None and old.name == name:
+            return
+        try:
+            self.channels[camera_id] = SharedFrameChannel.attach(name)
+        except FileNotFoundError:
+            logger.warning(f"工作进程 {self.worker_id} 连接摄像头 {camera_id} 帧通道 {name} 失败：已被删除")
+            self.channels.pop(camera_id, None)
+        # 旧通道可能仍有任务线程在读取，等该摄像头的任务全部停止后再关闭
+        if old is not None:
+            self._retired.setdefault(camera_id, []).append(old)
+
+    def start_task(self, spec: Dict[str, Any]):
+        self.stop_task(spec["task_id"])
+        if spec.get("channel"):
+            self.attach_channel(spec["camera_id"], spec["channel"])
+        task = _WorkerTask(spec, self)
+        self.tasks[task.task_id] = task
+        task.thread.start()
+
+    def stop_task(self, task_id: int):
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return
+        task.stop_event.set()
+        task.thread.join(timeout=10)
+        if not any(t.camera_id == task.camera_id for t in self.tasks.values()):
+            channels = self._retired.pop(task.camera_id, [])
+            if task.camera_id in self.channels:
+                channels.append(self.channels.pop(task.camera_id))
+            for channel in channels:
+                channel.close()
+
+    def shutdown(self):
+        for task_id in list(self.tasks):
+            self.stop_task(task_id)
+        for channel in list(self.channels.values()) + [c for cs in self._retired.values() for c in cs]:
+            channel.close()
+        self.channels.clear()
+        self._retired.clear()
+
+
+def _worker_main(worker_id: int, command_queue, result_queue, skill_dirs: List[str], log_level: int,
+                 initializer: Optional[Callable], initargs: Tuple):
+    """工作进程入口：注册技能后按命令启动/停止任务"""
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Ctrl+C 由主进程处理，工作进程随主进程的停止命令退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from app.skills.skill_factory import skill_factory
+
+    for skill_dir in skill_dirs:
+        skill_factory.scan_and_register_skills(skill_dir)
+    if initializer is not None:
+        initializer(*initargs)
+
+    worker = _TaskWorker(worker_id, result_queue)
+    worker.send({"type": "ready"})
+    try:
+        while True:
+            command = command_queue.get()
+            op = command.get("op")
+            if op == "shutdown":
+                break
+            try:
+                if op == "start_task":
+                    worker.start_task(command["spec"])
+                elif op == "stop_task":
+                    worker.stop_task(command["task_id"])
+                elif op == "attach":
+                    worker.attach_channel(command["camera_id"], command["channel"])
+            except Exception as e:
+                logger.error(f"工作进程 {worker_id} 执行命令 {op} 出错: {str(e)}", exc_info=True)
+    finally:
+        worker.shutdown()
+
+
+class _WorkerHandle:
+    """主进程中的工作进程句柄"""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.command_queue = None
+        self.task_ids: set = set()
+        self.cameras: Dict[Any, int] = {}  # 摄像头 -> 该工作进程上的任务数
+        self.restarts = 0
+
+
+class TaskProcessPool:
+    """检测任务工作进程池"""
+
+    def __init__(self, workers: int, channel_slots: int = 4, skill_dirs: Optional[List[str]] = None,
+                 initializer: Optional[Callable] = None, initargs: Tuple = ()):
+        """
+        Args:
+            workers: 工作进程数
+            channel_slots: 每个摄像头帧通道的帧槽数
+            skill_dirs: 工作进程启动时扫描注册的技能目录，默认为技能插件目录
+            initializer: 工作进程初始化函数（注册技能后调用），必须可被pickle
+            initargs: 初始化函数参数
+        """
+        if skill_dirs is None:
+            from app.skills.skill_manager import SKILL_PLUGINS_DIR
+            skill_dirs = [SKILL_PLUGINS_DIR]
+        self.workers_count = max(1, int(workers))
+        self.channel_slots = channel_slots
+        self.skill_dirs = list(skill_dirs)
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._result_queue = None
+        self._workers: List[_WorkerHandle] = []
+        self._task_specs: Dict[int, Dict[str, Any]] = {}
+        self._task_workers: Dict[int, _WorkerHandle] = {}
+        self._callbacks: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._channels: Dict[Any, SharedFrameChannel] = {}
+        self._lock = threading.RLock()
+        self._dispatch_thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {
+            "results_received": 0,
+            "frames_published": 0,
+            "bytes_published": 0,
+            "channel_reallocations": 0,
+            "worker_restarts": 0,
+        }
+
+    def start(self, timeout: float = 60.0) -> bool:
+        """启动全部工作进程，等待其完成技能注册"""
+        with self._lock:
+            if self.running:
+                return True
+            self._result_queue = self._ctx.Queue()
+            self._workers = [_WorkerHandle(i) for i in range(self.workers_count)]
+            for worker in self._workers:
+                self._spawn_worker(worker)
+            self.running = True
+
+        ready = 0
+        deadline = time.time() + timeout
+        while ready < self.workers_count and time.time() < deadline:
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not all(worker.process.is_alive() for worker in self._workers):
+                    break
+                continue
+            if message.get("type") == "ready":
+                ready += 1
+        if ready < self.workers_count:
+            logger.error(f"任务工作进程启动超时: {ready}/{self.workers_count} 就绪")
+            self.shutdown()
+            return False
+
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True, name="TaskProcessPool")
+        self._dispatch_thread.start()
+        logger.info(f"任务工作进程池已启动: {self.workers_count} 个工作进程")
+        return True
+
+    def _spawn_worker(self, worker: _WorkerHandle):
+        worker.command_queue = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, worker.command_queue, self._result_queue, self.skill_dirs,
+                  logging.getLogger().getEffectiveLevel(), self.initializer, self.initargs),
+            daemon=True,
+            name=f"TaskWorker-{worker.worker_id}",
+        )
+        worker.process.start()
+
+    def _select_worker(self, camera_id) -> _WorkerHandle:
+        """任务数最少的工作进程，任务数相同时优先已有该摄像头任务的进程"""
+        return min(self._workers, key=lambda w: (len(w.task_ids), camera_id not in w.cameras, w.worker_id))
+
+    def submit_task(self, spec: Dict[str, Any], on_result: Callable[[Dict[str, Any]], None]) -> int:
+        """
+        提交检测任务
+
+        Args:
+            spec: 任务描述，需可被pickle:
+                task_id, camera_id, skill_name, skill_config, fence_config, frame_interval,
+                motion_gate（可选，MotionGate参数）, max_frame_age（可选，帧延迟预算秒数）
+            on_result: 结果回调，在结果分发线程中调用
+
+        Returns:
+            分配到的工作进程编号
+        """
+        with self._lock:
+            if not self.running:
+                raise RuntimeError("任务工作进程池未启动")
+            task_id = spec["task_id"]
+            if task_id in self._task_workers:
+                self._remove_task(task_id)
+            worker = self._select_worker(spec["camera_id"])
+            self._task_specs[task_id] = spec
+            self._callbacks[task_id] = on_result
+            self._assign(worker, spec)
+            return worker.worker_id
+
+    def _assign(self, worker: _WorkerHandle, spec: Dict[str, Any]):
+        camera_id = spec["camera_id"]
+        channel = self._channels.get(camera_id)
+        worker.task_ids.add(spec["task_id"])
+        worker.cameras[camera_id] = worker.cameras.get(camera_id, 0) + 1
+        self._task_workers[spec["task_id"]] = worker
+        worker.command_queue.put({"op": "start_task", "spec": {**spec, "channel": channel.name if channel else None}})
+
+    def stop_task(self, task_id: int):
+        """停止检测任务"""
+        with self._lock:
+            self._remove_task(task_id)
+
+    def _remove_task(self, task_id: int):
+        worker = self._task_workers.pop(task_id, None)
+        spec = self._task_specs.pop(task_id, None)
+        self._callbacks.pop(task_id, None)
+        if worker is None or spec is None:
+            return
+        camera_id = spec["camera_id"]
+        worker.task_ids.discard(task_id)
+        worker.cameras[camera_id] -= 1
+        if worker.cameras[camera_id] <= 0:
+            del worker.cameras[camera_id]
+        if self.running:
+            worker.command_queue.put({"op": "stop_task", "task_id": task_id})
+        # 摄像头上已没有任务时删除帧通道
+        if not any(s["camera_id"] == camera_id for s in self._task_specs.values()):
+            channel = self._channels.pop(camera_id, None)
+            if channel is not None:
+                channel.close()
+
+    def get_task_worker(self, task_id: int) -> Optional[int]:
+        """任务所在的工作进程编号"""
+        with self._lock:
+            worker = self._task_workers.get(task_id)
+            return worker.worker_id if worker else None
+
+    def publish_frame(self, camera_id, frame: np.ndarray, generation: Optional[int] = None,
+                      timestamp: Optional[float] = None) -> bool:
+        """
+        把摄像头的最新帧写入帧通道（同一代次只写入一次）
+
+        Returns:
+            是否写入（同一帧已由同摄像头的其他任务写入时为False）
+        """
+        with self._lock:
+            channel = self._channels.get(camera_id)
+            if channel is not None and generation is not None and channel.last_generation is not None \
+                    and generation <= channel.last_generation:
+                return False
+            if channel is None or frame.nbytes > channel.capacity:
+                channel = self._recreate_channel(camera_id, frame.nbytes)
+                if channel is None:
+                    return False
+            written = channel.publish(frame, generation, timestamp)
+            if written:
+                self.stats["frames_published"] += 1
+                self.stats["bytes_published"] += frame.nbytes
+            return written
+
+    def _recreate_channel(self, camera_id, capacity: int) -> Optional[SharedFrameChannel]:
+        """按帧大小创建（或扩容重建）摄像头帧通道，并通知该摄像头所在的工作进程"""
+        if not any(s["camera_id"] == camera_id for s in self._task_specs.values()):
+            return None
+        old = self._channels.get(camera_id)
+        channel = SharedFrameChannel.create(capacity, self.channel_slots)
+        self._channels[camera_id] = channel
+        for worker in self._workers:
+            if camera_id in worker.cameras:
+                worker.command_queue.put({"op": "attach", "camera_id": camera_id, "channel": channel.name})
+        if old is not None:
+            channel.last_generation = old.last_generation
+            old.close()
+            self.stats["channel_reallocations"] += 1
+            logger.info(f"摄像头 {camera_id} 帧尺寸变化，帧通道扩容为 {capacity / 1024 / 1024:.1f}MB/帧")
+        return channel
+
+    def _dispatch_loop(self):
+        """分发工作进程返回的结果，并检查工作进程存活"""
+        last_check = time.time()
+        while self.running:
+            try:
+                message = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+
+            if message is not None:
+                self._dispatch(message)
+            if time.time() - last_check >= _WORKER_CHECK_INTERVAL:
+                last_check = time.time()
+                self._restart_dead_workers()
+
+    def _dispatch(self, message: Dict[str, Any]):
+        message_type = message.get("type")
+        if message_type == "ready":
+            return
+        task_id = message.get("task_id")
+        with self._lock:
+            callback = self._callbacks.get(task_id)
+        if message_type == "error":
+            logger.error(f"任务 {task_id} 在工作进程 {message.get('worker_id')} 中出错: {message.get('error')}")
+        if message_type == "result":
+            self.stats["results_received"] += 1
+        if callback is not None:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"任务 {task_id} 处理工作进程结果出错: {str(e)}", exc_info=True)
+
+    def _restart_dead_workers(self):
+        with self._lock:
+            if not self.running:
+                return
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    continue
+                logger.error(f"任务工作进程 {worker.worker_id} 异常退出(exitcode={worker.process.exitcode})，"
+                             f"重启并重新提交 {len(worker.task_ids)} 个任务")
+                specs = [self._task_specs[task_id] for task_id in worker.task_ids]
+                worker.task_ids.clear()
+                worker.cameras.clear()
+                worker.restarts += 1
+                self.stats["worker_restarts"] += 1
+                self._spawn_worker(worker)
+                for spec in specs:
+                    self._assign(worker, spec)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                **self.stats,
+                "workers": [
+                    {
+                        "worker_id": worker.worker_id,
+                        "pid": worker.process.pid if worker.process else None,
+                        "alive": bool(worker.process and worker.process.is_alive()),
+                        "tasks": sorted(worker.task_ids),
+                        "restarts": worker.restarts,
+                    }
+                    for worker in self._workers
+                ],
+                "channels": {
+                    str(camera_id): {"capacity": channel.capacity, "frames_written": channel.frames_written}
+                    for camera_id, channel in self._channels.items()
+                },
+            }
+
+    def shutdown(self, timeout: float = 10.0):
+        """停止全部任务和工作进程，删除帧通道"""
+        with self._lock:
+            if not self._workers:
+                return
+            self.running = False
+            for worker in self._workers:
+                try:
+                    worker.command_queue.put({"op": "shutdown"})
+                except Exception:
+                    pass
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                logger.warning(f"任务工作进程 {worker.worker_id} 未能按时退出，强制终止")
+                worker.process.terminate()
+                worker.process.join(1.0)
+        if self._dispatch_thread is not None:
+            self._dispatch_thread.join(timeout=2.0)
+        with self._lock:
+            for channel in self._channels.values():
+                channel.close()
+            self._channels.clear()
+            self._task_specs.clear()
+            self._task_workers.clear()
+            self._callbacks.clear()
+            self._workers = []
+        logger.info("任务工作进程池已关闭")
+
+
+# 测试代码：帧通道并发读写校验（读取方在另一个进程中）
+def _channel_reader(name: str, duration: float, result_queue):
+    channel = SharedFrameChannel.attach(name)
+    last_sequence = 0
+    checked = torn = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        read = channel.read(last_sequence)
+        if read is None:
+            continue
+        frame, last_sequence, generation, _ = read
+        # 每帧内容都等于代次的低8位
+        if not np.all(frame == generation % 251):
+            torn += 1
+        checked += 1
+    channel.close()
+    result_queue.put((checked, torn))
+
+
+if __name__ == "__main__":
+    ctx = multiprocessing.get_context("spawn")
+    channel = SharedFrameChannel.create(360 * 640 * 3, slots=3)
+    results = ctx.Queue()
+    readers = [ctx.Process(target=_channel_reader, args=(channel.name, 3.0, results)) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+
+    frame = np.empty((360, 640, 3), dtype=np.uint8)
+    generation = 0
+    deadline = time.time() + 3.5
+    while time.time() < deadline:
+        generation += 1
+        frame[...] = generation % 251
+        channel.publish(frame, generation)
+    assert not channel.publish(frame, generation), "同一代次不应重复写入"
+
+    totals = [results.get(timeout=10) for _ in readers]
+    for reader in readers:
+        reader.join()
+    channel.close()
+    print(f"写入 {generation} 帧，读取方校验: {totals}")
+    assert all(checked > 0 and torn == 0 for checked, torn in totals), totals
+    print("测试通过")
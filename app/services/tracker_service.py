@@ -1,11 +1,12 @@
 """
 目标跟踪服务 - 基于SORT算法
 支持按类别分离的多跟踪器，避免跨类别的错误关联
+跟踪器使用状态堆叠的 BatchSort（与 sort.Sort 结果一致），目标多时预测/关联/更新都是整批的数组运算
 """
 import numpy as np
 from typing import Dict, List, Any, Tuple, Optional
 import logging
-from app.services.sort import Sort
+from app.services.batch_sort import BatchSort, iou_batch
 
 logger = logging.getLogger(__name__)
 
@@ -47,60 +48,18 @@ class TrackerService:
         try:
             # 如果没有检测结果，更新所有跟踪器并返回空列表
             if not detections:
-                for tracker in self.trackers.values():
-                    tracker.update(np.empty((0, 5)))
+                self.track({})
                 return []
             
-            # 按类别分组检测结果
-            detections_by_class = {}
-            for detection in detections:
-                class_name = detection.get("class_name", "unknown")
-                if class_name not in detections_by_class:
-                    detections_by_class[class_name] = []
-                detections_by_class[class_name].append(detection)
+            detections_by_class = self.group_by_class(detections)
+            tracked_by_class = self.track(detections_by_class)
             
-            # 为每个类别分别进行跟踪
+            # 关联跟踪结果与原始检测
             all_tracked_detections = []
-            
             for class_name, class_detections in detections_by_class.items():
-                # 确保该类别有跟踪器
-                if class_name not in self.trackers:
-                    self.trackers[class_name] = Sort(
-                        max_age=self.max_age,
-                        min_hits=self.min_hits,
-                        iou_threshold=self.iou_threshold
-                    )
-                
-                # 转换该类别的检测结果为SORT格式
-                dets = []
-                for detection in class_detections:
-                    bbox = detection.get("bbox", [])
-                    confidence = detection.get("confidence", 0.0)
-                    
-                    if len(bbox) >= 4:
-                        dets.append([bbox[0], bbox[1], bbox[2], bbox[3], confidence])
-                
-                # 转换为numpy数组
-                if dets:
-                    dets_np = np.array(dets)
-                else:
-                    dets_np = np.empty((0, 5))
-                
-                # 更新该类别的跟踪器
-                tracked_objects = self.trackers[class_name].update(dets_np)
-                
-                # 关联跟踪结果与原始检测
-                class_tracked_detections = self._associate_tracks_with_detections(
-                    tracked_objects, class_detections, class_name
-                )
-                
-                all_tracked_detections.extend(class_tracked_detections)
-            
-            # 更新没有检测结果的类别的跟踪器（保持跟踪器状态）
-            active_classes = set(detections_by_class.keys())
-            for class_name, tracker in self.trackers.items():
-                if class_name not in active_classes:
-                    tracker.update(np.empty((0, 5)))
+                all_tracked_detections.extend(self.assign_track_ids(
+                    tracked_by_class[class_name], class_detections, class_name
+                ))
             
             return all_tracked_detections
             
@@ -109,6 +68,76 @@ class TrackerService:
             # 出错时返回原始检测结果，但不带track_id
             return detections
     
+    @staticmethod
+    def group_by_class(detections: List[Dict]) -> Dict[str, List[Dict]]:
+        """按类别分组检测结果（保持类别首次出现的顺序）"""
+        detections_by_class = {}
+        for detection in detections:
+            class_name = detection.get("class_name", "unknown")
+            if class_name not in detections_by_class:
+                detections_by_class[class_name] = []
+            detections_by_class[class_name].append(detection)
+        return detections_by_class
+    
+    def track(self, detections_by_class: Dict[str, List[Dict]]) -> Dict[str, np.ndarray]:
+        """
+        用一帧的检测更新各类别的跟踪器（每帧调用一次）
+        
+        Args:
+            detections_by_class: group_by_class 的分组结果
+            
+        Returns:
+            {class_name: SORT输出的跟踪结果 [[x1, y1, x2, y2, id], ...]}，只包含有检测的类别
+        """
+        tracked_by_class = {}
+        
+        # 为每个类别分别进行跟踪
+        for class_name, class_detections in detections_by_class.items():
+            # 确保该类别有跟踪器
+            if class_name not in self.trackers:
+                self.trackers[class_name] = BatchSort(
+                    max_age=self.max_age,
+                    min_hits=self.min_hits,
+                    iou_threshold=self.iou_threshold
+                )
+            
+            # 转换该类别的检测结果为SORT格式
+            dets = []
+            for detection in class_detections:
+                bbox = detection.get("bbox", [])
+                confidence = detection.get("confidence", 0.0)
+                
+                if len(bbox) >= 4:
+                    dets.append([bbox[0], bbox[1], bbox[2], bbox[3], confidence])
+            
+            # 转换为numpy数组
+            if dets:
+                dets_np = np.array(dets)
+            else:
+                dets_np = np.empty((0, 5))
+            
+            # 更新该类别的跟踪器
+            tracked_by_class[class_name] = self.trackers[class_name].update(dets_np)
+        
+        # 更新没有检测结果的类别的跟踪器（保持跟踪器状态）
+        for class_name, tracker in self.trackers.items():
+            if class_name not in detections_by_class:
+                tracker.update(np.empty((0, 5)))
+        
+        return tracked_by_class
+    
+    def assign_track_ids(self, tracked_objects: np.ndarray, detections: List[Dict],
+                         class_name: str) -> List[Dict]:
+        """
+        按IoU把跟踪结果的ID分配给检测结果（同类别内），返回带track_id的检测副本
+        
+        Args:
+            tracked_objects: track() 返回的该类别跟踪结果
+            detections: 检测结果列表（同类别）
+            class_name: 类别名称
+        """
+        return self._associate_tracks_with_detections(tracked_objects, detections, class_name)
+    
     def _associate_tracks_with_detections(self, tracked_objects: np.ndarray, 
                                         detections: List[Dict], 
                                         class_name: str) -> List[Dict]:
@@ -124,40 +153,33 @@ class TrackerService:
             带跟踪ID的检测结果列表
         """
         tracked_detections = []
-        used_detection_indices = set()
-        
-        for tracked_obj in tracked_objects:
-            track_bbox = tracked_obj[:4].tolist()
+        if len(tracked_objects) == 0:
+            return tracked_detections
+
+        # 只有bbox有效的检测参与匹配
+        valid_indices = [idx for idx, detection in enumerate(detections) if len(detection.get("bbox", [])) >= 4]
+        if not valid_indices:
+            return tracked_detections
+        det_boxes = np.array([detections[idx]["bbox"][:4] for idx in valid_indices], dtype=np.float64)
+
+        # 一次算出所有跟踪框与检测框的IoU；按跟踪结果顺序贪心选择IoU最大的未用检测（并列取靠前的）
+        iou_matrix = np.nan_to_num(iou_batch(tracked_objects[:, :4], det_boxes), nan=0.0)
+        used = np.zeros(len(valid_indices), dtype=bool)
+
+        for row, tracked_obj in zip(iou_matrix, tracked_objects):
+            candidates = np.where(used, -1.0, row)
+            best = int(np.argmax(candidates))
+            if candidates[best] <= 0.05:
+                continue
+
             sort_track_id = int(tracked_obj[4])
-            
+            tracked_detection = detections[valid_indices[best]].copy()
             # 生成全局唯一的track_id
-            global_track_id = self._get_global_track_id(class_name, sort_track_id)
-            
-            # 找到最佳匹配的检测结果
-            best_detection = None
-            best_iou = 0.0
-            best_idx = -1
-            
-            for idx, detection in enumerate(detections):
-                if idx in used_detection_indices:
-                    continue
-                    
-                bbox = detection.get("bbox", [])
-                if len(bbox) >= 4:
-                    iou = self._calculate_iou(track_bbox, bbox)
-                    if iou > best_iou:
-                        best_iou = iou
-                        best_detection = detection
-                        best_idx = idx
-            
-            # 如果找到合理匹配，创建带跟踪ID的检测结果
-            if best_detection and best_iou > 0.05:
-                tracked_detection = best_detection.copy()
-                tracked_detection["track_id"] = global_track_id
-                tracked_detection["class_track_id"] = sort_track_id  # 保留类别内的track_id
-                tracked_detections.append(tracked_detection)
-                used_detection_indices.add(best_idx)
-        
+            tracked_detection["track_id"] = self._get_global_track_id(class_name, sort_track_id)
+            tracked_detection["class_track_id"] = sort_track_id  # 保留类别内的track_id
+            tracked_detections.append(tracked_detection)
+            used[best] = True
+
         return tracked_detections
     
     def _get_global_track_id(self, class_name: str, sort_track_id: int) -> int:
@@ -176,38 +198,6 @@ class TrackerService:
         class_hash = abs(hash(class_name)) % 1000
         return class_hash * 10000 + sort_track_id
     
-    def _calculate_iou(self, box1: List[float], box2: List[float]) -> float:
-        """
-        计算两个边界框的IoU
-        
-        Args:
-            box1: 边界框1 [x1, y1, x2, y2]
-            box2: 边界框2 [x1, y1, x2, y2]
-            
-        Returns:
-            IoU值
-        """
-        try:
-            # 计算交集
-            x1 = max(box1[0], box2[0])
-            y1 = max(box1[1], box2[1])
-            x2 = min(box1[2], box2[2])
-            y2 = min(box1[3], box2[3])
-            
-            if x2 <= x1 or y2 <= y1:
-                return 0.0
-            
-            intersection = (x2 - x1) * (y2 - y1)
-            
-            # 计算并集
-            area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-            area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-            union = area1 + area2 - intersection
-            
-            return intersection / union if union > 0 else 0.0
-        except:
-            return 0.0
-    
     def reset(self):
         """重置所有跟踪器状态"""
         self.trackers = {}
@@ -233,7 +223,7 @@ class TrackerService:
         for class_name, tracker in self.trackers.items():
             info["classes"][class_name] = {
                 "frame_count": tracker.frame_count,
-                "active_tracks": len(tracker.trackers) if hasattr(tracker, 'trackers') else 0
+                "active_tracks": len(tracker)
             }
         
         return info 
\ No newline at end of file
@@ -3,13 +3,31 @@ import logging
 import numpy as np
 import json
 import time
+import threading
+from dataclasses import dataclass, field
 from typing import Dict, List, Any, Optional, Union, Tuple
 from app.core.config import settings
+from app.services.inference_batcher import InferenceBatcher, infer_stacked
+from app.services.inference_cache import inference_cache
+from app.services.frame_pipeline import add_stage_time
+from app.services.inference_backend import InferenceBackend, OnnxRuntimeBackend
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class ModelBindingPlan:
+    """模型I/O绑定计划：一次解析、多次复用的输入输出描述"""
+    model_name: str
+    model_version: str
+    input_datatypes: Dict[str, str]          # 输入名称 -> Triton数据类型（如FP32）
+    input_shapes: Dict[str, List[int]]       # 输入名称 -> 元数据中的形状（-1表示可变维）
+    output_names: List[str]                  # 输出名称列表
+    max_batch_size: int = 0                  # 模型配置中的最大批量，0表示不支持批处理
+    requested_outputs: List[Any] = field(default_factory=list)  # 复用的InferRequestedOutput对象
+
 class TritonClient:
     """
     Triton推理服务器通用客户端
@@ -31,6 +49,21 @@ class TritonClient:
         self._client = None  # 懒加载，不在初始化时连接
         self._last_connection_attempt = 0
         self._connection_retry_interval = 5  # 重连间隔（秒）
+        
+        self._last_liveness_check = 0  # 上次确认连接存活的时间
+        self._liveness_check_interval = 5  # 连接存活检查间隔（秒），期间复用连接不再探测
+        
+        # 模型I/O绑定计划缓存 {(model_name, model_version): ModelBindingPlan}
+        self._binding_plans: Dict[Tuple[str, str], ModelBindingPlan] = {}
+        self._binding_lock = threading.Lock()
+        
+        # 动态微批处理（懒加载）
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+        
+        # 进程内推理后端（按模型配置选择，懒加载） {后端名称: InferenceBackend}
+        self._backends: Dict[str, InferenceBackend] = {}
+        self._backend_lock = threading.Lock()
         logger.info(f"初始化Triton客户端配置，目标服务器: {url}")
     
     def _get_client(self):
@@ -42,9 +75,13 @@ class TritonClient:
         
         # 如果客户端存在且连接正常，直接返回
         if self._client is not None:
+            # 检查间隔内已确认过连接存活，直接复用，避免每次调用都多一次RPC
+            if current_time - self._last_liveness_check < self._liveness_check_interval:
+                return self._client
             try:
                 # 简单测试连接是否有效
                 self._client.is_server_live()
+                self._last_liveness_check = current_time
                 return self._client
             except Exception:
                 logger.warning("检测到Triton连接失效，准备重新连接")
@@ -63,6 +100,7 @@ class TritonClient:
             # 测试连接
             if self._client.is_server_live():
                 logger.info(f"成功连接到Triton服务器: {self.url}")
+                self._last_liveness_check = time.time()
                 return self._client
             else:
                 logger.error("Triton服务器无响应")
@@ -95,6 +133,7 @@ class TritonClient:
         try:
             self._client = None
             self._last_connection_attempt = 0  # 重置重连时间限制
+            self._last_liveness_check = 0
             self._get_client()
             return True
         except Exception as e:
@@ -138,6 +177,9 @@ class TritonClient:
         返回:
             bool: 模型是否就绪
         """
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            return backend.is_model_ready(model_name, model_version)
         try:
             return self.client.is_model_ready(model_name, model_version)
         except grpcclient.InferenceServerException as e:
@@ -155,6 +197,9 @@ class TritonClient:
         返回:
             Dict: 模型元数据，如果获取失败则返回None
         """
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            return backend.get_model_metadata(model_name, model_version)
         try:
             metadata = self.client.get_model_metadata(model_name, model_version, as_json=True)
             return metadata
@@ -173,6 +218,9 @@ class TritonClient:
         返回:
             Dict: 模型配置，如果获取失败则返回None
         """
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            return backend.get_model_config(model_name, model_version)
         try:
             config = self.client.get_model_config(model_name, model_version, as_json=True)
             return config
@@ -221,7 +269,14 @@ class TritonClient:
         返回:
             bool: 模型是否成功加载
         """
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            # 进程内后端：释放旧会话，下次推理时重新加载模型文件
+            self.invalidate_model_binding(model_name)
+            backend.unload_model(model_name)
+            return backend.is_model_ready(model_name)
         try:
+            self.invalidate_model_binding(model_name)
             self.client.load_model(model_name, config=config, files=files)
             logger.info(f"模型 {model_name} 加载请求已发送")
             
@@ -247,7 +302,13 @@ class TritonClient:
         返回:
             bool: 模型是否成功卸载
         """
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            self.invalidate_model_binding(model_name)
+            backend.unload_model(model_name)
+            return True
         try:
+            self.invalidate_model_binding(model_name)
             self.client.unload_model(model_name, unload_dependents=unload_dependents)
             logger.info(f"模型 {model_name} 卸载请求已发送")
             
@@ -262,12 +323,238 @@ class TritonClient:
             logger.error(f"卸载模型 {model_name} 失败: {e}")
             return False
     
+    def invalidate_model_binding(self, model_name: str):
+        """
+        使指定模型的I/O绑定计划失效（模型加载/卸载或版本变化时调用）
+        
+        参数:
+            model_name (str): 模型名称
+        """
+        with self._binding_lock:
+            for key in [k for k in self._binding_plans if k[0] == model_name]:
+                self._binding_plans.pop(key, None)
+    
+    def get_backend_name(self, model_name: str) -> str:
+        """
+        获取模型使用的推理后端名称
+        
+        参数:
+            model_name (str): 模型名称
+            
+        返回:
+            str: 后端名称（triton/onnxruntime）
+        """
+        backend_name = settings.INFERENCE_BACKEND_MODELS.get(model_name) or settings.INFERENCE_BACKEND_DEFAULT
+        return (backend_name or "triton").lower()
+    
+    def uses_triton(self, model_name: str) -> bool:
+        """模型是否经由Triton服务器推理"""
+        return self._get_local_backend(model_name) is None
+    
+    def _get_local_backend(self, model_name: str) -> Optional[InferenceBackend]:
+        """
+        获取模型的进程内推理后端，模型使用Triton时返回None
+        
+        参数:
+            model_name (str): 模型名称
+            
+        返回:
+            InferenceBackend: 后端实例（同名后端在所有模型间共享）
+        """
+        backend_name = self.get_backend_name(model_name)
+        if backend_name == "triton":
+            return None
+        
+        backend = self._backends.get(backend_name)
+        if backend is not None:
+            return backend
+        
+        with self._backend_lock:
+            backend = self._backends.get(backend_name)
+            if backend is None:
+                if backend_name == OnnxRuntimeBackend.name:
+                    backend = OnnxRuntimeBackend(
+                        settings.ONNX_MODEL_REPOSITORY or settings.TRITON_MODEL_REPOSITORY,
+                        intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+                        inter_op_threads=settings.ONNX_INTER_OP_THREADS
+                    )
+                    logger.info(f"已启用ONNX Runtime推理后端: 模型目录={backend.model_repository}, "
+                                f"intra_op_threads={backend.intra_op_threads}")
+                else:
+                    logger.error(f"模型 {model_name} 配置了不支持的推理后端 {backend_name}，使用Triton")
+                    return None
+                self._backends[backend_name] = backend
+        return backend
+    
+    def get_backend_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取已启用的进程内推理后端统计信息"""
+        return {name: backend.get_stats() for name, backend in list(self._backends.items())}
+    
+    def _get_binding_plan(self, model_name: str, model_version: str = "") -> Optional[ModelBindingPlan]:
+        """
+        获取模型的I/O绑定计划，首次调用时通过元数据和配置解析，之后直接复用
+        
+        参数:
+            model_name (str): 模型名称
+            model_version (str): 模型版本
+            
+        返回:
+            ModelBindingPlan: 绑定计划，获取元数据失败时返回None（不缓存，下次重试）
+        """
+        key = (model_name, model_version)
+        plan = self._binding_plans.get(key)
+        if plan is not None:
+            return plan
+        
+        metadata = self.get_model_metadata(model_name, model_version)
+        if not metadata:
+            return None
+        
+        max_batch_size = 0
+        config = self.get_model_config(model_name, model_version)
+        if config:
+            try:
+                max_batch_size = int(config.get("config", config).get("max_batch_size", 0))
+            except (TypeError, ValueError):
+                max_batch_size = 0
+        
+        output_names = [out['name'] for out in metadata.get('outputs', [])]
+        plan = ModelBindingPlan(
+            model_name=model_name,
+            model_version=model_version,
+            input_datatypes={inp['name']: inp['datatype'] for inp in metadata.get('inputs', [])},
+            input_shapes={inp['name']: [int(d) for d in inp.get('shape', [])] for inp in metadata.get('inputs', [])},
+            output_names=output_names,
+            max_batch_size=max_batch_size,
+            requested_outputs=[grpcclient.InferRequestedOutput(name) for name in output_names]
+        )
+        with self._binding_lock:
+            self._binding_plans[key] = plan
+        logger.info(f"已缓存模型 {model_name} 的I/O绑定计划: 输入={list(plan.input_datatypes)}, "
+                    f"输出={plan.output_names}, max_batch_size={max_batch_size}")
+        return plan
+    
+    def _get_batcher(self) -> InferenceBatcher:
+        """懒加载获取动态微批处理器"""
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = InferenceBatcher(
+                        lambda name, data, version, timeout: self._infer_direct(name, data, version, "", timeout),
+                        window_ms=settings.TRITON_BATCH_WINDOW_MS,
+                        max_batch_size=settings.TRITON_MAX_BATCH_SIZE
+                    )
+                    logger.info(f"已启用Triton动态微批处理: 窗口={settings.TRITON_BATCH_WINDOW_MS}ms, "
+                                f"最大批量={settings.TRITON_MAX_BATCH_SIZE}")
+        return self._batcher
+    
+    def get_batching_stats(self) -> Optional[Dict[str, float]]:
+        """获取动态微批处理统计信息，未启用时返回None"""
+        return self._batcher.get_stats() if self._batcher else None
+    
     def infer(self, model_name: str, inputs: Dict[str, np.ndarray], 
               model_version: str = "", request_id: str = "", 
               timeout: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
         """
         执行同步推理
         
+        启用动态微批处理且模型支持批处理时，同一时间窗口内其他任务对同一模型的
+        并发请求会被合并为一次批量推理，调用方拿到的仍是自己那一份输出。
+        
+        在 inference_cache.frame_scope() 作用域内调用时（检测线程处理摄像头帧），
+        同一摄像头同一帧对同一模型的重复请求只推理一次，返回共享的只读输出。
+        
+        参数:
+            model_name (str): 模型名称
+            inputs (Dict[str, np.ndarray]): 模型输入，键为输入名称，值为输入数据
+            model_version (str): 模型版本，默认为空字符串（使用最新版本）
+            request_id (str): 请求ID，用于追踪请求（指定时不参与批处理）
+            timeout (Optional[int]): 超时时间，单位为毫秒
+            
+        返回:
+            Dict[str, np.ndarray]: 推理结果，键为输出名称，值为输出数据，如果推理失败则返回None
+        """
+        start_time = time.perf_counter()
+        try:
+            scope = inference_cache.current_scope()
+            if scope is not None and settings.INFERENCE_DEDUP_ENABLED and not request_id:
+                key = inference_cache.make_key(model_name, model_version, inputs)
+                return inference_cache.get_or_infer(
+                    scope, key, lambda: self._infer_uncached(model_name, inputs, model_version, request_id, timeout)
+                )
+            
+            return self._infer_uncached(model_name, inputs, model_version, request_id, timeout)
+        finally:
+            # 检测流水线的分阶段计时（不在流水线帧处理中时忽略）
+            add_stage_time("inference", time.perf_counter() - start_time)
+    
+    def _infer_uncached(self, model_name: str, inputs: Dict[str, np.ndarray], 
+                        model_version: str = "", request_id: str = "", 
+                        timeout: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """执行推理（不经过去重缓存），进程内后端直接推理，Triton模型可支持批处理时交给微批处理器"""
+        backend = self._get_local_backend(model_name)
+        if backend is not None:
+            return backend.infer(model_name, inputs, model_version, timeout)
+        
+        if settings.TRITON_DYNAMIC_BATCHING_ENABLED and not request_id:
+            try:
+                plan = self._get_binding_plan(model_name, model_version)
+            except Exception as e:
+                logger.debug(f"获取模型 {model_name} 绑定计划失败: {e}")
+                plan = None
+            if plan is not None and plan.max_batch_size > 0:
+                return self._get_batcher().infer(
+                    model_name, inputs, model_version,
+                    timeout=timeout, max_batch_size=plan.max_batch_size
+                )
+        
+        return self._infer_direct(model_name, inputs, model_version, request_id, timeout)
+    
+    def infer_batch(self, model_name: str, batch_inputs: List[Dict[str, np.ndarray]], 
+                    model_version: str = "", timeout: Optional[int] = None) -> List[Optional[Dict[str, np.ndarray]]]:
+        """
+        批量执行同一模型的多份输入（如一帧中所有车牌裁剪图的识别）
+        
+        模型支持批处理（配置了max_batch_size，或输入第0维为可变维）时，
+        按模型允许的最大批量堆叠后推理，否则逐个推理。
+        
+        参数:
+            model_name (str): 模型名称
+            batch_inputs (List[Dict[str, np.ndarray]]): 输入列表，各项输入名称、形状（除第0维）和类型一致
+            model_version (str): 模型版本
+            timeout (Optional[int]): 超时时间，单位为毫秒
+            
+        返回:
+            List[Optional[Dict[str, np.ndarray]]]: 与输入一一对应的推理结果，失败的项为None
+        """
+        if not batch_inputs:
+            return []
+        
+        try:
+            plan = self._get_binding_plan(model_name, model_version)
+        except Exception as e:
+            logger.debug(f"获取模型 {model_name} 绑定计划失败: {e}")
+            plan = None
+        
+        batchable = plan is not None and (
+            plan.max_batch_size > 0 or
+            all(shape and shape[0] == -1 for shape in plan.input_shapes.values())
+        )
+        if not batchable or len(batch_inputs) == 1:
+            return [self.infer(model_name, inputs, model_version, timeout=timeout) for inputs in batch_inputs]
+        
+        return infer_stacked(
+            lambda name, inputs, version, infer_timeout: self.infer(name, inputs, version, timeout=infer_timeout),
+            model_name, batch_inputs, model_version, timeout,
+            max_batch_size=plan.max_batch_size or None
+        )
+    
+    def _infer_direct(self, model_name: str, inputs: Dict[str, np.ndarray], 
+                      model_version: str = "", request_id: str = "", 
+                      timeout: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        直接执行一次同步推理RPC（不经过批处理）
+        
         参数:
             model_name (str): 模型名称
             inputs (Dict[str, np.ndarray]): 模型输入，键为输入名称，值为输入数据
@@ -279,59 +566,46 @@ class TritonClient:
             Dict[str, np.ndarray]: 推理结果，键为输出名称，值为输出数据，如果推理失败则返回None
         """
         try:
-            # 获取模型元数据，用于确定输入输出格式
-            metadata = self.get_model_metadata(model_name, model_version)
-            if not metadata:
+            # 使用缓存的绑定计划确定输入输出格式（只在首次推理时查询元数据）
+            plan = self._get_binding_plan(model_name, model_version)
+            if plan is None:
                 logger.error(f"获取模型 {model_name} 元数据失败，无法执行推理")
                 return None
             
             # 创建输入对象
             infer_inputs = []
             for input_name, input_data in inputs.items():
-                # 查找匹配的输入元数据
-                input_metadata = next((inp for inp in metadata['inputs'] if inp['name'] == input_name), None)
-                if not input_metadata:
+                datatype = plan.input_datatypes.get(input_name)
+                if datatype is None:
                     logger.error(f"模型 {model_name} 没有名为 {input_name} 的输入")
                     return None
                 
-                # 创建输入对象
-                infer_input = grpcclient.InferInput(
-                    input_name, 
-                    input_data.shape, 
-                    input_metadata['datatype']
-                )
+                infer_input = grpcclient.InferInput(input_name, input_data.shape, datatype)
                 infer_input.set_data_from_numpy(input_data)
                 infer_inputs.append(infer_input)
             
-            # 创建输出对象
-            infer_outputs = []
-            for output_metadata in metadata['outputs']:
-                infer_output = grpcclient.InferRequestedOutput(output_metadata['name'])
-                infer_outputs.append(infer_output)
-            
             # 执行推理
             result = self.client.infer(
                 model_name=model_name,
                 inputs=infer_inputs,
-                outputs=infer_outputs,
+                outputs=plan.requested_outputs,
                 model_version=model_version,
                 request_id=request_id,
                 timeout=timeout
             )
             
             # 处理结果
-            outputs = {}
-            for output_metadata in metadata['outputs']:
-                output_name = output_metadata['name']
-                outputs[output_name] = result.as_numpy(output_name)
-            
-            return outputs
+            return {name: result.as_numpy(name) for name in plan.output_names}
             
         except grpcclient.InferenceServerException as e:
             logger.error(f"推理失败: {e}")
+            # 模型可能已被替换或卸载，下次推理时重新解析绑定计划并检查连接
+            self.invalidate_model_binding(model_name)
+            self._last_liveness_check = 0
             return None
         except Exception as e:
             logger.error(f"推理过程中发生错误: {e}")
+            self._last_liveness_check = 0
             return None
     
     # 移除了原来的async_infer方法，可以根据需要添加
@@ -341,6 +615,47 @@ triton_client = TritonClient()
 
 # 测试代码
 if __name__ == "__main__":
+    # 微基准：使用计数桩服务器统计每次推理的RPC次数（绑定计划缓存后应为1次）
+    class _CountingStubServer:
+        def __init__(self):
+            self.rpc_calls = {}
+        
+        def _count(self, name):
+            self.rpc_calls[name] = self.rpc_calls.get(name, 0) + 1
+        
+        def is_server_live(self):
+            self._count("is_server_live")
+            return True
+        
+        def get_model_metadata(self, model_name, model_version="", as_json=True):
+            self._count("get_model_metadata")
+            return {"inputs": [{"name": "images", "datatype": "FP32", "shape": [1, 3, 640, 640]}],
+                    "outputs": [{"name": "output0", "datatype": "FP32", "shape": [1, 84, 8400]}]}
+        
+        def get_model_config(self, model_name, model_version="", as_json=True):
+            self._count("get_model_config")
+            return {"config": {"max_batch_size": 0}}
+        
+        def infer(self, model_name, inputs, outputs=None, **kwargs):
+            self._count("infer")
+            output = np.zeros((1, 84, 8400), dtype=np.float32)
+            return type("_StubResult", (), {"as_numpy": lambda self, name: output})()
+    
+    stub = _CountingStubServer()
+    bench_client = TritonClient(url="stub:0")
+    bench_client._client = stub
+    bench_client._last_liveness_check = time.time()
+    frame_tensor = np.zeros((1, 3, 640, 640), dtype=np.float32)
+    bench_rounds = 100
+    start = time.perf_counter()
+    for _ in range(bench_rounds):
+        bench_client.infer("yolo11_stub", {"images": frame_tensor})
+    elapsed = time.perf_counter() - start
+    total_rpcs = sum(stub.rpc_calls.values())
+    print(f"桩服务器RPC统计: {stub.rpc_calls}")
+    print(f"每次推理RPC数: {total_rpcs / bench_rounds:.2f}（首次解析绑定计划后为1），"
+          f"平均耗时: {elapsed / bench_rounds * 1000:.3f}ms")
+    
     # 测试服务器连接
     client = TritonClient()
     print(f"服务器是否在线: {client.is_server_live()}")
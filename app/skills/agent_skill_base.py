@@ -288,7 +288,7 @@ class AgentSkillBase(BaseSkill, ABC):
         else:  # B2
             # 时序分析：保存发现结果，切换到COLLECTING阶段
             self._discovery_result = discovery
-            self._frame_buffer = [frame.copy()]
+            self._frame_buffer = [self.own_frame(frame)]
             self._last_buffer_time = time.time()
             self._batch_analyses = []
             self._current_batch = 0
@@ -367,7 +367,7 @@ class AgentSkillBase(BaseSkill, ABC):
             )
         
         # 时间到了，存入缓冲区
-        self._frame_buffer.append(frame.copy())
+        self._frame_buffer.append(self.own_frame(frame))
         self._last_buffer_time = now
         buffer_size = len(self._frame_buffer)
         
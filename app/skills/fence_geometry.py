@@ -0,0 +1,435 @@
+"""
+电子围栏几何的预编译
+
+围栏配置中的多边形使用归一化坐标（0-1），每次判断都要先校验配置、按图像尺寸换算成像素坐标再做射线法。
+CompiledFence 按 (围栏, 图像尺寸) 编译一次:
+1. 像素坐标多边形及其边数组，批量判断时对所有点和所有边一次做向量化射线法
+2. 每个多边形的外接框，先用外接框排除不可能在内的点
+3. 可选的栅格掩码（uint8，每像素一格，默认不生成）: 0 表示整格在围栏外、1 表示整格在围栏内、2 表示有边经过，
+   前两种直接查表，只有边经过的格子才回退到射线法；每个1080p围栏约2MB、编译约10ms，
+   常见的每帧数百个检测时并不比外接框排除+批量射线法快
+
+射线法与原逐点实现（point_in_polygon）的比较和运算顺序完全一致，判断结果相同。
+
+越线检测（trigger_mode="cross"）见 FenceCrossingDetector: 每帧把所有轨迹的移动线段与所有围栏边一次做相交判断。
+"""
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# 栅格掩码取值
+MASK_OUTSIDE = 0
+MASK_INSIDE = 1
+MASK_EDGE = 2
+
+# 掩码中标记边所经过格子的线宽（像素），覆盖边两侧至少1个像素，保证未标记的格子内没有边经过
+_EDGE_THICKNESS = 3
+_DRAW_SHIFT = 4
+
+
+def point_in_polygon(point: Tuple[float, float], polygon: List[Tuple[float, float]]) -> bool:
+    """
+    使用射线法判断点是否在多边形内
+
+    Args:
+        point: 待判断的点 (x, y)
+        polygon: 多边形顶点列表 [(x1, y1), (x2, y2), ...]
+
+    Returns:
+        点是否在多边形内
+    """
+    x, y = point
+    n = len(polygon)
+    inside = False
+
+    p1x, p1y = polygon[0]
+    for i in range(1, n + 1):
+        p2x, p2y = polygon[i % n]
+        if y > min(p1y, p2y):
+            if y <= max(p1y, p2y):
+                if x <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    if p1x == p2x or x <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+
+    return inside
+
+
+def fence_cache_key(fence_config: Dict, image_size: Tuple[int, int]) -> Hashable:
+    """按围栏内容和图像尺寸生成缓存键，围栏配置修改后键随之改变"""
+    shapes = tuple(tuple((p["x"], p["y"]) for p in shape) for shape in fence_config.get("points", []))
+    return shapes, (int(image_size[0]), int(image_size[1]))
+
+
+class _Polygon:
+    """一个像素坐标多边形的边数组和外接框"""
+
+    __slots__ = ("points", "p1x", "p1y", "p2x", "p2y", "edge_min_y", "edge_max_y", "edge_max_x",
+                 "vertical", "min_x", "min_y", "max_y", "max_x")
+
+    def __init__(self, points: List[Tuple[float, float]]):
+        self.points = points
+        vertices = np.asarray(points, dtype=np.float64)
+        nxt = np.roll(vertices, -1, axis=0)
+        # 第i条边为 顶点i -> 顶点i+1（最后一条边回到起点），与 point_in_polygon 的遍历顺序相同
+        self.p1x, self.p1y = vertices[:, 0], vertices[:, 1]
+        self.p2x, self.p2y = nxt[:, 0], nxt[:, 1]
+        self.edge_min_y = np.minimum(self.p1y, self.p2y)
+        self.edge_max_y = np.maximum(self.p1y, self.p2y)
+        self.edge_max_x = np.maximum(self.p1x, self.p2x)
+        self.vertical = self.p1x == self.p2x
+        # 外接框排除: y 不在 (min_y, max_y] 内或 x > max_x 时没有边会翻转结果。
+        # 多边形左侧的点交点数为偶数，但浮点舍入下不保证与逐点实现一致，因此不按左边界排除
+        self.min_x = float(vertices[:, 0].min())
+        self.min_y = float(vertices[:, 1].min())
+        self.max_y = float(vertices[:, 1].max())
+        self.max_x = float(vertices[:, 0].max())
+
+    def contains(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """批量射线法（点 × 边），x、y 为一维数组"""
+        X, Y = x[:, None], y[:, None]
+        crossing = (Y > self.edge_min_y) & (Y <= self.edge_max_y) & (X <= self.edge_max_x)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xinters = (Y - self.p1y) * (self.p2x - self.p1x) / (self.p2y - self.p1y) + self.p1x
+        crossing &= self.vertical | (X <= xinters)
+        return (np.count_nonzero(crossing, axis=1) & 1).astype(bool)
+
+    def fill_rows(self, mask: np.ndarray, value: int):
+        """将格子中心在多边形内的格子置为 value（扫描线：每行按交点个数的奇偶性填充，用于生成栅格掩码）"""
+        height, width = mask.shape
+        # 只有多边形外接框内的格子可能在多边形内
+        first_row = max(0, int(np.floor(self.min_y)) - 1)
+        last_row = min(height, int(np.ceil(self.max_y)) + 1)
+        first_col = max(0, int(np.floor(self.min_x)) - 1)
+        last_col = min(width, int(np.ceil(self.max_x)) + 1)
+        if first_row >= last_row or first_col >= last_col:
+            return
+        cols = last_col - first_col
+        y = np.arange(first_row, last_row, dtype=np.float64)[:, None] + 0.5
+        spans = (y > self.edge_min_y) & (y <= self.edge_max_y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xinters = np.where(self.vertical, self.p1x, (y - self.p1y) * (self.p2x - self.p1x) / (self.p2y - self.p1y) + self.p1x)
+        # 格子中心 c + 0.5 <= 交点时该边翻转一次，即 first_col..k-1 列翻转，k = floor(交点 - 0.5) + 1
+        rows, edges = np.nonzero(spans)
+        k = np.clip(np.floor(xinters[rows, edges] - 0.5) + 1 - first_col, 0, cols).astype(np.intp)
+        # 差分后按行累加得到每格的翻转次数，只关心奇偶性，int8 溢出回绕不影响结果
+        diff = np.zeros((last_row - first_row, cols + 1), dtype=np.int8)
+        np.add.at(diff, (rows, 0), 1)
+        np.add.at(diff, (rows, k), -1)
+        inside = (np.cumsum(diff[:, :cols], axis=1, dtype=np.int8) & 1).astype(bool)
+        mask[first_row:last_row, first_col:last_col][inside] = value
+
+
+class CrossingEdges:
+    """越线检测用的所有围栏边（多边形的边含首尾闭合边，计数线为一条线段）"""
+
+    __slots__ = ("px", "py", "qx", "qy", "inward", "shape_index")
+
+    def __init__(self, segments: List[Tuple[Tuple[float, float], Tuple[float, float], float, int]]):
+        """
+        Args:
+            segments: [(起点, 终点, 内侧符号, 所属图形在配置中的序号), ...]
+        """
+        self.px = np.array([seg[0][0] for seg in segments], dtype=np.float64)
+        self.py = np.array([seg[0][1] for seg in segments], dtype=np.float64)
+        self.qx = np.array([seg[1][0] for seg in segments], dtype=np.float64)
+        self.qy = np.array([seg[1][1] for seg in segments], dtype=np.float64)
+        # 边 p->q 的叉积 (q - p) × (x - p) 乘以内侧符号后大于0的一侧为"内侧"（进入方向）
+        self.inward = np.array([seg[2] for seg in segments], dtype=np.float64)
+        self.shape_index = np.array([seg[3] for seg in segments], dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.px)
+
+    def side(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """点相对各边的叉积（已乘内侧符号），x、y 为 (N, 1)，返回 (N, E)"""
+        return ((self.qx - self.px) * (y - self.py) - (self.qy - self.py) * (x - self.px)) * self.inward
+
+
+class CompiledFence:
+    """按图像尺寸编译好的电子围栏（多个多边形，点在任一多边形内即在围栏内；越线模式下还可包含计数线）"""
+
+    def __init__(self, polygons: List[List[Tuple[float, float]]], image_size: Tuple[int, int],
+                 build_mask: bool = False, lines: Optional[List[List[Tuple[float, float]]]] = None,
+                 shape_indices: Optional[List[int]] = None):
+        """
+        Args:
+            polygons: 像素坐标多边形列表（每个至少3个顶点）
+            image_size: 图像尺寸 (width, height)
+            build_mask: 是否生成栅格掩码
+            lines: 像素坐标计数线列表（每条2个端点），只用于越线检测
+            shape_indices: 多边形和计数线（按先多边形后计数线的顺序）在围栏配置中的序号，默认按顺序编号
+        """
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.polygons = [_Polygon(points) for points in polygons]
+        self.lines = list(lines or [])
+        self.shape_indices = list(shape_indices) if shape_indices is not None \
+            else list(range(len(self.polygons) + len(self.lines)))
+        self.mask = self._build_mask() if build_mask and self.polygons else None
+        self._crossing_edges = None
+
+    @classmethod
+    def from_config(cls, fence_config: Dict, image_size: Tuple[int, int], build_mask: bool = False) -> "CompiledFence":
+        """由围栏配置（归一化坐标）编译，2个点的图形为计数线，少于2个点的忽略"""
+        width, height = image_size
+        polygons, lines, polygon_indices, line_indices = [], [], [], []
+        for index, shape in enumerate(fence_config.get("points", [])):
+            points = [(p["x"] * width, p["y"] * height) for p in shape] if len(shape) >= 2 else None
+            if points is None:
+                continue
+            if len(points) >= 3:
+                polygons.append(points)
+                polygon_indices.append(index)
+            else:
+                lines.append(points)
+                line_indices.append(index)
+        return cls(polygons, image_size, build_mask=build_mask, lines=lines,
+                   shape_indices=polygon_indices + line_indices)
+
+    @property
+    def crossing_edges(self) -> CrossingEdges:
+        """越线检测用的边数组（首次使用时生成）"""
+        if self._crossing_edges is None:
+            segments = []
+            for polygon, shape_index in zip(self.polygons, self.shape_indices):
+                points = polygon.points
+                # 有向面积（图像坐标系）为正时，多边形内部在每条边 p->q 叉积为正的一侧
+                area = sum(points[i][0] * points[(i + 1) % len(points)][1] - points[(i + 1) % len(points)][0] * points[i][1]
+                           for i in range(len(points)))
+                inward = -1.0 if area < 0 else 1.0
+                segments += [(points[i], points[(i + 1) % len(points)], inward, shape_index)
+                             for i in range(len(points))]
+            for line, shape_index in zip(self.lines, self.shape_indices[len(self.polygons):]):
+                segments.append((line[0], line[1], 1.0, shape_index))
+            self._crossing_edges = CrossingEdges(segments)
+        return self._crossing_edges
+
+    def _build_mask(self) -> np.ndarray:
+        width, height = self.image_size
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for polygon in self.polygons:
+            polygon.fill_rows(mask, MASK_INSIDE)
+
+        # cv2 以整数坐标为像素中心，格子 (c, r) 的中心为 (c + 0.5, r + 0.5)，绘制时平移半个像素
+        scale = 1 << _DRAW_SHIFT
+        for polygon in self.polygons:
+            vertices = np.round((np.asarray(polygon.points, dtype=np.float64) - 0.5) * scale).astype(np.int32)
+            cv2.polylines(mask, [vertices], True, MASK_EDGE, thickness=_EDGE_THICKNESS,
+                          lineType=cv2.LINE_8, shift=_DRAW_SHIFT)
+        return mask
+
+    def _contains_exact(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        inside = np.zeros(len(x), dtype=bool)
+        for polygon in self.polygons:
+            candidates = np.flatnonzero(~inside & (y > polygon.min_y) & (y <= polygon.max_y) & (x <= polygon.max_x))
+            if len(candidates):
+                inside[candidates] = polygon.contains(x[candidates], y[candidates])
+        return inside
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        批量判断点是否在围栏内
+
+        Args:
+            points: 像素坐标 (N, 2)
+
+        Returns:
+            (N,) 布尔数组
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        if self.mask is None:
+            return self._contains_exact(x, y)
+
+        width, height = self.image_size
+        with np.errstate(invalid="ignore"):
+            in_image = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        values = np.full(len(points), MASK_EDGE, dtype=np.uint8)
+        values[in_image] = self.mask[y[in_image].astype(np.intp), x[in_image].astype(np.intp)]
+        inside = values == MASK_INSIDE
+        exact = np.flatnonzero(values == MASK_EDGE)
+        if len(exact):
+            inside[exact] = self._contains_exact(x[exact], y[exact])
+        return inside
+
+    def contains_point(self, point: Tuple[float, float]) -> bool:
+        """判断单个点是否在围栏内"""
+        x, y = point
+        if self.mask is not None and 0 <= x < self.image_size[0] and 0 <= y < self.image_size[1]:
+            value = self.mask[int(y), int(x)]
+            if value != MASK_EDGE:
+                return bool(value == MASK_INSIDE)
+        for polygon in self.polygons:
+            if polygon.min_y < y <= polygon.max_y and x <= polygon.max_x and point_in_polygon(point, polygon.points):
+                return True
+        return False
+
+
+class FenceCrossingDetector:
+    """
+    越线（绊线）检测
+
+    按 track_id 记录每条轨迹上一帧的关键点，以及它相对每条围栏边位于哪一侧（侧记忆）。每帧把所有轨迹
+    从上一关键点到当前关键点的移动线段与所有围栏边一次做相交判断（轨迹 × 边 的数组运算），
+    只有真正穿过边的移动才产生越线事件:
+    - 关键点正好落在边所在直线上时保持原来的一侧，碰线后返回不算越线，停在线上再继续穿过只算一次
+    - 边按半开区间 [起点, 终点) 判断，穿过多边形顶点时只计一条边
+    - 轨迹首次出现、或中断超过 max_gap 帧后重新出现时只记录位置，不产生事件
+
+    方向: 多边形为 in（进入）/ out（离开）；计数线从 p1 看向 p2，从左侧穿到右侧为 in，反之为 out（图像坐标系，y轴向下）。
+    每个图形（按配置中的序号）分方向累计越线次数。
+    """
+
+    DIRECTIONS = ("any", "in", "out")
+
+    def __init__(self, fence: CompiledFence, direction: str = "any", max_gap: int = 30):
+        """
+        Args:
+            fence: 编译好的围栏
+            direction: 产生事件的方向，any/in/out
+            max_gap: 轨迹最多中断的帧数（调用 update 的次数），超过后丢弃其上一位置
+        """
+        self.fence = fence
+        self.direction = direction if direction in self.DIRECTIONS else "any"
+        self.max_gap = max_gap
+        self.edges = fence.crossing_edges
+        self.frame = 0
+        self.counts = {index: {"in": 0, "out": 0} for index in fence.shape_indices}
+
+        # 轨迹状态按槽位存放: track_id -> 槽位
+        self._slots: Dict[Any, int] = {}
+        self._free: List[int] = []
+        self._next_slot = 0
+        capacity = 64
+        self._slot_ids: List[Any] = [None] * capacity
+        self._in_use = np.zeros(capacity, dtype=bool)
+        self._anchors = np.zeros((capacity, 2), dtype=np.float64)
+        self._sides = np.zeros((capacity, len(self.edges)), dtype=bool)
+        self._last_seen = np.zeros(capacity, dtype=np.int64)
+
+    def _allocate(self, count: int) -> List[int]:
+        slots = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        needed = count - len(slots)
+        if needed > 0:
+            if self._next_slot + needed > len(self._anchors):
+                capacity = max(2 * len(self._anchors), self._next_slot + needed)
+                self._anchors = np.resize(self._anchors, (capacity, 2))
+                self._sides = np.resize(self._sides, (capacity, len(self.edges)))
+                self._last_seen = np.resize(self._last_seen, capacity)
+                self._in_use = np.concatenate([self._in_use, np.zeros(capacity - len(self._in_use), dtype=bool)])
+                self._slot_ids += [None] * (capacity - len(self._slot_ids))
+            slots += list(range(self._next_slot, self._next_slot + needed))
+            self._next_slot += needed
+        return slots
+
+    def _expire(self):
+        stale = np.flatnonzero(self._in_use & (self.frame - self._last_seen > self.max_gap))
+        if len(stale):
+            self._in_use[stale] = False
+            for slot in stale.tolist():
+                del self._slots[self._slot_ids[slot]]
+                self._slot_ids[slot] = None
+                self._free.append(slot)
+
+    def update(self, track_ids: Sequence[Any], points: Sequence[Tuple[float, float]]) -> List[Sequence[Dict[str, Any]]]:
+        """
+        输入当前帧各轨迹的关键点，返回每条轨迹本帧的越线事件（按移动顺序，已按方向过滤）
+
+        Args:
+            track_ids: 轨迹ID列表（同一帧内不重复）
+            points: 与 track_ids 对应的关键点像素坐标
+
+        Returns:
+            与输入对应的事件列表，每个事件为 {"fence_index", "edge_index", "direction", "count"}；
+            没有事件的轨迹对应空序列
+        """
+        self.frame += 1
+        events: List[Sequence[Dict[str, Any]]] = [()] * len(track_ids)
+        if not len(track_ids):
+            self._expire()
+            return events
+
+        current = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        bx, by = current[:, :1], current[:, 1:]
+        side_b = self.edges.side(bx, by)
+
+        all_slots = np.fromiter((self._slots.get(track_id, -1) for track_id in track_ids),
+                                dtype=np.intp, count=len(track_ids))
+        known = all_slots >= 0
+        if known.any() and len(self.edges):
+            rows = np.flatnonzero(known)
+            slots = all_slots[rows]
+            previous_side = self._sides[slots]
+            sb = side_b[rows]
+            # 落在直线上时保持原来的一侧
+            new_side = np.where(sb == 0, previous_side, sb > 0)
+
+            ax, ay = self._anchors[slots, :1], self._anchors[slots, 1:]
+            mx, my = bx[rows] - ax, by[rows] - ay
+            # 边的两个端点相对移动线段的叉积，端点在 [起点, 终点) 两侧时移动线段穿过这条边
+            oa = mx * (self.edges.py - ay) - my * (self.edges.px - ax)
+            ob = mx * (self.edges.qy - ay) - my * (self.edges.qx - ax)
+            hit = ((oa <= 0) & (ob > 0)) | ((ob < 0) & (oa >= 0))
+            crossed = (new_side != previous_side) & hit
+
+            if crossed.any():
+                sa = self.edges.side(ax, ay)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    t = sa / (sa - sb)  # 交点在移动线段上的位置，用于按移动顺序排列事件
+                self._emit(events, rows, crossed, new_side, t)
+
+            self._anchors[slots] = current[rows]
+            self._sides[slots] = new_side
+            self._last_seen[slots] = self.frame
+
+        elif known.any():
+            slots = all_slots[known]
+            self._anchors[slots] = current[known]
+            self._last_seen[slots] = self.frame
+
+        new = np.flatnonzero(~known)
+        if len(new):
+            slots = self._allocate(len(new))
+            self._anchors[slots] = current[new]
+            self._sides[slots] = side_b[new] > 0
+            self._last_seen[slots] = self.frame
+            self._in_use[slots] = True
+            for i, slot in zip(new.tolist(), slots):
+                self._slots[track_ids[i]] = slot
+                self._slot_ids[slot] = track_ids[i]
+
+        self._expire()
+        return events
+
+    def _emit(self, events, rows, crossed, new_side, t):
+        pair_rows, pair_edges = np.nonzero(crossed)
+        order = np.lexsort((pair_edges, t[pair_rows, pair_edges], pair_rows))
+        for k in order:
+            row, edge = pair_rows[k], pair_edges[k]
+            direction = "in" if new_side[row, edge] else "out"
+            shape_index = int(self.edges.shape_index[edge])
+            self.counts[shape_index][direction] += 1
+            if self.direction != "any" and direction != self.direction:
+                continue
+            index = rows[row]
+            if not events[index]:
+                events[index] = []
+            events[index].append({
+                "fence_index": shape_index,
+                "edge_index": int(edge),
+                "direction": direction,
+                "count": self.counts[shape_index][direction],
+            })
+
+    def reset(self):
+        """清空轨迹状态和计数"""
+        self._slots.clear()
+        self._free.clear()
+        self._next_slot = 0
+        self._slot_ids = [None] * len(self._slot_ids)
+        self._in_use[:] = False
+        self.frame = 0
+        self.counts = {index: {"in": 0, "out": 0} for index in self.fence.shape_indices}
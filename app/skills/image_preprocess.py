@@ -0,0 +1,221 @@
+"""
+检测类技能共享的图像预处理模块
+
+将 BGR 图像转换为模型输入张量 (1, 3, H, W) float32，等价于各技能原有的
+cvtColor -> resize -> astype(float32)/255 -> transpose 流程，但：
+1. 输出张量和中间缩放缓冲区按线程、按图像尺寸预分配并复用，稳态下每帧不再分配整帧数组
+2. BGR->RGB 通道交换、归一化与 HWC->CHW 转换在写入输出张量时一次完成
+3. 支持 letterbox（等比缩放+边缘填充），并记录缩放比例和填充偏移供后处理反算坐标
+
+注意：返回的张量是复用缓冲区，同一线程下一次调用预处理时会被覆盖，
+调用方应在推理完成前使用它，不要跨帧持有。
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class PreprocessInfo:
+    """一次预处理的几何信息，用于将模型输入坐标还原为原图坐标"""
+    image_size: Tuple[int, int]   # 原图尺寸 (width, height)
+    input_size: Tuple[int, int]   # 模型输入尺寸 (width, height)
+    scale_x: float                # 原图 -> 模型输入 的水平缩放比例
+    scale_y: float                # 原图 -> 模型输入 的垂直缩放比例
+    pad_x: float = 0.0            # 左侧填充（letterbox时为单侧填充量）
+    pad_y: float = 0.0            # 顶部填充
+
+    @property
+    def x_factor(self) -> float:
+        """模型输入坐标 -> 原图坐标 的水平系数"""
+        return self.image_size[0] / (self.input_size[0] - 2 * self.pad_x)
+
+    @property
+    def y_factor(self) -> float:
+        """模型输入坐标 -> 原图坐标 的垂直系数"""
+        return self.image_size[1] / (self.input_size[1] - 2 * self.pad_y)
+
+
+class _BufferState:
+    """某一原图尺寸对应的预分配缓冲区和布局"""
+
+    __slots__ = ("info", "tensor", "resized", "region")
+
+    def __init__(self, info: PreprocessInfo, tensor: np.ndarray,
+                 resized: Optional[np.ndarray], region: Tuple[slice, slice]):
+        self.info = info
+        self.tensor = tensor
+        self.resized = resized
+        self.region = region
+
+
+class ImagePreprocessor:
+    """
+    复用缓冲区的YOLO图像预处理器
+
+    每个线程持有独立的缓冲区，原图尺寸变化时重新分配。
+    """
+
+    def __init__(self, input_width: int, input_height: int, letterbox: bool = False, pad_value: int = 114):
+        """
+        初始化预处理器
+
+        Args:
+            input_width: 模型输入宽度
+            input_height: 模型输入高度
+            letterbox: 是否使用等比缩放+填充，False时直接拉伸到输入尺寸（与原实现一致）
+            pad_value: letterbox填充的像素值
+        """
+        self.input_width = int(input_width)
+        self.input_height = int(input_height)
+        self.letterbox = letterbox
+        self.pad_value = pad_value
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "frames": 0,
+            "allocations": 0,
+            "total_time": 0.0,
+        }
+
+    def _layout(self, image_size: Tuple[int, int]) -> Tuple[PreprocessInfo, Tuple[int, int], Tuple[int, int]]:
+        """计算缩放后尺寸及左上角偏移（letterbox与Ultralytics一致）"""
+        width, height = image_size
+        input_size = (self.input_width, self.input_height)
+        if not self.letterbox:
+            info = PreprocessInfo(image_size, input_size,
+                                  self.input_width / width, self.input_height / height)
+            return info, input_size, (0, 0)
+
+        r = min(self.input_height / height, self.input_width / width)
+        new_w, new_h = int(round(width * r)), int(round(height * r))
+        pad_w = (self.input_width - new_w) / 2
+        pad_h = (self.input_height - new_h) / 2
+        left, top = int(round(pad_w - 0.1)), int(round(pad_h - 0.1))
+        info = PreprocessInfo(image_size, input_size, r, r, pad_w, pad_h)
+        return info, (new_w, new_h), (left, top)
+
+    def _get_state(self, image_size: Tuple[int, int]) -> _BufferState:
+        """获取当前线程、当前原图尺寸的缓冲区，不存在时分配"""
+        state = getattr(self._local, "state", None)
+        if state is not None and state.info.image_size == image_size:
+            return state
+
+        info, (new_w, new_h), (left, top) = self._layout(image_size)
+        tensor = np.empty((1, 3, self.input_height, self.input_width), dtype=np.float32)
+        allocations = 1
+        if self.letterbox:
+            # 填充区域只在分配时写入一次，之后每帧只覆盖图像区域
+            tensor.fill(np.float32(self.pad_value) / np.float32(255.0))
+        resized = None
+        if (new_w, new_h) != image_size:
+            resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            allocations += 1
+
+        state = _BufferState(info, tensor, resized, (slice(top, top + new_h), slice(left, left + new_w)))
+        self._local.state = state
+        with self._stats_lock:
+            self.stats["allocations"] += allocations
+        return state
+
+    def preprocess(self, img: np.ndarray) -> np.ndarray:
+        """
+        预处理BGR图像
+
+        Args:
+            img: BGR图像 (H, W, 3) uint8，可以是只读数组
+
+        Returns:
+            模型输入张量 (1, 3, H, W) float32（复用缓冲区）
+        """
+        start = time.perf_counter()
+        height, width = img.shape[:2]
+        state = self._get_state((width, height))
+
+        src = img
+        if state.resized is not None:
+            src = cv2.resize(img, (state.resized.shape[1], state.resized.shape[0]),
+                             dst=state.resized, interpolation=cv2.INTER_LINEAR)
+
+        rows, cols = state.region
+        for channel in range(3):
+            # 输出通道c取自BGR的第2-c通道，即完成BGR->RGB
+            np.divide(src[:, :, 2 - channel], np.float32(255.0),
+                      out=state.tensor[0, channel, rows, cols], dtype=np.float32, casting="unsafe")
+
+        self._local.last_info = state.info
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.stats["frames"] += 1
+            self.stats["total_time"] += elapsed
+        return state.tensor
+
+    @property
+    def last_info(self) -> Optional[PreprocessInfo]:
+        """当前线程最近一次预处理的几何信息"""
+        return getattr(self._local, "last_info", None)
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取预处理统计信息（帧数、缓冲区分配次数、平均耗时）"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["avg_time_ms"] = stats["total_time"] / stats["frames"] * 1000 if stats["frames"] else 0.0
+        return stats
+
+
+# 一致性校验与基准测试代码：与各技能原有预处理流程对比耗时和内存分配
+if __name__ == "__main__":
+    import tracemalloc
+
+    def legacy_preprocess(frame, input_width, input_height):
+        """原技能中的预处理流程（含process入口处的防御性拷贝）"""
+        img = frame.copy()
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        img = cv2.resize(img, (input_width, input_height))
+        img = img.astype(np.float32) / 255.0
+        return np.expand_dims(img.transpose(2, 0, 1), axis=0)
+
+    def legacy_letterbox(img, input_width, input_height):
+        """原吊装姿态技能中的letterbox流程"""
+        shape = img.shape[:2]
+        r = min(input_height / shape[0], input_width / shape[1])
+        new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+        pad_w, pad_h = (input_width - new_unpad[0]) / 2, (input_height - new_unpad[1]) / 2
+        if shape[::-1] != new_unpad:
+            img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+        left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        img = np.ascontiguousarray(np.einsum('HWC->CHW', img)[::-1], dtype=np.single) / 255.0
+        return img[None]
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    frame.flags.writeable = False
+
+    stretch = ImagePreprocessor(640, 640)
+    boxed = ImagePreprocessor(640, 640, letterbox=True)
+    assert np.array_equal(stretch.preprocess(frame), legacy_preprocess(frame, 640, 640)), "拉伸预处理结果不一致"
+    assert np.array_equal(boxed.preprocess(frame), legacy_letterbox(frame, 640, 640)), "letterbox预处理结果不一致"
+    print(f"letterbox信息: {boxed.last_info}")
+
+    rounds = 100
+    for name, func in (("原实现", lambda: legacy_preprocess(frame, 640, 640)),
+                       ("共享预处理", lambda: stretch.preprocess(frame))):
+        func()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = (time.perf_counter() - start) / rounds * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name}: {elapsed:6.2f}ms/帧, 峰值内存 {peak / 1024 / 1024:6.2f}MB")
+
+    print(f"共享预处理统计: {stretch.get_stats()}")
+    print("一致性校验通过")
@@ -2,11 +2,18 @@
 技能基类模块，定义所有技能的共同接口
 """
 import logging
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List, Union, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 跟踪器尚未创建的标记（None 表示跟踪器不可用）
+_TRACKER_UNSET = object()
+# 默认跟踪器（各技能独立的或同摄像头共享的）参数
+_TRACKER_PARAMS = {"max_age": 30, "min_hits": 1, "iou_threshold": 0.3}
+
 class SkillResult:
     """
     技能执行结果类
@@ -119,17 +126,19 @@ class BaseSkill(ABC):
             self.status = self.config.get("status", True)
             self.skill_id = f"{self.name}_{id(self)}"
         
-        # 初始化跟踪器（用于目标跟踪）
-        try:
-            from app.services.tracker_service import TrackerService
-            self.tracker = TrackerService(
-                max_age=30, 
-                min_hits=1, 
-                iou_threshold=0.3
-            )
-        except ImportError:
-            self.log("warning", "无法导入跟踪器服务，将跳过目标跟踪")
-            self.tracker = None
+        # 跟踪器（用于目标跟踪）在首次访问 self.tracker 时创建，不做跟踪的技能不加载跟踪模块
+        self._tracker = _TRACKER_UNSET
+        self._tracker_replaced = False  # 子类赋值了自己的跟踪器时不使用共享跟踪器
+        # 同摄像头共享的跟踪器 (摄像头ID, 跟踪键, SharedTracker)，在检测线程中首次分配跟踪ID时获取
+        self._shared_tracker = None
+
+        # 共享预处理器，按 (输入宽, 输入高, 是否letterbox) 缓存，首次预处理时创建
+        self._preprocessors = {}
+
+        # 编译好的电子围栏，按 (围栏内容, 图像尺寸) 缓存，围栏配置修改后自动使用新的缓存项
+        self._fence_cache = OrderedDict()
+        # 越线检测（trigger_mode="cross"）的轨迹状态，围栏或图像尺寸变化时重建
+        self._fence_crossing = None
         
         # 初始化技能
         self._initialize()
@@ -207,9 +216,29 @@ class BaseSkill(ABC):
         log_method = getattr(logger, level.lower(), logger.info)
         log_method(f"{message}")
     
+    @property
+    def tracker(self):
+        """目标跟踪器，首次访问时创建；子类可直接赋值替换为自己的跟踪器"""
+        if self._tracker is _TRACKER_UNSET:
+            try:
+                from app.services.tracker_service import TrackerService
+                self._tracker = TrackerService(**_TRACKER_PARAMS)
+            except ImportError:
+                self.log("warning", "无法导入跟踪器服务，将跳过目标跟踪")
+                self._tracker = None
+        return self._tracker
+
+    @tracker.setter
+    def tracker(self, value):
+        self._tracker = value
+        self._tracker_replaced = True
+
     def add_tracking_ids(self, detections: List[Dict]) -> List[Dict]:
         """
         为检测结果添加跟踪ID
+
+        检测线程处理摄像头帧时，同一摄像头上跟踪键相同的任务共用一个跟踪器（每帧只关联一次，track_id一致），
+        否则使用技能自己的跟踪器
         
         Args:
             detections: 检测结果列表
@@ -217,11 +246,222 @@ class BaseSkill(ABC):
         Returns:
             带跟踪ID的检测结果列表
         """
+        shared = self._get_shared_tracker()
+        if shared is not None:
+            tracker, generation = shared
+            with self.ordered_section("tracking"):
+                tracked = tracker.update(generation, detections)
+            if tracked is not None:
+                return tracked
+            # 帧代次已被共享跟踪器越过（本任务处理过慢），改用自己的跟踪器
         if self.tracker:
-            return self.tracker.update(detections)
+            with self.ordered_section("tracking"):
+                return self.tracker.update(detections)
         else:
             return detections
-    
+
+    def shared_tracking_key(self) -> Optional[Tuple]:
+        """
+        共享跟踪键：同一摄像头上跟踪键相同的任务共用一个跟踪器，应包含所有影响检测结果的参数
+
+        默认由技能类型、模型名、输入尺寸、检测阈值和类别组成（技能类型涵盖解码时的类别过滤和
+        跟踪前的其他过滤），没有 model_name 的技能返回None（使用自己的跟踪器）；
+        检测结果还受其他参数影响的子类应覆盖此方法，确认不同技能跟踪前的检测结果相同时可去掉技能类型以跨技能共享
+        """
+        model_name = getattr(self, "model_name", None)
+        if not model_name:
+            return None
+        classes = getattr(self, "classes", None)
+        return (f"{type(self).__module__}.{type(self).__qualname__}", model_name,
+                getattr(self, "input_width", None), getattr(self, "input_height", None),
+                getattr(self, "conf_thres", None), getattr(self, "iou_thres", None),
+                tuple(classes) if isinstance(classes, (list, tuple)) else classes,
+                tuple(sorted(_TRACKER_PARAMS.items())))
+
+    def _get_shared_tracker(self):
+        """当前帧可用的共享跟踪器和帧代次，不可用时返回None"""
+        from app.core.config import settings
+
+        if self._tracker_replaced or not settings.SHARED_TRACKER_ENABLED:
+            return None
+        from app.services.inference_cache import inference_cache
+
+        scope = inference_cache.current_scope()
+        if scope is None:
+            return None
+        camera_id, generation = scope
+        try:
+            key = self.shared_tracking_key()
+            hash(key)
+        except TypeError:
+            return None
+        if key is None:
+            return None
+        cached = self._shared_tracker
+        if cached is None or cached[0] != camera_id or cached[1] != key:
+            from app.services.shared_tracker import shared_trackers
+
+            cached = (camera_id, key, shared_trackers.acquire(camera_id, key, self, **_TRACKER_PARAMS))
+            self._shared_tracker = cached
+        return cached[2], generation
+
+    def ordered_section(self, name: Optional[str] = None):
+        """
+        有序区：检测流水线中多帧并发处理时，区内的有状态步骤（跟踪器更新、帧间差分等）按帧顺序执行
+
+        一帧内依次进入的多个有序区分别按帧顺序执行；并非每帧都进入的有序区应命名
+
+        用法:
+            with self.ordered_section():
+                tracks = self.tracker.update(detections)
+
+        Args:
+            name: 有序区名称，同一名称的有序区之间按帧顺序执行
+
+        Returns:
+            上下文管理器，不在流水线中时直接执行
+        """
+        from app.services.frame_pipeline import ordered_section
+
+        return ordered_section(name)
+
+    def current_frame_info(self):
+        """
+        当前正在处理的帧的采集信息（帧代次和采集时间），可用于按采集时间计算速度、停留时长等
+
+        Returns:
+            FrameInfo(generation, capture_time)，不在任务检测中调用时为None
+        """
+        from app.services.frame_pipeline import current_frame_info
+
+        return current_frame_info()
+
+    def decode_yolo_output(self, outputs: Any, original_img: Any,
+                           class_names: Optional[Dict[int, str]] = None,
+                           class_filter: Optional[List[int]] = None,
+                           default_class_name: str = "unknown",
+                           conf_thres: Optional[float] = None,
+                           iou_thres: Optional[float] = None) -> List[Dict]:
+        """
+        使用共享的向量化实现解码YOLO检测输出，检测类技能的postprocess应优先调用此方法
+
+        Args:
+            outputs: 模型输出字典（包含output0）或output0数组
+            original_img: 原始图像，用于获取尺寸
+            class_names: 类别映射，默认使用技能的class_names
+            class_filter: 只保留这些类别ID，默认不过滤
+            default_class_name: 类别映射中不存在时使用的名称
+            conf_thres: 置信度阈值，默认使用技能的conf_thres
+            iou_thres: NMS阈值，默认使用技能的iou_thres
+
+        Returns:
+            检测结果列表，每项包含bbox、confidence、class_id、class_name
+        """
+        from app.skills.yolo_postprocess import decode_yolo_output
+
+        height, width = original_img.shape[:2]
+        preprocess_info = self.last_preprocess_info()
+        if preprocess_info is not None and preprocess_info.image_size != (width, height):
+            preprocess_info = None
+        return decode_yolo_output(
+            outputs,
+            image_size=(width, height),
+            input_size=(self.input_width, self.input_height),
+            conf_thres=self.conf_thres if conf_thres is None else conf_thres,
+            iou_thres=self.iou_thres if iou_thres is None else iou_thres,
+            class_names=getattr(self, "class_names", None) if class_names is None else class_names,
+            class_filter=class_filter,
+            default_class_name=default_class_name,
+            preprocess_info=preprocess_info
+        )
+
+    def _get_preprocessor(self, letterbox: Optional[bool] = None):
+        """
+        获取共享预处理器
+
+        Args:
+            letterbox: 是否使用letterbox，默认读取技能参数 params.letterbox（默认False，即直接拉伸）
+        """
+        from app.skills.image_preprocess import ImagePreprocessor
+
+        if letterbox is None:
+            letterbox = bool(self.config.get("params", {}).get("letterbox", False))
+        key = (self.input_width, self.input_height, letterbox)
+        preprocessor = self._preprocessors.get(key)
+        if preprocessor is None:
+            preprocessor = ImagePreprocessor(self.input_width, self.input_height, letterbox=letterbox)
+            self._preprocessors[key] = preprocessor
+        return preprocessor
+
+    def preprocess_image(self, img: Any, letterbox: Optional[bool] = None) -> Any:
+        """
+        共享的YOLO预处理：BGR图像 -> (1, 3, H, W) float32 张量
+
+        输出写入按线程预分配的缓冲区，下一帧预处理时会被覆盖，只应在本次推理中使用。
+
+        Args:
+            img: BGR图像，可以是只读数组
+            letterbox: 是否使用letterbox，默认读取技能参数
+
+        Returns:
+            模型输入张量
+        """
+        from app.services.frame_pipeline import add_stage_time
+
+        start_time = time.perf_counter()
+        input_tensor = self._get_preprocessor(letterbox).preprocess(img)
+        add_stage_time("preprocess", time.perf_counter() - start_time)
+        return input_tensor
+
+    def last_preprocess_info(self, letterbox: Optional[bool] = None):
+        """
+        获取当前线程最近一次预处理的几何信息（缩放比例和填充偏移）
+
+        Args:
+            letterbox: 对应preprocess_image时使用的letterbox参数
+
+        Returns:
+            PreprocessInfo，尚未预处理时返回None
+        """
+        return self._get_preprocessor(letterbox).last_info
+
+    def get_preprocess_stats(self) -> Dict[str, Dict[str, float]]:
+        """获取各预处理器的统计信息（帧数、缓冲区分配次数、平均耗时）"""
+        return {
+            f"{width}x{height}{'_letterbox' if letterbox else ''}": preprocessor.get_stats()
+            for (width, height, letterbox), preprocessor in self._preprocessors.items()
+        }
+
+    def own_frame(self, frame: Any) -> Any:
+        """
+        获取技能处理期间可安全持有的图像
+
+        只读帧由调用方保证在处理期间不会被修改，直接使用以省去整帧拷贝；
+        可写帧仍做防御性拷贝。
+
+        Args:
+            frame: 输入图像数组
+
+        Returns:
+            可供技能使用的图像
+        """
+        if not frame.flags.writeable:
+            return frame
+        return frame.copy()
+
+    def execution_graph(self):
+        """
+        创建技能内执行图，用于并发执行互不依赖的模型调用
+
+        预处理缓冲区按线程分配，同一模型的预处理、推理和后处理应放在同一个节点内完成。
+
+        Returns:
+            SkillGraph实例
+        """
+        from app.skills.execution_graph import SkillGraph
+
+        return SkillGraph()
+
     def is_fence_config_valid(self, fence_config: Dict) -> bool:
         """
         检查围栏配置是否有效
@@ -244,13 +484,45 @@ class BaseSkill(ABC):
         if not polygons:
             return False
         
-        # 检查是否有有效的多边形（至少3个点）
+        # 检查是否有有效的多边形（至少3个点）；越线模式下2个点的计数线也有效
+        min_points = 2 if fence_config.get("trigger_mode") == "cross" else 3
         for polygon in polygons:
-            if len(polygon) >= 3:
+            if len(polygon) >= min_points:
                 return True
         
         return False
 
+    def compile_fence(self, fence_config: Dict, image_size: Tuple[int, int] = None):
+        """
+        获取按图像尺寸编译好的围栏（缓存），围栏无效或未提供图像尺寸时返回None
+
+        Args:
+            fence_config: 电子围栏配置（围栏点使用归一化坐标 0-1）
+            image_size: 图像尺寸 (width, height)
+
+        Returns:
+            CompiledFence 或 None
+        """
+        from app.core.config import settings
+        from app.skills.fence_geometry import CompiledFence, fence_cache_key
+
+        if not self.is_fence_config_valid(fence_config) or not image_size:
+            return None
+
+        # 越线模式只用围栏边，不生成栅格掩码
+        build_mask = settings.FENCE_RASTER_MASK_ENABLED and fence_config.get("trigger_mode") != "cross"
+        key = (fence_cache_key(fence_config, image_size), build_mask)
+        compiled = self._fence_cache.get(key)
+        if compiled is not None:
+            self._fence_cache.move_to_end(key)
+            return compiled
+
+        compiled = CompiledFence.from_config(fence_config, image_size, build_mask=build_mask)
+        self._fence_cache[key] = compiled
+        while len(self._fence_cache) > max(1, settings.FENCE_CACHE_SIZE):
+            self._fence_cache.popitem(last=False)
+        return compiled
+
     def is_point_inside_fence(self, point: Tuple[float, float], fence_config: Dict, image_size: Tuple[int, int] = None) -> bool:
         """
         判断点是否在围栏内
@@ -271,19 +543,7 @@ class BaseSkill(ABC):
                 self.log("warning", "未提供图像尺寸，无法进行围栏判断")
                 return False
             
-            polygons = fence_config.get("points", [])
-            
-            for polygon in polygons:
-                if len(polygon) < 3:
-                    continue
-                
-                # 将归一化坐标转换为像素坐标
-                poly_points = [(p["x"] * image_size[0], p["y"] * image_size[1]) for p in polygon]
-                
-                if self._point_in_polygon(point, poly_points):
-                    return True
-            
-            return False
+            return self.compile_fence(fence_config, image_size).contains_point(point)
             
         except Exception as e:
             self.log("error", f"判断点是否在围栏内时出错: {str(e)}")
@@ -291,7 +551,10 @@ class BaseSkill(ABC):
     
     def filter_detections_by_fence(self, detections: List[Dict], fence_config: Dict, image_size: Tuple[int, int] = None) -> List[Dict]:
         """
-        根据电子围栏配置过滤检测结果，支持 trigger_mode（inside/outside）
+        根据电子围栏配置过滤检测结果，支持 trigger_mode（inside/outside/cross）
+
+        cross（越线）模式需要检测结果带 track_id（先调用 add_tracking_ids），只保留本帧穿过围栏边或计数线的检测，
+        并在检测结果副本中加入 "crossings" 事件列表；fence_config 中 "direction" 可选 any（默认）/in/out
         
         Args:
             detections: 检测结果列表
@@ -305,15 +568,26 @@ class BaseSkill(ABC):
             return detections
         
         trigger_mode = fence_config.get("trigger_mode", "inside")
-        filtered_results = []
-        
+
+        # 先取所有检测的关键点，再用编译好的围栏一次判断
+        candidates = []
+        points = []
         for detection in detections:
             point = self._get_detection_point(detection)
             if not point:
                 continue
-            
-            is_inside = self.is_point_inside_fence(point, fence_config, image_size)
-            
+            candidates.append(detection)
+            points.append(point)
+        if not candidates:
+            return []
+
+        if trigger_mode == "cross":
+            return self._filter_detections_by_crossing(candidates, points, fence_config, image_size)
+
+        inside_flags = self._points_inside_fence(points, fence_config, image_size)
+        filtered_results = []
+        
+        for detection, is_inside in zip(candidates, inside_flags):
             # 根据触发模式决定是否保留检测结果
             if trigger_mode == "inside" and is_inside:
                 # inside模式：只保留围栏内的检测结果
@@ -321,12 +595,62 @@ class BaseSkill(ABC):
             elif trigger_mode == "outside" and not is_inside:
                 # outside模式：只保留围栏外的检测结果
                 filtered_results.append(detection)
-            elif trigger_mode == "cross":
-                # cross模式（穿越检测）：需要跟踪支持，暂时保留所有结果
-                # 实际的穿越检测需要在跟踪器中实现
-                filtered_results.append(detection)
         
         return filtered_results
+
+    def _filter_detections_by_crossing(self, detections: List[Dict], points: List[Tuple[float, float]],
+                                       fence_config: Dict, image_size: Tuple[int, int] = None) -> List[Dict]:
+        """cross模式：用各轨迹上一帧和本帧的关键点做越线判断，只返回本帧越线的检测"""
+        from app.core.config import settings
+        from app.skills.fence_geometry import FenceCrossingDetector
+
+        if not image_size:
+            self.log("warning", "未提供图像尺寸，无法进行越线判断")
+            return []
+
+        tracked = [(detection, point) for detection, point in zip(detections, points)
+                   if detection.get("track_id") is not None]
+        try:
+            fence = self.compile_fence(fence_config, image_size)
+            direction = fence_config.get("direction", "any")
+            # 越线状态跨帧累积，流水线并发处理多帧时按帧顺序更新（与跟踪器更新是两个独立排序的有序区）
+            with self.ordered_section("fence_crossing"):
+                crossing = self._fence_crossing
+                if crossing is None or crossing.fence is not fence or crossing.direction != direction:
+                    crossing = FenceCrossingDetector(fence, direction=direction,
+                                                     max_gap=settings.FENCE_CROSS_MAX_GAP_FRAMES)
+                    self._fence_crossing = crossing
+                events = crossing.update([detection["track_id"] for detection, _ in tracked],
+                                         [point for _, point in tracked])
+        except Exception as e:
+            self.log("error", f"越线判断时出错: {str(e)}")
+            return []
+
+        filtered_results = []
+        for (detection, _), track_events in zip(tracked, events):
+            if track_events:
+                crossed = detection.copy()
+                crossed["crossings"] = track_events
+                filtered_results.append(crossed)
+        return filtered_results
+
+    def get_fence_cross_counts(self) -> Dict[int, Dict[str, int]]:
+        """越线模式下各围栏图形（按配置中的序号）分方向的累计越线次数"""
+        if self._fence_crossing is None:
+            return {}
+        return {index: dict(counts) for index, counts in self._fence_crossing.counts.items()}
+
+    def _points_inside_fence(self, points: List[Tuple[float, float]], fence_config: Dict,
+                             image_size: Tuple[int, int] = None) -> List[bool]:
+        """批量判断点是否在围栏内，出错或未提供图像尺寸时全部视为围栏外（与逐点调用 is_point_inside_fence 一致）"""
+        if not image_size:
+            self.log("warning", "未提供图像尺寸，无法进行围栏判断")
+            return [False] * len(points)
+        try:
+            return self.compile_fence(fence_config, image_size).contains(points).tolist()
+        except Exception as e:
+            self.log("error", f"判断点是否在围栏内时出错: {str(e)}")
+            return [False] * len(points)
     
     def _get_detection_point(self, detection: Dict) -> Optional[Tuple[float, float]]:
         """
@@ -359,23 +683,9 @@ class BaseSkill(ABC):
         Returns:
             点是否在多边形内
         """
-        x, y = point
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
+        from app.skills.fence_geometry import point_in_polygon
+
+        return point_in_polygon(point, polygon)
         
     def get_metadata(self) -> Dict[str, Any]:
         """
@@ -418,6 +728,24 @@ class BaseSkill(ABC):
             return self.config["required_models"]
         return []
         
+    def get_frame_input_size(self) -> Optional[Tuple[int, int]]:
+        """
+        获取技能所需的最大输入图像尺寸，用于帧读取器直接解码为缩放帧
+        
+        默认取模型输入尺寸 (input_width, input_height)；需要在原图上裁剪目标做二次识别等依赖原图细节的技能
+        可设置 params.full_resolution_input=True 或覆盖此方法返回None。
+        
+        Returns:
+            (宽, 高)，None表示需要原始分辨率
+        """
+        if self.config.get("params", {}).get("full_resolution_input", False):
+            return None
+        width = getattr(self, "input_width", None)
+        height = getattr(self, "input_height", None)
+        if not width or not height:
+            return None
+        return int(width), int(height)
+        
     def check_model_readiness(self) -> Tuple[bool, Optional[str]]:
         """
         检查所需模型和Triton服务器是否就绪
@@ -427,13 +755,16 @@ class BaseSkill(ABC):
         """
         from app.services.triton_client import triton_client
         
-        # 检查Triton服务器是否就绪
-        if not triton_client.is_server_ready():
-            return False, "Triton服务器未就绪"
-        
         # 获取所需模型
         required_models = self.get_required_models()
         
+        # 检查Triton服务器是否就绪（所需模型全部使用进程内推理后端时无需Triton）
+        uses_triton = not required_models or any(
+            model_name and triton_client.uses_triton(model_name) for model_name in required_models
+        )
+        if uses_triton and not triton_client.is_server_ready():
+            return False, "Triton服务器未就绪"
+        
         # 检查所有模型是否就绪
         for model_name in required_models:
             if model_name and not triton_client.is_model_ready(model_name):
@@ -0,0 +1,299 @@
+"""
+YOLO检测输出的向量化后处理模块，供所有检测类技能共享
+
+替代各技能中逐行遍历8400个锚框的Python循环和逐类别调用cv2.dnn.NMSBoxes的实现：
+1. 使用numpy掩码一次性完成置信度过滤和类别过滤
+2. 向量化完成 xywh -> 像素坐标 的转换、缩放和边界修正
+3. 一次完成按类别区分的批量NMS
+
+输出与原有逐行循环实现保持一致（相同的框、置信度、类别及结果顺序）。
+"""
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.skills.image_preprocess import PreprocessInfo
+
+
+def _class_order(class_ids: np.ndarray) -> List[int]:
+    """
+    返回结果中类别的排列顺序
+
+    原实现通过遍历 set(class_ids) 决定输出顺序，这里按同样的插入顺序构建集合，
+    使跟踪器等依赖结果顺序的下游逻辑行为不变。
+    """
+    return list(set(class_ids.tolist()))
+
+
+def nms_boxes(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray,
+              conf_thres: float, iou_thres: float) -> np.ndarray:
+    """
+    按类别区分的批量NMS（语义与逐类别调用cv2.dnn.NMSBoxes一致）
+
+    Args:
+        boxes: 整数像素框 (N, 4)，格式 [left, top, width, height]
+        scores: 置信度 (N,)
+        class_ids: 类别ID (N,)
+        conf_thres: 置信度阈值（与cv2一致，分数需严格大于该阈值）
+        iou_thres: IoU阈值，重叠度大于该值的同类框被抑制
+
+    Returns:
+        保留框的索引，按分数降序（同分时保持原始顺序）
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    candidates = np.flatnonzero(scores > np.float32(conf_thres))
+    if candidates.size == 0:
+        return np.empty((0,), dtype=np.int64)
+
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    boxes = np.asarray(boxes, dtype=np.int64)[order]
+    classes = np.asarray(class_ids)[order]
+
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = x1 + boxes[:, 2]
+    y2 = y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    iou_limit = np.float32(iou_thres)
+
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+
+        rest = np.arange(i + 1, len(order))
+        rest = rest[~suppressed[rest] & (classes[rest] == classes[i])]
+        if rest.size == 0:
+            continue
+
+        inter_w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        inter_h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        inter = np.where((inter_w > 0) & (inter_h > 0), inter_w * inter_h, 0).astype(np.float64)
+        area_sum = (areas[i] + areas[rest]).astype(np.float64)
+        union = area_sum - inter
+
+        # 与cv2的jaccardDistance一致：面积和为0时视为完全重叠
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(union != 0, inter / union, 0.0)
+        overlap = np.where(area_sum <= 0, np.float32(1.0),
+                           np.float32(1.0) - (1.0 - ratio).astype(np.float32))
+        suppressed[rest[overlap > iou_limit]] = True
+
+    return order[np.asarray(keep, dtype=np.int64)]
+
+
+def decode_yolo_output(output: Union[np.ndarray, Dict[str, np.ndarray]],
+                       image_size: Tuple[int, int],
+                       input_size: Tuple[int, int],
+                       conf_thres: float,
+                       iou_thres: float,
+                       class_names: Optional[Dict[int, str]] = None,
+                       class_filter: Optional[Iterable[int]] = None,
+                       default_class_name: str = "unknown",
+                       preprocess_info: Optional["PreprocessInfo"] = None) -> List[Dict[str, Any]]:
+    """
+    解码YOLO检测输出 (1, 4+nc, anchors)
+
+    Args:
+        output: 模型输出数组，或包含"output0"的输出字典
+        image_size: 原始图像尺寸 (width, height)
+        input_size: 模型输入尺寸 (width, height)
+        conf_thres: 置信度阈值
+        iou_thres: NMS的IoU阈值
+        class_names: 类别ID到名称的映射
+        class_filter: 只保留这些类别ID（为空则保留全部类别）
+        default_class_name: 类别映射中不存在时使用的名称
+        preprocess_info: 预处理几何信息，用于还原letterbox的缩放和填充，为空时按直接拉伸处理
+
+    Returns:
+        检测结果列表，每项包含bbox([x1,y1,x2,y2])、confidence、class_id、class_name
+    """
+    if isinstance(output, dict):
+        output = output.get("output0")
+        if output is None:
+            return []
+
+    # (1, 4+nc, anchors) -> (anchors, 4+nc)，只取视图不拷贝
+    preds = np.squeeze(output, axis=0).T
+    class_scores = preds[:, 4:]
+    max_scores = class_scores.max(axis=1)
+    class_ids = class_scores.argmax(axis=1)
+
+    mask = max_scores >= conf_thres
+    if class_filter is not None:
+        mask &= np.isin(class_ids, np.fromiter(class_filter, dtype=np.int64))
+    if not mask.any():
+        return []
+
+    scores = max_scores[mask]
+    class_ids = class_ids[mask]
+    # 与原逐元素计算的精度一致：numpy 1.x 中 float32 标量与Python浮点数运算提升为 float64，
+    # numpy 2（NEP 50）中保持 float32，取整边界上的框会因此相差1个像素
+    xywh = preds[mask, :4].astype(type(preds.dtype.type(0) * 1.0))
+
+    width, height = image_size
+    if preprocess_info is not None:
+        x_factor, y_factor = preprocess_info.x_factor, preprocess_info.y_factor
+        pad_x, pad_y = preprocess_info.pad_x, preprocess_info.pad_y
+    else:
+        x_factor = width / input_size[0]
+        y_factor = height / input_size[1]
+        pad_x = pad_y = 0
+
+    # 中心点宽高 -> 左上角+宽高，并做边界修正（截断取整与int()一致）
+    left = np.trunc((xywh[:, 0] - xywh[:, 2] / 2 - pad_x) * x_factor).astype(np.int64)
+    top = np.trunc((xywh[:, 1] - xywh[:, 3] / 2 - pad_y) * y_factor).astype(np.int64)
+    box_w = np.trunc(xywh[:, 2] * x_factor).astype(np.int64)
+    box_h = np.trunc(xywh[:, 3] * y_factor).astype(np.int64)
+    left = np.maximum(left, 0)
+    top = np.maximum(top, 0)
+    box_w = np.minimum(box_w, width - left)
+    box_h = np.minimum(box_h, height - top)
+    boxes = np.stack([left, top, box_w, box_h], axis=1)
+
+    keep = nms_boxes(boxes, scores, class_ids, conf_thres, iou_thres)
+    if keep.size == 0:
+        return []
+
+    # 按原实现的类别顺序输出，同类别内按分数降序
+    kept_classes = class_ids[keep]
+    class_names = class_names or {}
+    results = []
+    for class_id in _class_order(class_ids):
+        for idx in keep[kept_classes == class_id].tolist():
+            x, y, w, h = boxes[idx].tolist()
+            results.append({
+                "bbox": [x, y, x + w, y + h],
+                "confidence": float(scores[idx]),
+                "class_id": int(class_id),
+                "class_name": class_names.get(int(class_id), default_class_name)
+            })
+    return results
+
+
+# 一致性校验与基准测试代码：与各技能原有的逐行循环实现对比
+# 仓库中没有模型权重，默认用合成的YOLO形状输出校验；可传入从线上模型保存的output0张量（np.save的.npy，
+# 或包含output0的.npz）在真实输出上校验:
+#     python -m app.skills.yolo_postprocess recorded/helmet_output0.npy recorded/coco_output0.npz
+if __name__ == "__main__":
+    import argparse
+    import time
+    import cv2
+
+    parser = argparse.ArgumentParser(description="YOLO后处理与原逐行循环实现的一致性校验")
+    parser.add_argument("recorded", nargs="*", help="录制的模型输出张量文件 (1, 4+nc, anchors)")
+    parser.add_argument("--input-size", type=int, default=None,
+                        help="录制输出对应的模型输入边长，默认按锚框数推算（正方形输入）")
+    cli_args = parser.parse_args()
+
+    def reference_decode(output, image_size, input_size, conf_thres, iou_thres, class_names):
+        """原各技能postprocess中的逐行循环实现"""
+        width, height = image_size
+        detections = np.transpose(np.squeeze(output, axis=0), (1, 0))
+        boxes, scores, class_ids = [], [], []
+        x_factor = width / input_size[0]
+        y_factor = height / input_size[1]
+        for i in range(detections.shape[0]):
+            classes_scores = detections[i][4:]
+            max_score = np.amax(classes_scores)
+            if max_score >= conf_thres:
+                class_id = np.argmax(classes_scores)
+                x, y, w, h = detections[i][0], detections[i][1], detections[i][2], detections[i][3]
+                left = max(0, int((x - w / 2) * x_factor))
+                top = max(0, int((y - h / 2) * y_factor))
+                width_box = min(int(w * x_factor), width - left)
+                height_box = min(int(h * y_factor), height - top)
+                boxes.append([left, top, width_box, height_box])
+                scores.append(max_score)
+                class_ids.append(class_id)
+        results = []
+        for class_id in set(class_ids):
+            cls_indices = [i for i, cid in enumerate(class_ids) if cid == class_id]
+            cls_boxes = [boxes[i] for i in cls_indices]
+            cls_scores = [scores[i] for i in cls_indices]
+            for j in cv2.dnn.NMSBoxes(cls_boxes, cls_scores, conf_thres, iou_thres):
+                idx = cls_indices[j[0] if isinstance(j, (list, tuple, np.ndarray)) else j]
+                box = boxes[idx]
+                results.append({
+                    "bbox": [box[0], box[1], box[0] + box[2], box[1] + box[3]],
+                    "confidence": float(scores[idx]),
+                    "class_id": int(class_id),
+                    "class_name": class_names.get(int(class_id), "unknown")
+                })
+        return results
+
+    def synthetic_output(rng, num_classes, num_objects, anchors=8400, input_size=640):
+        """生成YOLO形状的输出：背景低分锚框 + 若干目标周围的密集高分候选框"""
+        preds = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+        preds[0:2] = rng.uniform(0, input_size, (2, anchors))
+        preds[2:4] = rng.uniform(4, 200, (2, anchors))
+        preds[4:] = rng.uniform(0, 0.3, (num_classes, anchors))
+        for _ in range(num_objects):
+            cls = rng.integers(num_classes)
+            cx, cy = rng.uniform(0, input_size, 2)
+            bw, bh = rng.uniform(20, 300, 2)
+            idx = rng.choice(anchors, size=12, replace=False)
+            preds[0, idx] = cx + rng.normal(0, 4, 12)
+            preds[1, idx] = cy + rng.normal(0, 4, 12)
+            preds[2, idx] = bw + rng.normal(0, 6, 12)
+            preds[3, idx] = bh + rng.normal(0, 6, 12)
+            preds[4 + cls, idx] = rng.uniform(0.3, 0.95, 12)
+        return preds[np.newaxis]
+
+    def load_recorded(path):
+        """读取录制的输出张量，.npz 取其中的 output0"""
+        data = np.load(path)
+        if isinstance(data, np.lib.npyio.NpzFile):
+            data = data["output0"]
+        return data if data.ndim == 3 else data[np.newaxis]
+
+    for path in cli_args.recorded:
+        output = load_recorded(path)
+        anchors = output.shape[2]
+        # 三个检测头步长 8/16/32：anchors = s^2 * (1/64 + 1/256 + 1/1024)
+        side = cli_args.input_size or int(round((anchors * 1024 / 21) ** 0.5))
+        names = {i: f"class_{i}" for i in range(output.shape[1] - 4)}
+        for conf_thres in (0.25, 0.5):
+            for image_size in ((1920, 1080), (1280, 720), (side, side)):
+                expected = reference_decode(output, image_size, (side, side), conf_thres, 0.45, names)
+                actual = decode_yolo_output(output, image_size, (side, side), conf_thres, 0.45, names)
+                assert actual == expected, f"录制输出 {path} 结果不一致: conf={conf_thres}, image={image_size}"
+        print(f"录制输出 {path}: shape={tuple(output.shape)}, 输入 {side}x{side}, 一致")
+
+    rng = np.random.default_rng(0)
+    # 覆盖各技能的检测头形状：单类别/少类别/COCO 80类，以及 320/640/1280 输入对应的锚框数
+    layouts = [(1, 8400, 640), (2, 2100, 320), (80, 33600, 1280)]
+    for num_classes, anchors, side in layouts:
+        names = {i: f"class_{i}" for i in range(num_classes)}
+        for image_size in ((1920, 1080), (1280, 720)):
+            output = synthetic_output(rng, num_classes, 30, anchors=anchors, input_size=side)
+            expected = reference_decode(output, image_size, (side, side), 0.5, 0.45, names)
+            actual = decode_yolo_output(output, image_size, (side, side), 0.5, 0.45, names)
+            assert actual == expected, f"结果不一致: classes={num_classes}, anchors={anchors}"
+
+    cases = [(2, 5), (2, 40), (80, 20), (80, 100)]
+    for num_classes, num_objects in cases:
+        names = {i: f"class_{i}" for i in range(num_classes)}
+        for image_size in ((1920, 1080), (1280, 720)):
+            output = synthetic_output(rng, num_classes, num_objects)
+            expected = reference_decode(output, image_size, (640, 640), 0.5, 0.45, names)
+            actual = decode_yolo_output(output, image_size, (640, 640), 0.5, 0.45, names)
+            assert actual == expected, f"结果不一致: classes={num_classes}, objects={num_objects}"
+
+        output = synthetic_output(rng, num_classes, num_objects)
+        rounds = 20
+        start = time.perf_counter()
+        for _ in range(rounds):
+            reference_decode(output, (1920, 1080), (640, 640), 0.5, 0.45, names)
+        loop_ms = (time.perf_counter() - start) / rounds * 1000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            decode_yolo_output(output, (1920, 1080), (640, 640), 0.5, 0.45, names)
+        vec_ms = (time.perf_counter() - start) / rounds * 1000
+        print(f"classes={num_classes:2d}, objects={num_objects:3d}: 循环实现 {loop_ms:7.2f}ms, "
+              f"向量化 {vec_ms:6.2f}ms, 加速 {loop_ms / vec_ms:5.1f}x")
+
+    print("一致性校验通过")